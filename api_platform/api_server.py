@@ -2,9 +2,10 @@
 Commission Intelligence Platform - FastAPI Server
 RESTful API implementation
 """
-from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, BackgroundTasks, Body
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date
@@ -18,6 +19,14 @@ from dotenv import load_dotenv
 # Add parent directory to path for imports
 sys.path.append('..')
 from commission_app import get_supabase_client
+from auth.api_key_cache import APIKeyCache, APIKeyVerifier, create_redis_client
+from database.async_data import AsyncDataAccess
+from database.commission_aggregates import CommissionAggregates
+from database.policy_ingestion import BATCH_MAX_POLICIES, TransactionIdPool, insert_rows, validate_policy_batch
+from database.policy_search import (
+    DEFAULT_SEARCH_FIELDS, SEARCHABLE_FIELDS, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT,
+    build_search_results, search_filter, search_select_clause
+)
 
 # Load environment variables
 load_dotenv()
@@ -43,6 +52,31 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
+# Shared by the API key cache and the aggregates cache (None without redis)
+redis_client = create_redis_client()
+
+# API keys are verified from a cache shared through Redis; last_used is written behind
+api_key_verifier = APIKeyVerifier(get_supabase_client, APIKeyCache(redis_client))
+
+# Handlers await their queries here instead of blocking the event loop
+db = AsyncDataAccess(get_supabase_client)
+
+# Totals computed in the database, cached in Redis by data version
+commission_aggregates = CommissionAggregates(db, redis_client)
+
+# Transaction IDs for API-created policies, reserved in bulk
+transaction_ids = TransactionIdPool(get_supabase_client)
+
+@app.on_event("startup")
+async def start_background_services():
+    api_key_verifier.start()
+    await db.connect()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    api_key_verifier.stop()
+    await db.close()
+
 # Models
 class PolicyBase(BaseModel):
     policy_number: str
@@ -91,24 +125,19 @@ class WebhookResponse(BaseModel):
     is_active: bool
 
 # Utility functions
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify API key and return user context."""
     api_key = credentials.credentials
     
-    # Get Supabase client
-    supabase = get_supabase_client()
-    
-    # Check API key in database
-    result = supabase.table('api_keys').select("*").eq('api_key', api_key).eq('is_active', True).execute()
+    # Cached keys are verified without any I/O
+    cached, key_data = api_key_verifier.verify_local(api_key)
+    if not cached:
+        # Redis / database lookup off the event loop
+        key_data = await run_in_threadpool(api_key_verifier.verify, api_key)
     
-    if not result.data:
+    if not key_data:
         raise HTTPException(status_code=401, detail="Invalid API key")
     
-    key_data = result.data[0]
-    
-    # Update last used
-    supabase.table('api_keys').update({'last_used': datetime.now().isoformat()}).eq('id', key_data['id']).execute()
-    
     return key_data
 
 def calculate_commission(premium: float, rate: float, policy_type: str, transaction_type: str) -> Dict[str, float]:
@@ -128,6 +157,66 @@ def calculate_commission(premium: float, rate: float, policy_type: str, transact
         "agency_commission": round(gross * (1 - agent_split), 2)
     }
 
+def build_policy_data(policy: PolicyCreate, api_key: dict, transaction_id: Optional[str] = None) -> Dict[str, Any]:
+    """Policies row for a validated policy (commission calculated when a rate is given)."""
+    # Calculate commission if rate provided
+    commission = 0
+    if policy.commission_rate:
+        calc = calculate_commission(
+            policy.premium, 
+            policy.commission_rate, 
+            policy.policy_type or "AUTO",
+            policy.transaction_type
+        )
+        commission = calc['agent_commission']
+    
+    policy_data = {
+        'Transaction ID': transaction_id,
+        'Policy Number': policy.policy_number,
+        'Customer': policy.customer,
+        'Effective Date': policy.effective_date.isoformat(),
+        'X-Date': policy.expiration_date.isoformat() if policy.expiration_date else None,
+        'Premium Sold': policy.premium,
+        'Policy Type': policy.policy_type,
+        'MGA/Carrier': policy.carrier,
+        'Transaction Type': policy.transaction_type,
+        'Agent Estimated Comm $': commission,
+        'api_source': 'api_platform',
+        'external_id': policy.external_id,
+        'created_at': datetime.now().isoformat()
+    }
+    
+    # Add user email if in production
+    if 'user_email' in api_key:
+        policy_data['user_email'] = api_key['user_email']
+    
+    return policy_data
+
+def policy_response(created: Dict[str, Any]) -> PolicyResponse:
+    """PolicyResponse for an inserted policies row."""
+    return PolicyResponse(
+        id=str(created.get('_id', '')),
+        policy_number=created.get('Policy Number', ''),
+        customer=created.get('Customer', ''),
+        effective_date=created.get('Effective Date', ''),
+        expiration_date=created.get('X-Date', ''),
+        premium=float(created.get('Premium Sold', 0)),
+        policy_type=created.get('Policy Type', ''),
+        carrier=created.get('MGA/Carrier', ''),
+        commission=float(created.get('Agent Estimated Comm $', 0)),
+        status='active',
+        created_at=created.get('created_at', datetime.now()),
+        transaction_type=created.get('Transaction Type', 'NEW')
+    )
+
+async def trigger_batch_webhook(payload: Dict[str, Any], user_email: Optional[str]):
+    """Deliver one policies.batch_created event (runs after the response is sent)."""
+    try:
+        from webhook_handler import WebhookHandler, WebhookEvents
+        await WebhookHandler().trigger_event(WebhookEvents.POLICIES_BATCH_CREATED, payload, user_email=user_email)
+    except Exception as e:
+        print(f"Batch webhook delivery failed: {e}")
+
 # Routes
 @app.get("/")
 async def root():
@@ -156,10 +245,8 @@ async def list_policies(
     api_key: dict = Depends(verify_api_key)
 ):
     """List all policies for authenticated user."""
-    supabase = get_supabase_client()
-    
     # Build query
-    query = supabase.table('policies').select("*")
+    query = db.table('policies').select("*")
     
     # Filter by user
     if 'user_email' in api_key:
@@ -174,7 +261,7 @@ async def list_policies(
     end = start + per_page - 1
     query = query.range(start, end)
     
-    result = query.execute()
+    result = await db.execute(query)
     
     # Format response
     policies = []
@@ -202,57 +289,14 @@ async def create_policy(
     api_key: dict = Depends(verify_api_key)
 ):
     """Create a new policy."""
-    supabase = get_supabase_client()
-    
-    # Calculate commission if rate provided
-    commission = 0
-    if policy.commission_rate:
-        calc = calculate_commission(
-            policy.premium, 
-            policy.commission_rate, 
-            policy.policy_type or "AUTO",
-            policy.transaction_type
-        )
-        commission = calc['agent_commission']
-    
-    # Create policy data
-    policy_data = {
-        'Policy Number': policy.policy_number,
-        'Customer': policy.customer,
-        'Effective Date': policy.effective_date.isoformat(),
-        'X-Date': policy.expiration_date.isoformat() if policy.expiration_date else None,
-        'Premium Sold': policy.premium,
-        'Policy Type': policy.policy_type,
-        'MGA/Carrier': policy.carrier,
-        'Transaction Type': policy.transaction_type,
-        'Agent Estimated Comm $': commission,
-        'api_source': 'api_platform',
-        'external_id': policy.external_id,
-        'created_at': datetime.now().isoformat()
-    }
-    
-    # Add user email if in production
-    if 'user_email' in api_key:
-        policy_data['user_email'] = api_key['user_email']
+    transaction_id = (await db.run(transaction_ids.allocate, 1))[0]
+    policy_data = build_policy_data(policy, api_key, transaction_id)
     
     # Insert policy
-    result = supabase.table('policies').insert(policy_data).execute()
+    result = await db.execute(db.table('policies').insert(policy_data))
     
     if result.data:
-        created = result.data[0]
-        return PolicyResponse(
-            id=created.get('_id', ''),
-            policy_number=created.get('Policy Number', ''),
-            customer=created.get('Customer', ''),
-            effective_date=created.get('Effective Date', ''),
-            expiration_date=created.get('X-Date', ''),
-            premium=float(created.get('Premium Sold', 0)),
-            policy_type=created.get('Policy Type', ''),
-            carrier=created.get('MGA/Carrier', ''),
-            commission=float(created.get('Agent Estimated Comm $', 0)),
-            status='active',
-            created_at=created.get('created_at', datetime.now())
-        )
+        return policy_response(result.data[0])
     
     raise HTTPException(status_code=400, detail="Failed to create policy")
 
@@ -289,8 +333,6 @@ async def create_webhook(
     api_key: dict = Depends(verify_api_key)
 ):
     """Register a new webhook."""
-    supabase = get_supabase_client()
-    
     # Generate webhook secret if not provided
     if not webhook.secret:
         webhook.secret = secrets.token_urlsafe(32)
@@ -304,7 +346,7 @@ async def create_webhook(
         'created_at': datetime.now().isoformat()
     }
     
-    result = supabase.table('webhook_endpoints').insert(webhook_data).execute()
+    result = await db.execute(db.table('webhook_endpoints').insert(webhook_data))
     
     if result.data:
         created = result.data[0]
@@ -321,14 +363,12 @@ async def create_webhook(
 @app.get("/v1/webhooks", response_model=List[WebhookResponse])
 async def list_webhooks(api_key: dict = Depends(verify_api_key)):
     """List all webhooks for authenticated user."""
-    supabase = get_supabase_client()
-    
-    query = supabase.table('webhook_endpoints').select("*")
+    query = db.table('webhook_endpoints').select("*")
     
     if 'user_email' in api_key:
         query = query.eq('user_email', api_key['user_email'])
     
-    result = query.execute()
+    result = await db.execute(query)
     
     webhooks = []
     for hook in result.data:
@@ -342,6 +382,19 @@ async def list_webhooks(api_key: dict = Depends(verify_api_key)):
     
     return webhooks
 
+# API key management
+@app.delete("/v1/api-keys/{key_id}")
+async def revoke_api_key(key_id: str, api_key: dict = Depends(verify_api_key)):
+    """Deactivate one of the caller's API keys; every worker stops accepting it at once."""
+    user_email = api_key.get('user_email')
+    if not user_email:
+        raise HTTPException(status_code=403, detail="API key has no owner")
+    
+    if not await db.run(api_key_verifier.deactivate, key_id, user_email):
+        raise HTTPException(status_code=404, detail="API key not found")
+    
+    return {'id': key_id, 'revoked': True}
+
 # Analytics endpoints
 @app.get("/v1/analytics/summary")
 async def get_analytics_summary(
@@ -350,31 +403,39 @@ async def get_analytics_summary(
     api_key: dict = Depends(verify_api_key)
 ):
     """Get commission analytics summary."""
-    supabase = get_supabase_client()
+    # Year to date unless a period is given
+    start_date = start_date or date(date.today().year, 1, 1)
+    end_date = end_date or date.today()
+    
+    summary = await commission_aggregates.get(api_key.get('user_email'), start_date, end_date)
+    totals = summary['totals']
+    policies = totals['transactions'] - totals['payments']
     
-    # This would aggregate data from policies table
-    # For demo, return mock data
     return {
         "period": {
-            "start": start_date or date(2025, 1, 1),
-            "end": end_date or date.today()
+            "start": start_date,
+            "end": end_date
         },
         "totals": {
-            "policies": 156,
-            "premium": 187500.00,
-            "commission_earned": 22500.00,
-            "commission_paid": 18750.00,
-            "commission_pending": 3750.00
+            "policies": policies,
+            "premium": totals['premium'],
+            "commission_earned": totals['commission'],
+            "commission_paid": totals['paid'],
+            "commission_pending": round(totals['commission'] - totals['paid'], 2)
         },
         "by_type": {
-            "NEW": {"count": 45, "commission": 15000.00},
-            "RWL": {"count": 98, "commission": 7000.00},
-            "END": {"count": 13, "commission": 500.00}
+            t_type: {"count": figures['transactions'], "commission": figures['commission']}
+            for t_type, figures in summary['by_type'].items()
         },
         "by_carrier": [
-            {"carrier": "Progressive", "policies": 45, "commission": 8500.00},
-            {"carrier": "State Farm", "policies": 38, "commission": 7200.00},
-            {"carrier": "Allstate", "policies": 29, "commission": 4800.00}
+            {"carrier": item['carrier'], "policies": item['transactions'] - item['payments'],
+             "commission": item['commission']}
+            for item in summary['by_carrier']
+        ],
+        "by_month": [
+            {"month": item['month'], "policies": item['transactions'] - item['payments'],
+             "premium": item['premium'], "commission": item['commission'], "paid": item['paid']}
+            for item in summary['by_month']
         ]
     }
 
@@ -397,12 +458,10 @@ async def get_upcoming_renewals(
     api_key: dict = Depends(verify_api_key)
 ):
     """Get policies with upcoming renewals."""
-    supabase = get_supabase_client()
-    
     from datetime import timedelta
     future_date = (datetime.now() + timedelta(days=days_ahead)).date()
     
-    query = supabase.table('policies').select("*")
+    query = db.table('policies').select("*")
     if 'user_email' in api_key:
         query = query.eq('user_email', api_key['user_email'])
     
@@ -410,7 +469,7 @@ async def get_upcoming_renewals(
     query = query.gte('X-Date', datetime.now().date().isoformat())
     query = query.lte('X-Date', future_date.isoformat())
     
-    result = query.execute()
+    result = await db.execute(query)
     
     renewals = []
     for policy in result.data:
@@ -431,24 +490,57 @@ async def get_upcoming_renewals(
 # Batch Operations
 @app.post("/v1/policies/batch")
 async def create_policies_batch(
-    policies: List[PolicyCreate],
+    background_tasks: BackgroundTasks,
+    policies: List[Dict[str, Any]] = Body(...),
     api_key: dict = Depends(verify_api_key)
 ):
     """Create multiple policies in one request."""
+    if len(policies) > BATCH_MAX_POLICIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POLICIES} policies per batch")
+    
+    # Validate everything first; invalid items are reported by index and skipped
+    valid, errors = validate_policy_batch(policies, PolicyCreate)
+    
+    created = {}
+    if valid:
+        ids = await db.run(transaction_ids.allocate, len(valid))
+        rows = [(index, build_policy_data(policy, api_key, transaction_id))
+                for (index, policy), transaction_id in zip(valid, ids)]
+        created, insert_errors = await insert_rows(db, 'policies', rows)
+        errors.extend(insert_errors)
+    
+    # The rows are already saved, so a row that can't be turned into a response
+    # is reported by index instead of failing the whole batch
     created_policies = []
-    errors = []
-    
-    for idx, policy in enumerate(policies):
+    for index in sorted(created):
         try:
-            # Reuse single policy creation logic
-            result = await create_policy(policy, api_key)
-            created_policies.append(result)
-        except Exception as e:
+            created_policies.append(policy_response(created[index]))
+        except (TypeError, ValueError) as e:
             errors.append({
-                'index': idx,
-                'policy_number': policy.policy_number,
-                'error': str(e)
+                'index': index,
+                'policy_number': created[index].get('Policy Number'),
+                'error': f"Policy was created but could not be returned: {e}"
             })
+    errors.sort(key=lambda error: error['index'])
+    
+    # One event for the whole batch instead of one per policy
+    if created:
+        background_tasks.add_task(trigger_batch_webhook, {
+            'batch_size': len(policies),
+            'created_count': len(created),
+            'error_count': len(errors),
+            'policies': [
+                {
+                    'id': created[index].get('_id'),
+                    'transaction_id': created[index].get('Transaction ID'),
+                    'policy_number': created[index].get('Policy Number'),
+                    'customer': created[index].get('Customer'),
+                    'premium': created[index].get('Premium Sold'),
+                    'commission': created[index].get('Agent Estimated Comm $')
+                }
+                for index in sorted(created)
+            ]
+        }, api_key.get('user_email'))
     
     return {
         'created': created_policies,
@@ -461,35 +553,39 @@ async def create_policies_batch(
 @app.get("/v1/search")
 async def search_policies(
     q: str,
-    search_fields: List[str] = ["Policy Number", "Customer"],
+    search_fields: List[str] = Query(DEFAULT_SEARCH_FIELDS),
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    offset: int = 0,
     api_key: dict = Depends(verify_api_key)
 ):
-    """Search across multiple fields."""
-    supabase = get_supabase_client()
-    
-    results = []
-    for field in search_fields:
-        query = supabase.table('policies').select("*")
-        
-        if 'user_email' in api_key:
-            query = query.eq('user_email', api_key['user_email'])
-        
-        # Case-insensitive search
-        query = query.ilike(field, f'%{q}%')
-        result = query.execute()
-        
-        for policy in result.data:
-            # Avoid duplicates
-            if not any(p.get('_id') == policy.get('_id') for p in results):
-                results.append({
-                    'id': policy.get('_id'),
-                    'policy_number': policy.get('Policy Number'),
-                    'customer': policy.get('Customer'),
-                    'matched_field': field,
-                    'premium': float(policy.get('Premium Sold', 0))
-                })
-    
-    return {"results": results, "count": len(results), "query": q}
+    """Search across multiple fields in one query."""
+    unsupported = [field for field in search_fields if field not in SEARCHABLE_FIELDS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported search fields: {', '.join(unsupported)}")
+    
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    
+    query = db.table('policies').select(search_select_clause(search_fields))
+    
+    if 'user_email' in api_key:
+        query = query.eq('user_email', api_key['user_email'])
+    
+    # Case-insensitive match on any field; one extra row tells whether there is another page
+    query = query.or_(search_filter(q, search_fields)).order('_id').range(offset, offset + limit)
+    result = await db.execute(query)
+    
+    rows = result.data or []
+    results = build_search_results(rows[:limit], q, search_fields)
+    
+    return {
+        "results": results,
+        "count": len(results),
+        "query": q,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit
+    }
 
 # Commission history
 @app.get("/v1/commissions/history")
@@ -500,28 +596,9 @@ async def get_commission_history(
     api_key: dict = Depends(verify_api_key)
 ):
     """Get historical commission data with filters."""
-    supabase = get_supabase_client()
-    
-    query = supabase.table('policies').select("*")
-    
-    if 'user_email' in api_key:
-        query = query.eq('user_email', api_key['user_email'])
-    
-    # Date filtering
-    if start_date:
-        query = query.gte('Effective Date', start_date.isoformat())
-    if end_date:
-        query = query.lte('Effective Date', end_date.isoformat())
-    
-    # Transaction type filter
-    if transaction_type:
-        query = query.eq('Transaction Type', transaction_type)
-    
-    result = query.execute()
-    
-    # Calculate totals
-    total_premium = sum(float(p.get('Premium Sold', 0)) for p in result.data)
-    total_commission = sum(float(p.get('Agent Estimated Comm $', 0)) for p in result.data)
+    # Totals are aggregated in the database; only the aggregates come back
+    summary = await commission_aggregates.get(api_key.get('user_email'), start_date, end_date, transaction_type)
+    totals = summary['totals']
     
     return {
         'period': {
@@ -529,25 +606,19 @@ async def get_commission_history(
             'end': end_date.isoformat() if end_date else None
         },
         'totals': {
-            'premium': total_premium,
-            'commission': total_commission,
-            'policy_count': len(result.data),
-            'average_commission': total_commission / len(result.data) if result.data else 0
+            'premium': totals['premium'],
+            'commission': totals['commission'],
+            'policy_count': totals['transactions'],
+            'average_commission': totals['commission'] / totals['transactions'] if totals['transactions'] else 0
+        },
+        'by_type': {
+            t_type: {'count': figures['transactions'], 'commission': figures['commission']}
+            for t_type, figures in summary['by_type'].items()
         },
-        'by_type': self._group_by_type(result.data)
+        'by_carrier': summary['by_carrier'],
+        'by_month': summary['by_month']
     }
 
-def _group_by_type(self, policies):
-    """Group policies by transaction type."""
-    grouped = {}
-    for policy in policies:
-        t_type = policy.get('Transaction Type', 'OTHER')
-        if t_type not in grouped:
-            grouped[t_type] = {'count': 0, 'commission': 0}
-        grouped[t_type]['count'] += 1
-        grouped[t_type]['commission'] += float(policy.get('Agent Estimated Comm $', 0))
-    return grouped
-
 # Run server
 if __name__ == "__main__":
     import uvicorn
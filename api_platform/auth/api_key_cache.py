@@ -0,0 +1,330 @@
+"""
+Cached API key verification
+Keeps hashed API key -> key context in an in-process TTL/LRU cache shared across
+workers through Redis, broadcasts revocations over Redis pub/sub, and writes
+last_used timestamps behind in batches instead of on every request
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError as e:
+    redis = None
+    print(f"redis not installed, API key cache is per-process only: {e}")
+
+# How long a verified key context is trusted before it is looked up again
+API_KEY_CACHE_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", 60))
+
+# Key contexts kept per worker (least recently used are dropped first)
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", 10000))
+
+# Unknown keys are remembered briefly so a bad key can't hammer the database
+INVALID_KEY_CACHE_TTL_SECONDS = 5
+
+# last_used updates are coalesced and written at most this often
+LAST_USED_FLUSH_SECONDS = float(os.getenv("API_KEY_LAST_USED_FLUSH_SECONDS", 5))
+
+# Redis key prefix of shared key contexts and the revocation channel
+REDIS_KEY_PREFIX = "api_key_ctx:"
+REVOCATION_CHANNEL = "api_keys:revoked"
+
+# After a Redis error, skip Redis for this long instead of failing every request
+REDIS_RETRY_SECONDS = 30
+
+# Fields never copied to Redis (the raw key is restored from the request)
+REDIS_EXCLUDED_FIELDS = ('api_key',)
+
+# Wall-clock expiry stored with each shared context, so a worker that picks a context
+# up from Redis trusts it only for what is left of the original TTL
+REDIS_EXPIRES_AT_FIELD = '_expires_at'
+
+_MISSING = object()
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 of an API key (the cache never holds raw keys as lookup keys)."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def create_redis_client():
+    """Redis client from REDIS_HOST/REDIS_PORT/REDIS_PASSWORD, or None without redis."""
+    if redis is None:
+        return None
+    return redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+        password=os.getenv("REDIS_PASSWORD")
+    )
+
+
+class APIKeyCache:
+    """TTL/LRU cache of key contexts, optionally shared through Redis."""
+
+    def __init__(self, redis_client=None, ttl: int = API_KEY_CACHE_TTL_SECONDS,
+                 max_entries: int = API_KEY_CACHE_MAX_ENTRIES,
+                 invalid_ttl: int = INVALID_KEY_CACHE_TTL_SECONDS):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.invalid_ttl = invalid_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+        self._listener = None
+
+    def get_local(self, key_hash: str):
+        """Context from this worker's cache (None for a known-invalid key), or _MISSING."""
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return _MISSING
+            expires_at, context = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key_hash]
+                return _MISSING
+            self._entries.move_to_end(key_hash)
+            return context
+
+    def get_shared(self, key_hash: str) -> Tuple[Optional[dict], float]:
+        """
+        Context cached in Redis by any worker.
+
+        Returns:
+            (context or None, seconds left of the context's TTL)
+        """
+        raw = self._redis_call(lambda client: client.get(REDIS_KEY_PREFIX + key_hash))
+        if not raw:
+            return None, 0.0
+        try:
+            context = json.loads(raw)
+        except ValueError:
+            return None, 0.0
+        expires_at = context.pop(REDIS_EXPIRES_AT_FIELD, None)
+        remaining = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if remaining <= 0:
+            return None, 0.0
+        return context, remaining
+
+    def put(self, key_hash: str, context: Optional[dict], share: bool = True,
+            ttl: Optional[float] = None):
+        """
+        Cache a context (None marks the key invalid for invalid_ttl, locally only).
+        ttl overrides the cache TTL for this worker's entry, e.g. the time left on a
+        context read from Redis.
+        """
+        if ttl is None:
+            ttl = self.ttl if context is not None else self.invalid_ttl
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + ttl, context)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if share and context is not None:
+            shared = {k: v for k, v in context.items() if k not in REDIS_EXCLUDED_FIELDS}
+            shared[REDIS_EXPIRES_AT_FIELD] = time.time() + self.ttl
+            payload = json.dumps(shared, default=str)
+            self._redis_call(lambda client: client.setex(REDIS_KEY_PREFIX + key_hash, self.ttl, payload))
+
+    def drop_local(self, key_hash: str):
+        """Forget a key in this worker."""
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def revoke(self, key_hash: str):
+        """Forget a key here, in Redis, and (through pub/sub) in every other worker."""
+        self.drop_local(key_hash)
+        self._redis_call(lambda client: client.delete(REDIS_KEY_PREFIX + key_hash))
+        self._redis_call(lambda client: client.publish(REVOCATION_CHANNEL, key_hash))
+
+    def start_revocation_listener(self):
+        """Subscribe to revocations in a background thread (no-op without Redis)."""
+        if self.redis is None or self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen, name="api-key-revocations", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REVOCATION_CHANNEL)
+                for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.drop_local(message['data'])
+            except Exception as e:
+                print(f"API key revocation listener error, resubscribing: {e}")
+                # Revocations may have been missed while disconnected
+                with self._lock:
+                    self._entries.clear()
+                time.sleep(REDIS_RETRY_SECONDS)
+
+    def _redis_call(self, call):
+        if self.redis is None or time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            return call(self.redis)
+        except Exception as e:
+            print(f"API key cache Redis error, using local cache only for {REDIS_RETRY_SECONDS}s: {e}")
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+
+
+class LastUsedWriter:
+    """Coalesces last_used timestamps per key id and flushes them in batches."""
+
+    def __init__(self, flush_func: Callable[[Dict[str, str]], None],
+                 interval: float = LAST_USED_FLUSH_SECONDS):
+        self.flush_func = flush_func
+        self.interval = interval
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, key_id, used_at: Optional[datetime] = None):
+        """Note that a key was used (the latest use per key wins)."""
+        if key_id is None:
+            return
+        timestamp = (used_at or datetime.now()).isoformat()
+        with self._lock:
+            self._pending[key_id] = timestamp
+
+    def flush(self) -> int:
+        """Write pending timestamps; failed batches are kept for the next flush."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            self.flush_func(batch)
+        except Exception as e:
+            print(f"API key last_used flush failed, retrying later: {e}")
+            with self._lock:
+                for key_id, timestamp in batch.items():
+                    if timestamp > self._pending.get(key_id, ''):
+                        self._pending[key_id] = timestamp
+            return 0
+        return len(batch)
+
+    def start(self):
+        """Flush every interval in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="api-key-last-used", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and write what is pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+def write_last_used(supabase, batch: Dict[str, str]):
+    """
+    Write a batch of last_used timestamps in one update.
+    Every key in the batch gets the newest timestamp (all fall within one flush interval).
+    """
+    supabase.table('api_keys').update({'last_used': max(batch.values())}).in_('id', list(batch)).execute()
+
+
+def fetch_api_key(supabase, api_key: str) -> Optional[dict]:
+    """Active api_keys row for a key, or None."""
+    result = supabase.table('api_keys').select("*").eq('api_key', api_key).eq('is_active', True).execute()
+    return result.data[0] if result.data else None
+
+
+def deactivate_api_key(supabase, key_id: str, user_email: Optional[str] = None) -> List[dict]:
+    """Set is_active = false on an api_keys row (only the owner's when user_email is given)."""
+    query = supabase.table('api_keys').update({
+        'is_active': False,
+        'updated_at': datetime.now().isoformat()
+    }).eq('id', key_id)
+    if user_email is not None:
+        query = query.eq('user_email', user_email)
+    result = query.execute()
+    return result.data or []
+
+
+class APIKeyVerifier:
+    """Verifies API keys through the cache, falling back to the api_keys table."""
+
+    def __init__(self, get_client: Callable, cache: Optional[APIKeyCache] = None,
+                 last_used: Optional[LastUsedWriter] = None):
+        self.get_client = get_client
+        self.cache = cache or APIKeyCache()
+        self.last_used = last_used or LastUsedWriter(lambda batch: write_last_used(self.get_client(), batch))
+
+    def verify_local(self, api_key: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Verify from this worker's cache only (no I/O).
+
+        Returns:
+            (hit, key context or None); on a miss call verify
+        """
+        context = self.cache.get_local(hash_api_key(api_key))
+        if context is _MISSING:
+            return False, None
+        self._record_use(context)
+        return True, dict(context) if context else None
+
+    def verify(self, api_key: str) -> Optional[dict]:
+        """Key context for an API key (cache, then Redis, then database), or None when invalid."""
+        key_hash = hash_api_key(api_key)
+        context = self.cache.get_local(key_hash)
+        if context is _MISSING:
+            context, remaining = self.cache.get_shared(key_hash)
+            if context is not None:
+                context['api_key'] = api_key
+                self.cache.put(key_hash, context, share=False, ttl=remaining)
+            else:
+                context = fetch_api_key(self.get_client(), api_key)
+                self.cache.put(key_hash, context)
+        self._record_use(context)
+        return dict(context) if context else None
+
+    def revoke(self, api_key: str):
+        """Drop a key from every worker's cache (call after deactivating it in api_keys)."""
+        self.cache.revoke(hash_api_key(api_key))
+
+    def deactivate(self, key_id: str, user_email: Optional[str] = None) -> bool:
+        """
+        Deactivate a key in api_keys and revoke it in every worker.
+
+        Returns:
+            False when no matching key exists (or it belongs to another user)
+        """
+        rows = deactivate_api_key(self.get_client(), key_id, user_email)
+        for row in rows:
+            if row.get('api_key'):
+                self.revoke(row['api_key'])
+        return bool(rows)
+
+    def start(self):
+        """Start the revocation listener and the last_used writer."""
+        self.cache.start_revocation_listener()
+        self.last_used.start()
+
+    def stop(self):
+        """Stop background work, flushing pending last_used timestamps."""
+        self.last_used.stop()
+
+    def _record_use(self, context: Optional[dict]):
+        if context:
+            self.last_used.record(context.get('id'))
@@ -0,0 +1,99 @@
+"""
+Non-blocking data access for the API server
+Handlers build PostgREST queries as before and await them here. Queries run on
+Supabase's async client over one pooled httpx.AsyncClient per worker; if the
+async client can't be created, they run on the shared sync client in a bounded
+thread pool. Either way a slow query no longer blocks the event loop.
+"""
+import asyncio
+import inspect
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from database_utils import _resolve_credentials
+
+try:
+    from supabase import acreate_client
+except ImportError as e:
+    acreate_client = None
+    print(f"Async Supabase client unavailable, API queries run on a thread pool: {e}")
+
+# Connections kept open by the async client (per worker)
+API_DB_POOL_SIZE = int(os.getenv("API_DB_POOL_SIZE", 20))
+
+# Threads running sync queries when the async client is unavailable
+API_DB_EXECUTOR_WORKERS = int(os.getenv("API_DB_EXECUTOR_WORKERS", 16))
+
+# Seconds an idle pooled connection is kept alive
+API_DB_KEEPALIVE_EXPIRY = 60.0
+
+
+class AsyncDataAccess:
+    """Awaitable PostgREST queries: async client when connected, bounded executor otherwise."""
+
+    def __init__(self, get_sync_client: Callable, async_client=None,
+                 executor_workers: int = API_DB_EXECUTOR_WORKERS):
+        self.get_sync_client = get_sync_client
+        self.async_client = async_client
+        self._session: Optional[httpx.AsyncClient] = None
+        self._executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="api-db")
+
+    async def connect(self):
+        """Create the pooled async client (call once the event loop is running)."""
+        if self.async_client is not None or acreate_client is None:
+            return
+        _environment, _role, url, key = _resolve_credentials()
+        if not url or not key:
+            print("Supabase URL and key not set, API queries run on a thread pool")
+            return
+        try:
+            client = await acreate_client(url, key)
+            postgrest = client.postgrest
+            default_session = postgrest.session
+            # Same base URL, auth headers and timeout as the default session, with our pool limits
+            self._session = httpx.AsyncClient(
+                base_url=default_session.base_url,
+                headers=default_session.headers,
+                timeout=default_session.timeout,
+                limits=httpx.Limits(max_connections=API_DB_POOL_SIZE,
+                                    max_keepalive_connections=API_DB_POOL_SIZE,
+                                    keepalive_expiry=API_DB_KEEPALIVE_EXPIRY),
+            )
+            postgrest.session = self._session
+            await default_session.aclose()
+            self.async_client = client
+        except Exception as e:
+            print(f"Async Supabase client failed to start, API queries run on a thread pool: {e}")
+
+    async def close(self):
+        """Close pooled connections and the executor."""
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+        self.async_client = None
+        self._executor.shutdown(wait=False)
+
+    def table(self, name: str):
+        """Query builder for a table (build it as usual, then await execute(query))."""
+        client = self.async_client if self.async_client is not None else self.get_sync_client()
+        return client.table(name)
+
+    def rpc(self, function: str, params: Optional[dict] = None):
+        """Call builder for a database function (await execute(call) to run it)."""
+        client = self.async_client if self.async_client is not None else self.get_sync_client()
+        return client.rpc(function, params or {})
+
+    async def execute(self, query):
+        """Run a query built from table() or rpc() without blocking the event loop."""
+        if inspect.iscoroutinefunction(query.execute):
+            return await query.execute()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, query.execute)
+
+    async def run(self, func: Callable, *args):
+        """Run another blocking call (e.g. Redis) on the bounded executor."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
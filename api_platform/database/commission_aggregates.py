@@ -0,0 +1,115 @@
+"""
+Commission aggregates for the API server
+Totals by transaction type, carrier and month are computed in the database by
+the commission_aggregates() function (sql_scripts/create_commission_aggregates_function.sql);
+this module calls it, rolls the rows up for the endpoints, and caches results in
+Redis keyed by user, date range, filters and the user's data version.
+"""
+import hashlib
+import json
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+# Cached aggregates live this long (a new data version makes them unreachable sooner)
+AGGREGATES_CACHE_TTL_SECONDS = 3600
+
+# Redis key prefix of cached aggregates
+AGGREGATES_CACHE_PREFIX = "commission_aggregates:"
+
+# After a Redis error, skip Redis for this long instead of failing every request
+REDIS_RETRY_SECONDS = 30
+
+
+def _amount(value) -> float:
+    return round(float(value or 0), 2)
+
+
+def summarize_aggregates(rows: List[dict]) -> Dict:
+    """
+    Roll commission_aggregates() rows up into totals, by_type, by_carrier and by_month.
+    Carriers are sorted by commission (largest first), months chronologically.
+    """
+    summary = {
+        'totals': {'transactions': 0, 'payments': 0, 'premium': 0.0, 'commission': 0.0, 'paid': 0.0},
+        'by_type': {},
+        'by_carrier': [],
+        'by_month': [],
+    }
+    for row in rows:
+        figures = {
+            'transactions': int(row.get('transactions') or 0),
+            'payments': int(row.get('payments') or 0),
+            'premium': _amount(row.get('premium')),
+            'commission': _amount(row.get('commission')),
+            'paid': _amount(row.get('paid')),
+        }
+        dimension = row.get('dimension')
+        if dimension == 'total':
+            summary['totals'] = figures
+        elif dimension == 'transaction_type':
+            summary['by_type'][row.get('key')] = figures
+        elif dimension == 'carrier':
+            summary['by_carrier'].append({'carrier': row.get('key'), **figures})
+        elif dimension == 'month':
+            summary['by_month'].append({'month': row.get('key'), **figures})
+
+    summary['by_carrier'].sort(key=lambda item: (-item['commission'], item['carrier']))
+    summary['by_month'].sort(key=lambda item: item['month'])
+    return summary
+
+
+def aggregates_cache_key(user_email: Optional[str], start_date: Optional[date], end_date: Optional[date],
+                         transaction_type: Optional[str], data_version: str) -> str:
+    """Redis key of one aggregate result (the user's email is hashed)."""
+    user = hashlib.sha256((user_email or '').encode()).hexdigest()[:32]
+    parts = [user, start_date.isoformat() if start_date else '', end_date.isoformat() if end_date else '',
+             transaction_type or '', data_version]
+    return AGGREGATES_CACHE_PREFIX + hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+class CommissionAggregates:
+    """Aggregates through AsyncDataAccess, cached in Redis by data version."""
+
+    def __init__(self, db, redis_client=None, ttl: int = AGGREGATES_CACHE_TTL_SECONDS):
+        self.db = db
+        self.redis = redis_client
+        self.ttl = ttl
+        self._redis_down_until = 0.0
+
+    async def data_version(self, user_email: Optional[str]) -> str:
+        """Stamp that changes whenever the user's policies change."""
+        result = await self.db.execute(self.db.rpc('policies_data_version', {'p_user_email': user_email}))
+        return str(result.data)
+
+    async def get(self, user_email: Optional[str], start_date: Optional[date] = None,
+                  end_date: Optional[date] = None, transaction_type: Optional[str] = None) -> Dict:
+        """Summary of the user's commissions (see summarize_aggregates)."""
+        cache_key = aggregates_cache_key(user_email, start_date, end_date, transaction_type,
+                                         await self.data_version(user_email))
+        cached = await self._redis_call(lambda client: client.get(cache_key))
+        if cached:
+            return json.loads(cached)
+
+        params = {
+            'p_user_email': user_email,
+            'p_start_date': start_date.isoformat() if start_date else None,
+            'p_end_date': end_date.isoformat() if end_date else None,
+            'p_transaction_type': transaction_type,
+        }
+        result = await self.db.execute(self.db.rpc('commission_aggregates', params))
+        summary = summarize_aggregates(result.data or [])
+
+        payload = json.dumps(summary)
+        await self._redis_call(lambda client: client.setex(cache_key, self.ttl, payload))
+        return summary
+
+    async def _redis_call(self, call):
+        if self.redis is None or time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            return await self.db.run(call, self.redis)
+        except Exception as e:
+            print(f"Aggregates cache Redis error, skipping cache for {REDIS_RETRY_SECONDS}s: {e}")
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
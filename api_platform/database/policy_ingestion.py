@@ -0,0 +1,115 @@
+"""
+Bulk policy ingestion for the API server
+Validates a whole batch up front (keeping per-index errors), allocates the
+batch's Transaction IDs in one go, and inserts rows in multi-row chunks sent
+concurrently, isolating failing rows when a chunk is rejected.
+"""
+import asyncio
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from id_allocator import IdAllocator
+
+# Policies accepted per batch request
+BATCH_MAX_POLICIES = 1000
+
+# Rows per multi-row insert request
+BATCH_INSERT_CHUNK_SIZE = 100
+
+# Insert requests in flight at once per batch
+BATCH_MAX_CONCURRENT_CHUNKS = 4
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return '; '.join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+    return str(error)
+
+
+def validate_policy_batch(items: Sequence[Any], model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[dict]]:
+    """
+    Validate every item of a batch.
+
+    Returns:
+        (valid: [(index, model instance)], errors: [{'index', 'policy_number', 'error'}])
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Each policy must be a JSON object")
+            valid.append((index, model(**item)))
+        except (ValidationError, ValueError, TypeError) as e:
+            errors.append({
+                'index': index,
+                'policy_number': item.get('policy_number') if isinstance(item, dict) else None,
+                'error': _error_message(e)
+            })
+    return valid, errors
+
+
+class TransactionIdPool:
+    """One IdAllocator per worker (existing IDs load once); safe to call from executor threads."""
+
+    def __init__(self, get_client: Callable):
+        self.get_client = get_client
+        self._allocator = None
+        self._lock = threading.Lock()
+
+    def allocate(self, n: int) -> List[str]:
+        """Reserve n new Transaction IDs."""
+        with self._lock:
+            if self._allocator is None:
+                self._allocator = IdAllocator(self.get_client())
+            return self._allocator.allocate_many(n)
+
+
+async def _insert_chunk(db, table: str, chunk: List[Tuple[int, dict]]) -> Tuple[Dict[int, dict], List[dict]]:
+    """Insert a chunk in one request; on failure retry row by row to find the bad rows."""
+    rows = [row for _index, row in chunk]
+    try:
+        response = await db.execute(db.table(table).insert(rows))
+        if response.data is not None and len(response.data) == len(rows):
+            return {index: created for (index, _row), created in zip(chunk, response.data)}, []
+        raise Exception(f"Inserted {len(response.data or [])} of {len(rows)} rows")
+    except Exception as chunk_error:
+        print(f"Bulk insert into {table} failed, retrying rows individually: {chunk_error}")
+
+    created, errors = {}, []
+    for index, row in chunk:
+        try:
+            response = await db.execute(db.table(table).insert(row))
+            if not response.data:
+                raise Exception("Insert returned no data")
+            created[index] = response.data[0]
+        except Exception as row_error:
+            errors.append({'index': index, 'policy_number': row.get('Policy Number'), 'error': str(row_error)})
+    return created, errors
+
+
+async def insert_rows(db, table: str, indexed_rows: Sequence[Tuple[int, dict]],
+                      chunk_size: int = BATCH_INSERT_CHUNK_SIZE,
+                      max_concurrent: int = BATCH_MAX_CONCURRENT_CHUNKS) -> Tuple[Dict[int, dict], List[dict]]:
+    """
+    Insert (index, row) pairs in concurrent multi-row chunks.
+
+    Returns:
+        (created rows by index, per-row errors with index)
+    """
+    chunks = [list(indexed_rows[start:start + chunk_size]) for start in range(0, len(indexed_rows), chunk_size)]
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def run(chunk):
+        async with semaphore:
+            return await _insert_chunk(db, table, chunk)
+
+    created, errors = {}, []
+    for chunk_created, chunk_errors in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+        created.update(chunk_created)
+        errors.extend(chunk_errors)
+    return created, errors
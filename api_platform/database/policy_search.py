@@ -0,0 +1,68 @@
+"""
+Policy search for the API server
+Builds one PostgREST OR filter across the searched fields (instead of one query
+per field), selects only the columns the response needs, and works out which
+fields matched from the returned rows.
+"""
+import os
+import sys
+from typing import Dict, List, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from policies_data_layer import format_select_columns
+
+# Fields /v1/search may match on (trigram-indexed: Customer, Policy Number)
+SEARCHABLE_FIELDS = ['Policy Number', 'Customer', 'Client ID', 'Transaction ID', 'Carrier Name', 'MGA Name']
+
+DEFAULT_SEARCH_FIELDS = ['Policy Number', 'Customer']
+
+# Columns every search result needs besides the searched fields
+SEARCH_RESULT_COLUMNS = ['_id', 'Policy Number', 'Customer', 'Premium Sold']
+
+# Results per page
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+
+def _quote_value(value: str) -> str:
+    """Double-quote a value for a PostgREST logic tree (commas, dots and parentheses are reserved)."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so q matches literally (backslash is Postgres' default LIKE escape)."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_filter(q: str, fields: Sequence[str]) -> str:
+    """or_ filter matching q (case-insensitive literal substring) in any of the fields."""
+    pattern = _quote_value(f'%{_escape_like(q)}%')
+    return ','.join(f'"{field}".ilike.{pattern}' for field in fields)
+
+
+def search_select_clause(fields: Sequence[str]) -> str:
+    """Select clause with the result columns and the searched fields."""
+    columns = list(SEARCH_RESULT_COLUMNS) + [field for field in fields if field not in SEARCH_RESULT_COLUMNS]
+    return format_select_columns(columns)
+
+
+def matched_fields(row: dict, q: str, fields: Sequence[str]) -> List[str]:
+    """Searched fields whose value contains q, case-insensitively (what ILIKE '%q%' matched)."""
+    needle = q.lower()
+    return [field for field in fields if row.get(field) is not None and needle in str(row[field]).lower()]
+
+
+def build_search_results(rows: Sequence[dict], q: str, fields: Sequence[str]) -> List[Dict]:
+    """Search response items; matched_field is the first matching field in search order."""
+    results = []
+    for row in rows:
+        matched = matched_fields(row, q, fields)
+        results.append({
+            'id': row.get('_id'),
+            'policy_number': row.get('Policy Number'),
+            'customer': row.get('Customer'),
+            'matched_field': matched[0] if matched else None,
+            'matched_fields': matched,
+            'premium': float(row.get('Premium Sold') or 0)
+        })
+    return results
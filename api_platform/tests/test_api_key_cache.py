@@ -0,0 +1,133 @@
+"""
+Test the cached API key verification (TTL cache, Redis sharing, revocation, write-behind last_used)
+Run with: pytest test_api_key_cache.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import FakeRedis, FakeSupabase
+from auth.api_key_cache import (REDIS_EXPIRES_AT_FIELD, REDIS_KEY_PREFIX, APIKeyCache, APIKeyVerifier,
+                                LastUsedWriter, hash_api_key, write_last_used)
+
+API_KEYS = [
+    {'id': 'k1', 'api_key': 'cipk_live', 'user_email': 'agent@example.com', 'is_active': True},
+    {'id': 'k2', 'api_key': 'cipk_other', 'user_email': 'b@example.com', 'is_active': True},
+]
+
+
+def make_supabase():
+    return FakeSupabase(tables={'api_keys': API_KEYS})
+
+
+def key_row(supabase, api_key):
+    return next(row for row in supabase.rows('api_keys') if row['api_key'] == api_key)
+
+
+def make_verifier(supabase, redis_client=None):
+    return APIKeyVerifier(lambda: supabase, APIKeyCache(redis_client),
+                          LastUsedWriter(lambda batch: write_last_used(supabase, batch)))
+
+
+def test_cached_key_skips_database():
+    supabase = make_supabase()
+    verifier = make_verifier(supabase)
+
+    assert verifier.verify_local('cipk_live') == (False, None)
+    assert verifier.verify('cipk_live')['user_email'] == 'agent@example.com'
+    for _ in range(100):
+        hit, context = verifier.verify_local('cipk_live')
+        assert hit and context['id'] == 'k1'
+
+    # One select, and no last_used update until the flush
+    assert [(request.table, request.method) for request in supabase.requests] == [('api_keys', 'select')]
+
+    # Unknown keys are cached as invalid for a short while
+    assert verifier.verify('cipk_bogus') is None
+    assert verifier.verify_local('cipk_bogus') == (True, None)
+
+
+def test_last_used_is_coalesced_into_one_update():
+    supabase = make_supabase()
+    verifier = make_verifier(supabase)
+
+    for _ in range(50):
+        verifier.verify('cipk_live')
+        verifier.verify('cipk_other')
+    assert verifier.last_used.flush() == 2
+
+    updates = supabase.executed('api_keys', 'update')
+    assert len(updates) == 1
+    assert sorted(updates[0].filter_values('id')) == ['k1', 'k2']
+    assert key_row(supabase, 'cipk_live')['last_used'] == key_row(supabase, 'cipk_other')['last_used']
+    assert verifier.last_used.flush() == 0
+
+
+def test_failed_flush_is_retried():
+    def unavailable(batch):
+        raise RuntimeError('database unavailable')
+
+    writer = LastUsedWriter(unavailable)
+    writer.record('k1')
+    assert writer.flush() == 0
+
+    written = []
+    writer.flush_func = written.append
+    assert writer.flush() == 1
+    assert list(written[0]) == ['k1']
+
+
+def test_redis_shares_contexts_and_broadcasts_revocation():
+    supabase, redis_client = make_supabase(), FakeRedis()
+    worker_a = make_verifier(supabase, redis_client)
+    worker_b = make_verifier(supabase, redis_client)
+    worker_b.cache.start_revocation_listener()
+    while not redis_client.subscribers:
+        time.sleep(0.01)
+
+    # Worker B finds worker A's lookup in Redis (raw key is never stored there)
+    worker_a.verify('cipk_live')
+    assert all('cipk_live' not in value for value in redis_client.values.values())
+    assert worker_b.verify('cipk_live')['api_key'] == 'cipk_live'
+    assert len(supabase.requests) == 1
+
+    # Only the owner can deactivate a key
+    assert worker_a.deactivate('k1', 'someone@example.com') is False
+    assert worker_a.deactivate('k404', 'agent@example.com') is False
+    assert worker_b.verify_local('cipk_live')[0]
+
+    # Deactivate on worker A; worker B drops its cached copy
+    assert worker_a.deactivate('k1', 'agent@example.com') is True
+    assert key_row(supabase, 'cipk_live')['is_active'] is False
+    assert worker_a.verify('cipk_live') is None
+    deadline = time.time() + 2
+    while worker_b.verify_local('cipk_live')[0] and time.time() < deadline:
+        time.sleep(0.01)
+    assert worker_b.verify_local('cipk_live') == (False, None)
+    assert worker_b.verify('cipk_live') is None
+
+
+def test_context_from_redis_keeps_remaining_ttl():
+    supabase, redis_client = make_supabase(), FakeRedis()
+    worker_a = make_verifier(supabase, redis_client)
+    worker_b = make_verifier(supabase, redis_client)
+    redis_key = REDIS_KEY_PREFIX + hash_api_key('cipk_live')
+
+    worker_a.verify('cipk_live')
+    shared = json.loads(redis_client.values[redis_key])
+    assert 0 < shared[REDIS_EXPIRES_AT_FIELD] - time.time() <= worker_a.cache.ttl
+
+    # Worker B trusts the context only for what is left of worker A's TTL
+    shared[REDIS_EXPIRES_AT_FIELD] = time.time() + 0.2
+    redis_client.values[redis_key] = json.dumps(shared)
+    assert worker_b.verify('cipk_live')['id'] == 'k1'
+    assert REDIS_EXPIRES_AT_FIELD not in worker_b.verify_local('cipk_live')[1]
+    time.sleep(0.3)
+    assert worker_b.verify_local('cipk_live') == (False, None)
+    assert len(supabase.requests) == 1
+
+    # An expired shared context is ignored and the key is looked up again
+    worker_b.verify('cipk_live')
+    assert len(supabase.requests) == 2
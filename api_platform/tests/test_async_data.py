@@ -0,0 +1,63 @@
+"""
+Test that API queries awaited through AsyncDataAccess don't block the event loop
+Run with: pytest test_async_data.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import FakeSupabase
+from database.async_data import AsyncDataAccess
+
+
+TABLES = ['policies', 'webhook_endpoints', 'api_keys', 'carriers']
+
+
+def make_client(**options):
+    """Every table holds one row named after it; each query takes 200 ms."""
+    return FakeSupabase(tables={name: [{'name': name, 'user_email': 'a@example.com'}] for name in TABLES},
+                        latency=0.2, **options)
+
+
+async def run_with_ticker(db, queries):
+    """Run queries concurrently while counting event loop ticks."""
+    ticks = 0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    tick_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(db.execute(db.table(name).eq('user_email', 'a@example.com')) for name in queries))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick_task
+    return [result.data[0]['name'] for result in results], elapsed, ticks
+
+
+def test_sync_client_queries_run_off_the_event_loop():
+    client = make_client()
+    db = AsyncDataAccess(lambda: client, executor_workers=4)
+    results, elapsed, ticks = asyncio.run(run_with_ticker(db, TABLES))
+
+    assert results == TABLES
+    assert client.max_in_flight == 4
+    # Four 200 ms queries overlap, and the loop keeps serving other work meanwhile
+    assert elapsed < 0.5
+    assert ticks >= 10
+
+
+def test_async_client_queries_are_awaited():
+    client = make_client(asynchronous=True)
+    db = AsyncDataAccess(lambda: None, async_client=client)
+    results, elapsed, ticks = asyncio.run(run_with_ticker(db, ['policies', 'api_keys']))
+
+    assert results == ['policies', 'api_keys']
+    assert sorted(request.table for request in client.requests) == ['api_keys', 'policies']
+    assert elapsed < 0.5 and ticks >= 10
@@ -0,0 +1,77 @@
+"""
+Test the commission aggregates roll-up and its Redis result cache
+Run with: pytest test_commission_aggregates.py
+"""
+import asyncio
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import FakeRedis, FakeSupabase
+from database.async_data import AsyncDataAccess
+from database.commission_aggregates import CommissionAggregates, summarize_aggregates
+
+AGGREGATE_ROWS = [
+    {'dimension': 'total', 'key': None, 'transactions': 5, 'payments': 1, 'premium': '4200.00',
+     'commission': '630.00', 'paid': '150.00'},
+    {'dimension': 'transaction_type', 'key': 'NEW', 'transactions': 3, 'payments': 0, 'premium': '3000',
+     'commission': '450', 'paid': None},
+    {'dimension': 'transaction_type', 'key': 'RWL', 'transactions': 2, 'payments': 1, 'premium': '1200',
+     'commission': '180', 'paid': '150'},
+    {'dimension': 'carrier', 'key': 'Safeco', 'transactions': 1, 'payments': 0, 'premium': '700',
+     'commission': '105', 'paid': None},
+    {'dimension': 'carrier', 'key': 'Progressive', 'transactions': 4, 'payments': 1, 'premium': '3500',
+     'commission': '525', 'paid': '150'},
+    {'dimension': 'month', 'key': '2025-03', 'transactions': 2, 'payments': 1, 'premium': '1200',
+     'commission': '180', 'paid': '150'},
+    {'dimension': 'month', 'key': '2025-01', 'transactions': 3, 'payments': 0, 'premium': '3000',
+     'commission': '450', 'paid': None},
+]
+
+
+def make_client(data_version):
+    """Serves policies_data_version from data_version['value'] and the fixed aggregate rows."""
+    return FakeSupabase(functions={
+        'policies_data_version': lambda p_user_email: data_version['value'],
+        'commission_aggregates': lambda **params: AGGREGATE_ROWS,
+    })
+
+
+def test_summary_rolls_up_dimensions():
+    summary = summarize_aggregates(AGGREGATE_ROWS)
+
+    assert summary['totals'] == {'transactions': 5, 'payments': 1, 'premium': 4200.0, 'commission': 630.0, 'paid': 150.0}
+    assert summary['by_type']['NEW']['commission'] == 450.0
+    assert summary['by_type']['NEW']['paid'] == 0.0
+    assert [item['carrier'] for item in summary['by_carrier']] == ['Progressive', 'Safeco']
+    assert [item['month'] for item in summary['by_month']] == ['2025-01', '2025-03']
+
+    # No matching rows: the database still returns the (empty) total row
+    empty = summarize_aggregates([{'dimension': 'total', 'key': None, 'transactions': 0, 'payments': 0,
+                                   'premium': None, 'commission': None, 'paid': None}])
+    assert empty['totals']['commission'] == 0.0 and empty['by_type'] == {}
+
+
+def test_results_are_cached_per_data_version():
+    data_version = {'value': '5:2025-03-01 00:00:00+00'}
+    client, redis_client = make_client(data_version), FakeRedis()
+    aggregates = CommissionAggregates(AsyncDataAccess(lambda: client), redis_client)
+
+    async def run():
+        first = await aggregates.get('agent@example.com', date(2025, 1, 1), date(2025, 12, 31))
+        second = await aggregates.get('agent@example.com', date(2025, 1, 1), date(2025, 12, 31))
+        other_filter = await aggregates.get('agent@example.com', date(2025, 1, 1), date(2025, 12, 31), 'NEW')
+        data_version['value'] = '6:2025-03-02 00:00:00+00'
+        after_change = await aggregates.get('agent@example.com', date(2025, 1, 1), date(2025, 12, 31))
+        return first, second, other_filter, after_change
+
+    first, second, other_filter, after_change = asyncio.run(run())
+    assert first == second == after_change == summarize_aggregates(AGGREGATE_ROWS)
+
+    aggregate_calls = [request.params for request in client.executed('commission_aggregates')]
+    # Cached once per (filters, data version): first call, the NEW filter, and after the data changed
+    assert len(aggregate_calls) == 3
+    assert aggregate_calls[0] == {'p_user_email': 'agent@example.com', 'p_start_date': '2025-01-01',
+                                  'p_end_date': '2025-12-31', 'p_transaction_type': None}
+    assert len(redis_client.values) == 3
@@ -0,0 +1,83 @@
+"""
+Test bulk policy ingestion: batch validation, chunked concurrent inserts and per-row fallback
+Run with: pytest test_policy_ingestion.py
+"""
+import asyncio
+import os
+import sys
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import FakeAPIError, FakeSupabase
+from database.async_data import AsyncDataAccess
+from database.policy_ingestion import insert_rows, validate_policy_batch
+
+
+class Policy(BaseModel):
+    policy_number: str
+    customer: str
+    effective_date: date
+    premium: float
+    carrier: Optional[str] = None
+
+
+def make_client(rejected=(), latency=0.0):
+    """Policies get serial _ids; a request holding a rejected policy number fails as a whole (like PostgREST)."""
+    client = FakeSupabase(serial_columns={'policies': '_id'}, latency=latency)
+
+    def check_constraint(request):
+        if any(row['Policy Number'] in rejected for row in request.rows):
+            raise FakeAPIError("violates check constraint", '23514')
+
+    client.before_execute.append(check_constraint)
+    return client
+
+
+def policy_rows(count):
+    return [(index, {'Policy Number': f"POL-{index:03d}", 'Premium Sold': 100.0}) for index in range(count)]
+
+
+def test_validation_reports_errors_by_index():
+    items = [
+        {'policy_number': 'POL-001', 'customer': 'A', 'effective_date': '2025-01-01', 'premium': 100},
+        {'policy_number': 'POL-002', 'customer': 'B', 'effective_date': 'not a date', 'premium': 100},
+        'not an object',
+        {'policy_number': 'POL-004', 'customer': 'D', 'effective_date': '2025-01-04', 'premium': 400},
+        {'customer': 'E', 'effective_date': '2025-01-05'},
+    ]
+    valid, errors = validate_policy_batch(items, Policy)
+
+    assert [index for index, _policy in valid] == [0, 3]
+    assert valid[1][1].premium == 400.0
+    assert [error['index'] for error in errors] == [1, 2, 4]
+    assert errors[0]['policy_number'] == 'POL-002' and 'effective_date' in errors[0]['error']
+    assert errors[1]['policy_number'] is None
+    assert 'policy_number' in errors[2]['error'] and 'premium' in errors[2]['error']
+
+
+def test_rows_are_inserted_in_concurrent_chunks():
+    client = make_client(latency=0.05)
+    db = AsyncDataAccess(lambda: client, executor_workers=8)
+
+    created, errors = asyncio.run(insert_rows(db, 'policies', policy_rows(250), chunk_size=50, max_concurrent=3))
+
+    assert errors == []
+    assert sorted(created) == list(range(250))
+    assert created[137]['Policy Number'] == 'POL-137'
+    assert [len(request.rows) for request in client.requests] == [50] * 5
+    assert client.max_in_flight == 3
+
+
+def test_failed_chunk_falls_back_to_single_rows():
+    client = make_client(rejected={'POL-007'})
+    db = AsyncDataAccess(lambda: client)
+
+    created, errors = asyncio.run(insert_rows(db, 'policies', policy_rows(25), chunk_size=10))
+
+    # Only the chunk holding the bad row is retried row by row
+    assert sorted(created) == [index for index in range(25) if index != 7]
+    assert errors == [{'index': 7, 'policy_number': 'POL-007', 'error': 'violates check constraint'}]
+    assert sorted(len(request.rows) for request in client.requests) == [1] * 10 + [5, 10, 10]
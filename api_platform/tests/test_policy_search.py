@@ -0,0 +1,85 @@
+"""
+Test the single-query policy search against the original one-query-per-field search
+Run with: pytest test_policy_search.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import FakeSupabase
+from database.policy_search import build_search_results, search_filter, search_select_clause
+
+POLICIES = [
+    {'_id': 1, 'Policy Number': 'HO3-1001', 'Customer': 'Smith Family Trust', 'Premium Sold': 1200.0},
+    {'_id': 2, 'Policy Number': 'AUTO-SMITH-2', 'Customer': 'John Smith', 'Premium Sold': 800.0},
+    {'_id': 3, 'Policy Number': 'BOAT-77', 'Customer': 'Jane Doe', 'Premium Sold': None},
+    {'_id': 4, 'Policy Number': 'SMI-404', 'Customer': None, 'Premium Sold': 50.0},
+]
+
+
+def ilike(value, q):
+    return value is not None and q.lower() in str(value).lower()
+
+
+def legacy_search(q, search_fields):
+    """
+    The original endpoint: one ilike query per field, deduped against the growing result list.
+    (The original compared p.get('_id'), which result items don't have, so it never deduped.)
+    """
+    results = []
+    for field in search_fields:
+        for policy in [p for p in POLICIES if ilike(p.get(field), q)]:
+            if not any(p.get('id') == policy.get('_id') for p in results):
+                results.append({
+                    'id': policy.get('_id'),
+                    'policy_number': policy.get('Policy Number'),
+                    'customer': policy.get('Customer'),
+                    'matched_field': field,
+                })
+    return results
+
+
+def test_matches_legacy_search():
+    fields = ['Policy Number', 'Customer']
+    for q in ['smith', 'SMI', 'doe', '77', 'nothing']:
+        # The OR query returns each matching row once, in _id order
+        rows = [p for p in POLICIES if any(ilike(p.get(field), q) for field in fields)]
+        results = build_search_results(rows, q, fields)
+
+        expected = {item['id']: item['matched_field'] for item in legacy_search(q, fields)}
+        assert {item['id']: item['matched_field'] for item in results} == expected
+
+    both = build_search_results([POLICIES[1]], 'smith', fields)[0]
+    assert both['matched_fields'] == ['Policy Number', 'Customer']
+    assert build_search_results([POLICIES[2]], 'doe', fields)[0]['premium'] == 0.0
+
+
+def test_filter_is_one_quoted_or_clause():
+    clause = search_filter('O\'Brien, "Jr"', ['Policy Number', 'Customer'])
+    assert clause == ('"Policy Number".ilike."%O\'Brien, \\"Jr\\"%",'
+                      '"Customer".ilike."%O\'Brien, \\"Jr\\"%"')
+
+    select = search_select_clause(['Customer', 'Client ID'])
+    assert select == '_id,"Policy Number","Customer","Premium Sold","Client ID"'
+
+
+def test_wildcards_in_q_match_literally():
+    fields = ['Policy Number', 'Customer']
+    supabase = FakeSupabase(tables={'policies': [
+        {'_id': 1, 'Policy Number': 'DISC-100%', 'Customer': 'A_B Holdings'},
+        {'_id': 2, 'Policy Number': 'DISC-1005', 'Customer': 'AXB Holdings'},
+        {'_id': 3, 'Policy Number': 'PATH\\1', 'Customer': 'Back Slash'},
+        {'_id': 4, 'Policy Number': 'PATH1', 'Customer': 'Forward'},
+    ]})
+
+    def search(q):
+        response = supabase.table('policies').select(search_select_clause(fields)).or_(search_filter(q, fields)).execute()
+        return [row['_id'] for row in response.data], build_search_results(response.data, q, fields)
+
+    for q, expected in [('100%', [1]), ('a_b', [1]), ('%', [1]), ('_', [1]), ('H\\1', [3])]:
+        ids, results = search(q)
+        assert ids == expected, q
+        # Every returned row has the field the server matched on
+        assert all(item['matched_field'] for item in results)
+
+    assert search('100')[0] == [1, 2]
@@ -181,6 +181,7 @@ class WebhookEvents:
     POLICY_UPDATED = "policy.updated"
     POLICY_RENEWED = "policy.renewed"
     POLICY_CANCELLED = "policy.cancelled"
+    POLICIES_BATCH_CREATED = "policies.batch_created"
     
     COMMISSION_CALCULATED = "commission.calculated"
     COMMISSION_PAID = "commission.paid"
@@ -0,0 +1,266 @@
+"""
+Balance engine for the commission app.
+Computes outstanding agent commission balances for every original transaction
+with grouped/joined pandas operations instead of a per-row scan of the book,
+and the as-earned amounts of payment-plan policies column-wise.
+"""
+
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from canonical_columns import PAYMENT_KINDS, RECONCILIATION_KINDS, TransactionKind, kind_mask
+
+# Transaction ID markers for reconciliation entries
+RECONCILIATION_PATTERN = '-STMT-|-ADJ-|-VOID-'
+PAYMENT_PATTERN = '-STMT-|-VOID-'
+
+# Annual payment counts of the old payment plan dropdown values (new values are "N-PAY")
+PAYMENT_FREQUENCY_MAP = {
+    'FULL': 1,
+    'ANNUAL': 1,
+    'SEMI-ANNUAL': 2,
+    'QUARTERLY': 4,
+    'MONTHLY': 12,
+    'SEMI-MONTHLY': 24,
+    'BI-WEEKLY': 26,
+    'WEEKLY': 52
+}
+
+
+def normalize_policy_key(policy_numbers: pd.Series) -> pd.Series:
+    """Normalize policy numbers for matching (string, whitespace stripped)."""
+    return policy_numbers.astype(str).str.strip()
+
+
+def parse_effective_dates(dates: pd.Series) -> pd.Series:
+    """Parse effective dates that may be stored in mixed formats."""
+    try:
+        return pd.to_datetime(dates, format='mixed', errors='coerce')
+    except Exception:
+        return pd.to_datetime(dates, errors='coerce')
+
+
+def transaction_id_mask(all_data: pd.DataFrame, pattern: str) -> Optional[pd.Series]:
+    """Return a boolean mask of Transaction IDs matching pattern, or None if it can't be evaluated."""
+    try:
+        return all_data['Transaction ID'].str.contains(pattern, na=False)
+    except Exception:
+        return None
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    """Get a numeric version of a column, 0 when the column is missing."""
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce')
+
+
+def calculate_credits(original_trans: pd.DataFrame) -> pd.Series:
+    """
+    Commission owed per original transaction.
+    Uses Total Agent Comm, falling back to Agent Estimated Comm $ + Broker Fee Agent Comm
+    when the total is missing or zero.
+    """
+    total = _numeric(original_trans, 'Total Agent Comm')
+    fallback = (_numeric(original_trans, 'Agent Estimated Comm $').fillna(0) +
+                _numeric(original_trans, 'Broker Fee Agent Comm').fillna(0))
+    use_fallback = total.isna() | (total == 0)
+    return total.where(~use_fallback, fallback).astype(float)
+
+
+def calculate_debits(all_data: pd.DataFrame, original_trans: pd.DataFrame,
+                     policy_keys: Optional[pd.Series] = None,
+                     effective_dates: Optional[pd.Series] = None,
+                     payment_mask: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Total paid per original transaction.
+    Sums Agent Paid Amount (STMT) of -STMT-/-VOID- entries sharing the same
+    (Policy Number, Effective Date). Originals whose date can't be parsed fall
+    back to matching on the raw Effective Date value.
+
+    Args:
+        all_data: Full book including reconciliation entries
+        original_trans: Subset of all_data (same index) to compute debits for
+        policy_keys: Optional precomputed normalized policy keys for all_data
+        effective_dates: Optional precomputed parsed effective dates for all_data
+        payment_mask: Optional precomputed -STMT-/-VOID- mask for all_data
+    """
+    debits = pd.Series(0.0, index=original_trans.index)
+    if original_trans.empty:
+        return debits
+
+    if payment_mask is None:
+        payment_mask = transaction_id_mask(all_data, PAYMENT_PATTERN)
+    if payment_mask is None or not payment_mask.any() or 'Agent Paid Amount (STMT)' not in all_data.columns:
+        return debits
+
+    if policy_keys is None:
+        policy_keys = normalize_policy_key(all_data['Policy Number'])
+    if effective_dates is None:
+        effective_dates = parse_effective_dates(all_data['Effective Date'])
+
+    payments = pd.DataFrame({
+        '_key': policy_keys[payment_mask],
+        '_date': effective_dates[payment_mask],
+        '_raw_date': all_data.loc[payment_mask, 'Effective Date'],
+        '_paid': pd.to_numeric(all_data.loc[payment_mask, 'Agent Paid Amount (STMT)'], errors='coerce').fillna(0)
+    })
+
+    orig_keys = policy_keys.loc[original_trans.index]
+    orig_dates = effective_dates.loc[original_trans.index]
+    has_date = orig_dates.notna()
+
+    # Match on parsed date
+    if has_date.any():
+        by_date = payments[payments['_date'].notna()].groupby(['_key', '_date'], sort=False)['_paid'].sum()
+        lookup = pd.MultiIndex.from_arrays([orig_keys[has_date], orig_dates[has_date]])
+        debits.loc[has_date] = by_date.reindex(lookup).fillna(0).to_numpy()
+
+    # Fallback to raw value comparison when the original's date failed to parse
+    if (~has_date).any():
+        by_raw = payments.groupby(['_key', '_raw_date'], sort=False)['_paid'].sum()
+        raw_dates = original_trans.loc[~has_date, 'Effective Date']
+        lookup = pd.MultiIndex.from_arrays([orig_keys[~has_date], raw_dates])
+        debits.loc[~has_date] = by_raw.reindex(lookup).fillna(0).to_numpy()
+
+    return debits
+
+
+def build_balance_frame(all_data: pd.DataFrame, canonical: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Return the original transactions (no -STMT-, -ADJ-, -VOID-) with a _balance column.
+    Balance = credits (commission owed) - debits (STMT/VOID payments for the same policy term).
+    canonical: Optional canonical columns of all_data (see canonical_columns), used
+    instead of re-parsing IDs, policy numbers and dates.
+    """
+    if all_data is None or all_data.empty or 'Transaction ID' not in all_data.columns:
+        return pd.DataFrame()
+
+    if canonical is not None:
+        recon_mask = kind_mask(canonical, RECONCILIATION_KINDS)
+        payment_mask = kind_mask(canonical, PAYMENT_KINDS)
+        policy_keys = canonical['policy_key']
+        effective_dates = canonical['effective_date']
+    else:
+        recon_mask = transaction_id_mask(all_data, RECONCILIATION_PATTERN)
+        payment_mask = None
+        if recon_mask is None:
+            return pd.DataFrame()
+        policy_keys = normalize_policy_key(all_data['Policy Number'])
+        effective_dates = parse_effective_dates(all_data['Effective Date'])
+
+    original_trans = all_data[~recon_mask].copy()
+    if original_trans.empty:
+        return pd.DataFrame()
+
+    credits = calculate_credits(original_trans)
+    debits = calculate_debits(all_data, original_trans, policy_keys, effective_dates, payment_mask)
+    original_trans['_balance'] = credits.fillna(0) - debits
+    return original_trans
+
+
+def get_payment_frequency(payment_plan_text):
+    """Convert payment plan selection to annual frequency."""
+    if not payment_plan_text:
+        return None
+
+    plan = str(payment_plan_text).upper().strip()
+
+    # Check if it's the new format (e.g., "12-PAY")
+    if '-PAY' in plan:
+        try:
+            return int(plan.replace('-PAY', ''))
+        except ValueError:
+            return None
+
+    # Direct mapping for old dropdown values (backward compatibility)
+    return PAYMENT_FREQUENCY_MAP.get(plan, None)
+
+
+@lru_cache(maxsize=1024)
+def _cached_payment_frequency(payment_plan_text):
+    return get_payment_frequency(payment_plan_text)
+
+
+def payment_frequencies(plans: pd.Series) -> pd.Series:
+    """Annual frequency per row (NaN where there is no usable plan), parsing each distinct plan once."""
+    codes, uniques = pd.factorize(plans)
+    lookup = np.array([_cached_payment_frequency(plan) for plan in uniques] + [None], dtype=float)
+    frequencies = np.nan_to_num(lookup, nan=0.0)[codes]
+    return pd.Series(np.where(frequencies == 0, np.nan, frequencies), index=plans.index)
+
+
+def months_elapsed_since(dates: pd.Series, now: datetime.datetime,
+                         parsed: Optional[pd.Series] = None) -> pd.Series:
+    """Calendar months from each date through now, counting the starting month (0 if not started)."""
+    if parsed is None:
+        parsed = parse_effective_dates(dates)
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        # Mixed timezone offsets: parse each distinct value on its own
+        codes, uniques = pd.factorize(dates)
+        lookup = {code: pd.to_datetime(value, errors='coerce') for code, value in enumerate(uniques)}
+        parsed = pd.Series([lookup.get(code, pd.NaT) for code in codes], index=dates.index, dtype=object)
+        years = parsed.map(lambda value: value.year if not pd.isna(value) else np.nan).astype(float)
+        months = parsed.map(lambda value: value.month if not pd.isna(value) else np.nan).astype(float)
+    else:
+        years, months = parsed.dt.year.astype(float), parsed.dt.month.astype(float)
+    elapsed = (now.year - years) * 12 + (now.month - months) + 1
+    return elapsed.clip(lower=0).fillna(0)
+
+
+def _first_column(df: pd.DataFrame, columns) -> pd.Series:
+    """Values of the first of columns present and non-empty per row (like dict.get(a) or dict.get(b))."""
+    values = pd.Series(None, index=df.index, dtype=object)
+    for column in reversed(columns):
+        if column in df.columns:
+            column_values = df[column]
+            present = column_values.notna() & (column_values.astype(str) != '')
+            values = column_values.astype(object).where(present, values)
+    return values
+
+
+def calculate_as_earned_balances(df: pd.DataFrame, now: Optional[datetime.datetime] = None,
+                                 canonical: Optional[pd.DataFrame] = None) -> pd.Series:
+    """
+    As Earned Balance Due for every row in one pass.
+
+    STMT rows show their payment as a negative amount. Rows with a payment plan
+    show Total Agent Comm earned so far: all of it on 1-pay plans, otherwise one
+    installment (total / frequency) per calendar month since the Effective Date,
+    capped at the plan's installment count. NaN where neither applies.
+    canonical: Optional canonical columns of df (parsed Effective Date, transaction kinds)
+    """
+    if df is None or df.empty:
+        return pd.Series(dtype=float)
+    now = now or datetime.datetime.now()
+    earned = pd.Series(np.nan, index=df.index)
+
+    if canonical is not None:
+        is_statement = canonical['transaction_kind'] == TransactionKind.STMT
+    elif 'Transaction ID' in df.columns:
+        is_statement = df['Transaction ID'].astype(str).str.contains('-STMT-', regex=False)
+    else:
+        is_statement = pd.Series(False, index=df.index)
+    paid = _numeric(df, 'Agent Paid Amount (STMT)').fillna(0)
+    earned = earned.mask(is_statement & (paid != 0), -paid)
+
+    frequency = payment_frequencies(_first_column(df, ['AS EARNED PMT PLAN', 'AS_EARNED_PMT_PLAN']))
+    total_comm = _numeric(df, 'Total Agent Comm').fillna(0)
+    effective_dates = (df['Effective Date'] if 'Effective Date' in df.columns
+                       else pd.Series(None, index=df.index, dtype=object))
+    has_date = effective_dates.notna() & (effective_dates.astype(str) != '')
+    applies = ~is_statement & frequency.notna() & has_date & (total_comm != 0)
+    if not applies.any():
+        return earned
+
+    parsed = canonical.loc[applies, 'effective_date'] if canonical is not None else None
+    months = months_elapsed_since(effective_dates[applies], now, parsed)
+    frequency, total_comm = frequency[applies], total_comm[applies]
+    installments = total_comm / frequency * np.minimum(months, frequency)
+    plan_earned = total_comm.where(frequency == 1, installments).where(months > 0, 0.0)
+    earned.loc[applies] = plan_earned
+    return earned
@@ -0,0 +1,214 @@
+"""
+Bulk renewal generation for Pending Policy Renewals.
+Builds the RWL rows for many pending policies at once (dates shifted by the
+policy term, commission rates taken from one resolved rule table, financial
+fields cleared for the new term), then writes the renewals and their
+renewal_history entries with chunked bulk inserts.
+"""
+
+import datetime
+import json
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from bulk_writer import BULK_WRITE_BATCH_SIZE, insert_op, write_operations
+
+# Agent split on renewals (same as the transaction form for RWL)
+RENEWAL_AGENT_RATE = 25.0
+
+# Term used when a policy has no (or a zero) Policy Term
+DEFAULT_RENEWAL_TERM_MONTHS = 6
+
+# Amounts belonging to the expiring term; the new term starts without them
+RENEWAL_CLEARED_FIELDS = [
+    'Premium Sold', 'Commissionable Premium', 'Commission %',
+    'Commission $', 'Producer Commission %', 'Producer Commission $',
+    'Override %', 'Override Commission', 'Commission Already Earned',
+    'Commission Already Received', 'Balance Owed', 'Renewal/Bonus Percentage',
+    'Renewal Amount', 'Not Paid/Paid', 'Agent Paid Amount (STMT)',
+    'Agency Comm Received (STMT)', 'Policy Taxes & Fees', 'Broker Fee',
+    'Agency Estimated Comm/Revenue (CRM)', 'Agent Estimated Comm $', 'Total Agent Comm',
+    'STMT DATE', 'reconciliation_status', 'reconciliation_id', 'reconciled_at', 'is_reconciliation_entry'
+]
+
+# Columns filled in by the pending renewals page or the database, never copied
+RENEWAL_DROPPED_COLUMNS = ['Edit', 'Status', 'Days Until Expiration', 'expiration_date',
+                           '_id', 'id', 'created_at', 'updated_at']
+
+
+def renewal_terms(rows: pd.DataFrame, policy_term_col: str = 'Policy Term') -> pd.Series:
+    """Months to add for each renewal (the Policy Term, or the default when missing or zero)."""
+    if policy_term_col not in rows.columns:
+        return pd.Series(DEFAULT_RENEWAL_TERM_MONTHS, index=rows.index)
+    terms = pd.to_numeric(rows[policy_term_col], errors='coerce')
+    return terms.where(terms.notna() & (terms != 0), DEFAULT_RENEWAL_TERM_MONTHS).astype(int)
+
+
+def shift_by_months(dates: pd.Series, months: pd.Series) -> pd.Series:
+    """dates + months (calendar months, end-of-month aware), one vectorized add per distinct term."""
+    shifted = pd.Series(pd.NaT, index=dates.index, dtype=dates.dtype)
+    for term, index in months.groupby(months).groups.items():
+        shifted.loc[index] = dates.loc[index] + pd.DateOffset(months=int(term))
+    return shifted
+
+
+def resolve_renewal_rates(rows: pd.DataFrame, resolver, effective_dates: pd.Series) -> pd.DataFrame:
+    """
+    One rule lookup per distinct (carrier, MGA, policy type, effective date).
+
+    Returns:
+        DataFrame aligned to rows with commission_rule_id and rule_rate (renewal rate,
+        falling back to the new business rate); NaN where no rule applies
+    """
+    rates = pd.DataFrame({'commission_rule_id': None, 'rule_rate': float('nan')}, index=rows.index)
+    if resolver is None or 'carrier_id' not in rows.columns:
+        return rates
+
+    keys = pd.DataFrame({
+        'carrier_id': rows['carrier_id'],
+        'mga_id': rows['mga_id'] if 'mga_id' in rows.columns else None,
+        'policy_type': rows['Policy Type'] if 'Policy Type' in rows.columns else None,
+        'effective_date': effective_dates.dt.date,
+    }, index=rows.index).astype(object).where(lambda frame: frame.notna(), None)
+
+    rule_table = {}
+    for key in keys.drop_duplicates().itertuples(index=False):
+        if not key.carrier_id:
+            continue
+        rule = resolver.find_rule(key.carrier_id, key.mga_id or None, key.policy_type or None, key.effective_date)
+        if rule is not None:
+            rule_table[tuple(key)] = (rule['rule_id'], rule.get('renewal_rate') or rule['new_rate'])
+
+    for index, key in zip(keys.index, keys.itertuples(index=False)):
+        resolved = rule_table.get(tuple(key))
+        if resolved is not None:
+            rates.at[index, 'commission_rule_id'], rates.at[index, 'rule_rate'] = resolved
+    return rates
+
+
+def build_renewal_rows(pending: pd.DataFrame, transaction_ids: Sequence[str], resolver=None,
+                       notes: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Build the RWL rows for pending renewals.
+
+    Args:
+        pending: Pending renewals (rows of the latest term, with an expiration_date column)
+        transaction_ids: One new Transaction ID per pending row
+        resolver: Optional CommissionRuleResolver for the renewal Policy Gross Comm %
+        notes: NOTES for the new rows (default: none)
+
+    Returns:
+        dict with renewals (new rows, index aligned to pending) and skipped
+        (pending rows without a usable expiration date)
+
+    Raises:
+        ValueError: pending has neither an expiration_date nor an X-DATE column
+    """
+    expiration_col = next((col for col in ('expiration_date', 'X-DATE') if col in pending.columns), None)
+    if expiration_col is None:
+        raise ValueError("Pending renewals need an expiration_date or X-DATE column")
+    expirations = pd.to_datetime(pending[expiration_col], errors='coerce', format='mixed')
+    usable = expirations.notna()
+    rows = pending[usable].copy()
+    ids = pd.Series(list(transaction_ids), index=pending.index)[usable]
+
+    effective = expirations[usable]
+    expiration = shift_by_months(effective, renewal_terms(rows))
+    rates = resolve_renewal_rates(rows, resolver, effective)
+
+    renewals = rows.drop(columns=[col for col in RENEWAL_DROPPED_COLUMNS if col in rows.columns])
+    renewals['Transaction ID'] = ids
+    renewals['Prior Policy Number'] = rows['Policy Number'] if 'Policy Number' in rows.columns else None
+    renewals['Transaction Type'] = 'RWL'
+    renewals['Effective Date'] = effective.dt.strftime('%Y-%m-%d')
+    renewals['X-DATE'] = expiration.dt.strftime('%Y-%m-%d')
+    renewals['Agent Comm %'] = RENEWAL_AGENT_RATE
+
+    has_rule = rates['rule_rate'].notna()
+    if has_rule.any():
+        if 'Policy Gross Comm %' not in renewals.columns:
+            renewals['Policy Gross Comm %'] = None
+        renewals['Policy Gross Comm %'] = renewals['Policy Gross Comm %'].astype(object)
+        renewals.loc[has_rule, 'Policy Gross Comm %'] = rates.loc[has_rule, 'rule_rate']
+        renewals['commission_rule_id'] = rates['commission_rule_id']
+
+    for field in RENEWAL_CLEARED_FIELDS:
+        if field in renewals.columns:
+            renewals[field] = None
+    renewals['NOTES'] = notes
+
+    return {'renewals': renewals, 'skipped': pending[~usable]}
+
+
+def build_renewal_history(originals: pd.DataFrame, renewals: pd.DataFrame, batch_id: str,
+                          renewed_by: str = "User") -> List[dict]:
+    """renewal_history rows (one per renewal) in the same shape as single renewals."""
+    renewed_at = datetime.datetime.now().isoformat()
+    history = []
+    for index, renewal in renewals.iterrows():
+        original = originals.loc[index]
+        history.append({
+            "renewal_timestamp": renewed_at,
+            "renewed_by": renewed_by,
+            "original_transaction_id": original.get('Transaction ID', ''),
+            "new_transaction_id": renewal['Transaction ID'],
+            "details": json.dumps({
+                "count": 1,
+                "renewed_ids": [renewal['Transaction ID']],
+                "original_policy_number": original.get('Policy Number', ''),
+                "new_policy_number": renewal.get('Policy Number', ''),
+                "policy_chain": True,
+                "batch_id": batch_id
+            }, default=str)
+        })
+    return history
+
+
+def write_renewals(supabase, pending: pd.DataFrame, renewals: pd.DataFrame, batch_id: str,
+                   prepare_row: Callable[[dict], dict] = dict,
+                   batch_size: int = BULK_WRITE_BATCH_SIZE,
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Insert renewal rows, then renewal_history for the ones that were written, in chunked bulk calls.
+
+    Args:
+        supabase: Supabase client
+        pending: The pending rows being renewed (for history)
+        renewals: Output of build_renewal_rows
+        batch_id: Identifier recorded with every history entry
+        prepare_row: Per-row cleanup before insert (UI-only fields, NaN, user ownership)
+        batch_size: Rows per bulk call
+        progress_callback: Called with (rows written, total rows) across both tables
+
+    Returns:
+        dict with policies (BulkWriteResult), history (BulkWriteResult), renewed
+        (pending index of renewals that were written) and failed (pending index of ones that weren't)
+    """
+    records = renewals.astype(object).where(renewals.notna(), None).to_dict('records')
+    operations = [insert_op('policies', prepare_row(record)) for record in records]
+    total = len(operations) * 2
+
+    def report(offset):
+        if progress_callback is None:
+            return None
+        return lambda written, _total: progress_callback(offset + written, total)
+
+    policies_result = write_operations(supabase, operations, batch_size=batch_size,
+                                       stop_on_error=False, progress_callback=report(0))
+
+    failed_positions = {error['index'] for error in policies_result.errors}
+    written = [position for position in range(len(operations)) if position not in failed_positions]
+    renewed_index = renewals.index[written]
+
+    history = build_renewal_history(pending, renewals.loc[renewed_index], batch_id)
+    history_result = write_operations(supabase, [insert_op('renewal_history', row) for row in history],
+                                      batch_size=batch_size, stop_on_error=False,
+                                      progress_callback=report(len(operations)))
+
+    return {
+        'policies': policies_result,
+        'history': history_result,
+        'renewed': renewed_index,
+        'failed': renewals.index[sorted(failed_positions)],
+    }
@@ -0,0 +1,196 @@
+"""
+Batched write pipeline for Supabase tables.
+Groups queued inserts and updates into chunked bulk calls (one HTTP round trip
+per chunk instead of per row), isolates the offending rows when a chunk fails,
+and records where to resume so a failed run can be retried without
+re-writing rows that already went through.
+"""
+
+import json
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Rows sent per bulk call (keeps request bodies well under PostgREST limits)
+BULK_WRITE_BATCH_SIZE = 500
+
+# Optional progress callback: (rows written so far, total rows)
+ProgressCallback = Callable[[int, int], None]
+
+
+class BulkWriteResult:
+    """Outcome of a bulk write: rows written, per-row errors and the resume point."""
+
+    def __init__(self, operations: Sequence[tuple]):
+        self.operations = list(operations)
+        self.written = 0
+        self.errors: List[dict] = []
+        # Index of the first operation that was never attempted
+        self.next_index = len(self.operations)
+
+    @property
+    def completed(self) -> bool:
+        return not self.errors and self.next_index >= len(self.operations)
+
+    def remaining_operations(self) -> List[tuple]:
+        """
+        Operations to pass back to write_operations to resume: failed rows, then unattempted ones.
+        Rows whose outcome is unknown (a bulk insert reported fewer rows than sent) are left out
+        so a resume can't insert them twice.
+        """
+        failed = sorted({error['index'] for error in self.errors if error.get('retryable', True)})
+        return [self.operations[i] for i in failed] + self.operations[self.next_index:]
+
+    def error_summary(self, limit: int = 5) -> str:
+        """Short human-readable list of the first failed rows."""
+        lines = [f"{error['transaction_id'] or 'row ' + str(error['index'] + 1)}: {error['error']}"
+                 for error in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"... and {len(self.errors) - limit} more")
+        return "\n".join(lines)
+
+
+def insert_op(table: str, row: dict) -> tuple:
+    """Queue an insert of one row."""
+    return ('insert', table, row)
+
+
+def update_op(table: str, values: dict, key_column: str, key) -> tuple:
+    """Queue an update of the row(s) where key_column equals key."""
+    return ('update', table, {'values': values, 'key_column': key_column, 'key': key})
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _apply_filters(query, filters):
+    for operator, *args in filters:
+        query = getattr(query, operator)(*args)
+    return query
+
+
+def _transaction_id(operation: tuple):
+    op_type, _table, data = operation
+    if op_type == 'update':
+        return data.get('values', {}).get('Transaction ID') or f"{data['key_column']}={data['key']}"
+    return data.get('Transaction ID')
+
+
+def _record_error(result: BulkWriteResult, index: int, error, retryable: bool = True):
+    result.errors.append({
+        'index': index,
+        'transaction_id': _transaction_id(result.operations[index]),
+        'error': str(error),
+        'retryable': retryable
+    })
+
+
+def _run_inserts(supabase, table: str, indexed_rows: List[Tuple[int, dict]], result: BulkWriteResult) -> bool:
+    """Insert a chunk in one call; on failure retry row by row to find the bad rows."""
+    rows = [row for _index, row in indexed_rows]
+    try:
+        # Rows in a chunk may have different keys; columns a row leaves out get their
+        # database default (e.g. created_at) instead of NULL
+        response = supabase.table(table).insert(rows, default_to_null=False).execute()
+    except Exception as chunk_error:
+        print(f"Bulk insert into {table} failed, retrying rows individually: {chunk_error}")
+    else:
+        if response.data is None or len(response.data) == len(rows):
+            result.written += len(rows)
+            return True
+        # The request went through, so some rows may be saved: report instead of retrying
+        message = f"Bulk insert returned {len(response.data)} of {len(rows)} rows; not retried, check for duplicates"
+        for index, _row in indexed_rows:
+            _record_error(result, index, message, retryable=False)
+        return False
+
+    ok = True
+    for index, row in indexed_rows:
+        try:
+            response = supabase.table(table).insert(row).execute()
+            if not response.data:
+                raise Exception("Insert returned no data")
+            result.written += 1
+        except Exception as row_error:
+            _record_error(result, index, row_error)
+            ok = False
+    return ok
+
+
+def _run_updates(supabase, table: str, indexed_updates: List[Tuple[int, dict]], filters,
+                 result: BulkWriteResult) -> bool:
+    """Apply a chunk of updates, one call per distinct (values, key column) group."""
+    groups = {}
+    for index, update in indexed_updates:
+        group_key = (json.dumps(update['values'], sort_keys=True, default=str), update['key_column'])
+        groups.setdefault(group_key, []).append((index, update))
+
+    ok = True
+    for (_values_key, key_column), members in groups.items():
+        values = members[0][1]['values']
+        keys = [update['key'] for _index, update in members]
+        try:
+            query = supabase.table(table).update(values).in_(key_column, keys)
+            _apply_filters(query, filters).execute()
+            result.written += len(members)
+            continue
+        except Exception as group_error:
+            print(f"Bulk update of {table} failed, retrying rows individually: {group_error}")
+
+        for index, update in members:
+            try:
+                query = supabase.table(table).update(values).eq(key_column, update['key'])
+                _apply_filters(query, filters).execute()
+                result.written += 1
+            except Exception as row_error:
+                _record_error(result, index, row_error)
+                ok = False
+    return ok
+
+
+def write_operations(supabase, operations: Sequence[tuple], filters: Sequence[tuple] = (),
+                     batch_size: int = BULK_WRITE_BATCH_SIZE, stop_on_error: bool = True,
+                     progress_callback: Optional[ProgressCallback] = None) -> BulkWriteResult:
+    """
+    Execute queued ('insert'|'update', table, data) operations in bulk, preserving their order.
+
+    Args:
+        supabase: Supabase client
+        operations: Operations built with insert_op/update_op (plain ('insert', table, row) tuples also work)
+        filters: Extra (operator, *args) filters applied to every update, e.g. ('eq', 'user_id', user_id)
+        batch_size: Rows per bulk call
+        stop_on_error: Stop after the first chunk with failed rows (the rest is left for a resume)
+        progress_callback: Called with (written, total) after each chunk
+
+    Returns:
+        BulkWriteResult with the written count, per-row errors and resume position
+    """
+    result = BulkWriteResult(operations)
+    total = len(result.operations)
+    batch_size = max(1, int(batch_size))
+
+    # Group consecutive operations of the same kind and table so ordering is kept
+    runs = []
+    for index, (op_type, table, data) in enumerate(result.operations):
+        if op_type not in ('insert', 'update'):
+            raise ValueError(f"Unsupported bulk operation: {op_type}")
+        if runs and runs[-1][0] == op_type and runs[-1][1] == table:
+            runs[-1][2].append((index, data))
+        else:
+            runs.append((op_type, table, [(index, data)]))
+
+    for op_type, table, members in runs:
+        for chunk in _chunks(members, batch_size):
+            if op_type == 'insert':
+                ok = _run_inserts(supabase, table, chunk, result)
+            else:
+                ok = _run_updates(supabase, table, chunk, filters, result)
+
+            if progress_callback:
+                progress_callback(result.written, total)
+
+            if not ok and stop_on_error:
+                result.next_index = chunk[-1][0] + 1
+                return result
+
+    return result
@@ -0,0 +1,107 @@
+"""
+Canonical typed columns of the policies book.
+Parses the columns every hot path needs (Effective Date, X-DATE and STMT DATE as
+datetime64, a stripped policy key, the transaction kind encoded from the
+Transaction ID suffix) once per load. The result is a companion frame with the
+same index as the loaded policies frame, kept beside it rather than inside it so
+tables, editors and write paths never see the extra columns.
+"""
+
+from enum import IntEnum
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class TransactionKind(IntEnum):
+    """What a policies row is, from its Transaction ID."""
+    ORIGINAL = 0
+    IMPORT = 1
+    STMT = 2
+    VOID = 3
+    ADJ = 4
+
+
+# Transaction ID markers, checked in this order (a VOID of a STMT entry is a VOID)
+TRANSACTION_KIND_MARKERS = [
+    (TransactionKind.VOID, '-VOID-'),
+    (TransactionKind.STMT, '-STMT-'),
+    (TransactionKind.ADJ, '-ADJ-'),
+    (TransactionKind.IMPORT, '-IMPORT'),
+]
+
+# Kinds that are reconciliation entries (-STMT-, -VOID-, -ADJ-) and payments (-STMT-, -VOID-)
+RECONCILIATION_KINDS = (TransactionKind.STMT, TransactionKind.VOID, TransactionKind.ADJ)
+PAYMENT_KINDS = (TransactionKind.STMT, TransactionKind.VOID)
+
+# Source column of each parsed date column
+CANONICAL_DATE_COLUMNS = {
+    'effective_date': 'Effective Date',
+    'x_date': 'X-DATE',
+    'stmt_date': 'STMT DATE',
+}
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Parse dates stored in mixed formats (unparseable values become NaT)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format='mixed', errors='coerce')
+    except Exception:
+        return pd.to_datetime(values, errors='coerce')
+
+
+def encode_transaction_kinds(transaction_ids: pd.Series) -> pd.Series:
+    """TransactionKind code (int8) of every Transaction ID."""
+    ids = transaction_ids.astype(str)
+    kinds = np.full(len(ids), TransactionKind.ORIGINAL, dtype=np.int8)
+    unassigned = np.ones(len(ids), dtype=bool)
+    for kind, marker in TRANSACTION_KIND_MARKERS:
+        matches = ids.str.contains(marker, regex=False, na=False).to_numpy() & unassigned
+        kinds[matches] = kind
+        unassigned &= ~matches
+    return pd.Series(kinds, index=transaction_ids.index)
+
+
+def build_canonical_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Canonical columns for a policies frame (same index).
+
+    Returns:
+        DataFrame with effective_date, x_date, stmt_date (datetime64, NaT when
+        missing), policy_key (stripped Policy Number), transaction_kind
+        (TransactionKind codes) and _id when the frame has one
+    """
+    canonical = pd.DataFrame(index=df.index)
+    for name, source in CANONICAL_DATE_COLUMNS.items():
+        canonical[name] = parse_dates(df[source]) if source in df.columns else pd.NaT
+    canonical['policy_key'] = (df['Policy Number'].astype(str).str.strip() if 'Policy Number' in df.columns
+                               else pd.Series('', index=df.index))
+    canonical['transaction_kind'] = (encode_transaction_kinds(df['Transaction ID']) if 'Transaction ID' in df.columns
+                                     else pd.Series(TransactionKind.ORIGINAL, index=df.index, dtype=np.int8))
+    if '_id' in df.columns:
+        canonical['_id'] = df['_id']
+    return canonical
+
+
+def align_canonical_columns(canonical: Optional[pd.DataFrame], df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Canonical rows for df when df is (a subset of) the frame they were built from,
+    else None. Rows are matched by index and confirmed by _id, so a re-indexed or
+    aggregated frame is never paired with the wrong rows.
+    """
+    if canonical is None or df is None or '_id' not in df.columns or '_id' not in canonical.columns:
+        return None
+    if not df.index.isin(canonical.index).all():
+        return None
+    aligned = canonical.reindex(df.index)
+    if not (aligned['_id'].to_numpy() == df['_id'].to_numpy()).all():
+        return None
+    return aligned
+
+
+def kind_mask(canonical: pd.DataFrame, kinds) -> pd.Series:
+    """Boolean mask of rows whose transaction kind is one of kinds."""
+    return canonical['transaction_kind'].isin([int(kind) for kind in kinds])
@@ -0,0 +1,95 @@
+"""
+Carrier <-> MGA relationship graph.
+Loads every carrier/MGA link for the user (from carrier_mga_relationships and
+commission_rules, with the MGA name embedded) in two queries and keeps the
+adjacency in memory, so MGA dropdowns for any carrier answer without a query.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+import streamlit as st
+
+# Safety net for relationship changes made outside this session
+GRAPH_CACHE_TTL_SECONDS = 600
+
+# Sources of carrier/MGA links; both reference mgas(mga_id), so the MGA can be embedded
+LINK_TABLES = ['carrier_mga_relationships', 'commission_rules']
+
+
+class CarrierMgaGraph:
+    """Adjacency of carriers and active MGAs, in both directions."""
+
+    def __init__(self, links: Sequence[dict]):
+        self._mgas: Dict = {}                     # mga_id -> mga_name (active MGAs only)
+        self._carrier_mgas: Dict = {}             # carrier_id -> set of mga_ids
+        self._mga_carriers: Dict = {}             # mga_id -> set of carrier_ids
+
+        for link in links:
+            mga = link.get('mgas') or {}
+            mga_id = link.get('mga_id')
+            if not mga_id or mga.get('status') != 'Active':
+                continue
+            self._mgas[mga_id] = mga.get('mga_name')
+            self._carrier_mgas.setdefault(link.get('carrier_id'), set()).add(mga_id)
+            self._mga_carriers.setdefault(mga_id, set()).add(link.get('carrier_id'))
+
+    def mgas_for_carrier(self, carrier_id) -> List[dict]:
+        """Active MGAs linked to a carrier, sorted by name (same shape as load_mgas_for_carrier)."""
+        mgas = [{'mga_id': mga_id, 'mga_name': self._mgas[mga_id]}
+                for mga_id in self._carrier_mgas.get(carrier_id, ())]
+        return sorted(mgas, key=lambda mga: mga['mga_name'] or '')
+
+    def carriers_for_mga(self, mga_id) -> List:
+        """Carrier ids linked to an MGA."""
+        return list(self._mga_carriers.get(mga_id, ()))
+
+    def mga_name(self, mga_id) -> Optional[str]:
+        return self._mgas.get(mga_id)
+
+    @property
+    def link_count(self) -> int:
+        return sum(len(mga_ids) for mga_ids in self._carrier_mgas.values())
+
+
+def fetch_carrier_mga_links(supabase, filters: Sequence[tuple] = ()) -> List[dict]:
+    """All carrier/MGA links for the user, one query per link table, with the MGA embedded."""
+    links = []
+    for table in LINK_TABLES:
+        try:
+            query = supabase.table(table).select('carrier_id, mga_id, mgas(mga_name, status)').not_.is_('mga_id', 'null')
+            for operator, *args in filters:
+                query = getattr(query, operator)(*args)
+            links.extend(query.execute().data or [])
+        except Exception as e:
+            # A missing source doesn't block the other one
+            print(f"Error loading carrier/MGA links from {table}: {e}")
+    return links
+
+
+def get_carrier_mga_graph(supabase, cache_key: str, owner: str,
+                          filters: Sequence[tuple] = ()) -> CarrierMgaGraph:
+    """Return the session's carrier/MGA graph, loading it on first use or after invalidation."""
+    entry = st.session_state.get(cache_key)
+    if (isinstance(entry, dict) and entry.get('owner') == owner
+            and time.time() - entry.get('loaded_at', 0) <= GRAPH_CACHE_TTL_SECONDS):
+        return entry['graph']
+
+    return store_carrier_mga_graph(cache_key, owner, fetch_carrier_mga_links(supabase, filters))
+
+
+def store_carrier_mga_graph(cache_key: str, owner: str, links: List[dict]) -> CarrierMgaGraph:
+    """Build the graph from fetched links and keep it in the session (main thread only)."""
+    graph = CarrierMgaGraph(links)
+    st.session_state[cache_key] = {
+        'owner': owner,
+        'loaded_at': time.time(),
+        'graph': graph
+    }
+    return graph
+
+
+def invalidate_carrier_mga_graph(cache_key: str):
+    """Drop the cached graph (call after carrier, MGA, relationship or commission rule edits)."""
+    if cache_key in st.session_state:
+        del st.session_state[cache_key]
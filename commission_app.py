@@ -178,6 +178,34 @@ from user_mappings_db import user_mappings
 from user_prl_templates_db import user_prl_templates
 # from utils.styling_minimal import apply_css  # Temporarily disabled for mobile testing
 from database_utils import get_supabase_client
+from balance_engine import build_balance_frame, calculate_as_earned_balances
+from customer_index import find_customer_matches, normalize_business_name
+from bulk_writer import BULK_WRITE_BATCH_SIZE, insert_op, update_op, write_operations
+from reconciliation_dry_run import build_dry_run_report
+from dashboard_metrics import build_policy_summary, calculate_metrics_from_summary
+from commission_rule_resolver import (fetch_commission_rules, get_cached_name, get_rule_resolver, invalidate_rule_resolver,
+                                      store_rule_resolver)
+from id_allocator import IdAllocator, generate_client_id, generate_transaction_id
+from carrier_mga_graph import (fetch_carrier_mga_links, get_carrier_mga_graph, invalidate_carrier_mga_graph,
+                               store_carrier_mga_graph)
+from pending_renewals import RenewalIndex, summarize_due_windows
+from policy_terms import fill_statement_client_ids, transactions_for_term_month
+from bulk_renewals import build_renewal_rows, write_renewals
+from reference_data import (fetch_carriers, get_reference_value, invalidate_reference_data, prefetch_reference_data)
+from statement_matcher import (
+    StageTimer, StatementMatchIndex, dedupe_statement_rows, extract_statement_fields,
+    match_statement_rows
+)
+from policies_data_layer import (
+    fetch_policies, get_cached_policies, store_cached_policies, invalidate_policies_cache,
+    mark_policies_stale, sync_policies_delta, get_policies_data_version, get_canonical_columns,
+    restore_policies_snapshot, apply_snapshot_validation, delete_policies_snapshot
+)
+from compact_policies import COMPACT_POLICIES_CACHE, session_memory_report
+from canonical_columns import (
+    PAYMENT_KINDS, RECONCILIATION_KINDS, TransactionKind, align_canonical_columns,
+    encode_transaction_kinds, kind_mask
+)
 import stripe
 
 # Configure Stripe (only for production environment)
@@ -288,124 +316,6 @@ def check_password():
     
     return False
 
-# As-Earned Commission Functions
-def get_payment_frequency(payment_plan_text):
-    """Convert payment plan selection to annual frequency."""
-    if not payment_plan_text:
-        return None
-    
-    plan = str(payment_plan_text).upper().strip()
-    
-    # Check if it's the new format (e.g., "12-PAY")
-    if '-PAY' in plan:
-        try:
-            # Extract the number before "-PAY"
-            frequency = int(plan.replace('-PAY', ''))
-            return frequency
-        except ValueError:
-            return None
-    
-    # Direct mapping for old dropdown values (backward compatibility)
-    frequency_map = {
-        'FULL': 1,
-        'ANNUAL': 1,
-        'SEMI-ANNUAL': 2,
-        'QUARTERLY': 4,
-        'MONTHLY': 12,
-        'SEMI-MONTHLY': 24,
-        'BI-WEEKLY': 26,
-        'WEEKLY': 52
-    }
-    
-    return frequency_map.get(plan, None)
-
-def calculate_months_between(start_date, end_date):
-    """Calculate the number of months between two dates."""
-    if not start_date or not end_date:
-        return 0
-    
-    # Convert to datetime if needed
-    if isinstance(start_date, str):
-        start_date = pd.to_datetime(start_date, errors='coerce')
-        if pd.isna(start_date):
-            return 0
-    if isinstance(end_date, str):
-        end_date = pd.to_datetime(end_date, errors='coerce')
-        if pd.isna(end_date):
-            return 0
-    
-    # Calculate months (partial months count as full)
-    months = (end_date.year - start_date.year) * 12 + (end_date.month - start_date.month)
-    
-    # Add 1 because we count the starting month
-    total_months = months + 1
-    
-    # Return 0 if the start date is in the future
-    return max(0, total_months)
-
-def calculate_as_earned_balance(transaction, all_data=None):
-    """Calculate as-earned balance if payment plan exists."""
-    # Get transaction type and ID
-    trans_id = str(transaction.get('Transaction ID', ''))
-    trans_type = transaction.get('Transaction Type', '')
-    
-    # For STMT transactions, show the payment amount as negative (to match Policy Balance Due pattern)
-    if '-STMT-' in trans_id:
-        paid_amount = transaction.get('Agent Paid Amount (STMT)', 0)
-        try:
-            paid_amount = float(paid_amount) if paid_amount is not None else 0
-        except (ValueError, TypeError):
-            paid_amount = 0
-        if pd.isna(paid_amount):
-            paid_amount = 0
-        # Return as negative to show it's a payment/deduction
-        return -paid_amount if paid_amount != 0 else None
-    
-    # Check both possible column names (before and after rename)
-    payment_plan = transaction.get('AS EARNED PMT PLAN') or transaction.get('AS_EARNED_PMT_PLAN')
-    frequency = get_payment_frequency(payment_plan)
-    
-    if not frequency:
-        return None  # Don't show column for this row
-    
-    # Get values with safe defaults
-    effective_date = transaction.get('Effective Date')
-    total_comm = transaction.get('Total Agent Comm', 0)
-    
-    # Convert to float safely
-    try:
-        total_comm = float(total_comm) if total_comm is not None else 0
-    except (ValueError, TypeError):
-        total_comm = 0
-    
-    # Handle NaN values
-    if pd.isna(total_comm):
-        total_comm = 0
-    
-    if not effective_date or total_comm == 0:
-        return None
-    
-    # Calculate months elapsed (simple calendar month counting)
-    current_date = datetime.datetime.now()
-    months_elapsed = calculate_months_between(effective_date, current_date)
-    
-    # If policy hasn't started yet, nothing is earned
-    if months_elapsed <= 0:
-        return 0
-    
-    # Simple calculation: How much have we earned so far?
-    if frequency == 1:  # 1-PAY (FULL) - all earned immediately
-        earned_amount = total_comm
-    else:
-        # Simple: divide total by frequency, multiply by months elapsed
-        # Cap at the number of payments in the plan
-        payment_amount = total_comm / frequency
-        payments_earned = min(months_elapsed, frequency)
-        earned_amount = payment_amount * payments_earned
-    
-    # For non-STMT transactions, just return the earned amount
-    return earned_amount
-
 # Removed get_supabase_client function - now imported from database_utils at top of file
 
 def add_user_email_to_data(data_dict):
@@ -575,83 +485,168 @@ def ensure_user_id():
             print(f"Error ensuring user_id: {e}")
             # Don't crash the app if user_id lookup fails
 
-def load_policies_data():
-    """Load policies data from Supabase - filtered by current user. NO CACHING to prevent data leaks."""
+def get_policies_cache_owner():
+    """Identify whose policies the session cache holds (user_id preferred, then email)."""
+    if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
+        return str(get_user_id() or get_normalized_user_email() or '')
+    return 'personal'
+
+def get_user_write_filters():
+    """Security filters for bulk updates (same user_id / user_email rule as single-row updates)."""
+    if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
+        user_id = get_user_id()
+        if user_id:
+            return [('eq', 'user_id', user_id)]
+        return [('eq', 'user_email', get_normalized_user_email())]
+    return []
+
+def prepare_policies_frame(df):
+    """Apply the loader's cleanup to raw policies rows (dedupe IDs, numeric types, rounding)."""
+    # CRITICAL: Remove any duplicate Transaction IDs that might have been loaded
+    # This can happen with case-insensitive searches or data issues
+    if 'Transaction ID' in df.columns:
+        initial_count = len(df)
+        df = df.drop_duplicates(subset=['Transaction ID'])
+        final_count = len(df)
+        if initial_count != final_count:
+            print(f"WARNING: Removed {initial_count - final_count} duplicate Transaction IDs from loaded data")
+    
+    # Ensure numeric columns are properly typed
+    numeric_cols = [
+        'Agent Estimated Comm $',
+        'Policy Gross Comm %',
+        'Agency Estimated Comm/Revenue (CRM)',
+        'Agency Comm Received (STMT)',
+        'Premium Sold',
+        'Agent Paid Amount (STMT)',
+        'Agency Comm Received (STMT)',
+        'Broker Fee',
+        'Policy Taxes & Fees',
+        'Commissionable Premium',
+        'Broker Fee Agent Comm',
+        'Total Agent Comm'
+    ]
+    
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Keep date columns as they are in the database
+    # DO NOT format dates here as it can cause data loss
+    
+    # Round all numeric columns to 2 decimal places
+    return round_numeric_columns(df)
+
+def load_policies_data(columns=None, force_refresh=False):
+    """Load policies data from Supabase - filtered by current user.
+    
+    Rows are fetched in keyset-paginated chunks (ordered by _id) so large books are
+    never truncated, and kept in a per-user session cache. After clear_policies_cache()
+    the next call pulls only rows changed since the cached updated_at/_id watermark
+    (plus deleted_policies tombstones), falling back to a full reload when needed.
+    With POLICIES_SNAPSHOT_DIR set, a new session starts from the user's on-disk
+    snapshot, which is validated against the database in the background.
+    
+    Args:
+        columns: Optional list of columns to load (default: all columns)
+        force_refresh: If True, bypass the session cache and reload everything
+    """
     try:
         # Ensure user_id is set
         ensure_user_id()
         
-        supabase = get_supabase_client()
         user_id = get_user_id()
         user_email = get_normalized_user_email()
+        cache_key = get_user_session_key('policies_data')
+        cache_owner = get_policies_cache_owner()
+        
+        if not force_refresh:
+            # Merge a finished background check of a snapshot-restored book
+            apply_snapshot_validation(cache_key, cache_owner, prepare_policies_frame)
+            cached_df = get_cached_policies(cache_key, cache_owner, columns)
+            if cached_df is not None:
+                return cached_df
+        
+        supabase = get_supabase_client()
+        
+        # Cold start: serve the on-disk snapshot while it is validated in the background
+        if not force_refresh and restore_policies_snapshot(supabase, cache_key, cache_owner, user_id,
+                                                           compact=COMPACT_POLICIES_CACHE):
+            cached_df = get_cached_policies(cache_key, cache_owner, columns)
+            if cached_df is not None:
+                return cached_df
+        
+        # Incremental refresh of a stale or expired cache
+        if not force_refresh:
+            synced_df = sync_policies_delta(supabase, cache_key, cache_owner, prepare_policies_frame)
+            if synced_df is not None:
+                if columns:
+                    return synced_df[[col for col in columns if col in synced_df.columns]]
+                return synced_df
         
         # In production, filter by user_id if available, otherwise fall back to email
+        filters = []
+        rows = []
         if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
             if user_id:
                 # PREFERRED: Filter by user_id (no case sensitivity issues!)
-                response = supabase.table('policies').select("*").eq('user_id', user_id).execute()
+                filters = [('eq', 'user_id', user_id)]
             elif user_email:
                 # FALLBACK: Filter by email (for backward compatibility)
-                response = supabase.table('policies').select("*").eq('user_email', user_email).execute()
-            record_count = len(response.data) if response.data else 0
-            # print(f"DEBUG: Found {record_count} records for user {user_email}")
+                filters = [('eq', 'user_email', user_email)]
+            if filters:
+                rows = fetch_policies(supabase, filters, columns)
             
             # If no records found, try case-insensitive search as fallback
-            if record_count == 0:
-                # print(f"DEBUG: No records found with exact match, trying case-insensitive search")
-                response_ilike = supabase.table('policies').select("*").ilike('user_email', user_email).execute()
-                if response_ilike.data:
-                    # print(f"DEBUG: Found {len(response_ilike.data)} records with case-insensitive match")
-                    response = response_ilike
+            if not rows and user_email:
+                filters = [('ilike', 'user_email', user_email)]
+                rows = fetch_policies(supabase, filters, columns)
         else:
             # Personal environment - show all data
-            # print("DEBUG: Personal environment - loading all data")
-            response = supabase.table('policies').select("*").execute()
-        if response.data:
-            df = pd.DataFrame(response.data)
-            
-            # CRITICAL: Remove any duplicate Transaction IDs that might have been loaded
-            # This can happen with case-insensitive searches or data issues
-            if 'Transaction ID' in df.columns:
-                initial_count = len(df)
-                df = df.drop_duplicates(subset=['Transaction ID'])
-                final_count = len(df)
-                if initial_count != final_count:
-                    print(f"WARNING: Removed {initial_count - final_count} duplicate Transaction IDs from loaded data")
-            
-            # Ensure numeric columns are properly typed
-            numeric_cols = [
-                'Agent Estimated Comm $',
-                'Policy Gross Comm %',
-                'Agency Estimated Comm/Revenue (CRM)',
-                'Agency Comm Received (STMT)',
-                'Premium Sold',
-                'Agent Paid Amount (STMT)',
-                'Agency Comm Received (STMT)',
-                'Broker Fee',
-                'Policy Taxes & Fees',
-                'Commissionable Premium',
-                'Broker Fee Agent Comm',
-                'Total Agent Comm'
-            ]
-            
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Keep date columns as they are in the database
-            # DO NOT format dates here as it can cause data loss
-            
-            # Round all numeric columns to 2 decimal places
-            df = round_numeric_columns(df)
-            return df
-        return pd.DataFrame()
+            rows = fetch_policies(supabase, filters, columns)
+        
+        df = prepare_policies_frame(pd.DataFrame(rows)) if rows else pd.DataFrame()
+        
+        # Snapshots are keyed by user_id, so only books loaded strictly by user_id are written
+        snapshot_user_id = None
+        if user_id and (filters == [('eq', 'user_id', user_id)] or os.getenv("APP_ENVIRONMENT") != "PRODUCTION"):
+            snapshot_user_id = user_id
+        store_cached_policies(cache_key, cache_owner, df, columns, filters, compact=COMPACT_POLICIES_CACHE,
+                              snapshot_user_id=snapshot_user_id)
+        return df.copy()
     except Exception as e:
         st.error(f"Error loading data from Supabase: {e}")
         return pd.DataFrame()
 
-def clear_policies_cache():
-    """Clear the policies data cache - no longer needed since we removed caching."""
+def get_policy_canonical_columns(df):
+    """Canonical typed columns (parsed dates, policy key, transaction kind) for rows of the loaded policies frame.
+    
+    They are built once per load by the data layer. Returns None for frames that
+    don't come from the cached policies (aggregated, re-indexed or other tables).
+    """
+    canonical = get_canonical_columns(get_user_session_key('policies_data'), get_policies_cache_owner())
+    return align_canonical_columns(canonical, df)
+
+def policy_kind_mask(df, kinds):
+    """Mask of rows whose Transaction ID marks one of kinds (see canonical_columns.TransactionKind)."""
+    canonical = get_policy_canonical_columns(df)
+    if canonical is None:
+        canonical = pd.DataFrame({'transaction_kind': encode_transaction_kinds(df['Transaction ID'])})
+    return kind_mask(canonical, kinds)
+
+def clear_policies_cache(full_reload=False):
+    """Invalidate the cached policies data. Call after any insert/update/delete on policies.
+    
+    By default the cache is only marked stale so the next load fetches the changed rows;
+    pass full_reload=True to drop it entirely.
+    """
+    cache_key = get_user_session_key('policies_data')
+    if full_reload:
+        invalidate_policies_cache(cache_key)
+        delete_policies_snapshot(get_user_id())
+    else:
+        mark_policies_stale(cache_key)
+    # Legacy key from before the per-user cache
     if 'policies_data' in st.session_state:
         del st.session_state['policies_data']
 
@@ -739,204 +734,46 @@ def style_special_transactions(df):
     else:
         return df
 
-def calculate_dashboard_metrics(df):
-    """Calculate dashboard metrics with reconciled vs unreconciled YTD 2025 focus."""
-    # Initialize default metrics
-    metrics = {
-        # Transaction metrics
-        'total_transactions': 0,
-        'transactions_this_month': 0,
-        'stmt_transactions': 0,
-        
-        # Policy metrics (unique policy numbers)
-        'unique_policies': 0,
-        'active_policies': 0,
-        'cancelled_policies': 0,
-        
-        # Financial totals (all time, not just YTD)
-        'premium_sold_total': 0.0,
-        'agent_comm_paid_total': 0.0,
-        'agent_comm_due_total': 0.0
-    }
-    
-    # Return default metrics if no data
-    if df is None or df.empty:
-        return metrics
-    
-    # Update total transactions
-    metrics['total_transactions'] = len(df)
-    
-    if df.empty:
-        return metrics
-    
-    # Transaction counts
-    metrics['total_transactions'] = len(df)
-    
-    # Current month transactions
-    if 'Effective Date' in df.columns:
-        try:
-            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
-            current_month = datetime.datetime.now().month
-            current_year = datetime.datetime.now().year
-            metrics['transactions_this_month'] = len(df[(df['Effective Date'].dt.month == current_month) & 
-                                                       (df['Effective Date'].dt.year == current_year)])
-        except:
-            pass
-    
-    # STMT transactions
-    if 'Transaction Type' in df.columns:
-        metrics['stmt_transactions'] = len(df[df['Transaction Type'].str.startswith('-', na=False)])
-    
-    # Unique policy count
-    if 'Policy Number' in df.columns:
-        metrics['unique_policies'] = df['Policy Number'].nunique()
-        
-        # Calculate active vs cancelled policies
-        if not df.empty and 'Transaction Type' in df.columns:
-            # Strip whitespace from Policy Number to avoid duplicate policy counts
-            if 'Policy Number' in df.columns:
-                df['Policy Number'] = df['Policy Number'].astype(str).str.strip()
-            # Get latest transaction for each policy
-            latest_trans = df.sort_values('Effective Date').groupby('Policy Number').last()
-            metrics['active_policies'] = len(latest_trans[~latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
-            metrics['cancelled_policies'] = len(latest_trans[latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
-    
-    # Financial totals (all time, not restricted to any year)
-    # Calculate total premium sold from all original transactions
-    original_mask = pd.Series(True, index=df.index)
-    if 'Transaction ID' in df.columns:
-        # Exclude reconciliation entries
-        original_mask = ~df['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False, regex=True)
-    
-    df_originals = df[original_mask]
-    if 'Premium Sold' in df_originals.columns:
-        metrics['premium_sold_total'] = df_originals['Premium Sold'].sum()
-    
-    # Calculate total agent commission paid (from all -STMT- entries)
-    stmt_mask = pd.Series(False, index=df.index)
-    if 'Transaction ID' in df.columns:
-        stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
-    
-    df_stmt = df[stmt_mask]
-    if 'Agent Paid Amount (STMT)' in df_stmt.columns:
-        metrics['agent_comm_paid_total'] = df_stmt['Agent Paid Amount (STMT)'].sum()
-    
-    # Calculate total commission due using balance approach
-    try:
-        # Get all transactions with their balances
-        trans_with_balance = calculate_transaction_balances(df)
-        
-        # Sum all positive balances (what's still owed)
-        if '_balance' in trans_with_balance.columns:
-            unpaid_balances = trans_with_balance[trans_with_balance['_balance'] > 0]
-            metrics['agent_comm_due_total'] = unpaid_balances['_balance'].sum()
-        else:
-            # If _balance column doesn't exist, use fallback
-            raise Exception("_balance column not found")
-    except Exception as e:
-        # Fallback calculation if balance function fails
-        # Simple calculation: Total earned - Total paid
-        total_earned = 0
-        total_paid = 0
-        
-        # Calculate total earned from original transactions
-        if 'Total Agent Comm' in df_originals.columns:
-            total_earned = df_originals['Total Agent Comm'].sum()
-        elif 'Agent Estimated Comm $' in df_originals.columns:
-            # Fallback if Total Agent Comm doesn't exist
-            total_earned = df_originals['Agent Estimated Comm $'].sum()
-            if 'Broker Fee Agent Comm' in df_originals.columns:
-                total_earned += df_originals['Broker Fee Agent Comm'].sum()
-        
-        # Total paid is already calculated
-        total_paid = metrics['agent_comm_paid_total']
-        
-        # Commission due is earned minus paid
-        metrics['agent_comm_due_total'] = max(0, total_earned - total_paid)
+def get_policies_frame_fingerprint(df):
+    """What a result derived from a policies frame is cached on: the data version plus the exact
+    rows (index and _id) and columns of the frame, so a filtered or re-indexed frame of the same
+    size never picks up the full book's result. None when the frame can't be cached."""
+    version = get_policies_data_version(get_user_session_key('policies_data'), get_policies_cache_owner())
+    if version is None or df is None or '_id' not in df.columns:
+        return None
+    return {'version': version, 'columns': tuple(df.columns), 'index': df.index, 'ids': df['_id'].to_numpy()}
+
+def policies_fingerprints_match(cached, fingerprint):
+    """True when a cached fingerprint (see get_policies_frame_fingerprint) describes the same frame."""
+    return (cached is not None and fingerprint is not None
+            and cached['version'] == fingerprint['version'] and cached['columns'] == fingerprint['columns']
+            and cached['index'].equals(fingerprint['index'])
+            and np.array_equal(cached['ids'], fingerprint['ids']))
+
+def get_policy_summary(df):
+    """Per-policy-term summary of the book, rebuilt only when the cached policies data changes."""
+    summary_key = get_user_session_key('policy_summary')
+    fingerprint = get_policies_frame_fingerprint(df)
+    
+    cached = st.session_state.get(summary_key)
+    if cached and policies_fingerprints_match(cached.get('fingerprint'), fingerprint):
+        return cached['summary']
+    
+    summary = build_policy_summary(df, get_policy_canonical_columns(df))
+    if fingerprint is not None:
+        st.session_state[summary_key] = {'fingerprint': fingerprint, 'summary': summary}
+    return summary
+
+def calculate_dashboard_metrics(df, year=None):
+    """Calculate dashboard metrics with reconciled vs unreconciled YTD focus.
     
-    # Keep the existing date-based calculations below for other uses
-    if 'Effective Date' in df.columns:
-        try:
-            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
-            
-            # For reconciled metrics, we need -STMT- entries from 2025 and their matching originals (which could be from any year)
-            # First, get all -STMT- entries from 2025 for commission paid amounts
-            stmt_mask = pd.Series(False, index=df.index)
-            if 'Transaction ID' in df.columns:
-                stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
-            
-            # Filter -STMT- entries to only 2025 (based on statement date)
-            df_stmt_all = df[stmt_mask]
-            df_stmt_2025 = df_stmt_all[df_stmt_all['Effective Date'].dt.year == 2025]
-            
-            # Get ALL original transactions (from any year, exclude -STMT-, -VOID-, -ADJ-)
-            original_mask = pd.Series(True, index=df.index)
-            if 'Transaction ID' in df.columns:
-                original_mask = ~df['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False)
-            
-            df_originals = df[original_mask]
-            
-            # Now filter originals to only 2025 for unreconciled calculations
-            df_originals_2025 = df_originals[df_originals['Effective Date'].dt.year == 2025]
-            
-            # The issue: -STMT- entries from 2025 might be paying for policies from any year
-            # So we need to track which transactions (from any year) have been paid in 2025
-            
-            # Step 1: Get all -STMT- entries from 2025 (payments made in 2025)
-            # These use STMT DATE for when payment was made
-            df_stmt_2025_by_stmt_date = pd.DataFrame()
-            if 'STMT DATE' in df_stmt_all.columns:
-                df_stmt_all['STMT DATE'] = pd.to_datetime(df_stmt_all['STMT DATE'], errors='coerce', format='mixed')
-                df_stmt_2025_by_stmt_date = df_stmt_all[df_stmt_all['STMT DATE'].dt.year == 2025]
-            
-            # If no STMT DATE column, fall back to Effective Date
-            if df_stmt_2025_by_stmt_date.empty:
-                df_stmt_2025_by_stmt_date = df_stmt_2025
-            
-            # Step 2: Find which original transactions these -STMT- entries paid for
-            reconciled_in_2025 = set()
-            if not df_stmt_2025_by_stmt_date.empty and all(col in df_stmt_2025_by_stmt_date.columns for col in ['Policy Number', 'Effective Date']):
-                for _, stmt_row in df_stmt_2025_by_stmt_date.iterrows():
-                    policy = stmt_row.get('Policy Number', '')
-                    eff_date = pd.to_datetime(stmt_row.get('Effective Date'), errors='coerce')
-                    if policy and pd.notna(eff_date):
-                        reconciled_in_2025.add((policy, eff_date))
-            
-            # Step 3: Find original transactions that were paid in 2025
-            paid_in_2025_mask = pd.Series(False, index=df_originals.index)
-            if reconciled_in_2025 and all(col in df_originals.columns for col in ['Policy Number', 'Effective Date']):
-                for idx, row in df_originals.iterrows():
-                    policy = row.get('Policy Number', '')
-                    eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                    if (policy, eff_date) in reconciled_in_2025:
-                        paid_in_2025_mask.loc[idx] = True
-            
-            # Step 4: Calculate metrics
-            df_originals_paid_in_2025 = df_originals[paid_in_2025_mask]
-            df_originals_2025_unpaid = df_originals_2025[~df_originals_2025.index.isin(df_originals_paid_in_2025.index)]
-            
-            # Premium from transactions paid in 2025 (regardless of their effective date)
-            if 'Premium Sold' in df_originals_paid_in_2025.columns:
-                metrics['premium_reconciled_ytd'] = df_originals_paid_in_2025['Premium Sold'].sum()
-            
-            # Agent commission actually paid in 2025
-            if 'Agent Paid Amount (STMT)' in df_stmt_2025_by_stmt_date.columns:
-                metrics['agent_comm_paid_ytd'] = df_stmt_2025_by_stmt_date['Agent Paid Amount (STMT)'].sum()
-            
-            # Unreconciled = 2025 originals that haven't been paid yet
-            if 'Premium Sold' in df_originals_2025_unpaid.columns:
-                metrics['premium_unreconciled_ytd'] = df_originals_2025_unpaid['Premium Sold'].sum()
-            # Use Total Agent Comm to include broker fees
-            if 'Total Agent Comm' in df_originals_2025_unpaid.columns:
-                metrics['agent_comm_estimated_ytd'] = df_originals_2025_unpaid['Total Agent Comm'].sum()
-            elif 'Agent Estimated Comm $' in df_originals_2025_unpaid.columns:
-                # Fallback to Agent Estimated Comm $ if Total Agent Comm doesn't exist
-                metrics['agent_comm_estimated_ytd'] = df_originals_2025_unpaid['Agent Estimated Comm $'].sum()
-        except Exception as e:
-            # If date parsing fails, fall back to zero
-            pass
+    Metrics are reductions over the per-policy-term summary (see dashboard_metrics).
     
-    return metrics
+    Args:
+        df: Policies data
+        year: Year for the reconciled/unreconciled figures (default: current year)
+    """
+    return calculate_metrics_from_summary(get_policy_summary(df), year=year)
 
 def log_debug(message, level="INFO", error_obj=None):
     """Add a debug log entry to session state."""
@@ -1683,102 +1520,56 @@ def save_column_mappings_to_file(mappings):
         st.error(f"Error saving mappings: {str(e)}")
         return False
 
-def generate_client_id(length=6):
-    """Generate a unique Client ID with exactly 3 letters and 3 numbers in random order."""
-    # Generate exactly 3 letters and 3 numbers, then mix them randomly
-    letters = string.ascii_uppercase
-    digits = string.digits
-    
-    # Pick 3 random letters
-    selected_letters = [random.choice(letters) for _ in range(3)]
-    
-    # Pick 3 random numbers
-    selected_numbers = [random.choice(digits) for _ in range(3)]
-    
-    # Combine them
-    result = selected_letters + selected_numbers
-    
-    # Shuffle to create random pattern
-    random.shuffle(result)
-    return ''.join(result)
-
-def generate_transaction_id(length=7, suffix=None):
-    """Generate a unique Transaction ID with at least 3 letters and 3 numbers.
-    
-    Args:
-        length: Length of the base ID (default 7)
-        suffix: Optional suffix to append (e.g., '-IMPORT', '-STMT')
-    """
-    # Ensure at least 3 letters and 3 numbers for 7-character ID
-    letters = string.ascii_uppercase
-    digits = string.digits
-    
-    # Pick 3 random letters
-    selected_letters = [random.choice(letters) for _ in range(3)]
-    
-    # Pick 3 random numbers
-    selected_numbers = [random.choice(digits) for _ in range(3)]
-    
-    # For the 7th character, randomly choose letter or number
-    if random.choice([True, False]):
-        extra_char = random.choice(letters)
-    else:
-        extra_char = random.choice(digits)
-    
-    # Combine all characters
-    result = selected_letters + selected_numbers + [extra_char]
-    
-    # Shuffle to create random pattern
-    random.shuffle(result)
-    base_id = ''.join(result)
-    
-    # Append suffix if provided
-    if suffix:
-        return f"{base_id}{suffix}"
-    return base_id
+def get_id_allocator():
+    """Session ID allocator (loads the existing IDs once, then reserves new ones in batches)."""
+    allocator_key = get_user_session_key('id_allocator')
+    allocator = st.session_state.get(allocator_key)
+    if allocator is None:
+        allocator = IdAllocator(get_supabase_client(), get_user_id())
+        st.session_state[allocator_key] = allocator
+    return allocator
 
 def generate_unique_client_id():
     """Generate a unique Client ID with 3 letters and 3 numbers mixed randomly by checking against existing IDs."""
     try:
-        # Get all existing client IDs
-        supabase = get_supabase_client()
-        response = supabase.table('policies').select('"Client ID"').execute()
-        
-        existing_ids = set()
-        if response.data:
-            for record in response.data:
-                client_id = record.get('Client ID')
-                if client_id:
-                    existing_ids.add(str(client_id).upper())
-        
-        # Generate a unique ID using the existing pattern
-        max_attempts = 100
-        for _ in range(max_attempts):
-            # Use the existing generate_client_id function for proper format
-            new_id = generate_client_id()
-            if new_id.upper() not in existing_ids:
-                return new_id
-        
-        # If we couldn't find a unique ID in 100 attempts, add timestamp suffix
-        # This maintains the format while ensuring uniqueness
-        base_id = generate_client_id()
-        timestamp = str(int(datetime.datetime.now().timestamp()))[-2:]
-        return f"{base_id[:4]}{timestamp}"
-        
+        return get_id_allocator().allocate_client_ids(1)[0]
     except Exception as e:
         # If there's an error checking existing IDs, just generate one
+        print(f"Warning: Could not allocate Client ID: {e}")
         return generate_client_id()
 
 def generate_reconciliation_transaction_id(transaction_type="STMT", date=None):
     """Generate a reconciliation transaction ID with format: XXXXXXX-TYPE-YYYYMMDD"""
-    base_id = generate_transaction_id()
+    return allocate_reconciliation_transaction_ids(1, transaction_type, date)[0]
 
+def allocate_reconciliation_transaction_ids(count, transaction_type="STMT", date=None):
+    """Allocate count reconciliation transaction IDs (XXXXXXX-TYPE-YYYYMMDD) in one reservation."""
     if date is None:
         date = datetime.datetime.now()
 
-    date_str = date.strftime("%Y%m%d")
+    suffix = f"-{transaction_type}-{date.strftime('%Y%m%d')}"
+    try:
+        return get_id_allocator().allocate_many(count, suffix=suffix)
+    except Exception as e:
+        print(f"Warning: Could not allocate reconciliation Transaction IDs: {e}")
+        return [generate_transaction_id(suffix=suffix) for _ in range(count)]
 
-    return f"{base_id}-{transaction_type}-{date_str}"
+def allocate_transaction_ids(count, suffix=None):
+    """Allocate count unique Transaction IDs at once (for imports and batch creation).
+
+    Args:
+        count: Number of IDs needed
+        suffix: Optional suffix to append (e.g., '-IMPORT-20250102')
+
+    Returns:
+        A list of unique transaction ID strings
+    """
+    try:
+        return get_id_allocator().allocate_many(count, suffix=suffix)
+    except Exception as e:
+        # If the database is unavailable, fall back to basic generation
+        print(f"Warning: Could not allocate Transaction IDs: {e}")
+        return [generate_transaction_id(suffix=suffix) for _ in range(count)]
 
 def generate_unique_transaction_id(suffix=None):
     """Generate a unique Transaction ID by checking against existing IDs in database.
@@ -1789,45 +1580,34 @@ def generate_unique_transaction_id(suffix=None):
     Returns:
         A unique transaction ID string
     """
-    try:
-        supabase = get_supabase_client()
-
-        # Try up to 10 times to generate a unique ID
-        max_attempts = 10
-        for attempt in range(max_attempts):
-            # Generate base ID
-            base_id = generate_transaction_id()
+    return allocate_transaction_ids(1, suffix=suffix)[0]
 
-            # Add suffix if provided
-            if suffix:
-                transaction_id = f"{base_id}{suffix}"
-            else:
-                transaction_id = base_id
+# --- Commission Rule Functions ---
+def get_commission_rules_cache_key():
+    """Session key of the commission rule resolver cache."""
+    return get_user_session_key('commission_rule_resolver')
 
-            # Check if ID exists in database
-            existing = supabase.table('policies').select('"Transaction ID"').eq('"Transaction ID"', transaction_id).execute()
+def clear_commission_rules_cache():
+    """Invalidate the cached commission rules and reference data. Call after rule, carrier or MGA edits."""
+    invalidate_rule_resolver(get_commission_rules_cache_key())
+    clear_carrier_mga_cache()
 
-            if not existing.data:
-                # ID is unique, return it
-                return transaction_id
+def get_carrier_mga_cache_key():
+    """Session key of the carrier/MGA relationship graph."""
+    return get_user_session_key('carrier_mga_graph')
 
-        # If all attempts failed, fall back to timestamp-based ID (guaranteed unique)
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')[:17]  # YYYYMMDDHHMMSSmmm (17 chars)
-        if suffix:
-            return f"TXN{timestamp}{suffix}"
-        else:
-            return f"TXN{timestamp}"
+def get_carrier_mga_graph_for_user():
+    """The user's carrier/MGA graph (two queries on first use, then in memory)."""
+    if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
+        ensure_user_id()
+    return get_carrier_mga_graph(get_supabase_client(), get_carrier_mga_cache_key(),
+                                 get_policies_cache_owner(), get_user_write_filters())
 
-    except Exception as e:
-        # If there's an error checking database, fall back to basic generation
-        # This ensures the app doesn't break if DB is unavailable
-        print(f"Warning: Could not check for duplicate Transaction ID: {e}")
-        if suffix:
-            return f"{generate_transaction_id()}{suffix}"
-        else:
-            return generate_transaction_id()
+def clear_carrier_mga_cache():
+    """Invalidate the carrier/MGA graph and the reference data built from it."""
+    invalidate_carrier_mga_graph(get_carrier_mga_cache_key())
+    invalidate_reference_data(get_reference_data_cache_key())
 
-# --- Commission Rule Functions ---
 def lookup_commission_rule(carrier_id, mga_id=None, policy_type=None, transaction_type="NEW", effective_date=None):
     """
     Look up the best matching commission rule for given criteria.
@@ -1857,89 +1637,21 @@ def lookup_commission_rule(carrier_id, mga_id=None, policy_type=None, transactio
         if effective_date is None:
             effective_date = datetime.date.today()
         
-        # Build query to find matching rules
-        query = supabase.table('commission_rules').select("""
-            rule_id,
-            carrier_id,
-            mga_id,
-            policy_type,
-            new_rate,
-            renewal_rate,
-            rule_description,
-            effective_date,
-            end_date,
-            is_active
-        """)
-        
-        # Filter by user in production
+        # Resolve against the session's indexed rules (loaded once, no query per call)
         if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
             ensure_user_id()
-            user_id = get_user_id()
-            if user_id:
-                query = query.eq('user_id', user_id)
-            else:
-                # Fallback to email
-                user_email = get_normalized_user_email()
-                query = query.eq('user_email', user_email)
-        
-        # Filter by carrier
-        query = query.eq('carrier_id', carrier_id)
-        
-        # Filter by active rules and effective date
-        query = query.eq('is_active', True)
-        query = query.lte('effective_date', effective_date.isoformat())
-        query = query.or_('end_date.is.null,end_date.gte.' + effective_date.isoformat())
-        
-        # Execute query
-        response = query.execute()
-        
-        if not response.data:
+        cache_key = get_commission_rules_cache_key()
+        resolver = get_rule_resolver(supabase, cache_key, get_policies_cache_owner(), get_user_write_filters())
+        best_rule = resolver.find_rule(carrier_id, mga_id, policy_type, effective_date)
+        if best_rule is None:
             return None
         
-        # Calculate rule priority for each matching rule
-        rules_with_priority = []
-        for rule in response.data:
-            priority = 0
-            
-            # MGA match gets highest priority
-            if mga_id and rule.get('mga_id') == mga_id:
-                priority += 1000
-            elif not mga_id and not rule.get('mga_id'):
-                priority += 500  # Direct appointment match
-            elif rule.get('mga_id'):
-                continue  # MGA rule doesn't match, skip
-            
-            # Policy type match
-            if policy_type and rule.get('policy_type'):
-                rule_types = [t.strip() for t in rule['policy_type'].split(',')]
-                if policy_type in rule_types:
-                    # Give exact single policy type match highest priority
-                    if len(rule_types) == 1 and rule_types[0] == policy_type:
-                        priority += 200  # Exact match gets higher priority
-                    else:
-                        priority += 100  # Multi-type rule that includes this type
-                else:
-                    continue  # Policy type doesn't match, skip
-            elif not rule.get('policy_type'):
-                priority += 10  # Default rule (no specific policy type)
-            
-            rules_with_priority.append((priority, rule))
-        
-        if not rules_with_priority:
-            return None
-        
-        # Sort by priority (highest first), then by effective date (most recent first) for ties
-        rules_with_priority.sort(key=lambda x: (x[0], x[1].get('effective_date', '')), reverse=True)
-        best_rule = rules_with_priority[0][1]
-        
-        # Get carrier and MGA names for display
-        carrier_response = supabase.table('carriers').select('carrier_name').eq('carrier_id', carrier_id).execute()
-        carrier_name = carrier_response.data[0]['carrier_name'] if carrier_response.data else 'Unknown Carrier'
+        # Get carrier and MGA names for display (cached per id)
+        carrier_name = get_cached_name(supabase, cache_key, 'carriers', 'carrier_id', 'carrier_name', carrier_id) or 'Unknown Carrier'
         
         mga_name = None
         if best_rule.get('mga_id'):
-            mga_response = supabase.table('mgas').select('mga_name').eq('mga_id', best_rule['mga_id']).execute()
-            mga_name = mga_response.data[0]['mga_name'] if mga_response.data else 'Unknown MGA'
+            mga_name = get_cached_name(supabase, cache_key, 'mgas', 'mga_id', 'mga_name', best_rule['mga_id']) or 'Unknown MGA'
         
         # Determine which rate to use based on transaction type
         rate_to_use = best_rule['new_rate']
@@ -1969,8 +1681,53 @@ def lookup_commission_rule(carrier_id, mga_id=None, policy_type=None, transactio
         # The calling code will handle the None result appropriately
         return None
 
+def get_reference_data_cache_key():
+    """Session key of the prefetched reference data bundle."""
+    return get_user_session_key('reference_data')
+
+def prefetch_page_reference_data():
+    """Load the reference data pages need (policies, carriers, MGAs, rules, user settings) concurrently.
+    
+    Runs once per session (and again after the bundle expires or is invalidated); later calls
+    return the existing bundle. Loaders that fail are simply loaded on demand later.
+    
+    Only plain database reads go to the worker threads. Loaders that use st.session_state
+    (the policies cache, user settings) run on this thread while the pool works, and the
+    fetched links and rules are stored in the session here once the pool is done.
+    """
+    ensure_user_id()
+    supabase = get_supabase_client()
+    owner = get_policies_cache_owner()
+    filters = get_user_write_filters()
+    tasks = {
+        'carriers': lambda: fetch_carriers(supabase, filters),
+        'carrier_mga_links': lambda: fetch_carrier_mga_links(supabase, filters),
+        'commission_rules': lambda: fetch_commission_rules(supabase, filters),
+    }
+    main_tasks = {
+        'policies': lambda: len(load_policies_data()),
+        'policy_types': user_policy_types.get_user_policy_types,
+        'transaction_types': user_transaction_types.get_user_transaction_types,
+        'preferences': user_preferences.get_user_preferences,
+        'agent_rates': user_agent_rates.get_user_rates,
+    }
+    entry = prefetch_reference_data(get_reference_data_cache_key(), owner, tasks, main_tasks=main_tasks)
+    
+    # Fresh bundles still hold the raw rows; build the session caches from them once
+    links = entry['data'].pop('carrier_mga_links', None)
+    if links is not None:
+        store_carrier_mga_graph(get_carrier_mga_cache_key(), owner, links)
+    rules = entry['data'].pop('commission_rules', None)
+    if rules is not None:
+        store_rule_resolver(get_commission_rules_cache_key(), owner, rules)
+    return entry
+
 def load_carriers_for_dropdown():
     """Load all active carriers for dropdown selection."""
+    carriers = get_reference_value(get_reference_data_cache_key(), get_policies_cache_owner(), 'carriers')
+    if carriers is not None:
+        return carriers
+    
     try:
         supabase = get_supabase_client()
         # Filter by user_id for complete isolation
@@ -1992,91 +1749,14 @@ def load_carriers_for_dropdown():
 
 def load_mgas_for_carrier(carrier_id):
     """Load MGAs associated with a specific carrier through relationships OR commission rules."""
-    # Check session state cache first
-    cache_key = f'mgas_for_carrier_{carrier_id}'
-    if cache_key in st.session_state:
-        return st.session_state[cache_key]
-    
     try:
-        supabase = get_supabase_client()
-        mga_ids = set()  # Use set to avoid duplicates
-        
-        # Method 1: Get MGAs from carrier_mga_relationships table
-        try:
-            # Filter by user in production
-            if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-                ensure_user_id()
-                user_id = get_user_id()
-                if user_id:
-                    response = supabase.table('carrier_mga_relationships').select("mga_id").eq('carrier_id', carrier_id).eq('user_id', user_id).execute()
-                else:
-                    # Fallback to email
-                    user_email = get_normalized_user_email()
-                    response = supabase.table('carrier_mga_relationships').select("mga_id").eq('carrier_id', carrier_id).eq('user_email', user_email).execute()
-            else:
-                response = supabase.table('carrier_mga_relationships').select("mga_id").eq('carrier_id', carrier_id).execute()
-            if response.data:
-                for rel in response.data:
-                    if rel.get('mga_id'):
-                        mga_ids.add(rel['mga_id'])
-        except Exception:
-            # Silent fail - continue to other methods
-            pass
-        
-        # Method 2: Get MGAs that have commission rules with this carrier
-        try:
-            # Filter by user in production
-            if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-                ensure_user_id()
-                user_id = get_user_id()
-                if user_id:
-                    response = supabase.table('commission_rules').select("mga_id").eq('carrier_id', carrier_id).eq('user_id', user_id).execute()
-                else:
-                    # Fallback to email
-                    user_email = get_normalized_user_email()
-                    response = supabase.table('commission_rules').select("mga_id").eq('carrier_id', carrier_id).eq('user_email', user_email).execute()
-            else:
-                response = supabase.table('commission_rules').select("mga_id").eq('carrier_id', carrier_id).execute()
-            if response.data:
-                for rule in response.data:
-                    if rule.get('mga_id'):
-                        mga_ids.add(rule['mga_id'])
-        except Exception:
-            # Silent fail - continue
-            pass
-        
-        # Get MGA details for all collected mga_ids
-        if mga_ids:
-            # Filter by user in production
-            if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-                ensure_user_id()
-                user_id = get_user_id()
-                if user_id:
-                    mga_response = supabase.table('mgas').select('mga_id, mga_name, status').in_('mga_id', list(mga_ids)).eq('status', 'Active').eq('user_id', user_id).execute()
-                else:
-                    # Fallback to email
-                    user_email = st.session_state.get('user_email')
-                    mga_response = supabase.table('mgas').select('mga_id, mga_name, status').in_('mga_id', list(mga_ids)).eq('status', 'Active').eq('user_email', user_email).execute()
-            else:
-                mga_response = supabase.table('mgas').select('mga_id, mga_name, status').in_('mga_id', list(mga_ids)).eq('status', 'Active').execute()
-            if mga_response.data:
-                mgas = [{'mga_id': m['mga_id'], 'mga_name': m['mga_name']} for m in mga_response.data]
-                mgas.sort(key=lambda x: x['mga_name'])
-                st.session_state[cache_key] = mgas  # Cache the result
-                return mgas
-        
-        # If no MGAs found, return empty list
-        # Wright Flood and other carriers might not have MGAs
-        st.session_state[cache_key] = []  # Cache empty result too
-        return []
-        
+        return get_carrier_mga_graph_for_user().mgas_for_carrier(carrier_id)
     except Exception as e:
         # Log error for debugging but don't show to user
         # This prevents transient connection errors from disrupting the UI
         print(f"MGA loading error: {e}")
         return []
 
-# --- Excel Utility Functions ---
 def create_formatted_excel_file(data, sheet_name="Data", filename_prefix="export"):
     """
     Create a formatted Excel file from DataFrame with professional styling.
@@ -2373,113 +2053,44 @@ def calculate_commission(row):
     except (KeyError, TypeError):
         return revenue * 0.25
 
+def get_renewal_index(df: pd.DataFrame) -> RenewalIndex:
+    """Latest-term renewal index of the book, rebuilt only when the cached policies data changes."""
+    index_key = get_user_session_key('renewal_index')
+    fingerprint = get_policies_frame_fingerprint(df)
+    
+    cached = st.session_state.get(index_key)
+    if cached and policies_fingerprints_match(cached.get('fingerprint'), fingerprint):
+        return cached['index']
+    
+    renewal_index = RenewalIndex(
+        df,
+        transaction_type_col=get_mapped_column("Transaction Type"),
+        x_date_col=get_mapped_column("X-DATE"),
+        prior_policy_col=get_mapped_column("Prior Policy Number"),
+        canonical=get_policy_canonical_columns(df)
+    )
+    if fingerprint is not None:
+        st.session_state[index_key] = {'fingerprint': fingerprint, 'index': renewal_index}
+    return renewal_index
+
 def get_pending_renewals(df: pd.DataFrame, debug=False) -> pd.DataFrame:
     """
     Identifies and generates a DataFrame of policies pending renewal.
     Excludes policies that have already been renewed (appear in Prior Policy Number of another policy).
-    Shows ALL past-due renewals (no lower limit) and future renewals up to 90 days.
+    Shows ALL past-due renewals (no lower limit) and future renewals up to 365 days.
     """
-    debug_info = {}
-    
-    # Filter for relevant transaction types
-    all_policies = df[df[get_mapped_column("Transaction Type")].isin(["NEW", "RWL", "REWRITE"])]
-    
-    # IMPORTANT: Exclude STMT, VOID, and ADJ transactions BEFORE deduplication
-    # These are not real policy transactions and should never be considered for renewals
-    if 'Transaction ID' in all_policies.columns:
-        all_policies = all_policies[
-            ~all_policies['Transaction ID'].astype(str).str.contains('-STMT-|-VOID-|-ADJ-', case=False, na=False)
-        ]
-    
-    renewal_candidates = all_policies.copy()
-    
-    if debug:
-        debug_info['total_new_rwl_rewrite'] = len(all_policies)
-        # Check for Gratia Coffee specifically
-        gratia_policies = all_policies[all_policies['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_total'] = len(gratia_policies)
-        if not gratia_policies.empty:
-            debug_info['gratia_policies'] = gratia_policies[['Transaction ID', 'Policy Number', 'Transaction Type', 'X-DATE']].to_dict('records')
-    
-    # Convert date columns to datetime objects
-    renewal_candidates['expiration_date'] = pd.to_datetime(renewal_candidates[get_mapped_column("X-DATE")], errors='coerce')
-    
-    # Sort by policy number and expiration date to find the latest transaction
-    renewal_candidates = renewal_candidates.sort_values(by=["Policy Number", "expiration_date"], ascending=[True, False])
-    
-    # Get the most recent transaction for each policy
-    latest_renewals = renewal_candidates.drop_duplicates(subset="Policy Number", keep="first")
-    
-    if debug:
-        debug_info['after_dedup'] = len(latest_renewals)
-        gratia_after_dedup = latest_renewals[latest_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_after_dedup'] = len(gratia_after_dedup)
-    
-    # Calculate days until expiration for each policy
-    today = pd.to_datetime(datetime.date.today())
-    latest_renewals['Days Until Expiration'] = (latest_renewals['expiration_date'] - today).dt.days
-    
-    # Filter for policies expiring within 365 days OR already expired (no lower limit on past due)
-    # This will show ALL past-due renewals and future renewals up to 1 year
-    # Changed from 90 to 365 days to show more pending renewals
-    pending_renewals = latest_renewals[latest_renewals['Days Until Expiration'] <= 365].copy()
-    
-    if debug:
-        debug_info['after_date_filter'] = len(pending_renewals)
-        gratia_after_date = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_after_date_filter'] = len(gratia_after_date)
-    
-    # Optional: Add a safeguard for very old policies (e.g., more than 1 year past due)
-    # Uncomment if needed: pending_renewals = pending_renewals[pending_renewals['Days Until Expiration'] > -365]
-    
-    # Get list of policy numbers that have been renewed (appear in Prior Policy Number field)
-    prior_policy_col = get_mapped_column("Prior Policy Number")
-    if prior_policy_col and prior_policy_col in df.columns:
-        # Get all policy numbers that appear as prior policies (meaning they've been renewed)
-        renewed_policies = df[df[prior_policy_col].notna()][prior_policy_col].unique()
-        if debug:
-            debug_info['renewed_policies'] = list(renewed_policies)[:10]  # Show first 10
-            # Check if Gratia policies are in renewed list
-            gratia_policy_nums = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]['Policy Number'].unique()
-            debug_info['gratia_in_renewed'] = [p for p in gratia_policy_nums if p in renewed_policies]
-        # Exclude these from pending renewals
-        pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(renewed_policies)]
-        if debug:
-            debug_info['after_renewed_filter'] = len(pending_renewals)
-            gratia_after_renewed = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-            debug_info['gratia_after_renewed_filter'] = len(gratia_after_renewed)
-    
-    # Exclude policies that have been cancelled or excluded
-    # Check if any transaction for a policy number has type "CAN" or "XCL"
-    transaction_type_col = get_mapped_column("Transaction Type")
-    if transaction_type_col and transaction_type_col in df.columns:
-        # Get all policy numbers that have a CAN or XCL transaction
-        cancelled_policies = df[df[transaction_type_col].isin(["CAN", "XCL"])]["Policy Number"].unique()
-        if debug:
-            debug_info['cancelled_policies_count'] = len(cancelled_policies)
-            # Check if Gratia policies are cancelled
-            gratia_policy_nums = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]['Policy Number'].unique()
-            debug_info['gratia_in_cancelled'] = [p for p in gratia_policy_nums if p in cancelled_policies]
-        # Exclude these from pending renewals
-        pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(cancelled_policies)]
-        if debug:
-            debug_info['after_cancelled_filter'] = len(pending_renewals)
-            gratia_after_cancelled = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-            debug_info['gratia_after_cancelled_filter'] = len(gratia_after_cancelled)
-    
-    # Sort by Days Until Expiration (ascending, so most past-due show first)
-    pending_renewals = pending_renewals.sort_values('Days Until Expiration', ascending=True)
+    renewal_index = get_renewal_index(df)
+    pending_renewals = renewal_index.pending()
     
     if debug:
-        debug_info['final_count'] = len(pending_renewals)
-        gratia_final = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_final_count'] = len(gratia_final)
-        if not gratia_final.empty:
-            debug_info['gratia_final_policies'] = gratia_final[['Transaction ID', 'Policy Number', 'Days Until Expiration']].to_dict('records')
-        
         # Store debug info in session state for display
-        import streamlit as st
-        st.session_state['pending_renewals_debug'] = debug_info
+        st.session_state['pending_renewals_debug'] = {
+            'latest_terms': len(renewal_index.latest_terms),
+            'renewed_policies': list(renewal_index.renewed_policies)[:10],  # Show first 10
+            'cancelled_policies_count': len(renewal_index.cancelled_policies),
+            'candidates': len(renewal_index.candidates),
+            'final_count': len(pending_renewals)
+        }
     
     return pending_renewals
 
@@ -2505,138 +2116,14 @@ def style_renewal_rows(row):
         # Normal (8+ days) - no special styling
         return [''] * len(row)
 
-def normalize_business_name(name):
-    """
-    Normalize business names by removing common suffixes and punctuation.
-    Helps match "RCM Construction" to "RCM Construction of SWFL LLC"
-    """
-    if not name:
-        return ""
-    
-    # Common business suffixes to remove
-    suffixes = [
-        'LLC', 'L.L.C.', 'L.L.C', 'Inc', 'Inc.', 'Incorporated',
-        'Corp', 'Corp.', 'Corporation', 'Ltd', 'Ltd.', 'Limited',
-        'PA', 'P.A.', 'PC', 'P.C.', 'PLLC', 'P.L.L.C.',
-        'LLP', 'L.L.P.', 'LP', 'L.P.', 'Company', 'Co.', 'Co'
-    ]
-    
-    # Convert to string and strip
-    normalized = str(name).strip()
-    
-    # Remove suffixes (case-insensitive)
-    for suffix in suffixes:
-        # Check both with and without leading comma
-        patterns = [
-            rf',?\s+{re.escape(suffix)}\s*$',
-            rf'\s+{re.escape(suffix)}\s*$'
-        ]
-        for pattern in patterns:
-            normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE)
-    
-    # Remove "of [Location]" patterns
-    normalized = re.sub(r'\s+of\s+[A-Z][A-Za-z\s]+(?:LLC|Inc|Corp)?$', '', normalized, flags=re.IGNORECASE)
-    
-    # Clean up extra whitespace and punctuation
-    normalized = ' '.join(normalized.split())
-    normalized = normalized.strip(' ,.-')
-    
-    return normalized
-
 def find_potential_customer_matches(search_name, existing_customers):
     """
     Find potential customer matches using various strategies.
+    existing_customers can be a list of names or a prebuilt CustomerNameIndex;
+    lists are indexed once and reused (see customer_index).
     Returns list of (customer_name, match_type, score) tuples.
     """
-    if not search_name:
-        return []
-    
-    search_name_lower = search_name.lower().strip()
-    search_normalized = normalize_business_name(search_name).lower()
-    search_first_word = search_name.split()[0].lower() if search_name else ""
-    
-    # Handle "Last, First" format
-    search_name_reversed = ""
-    if "," in search_name:
-        parts = search_name.split(",", 1)
-        if len(parts) == 2:
-            search_name_reversed = f"{parts[1].strip()} {parts[0].strip()}".lower()
-    
-    matches = {}  # Use dict to avoid duplicates
-    
-    for customer in existing_customers:
-        if not customer:
-            continue
-            
-        customer_lower = customer.lower().strip()
-        customer_normalized = normalize_business_name(customer).lower()
-        customer_first_word = customer.split()[0].lower() if customer else ""
-        
-        # 1. Exact match (highest priority)
-        if search_name_lower == customer_lower:
-            matches[customer] = ('exact', 100)
-            continue
-        
-        # 2. Reversed name match (Last, First -> First Last)
-        if search_name_reversed and search_name_reversed == customer_lower:
-            if customer not in matches or matches[customer][1] < 98:
-                matches[customer] = ('name_reversed', 98)
-            continue
-        
-        # 3. Normalized match (very high priority)
-        if search_normalized and search_normalized == customer_normalized:
-            if customer not in matches or matches[customer][1] < 95:
-                matches[customer] = ('normalized', 95)
-            continue
-        
-        # 4. First word match (e.g., "Barboun" matches "Barboun, Thomas")
-        if search_first_word and customer_first_word == search_first_word:
-            if customer not in matches or matches[customer][1] < 90:
-                matches[customer] = ('first_word', 90)
-            continue
-        
-        # 5. Contains match (e.g., "RCM" in "RCM Construction")
-        if len(search_name) >= 3:
-            if search_name_lower in customer_lower:
-                if customer not in matches or matches[customer][1] < 85:
-                    matches[customer] = ('contains', 85)
-                continue
-            
-            # Check if search is contained in normalized version
-            if search_normalized in customer_normalized:
-                if customer not in matches or matches[customer][1] < 83:
-                    matches[customer] = ('normalized_contains', 83)
-                continue
-        
-        # 6. Customer contains search (e.g., searching "RCM Construction" finds "RCM Construction of SWFL LLC")
-        if customer_lower in search_name_lower and len(customer) >= 3:
-            if customer not in matches or matches[customer][1] < 80:
-                matches[customer] = ('reverse_contains', 80)
-            continue
-        
-        # 7. Starts with match
-        if customer_lower.startswith(search_name_lower[:3]) and len(search_name) >= 3:
-            if customer not in matches or matches[customer][1] < 75:
-                matches[customer] = ('starts_with', 75)
-        
-        # 8. Fuzzy word matching (e.g., "Adam Gomes" matches "Gomes Adam" or "Adam J Gomes")
-        search_words = set(search_name_lower.split())
-        customer_words = set(customer_lower.split())
-        if len(search_words) >= 2 and len(customer_words) >= 2:
-            # Check if all search words are in customer name (any order)
-            if search_words.issubset(customer_words):
-                if customer not in matches or matches[customer][1] < 88:
-                    matches[customer] = ('all_words', 88)
-            # Check if most words match
-            elif len(search_words.intersection(customer_words)) >= min(len(search_words), len(customer_words)) - 1:
-                if customer not in matches or matches[customer][1] < 82:
-                    matches[customer] = ('most_words', 82)
-    
-    # Convert to sorted list
-    result = [(name, match_type, score) for name, (match_type, score) in matches.items()]
-    result.sort(key=lambda x: (-x[2], x[0]))  # Sort by score desc, then name
-    
-    return result
+    return find_customer_matches(search_name, existing_customers)
 
 def safe_str_contains(df, column, pattern, na=False, negate=False, case=True):
     """
@@ -2700,10 +2187,10 @@ def calculate_transaction_balances(all_data, show_all_for_reconciliation=False):
     if 'Transaction ID' not in all_data.columns:
         return pd.DataFrame()
     
-    # Get original transactions only (exclude -STMT-, -ADJ-, -VOID-)
-    original_trans = all_data[
-        safe_str_contains(all_data, 'Transaction ID', '-STMT-|-ADJ-|-VOID-', na=False, negate=True)
-    ].copy()
+    # Get original transactions only (exclude -STMT-, -ADJ-, -VOID-) with their balances.
+    # The balance engine normalizes (Policy Number, Effective Date) once and joins
+    # grouped STMT/VOID payments to each original instead of rescanning all_data per row.
+    original_trans = build_balance_frame(all_data, get_policy_canonical_columns(all_data))
     
     if original_trans.empty:
         return pd.DataFrame()
@@ -2712,22 +2199,6 @@ def calculate_transaction_balances(all_data, show_all_for_reconciliation=False):
     if 'Total Agent Comm' not in original_trans.columns:
         print("WARNING: 'Total Agent Comm' column not found in data!")
     
-    # Normalize effective dates for comparison
-    # Convert all dates to a consistent format for comparison
-    all_data_normalized = all_data.copy()
-    try:
-        # Try to parse dates with mixed formats
-        all_data_normalized['_normalized_date'] = pd.to_datetime(all_data['Effective Date'], format='mixed', errors='coerce')
-    except:
-        # Fallback to coerce if mixed format fails
-        all_data_normalized['_normalized_date'] = pd.to_datetime(all_data['Effective Date'], errors='coerce')
-    
-    original_trans_normalized = original_trans.copy()
-    try:
-        original_trans_normalized['_normalized_date'] = pd.to_datetime(original_trans['Effective Date'], format='mixed', errors='coerce')
-    except:
-        original_trans_normalized['_normalized_date'] = pd.to_datetime(original_trans['Effective Date'], errors='coerce')
-    
     # DEBUG: Check column names first
     if len(original_trans) > 0:
         with st.expander("🔍 DEBUG: Column names in transaction data", expanded=False):
@@ -2746,67 +2217,6 @@ def calculate_transaction_balances(all_data, show_all_for_reconciliation=False):
             for col in sorted(cols_list):
                 st.text(f"  - {col}")
     
-    # Calculate balance for each transaction
-    for idx, row in original_trans.iterrows():
-        # Calculate credits (commission owed) - use Total Agent Comm which includes broker fees
-        if 'Total Agent Comm' in row.index:
-            total_agent_comm = row['Total Agent Comm']
-        else:
-            total_agent_comm = 0
-        
-        # Handle NaN values explicitly
-        if pd.isna(total_agent_comm) or total_agent_comm == 0:
-            # Fallback: Calculate from components if Total Agent Comm is missing
-            agent_est_comm = 0
-            broker_fee_comm = 0
-            
-            if 'Agent Estimated Comm $' in row.index:
-                agent_est_comm = row['Agent Estimated Comm $']
-                if pd.isna(agent_est_comm):
-                    agent_est_comm = 0
-                    
-            if 'Broker Fee Agent Comm' in row.index:
-                broker_fee_comm = row['Broker Fee Agent Comm']
-                if pd.isna(broker_fee_comm):
-                    broker_fee_comm = 0
-            
-            total_agent_comm = float(agent_est_comm or 0) + float(broker_fee_comm or 0)
-        
-        credit = float(total_agent_comm or 0)
-        
-        # Calculate debits (total paid for this policy)
-        policy_num = row['Policy Number']
-        
-        # Get normalized date for comparison
-        effective_date_normalized = original_trans_normalized.at[idx, '_normalized_date']
-        
-        # Get all STMT and VOID entries for this specific policy and date
-        # Include -VOID- entries since they have negative amounts that reduce the debit
-        # Strip whitespace from policy numbers to ensure matching
-        policy_num_stripped = str(policy_num).strip()
-        if pd.notna(effective_date_normalized):
-            recon_entries = all_data_normalized[
-                (all_data_normalized['Policy Number'].astype(str).str.strip() == policy_num_stripped) &
-                (all_data_normalized['_normalized_date'] == effective_date_normalized) &
-                (safe_str_contains(all_data, 'Transaction ID', '-STMT-|-VOID-', na=False))
-            ]
-        else:
-            # Fallback to string comparison if date parsing failed
-            effective_date = row['Effective Date']
-            recon_entries = all_data[
-                (all_data['Policy Number'].astype(str).str.strip() == policy_num_stripped) &
-                (all_data['Effective Date'] == effective_date) &
-                (safe_str_contains(all_data, 'Transaction ID', '-STMT-|-VOID-', na=False))
-            ]
-        
-        debit = 0
-        if not recon_entries.empty:
-            debit = recon_entries['Agent Paid Amount (STMT)'].fillna(0).sum()
-        
-        # Calculate balance
-        balance = credit - debit
-        original_trans.at[idx, '_balance'] = balance
-    
     # For reconciliation, optionally show all transactions from past 18 months
     if show_all_for_reconciliation:
         # Filter to past 18 months
@@ -2852,11 +2262,12 @@ def match_statement_transactions(statement_df, column_mapping, existing_data, st
     """
     Match statement transactions to existing database records.
     Now uses the same balance calculation as Unreconciled Transactions tab.
+    Hash indexes over the outstanding transactions are built once and every
+    statement line is resolved in a single pass (see statement_matcher).
+    Per-stage timings are kept in session state under 'statement_match_timings'.
     Returns: (matched_list, unmatched_list, can_create_list)
     """
-    matched = []
-    unmatched = []
-    can_create = []
+    timer = StageTimer()
     
     # DEBUG: Show raw input data
     with st.expander("🔍 DEBUG: Raw statement data and mapping", expanded=False):
@@ -2899,52 +2310,15 @@ def match_statement_transactions(statement_df, column_mapping, existing_data, st
                         st.markdown(f"  Sample values: {sample_values}")
     
     # REMOVE DUPLICATES from statement before processing
-    # Create a key for each row based on customer, policy, amount, and date
-    if not statement_df.empty:
-        # Create columns for deduplication
-        dedup_cols = []
-        
-        # Helper function to check if column exists (handles both names and indices)
-        def column_exists_and_get_name(mapped_col):
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, return the column index if valid
-                if 0 <= col_index < len(statement_df.columns):
-                    return col_index
-            except ValueError:
-                # Not a numeric index, check as column name
-                if mapped_col in statement_df.columns:
-                    return mapped_col
-            return None
-        
-        if 'Customer' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Customer'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Policy Number' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Policy Number'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Effective Date' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Effective Date'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Agent Paid Amount (STMT)' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Agent Paid Amount (STMT)'])
-            if col is not None:
-                dedup_cols.append(col)
-        
-        if dedup_cols:
-            # Remove duplicates based on key columns
-            original_count = len(statement_df)
-            statement_df = statement_df.drop_duplicates(subset=dedup_cols, keep='first')
-            duplicate_count = original_count - len(statement_df)
-            
-            if duplicate_count > 0:
-                st.warning(f"⚠️ Removed {duplicate_count} duplicate rows from the statement import")
+    # Key for each row is based on customer, policy, amount, and date
+    with timer.stage('dedupe'):
+        statement_df, duplicate_count = dedupe_statement_rows(statement_df, column_mapping)
+    if duplicate_count > 0:
+        st.warning(f"⚠️ Removed {duplicate_count} duplicate rows from the statement import")
     
     # Get all transactions from past 18 months for reconciliation matching
-    outstanding_trans = calculate_transaction_balances(existing_data, show_all_for_reconciliation=True)
+    with timer.stage('balances'):
+        outstanding_trans = calculate_transaction_balances(existing_data, show_all_for_reconciliation=True)
     
     # Debug output
     if outstanding_trans.empty:
@@ -3031,561 +2405,47 @@ def match_statement_transactions(statement_df, column_mapping, existing_data, st
         else:
             st.warning("Statement dataframe is empty!")
     
-    # Build lookup dictionaries
-    existing_lookup = {}
-    customer_trans_lookup = {}  # Customer -> list of transactions
+    # Extract all mapped statement fields in one pass
+    with timer.stage('extract'):
+        statement_fields = extract_statement_fields(statement_df, column_mapping)
     
-    if not outstanding_trans.empty:
-        for idx, trans in outstanding_trans.iterrows():
-            trans_dict = trans.to_dict()
-            trans_dict['balance'] = trans['_balance']
-            
-            # Store by policy key - normalize date format for matching
-            eff_date_normalized = trans['Effective Date']
-            if pd.notna(eff_date_normalized):
-                try:
-                    eff_date_normalized = pd.to_datetime(eff_date_normalized).strftime('%Y-%m-%d')
-                except:
-                    eff_date_normalized = str(eff_date_normalized)
-            policy_key = f"{trans['Policy Number']}_{eff_date_normalized}"
-            existing_lookup[policy_key] = trans_dict
-            
-            # Store by customer (for fuzzy matching)
-            customer = trans['Customer']
-            if pd.notna(customer):
-                customer_key = customer.lower().strip()
-                if customer_key not in customer_trans_lookup:
-                    customer_trans_lookup[customer_key] = []
-                customer_trans_lookup[customer_key].append(trans_dict)
-    
-    # Get unique customer list for fuzzy matching
-    all_customers = []
-    if not existing_data.empty:
-        all_customers = existing_data['Customer'].dropna().unique().tolist()
+    # Build hash indexes: (policy, effective date), customer, (customer, policy)
+    with timer.stage('index'):
+        match_index = StatementMatchIndex(outstanding_trans)
+        
+        # Get unique customer list for fuzzy matching
+        all_customers = []
+        if not existing_data.empty:
+            all_customers = existing_data['Customer'].dropna().unique().tolist()
     
     # DEBUG: Show lookup dictionary sample
     with st.expander("🔍 DEBUG: Transaction lookup dictionaries", expanded=False):
         st.markdown(f"**Existing lookup keys (first 10):**")
-        if existing_lookup:
-            for i, (key, trans) in enumerate(list(existing_lookup.items())[:10]):
+        if match_index.by_policy_date:
+            for i, (key, trans) in enumerate(list(match_index.by_policy_date.items())[:10]):
                 st.text(f"  {key}: {trans.get('Customer', 'Unknown')} - Balance: ${trans.get('balance', 0):.2f}")
         else:
             st.warning("No transactions in existing_lookup dictionary!")
         
         st.markdown(f"\n**Customer lookup (first 5 customers):**")
-        if customer_trans_lookup:
-            for i, (customer, trans_list) in enumerate(list(customer_trans_lookup.items())[:5]):
+        if match_index.by_customer:
+            for i, (customer, trans_list) in enumerate(list(match_index.by_customer.items())[:5]):
                 st.text(f"  {customer}: {len(trans_list)} transaction(s)")
         else:
             st.warning("No customers in customer_trans_lookup dictionary!")
-    
-    # Track processed statement rows to prevent duplicates
-    processed_statement_rows = set()
-    
-    # DEBUG: Track matching attempts
-    debug_matches = {
-        'total_rows': 0,
-        'skipped_totals': 0,
-        'skipped_empty': 0,
-        'policy_date_attempts': 0,
-        'customer_attempts': 0,
-        'matched': 0,
-        'unmatched': 0,
-        'can_create': 0
-    }
-    
-    # Process each statement row
-    for idx, row in statement_df.iterrows():
-        debug_matches['total_rows'] += 1
-        
-        # Show debug for first 3 rows to understand the data
-        if debug_matches['total_rows'] <= 3:
-            with st.expander(f"🔍 DEBUG: Processing row {idx} - BEFORE extraction", expanded=False):
-                st.markdown("**Raw row data:**")
-                st.json(row.to_dict())
-                st.markdown("**Column mapping:**")
-                st.json(column_mapping)
-                st.markdown("**DataFrame columns:**")
-                st.text(list(statement_df.columns))
-        
-        # Extract mapped values more carefully
-        customer = ''
-        policy_num = ''
-        eff_date = None
-        
-        # Extract Customer
-        if 'Customer' in column_mapping:
-            mapped_col = column_mapping['Customer']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    val = row.iloc[col_index]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        customer = str(val).strip()
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    val = row[mapped_col]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        customer = str(val).strip()
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        val = row[matching_cols[0]]
-                        if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                            customer = str(val).strip()
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Extract Policy Number
-        if 'Policy Number' in column_mapping:
-            mapped_col = column_mapping['Policy Number']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    val = row.iloc[col_index]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        policy_num = str(val).strip()
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    val = row[mapped_col]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        policy_num = str(val).strip()
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        val = row[matching_cols[0]]
-                        if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                            policy_num = str(val).strip()
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Extract Effective Date
-        if 'Effective Date' in column_mapping:
-            mapped_col = column_mapping['Effective Date']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    eff_date = row.iloc[col_index]
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                if mapped_col in statement_df.columns:
-                    eff_date = row[mapped_col]
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        eff_date = row[matching_cols[0]]
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Skip rows that appear to be totals
-        # Check if customer name contains common total indicators
-        customer_lower = customer.lower()
-        if any(total_word in customer_lower for total_word in ['total', 'totals', 'subtotal', 'sub-total', 'grand total', 'sum']):
-            continue
-        
-        # Also skip if policy number or customer is empty/missing and it looks like a summary row
-        if (not customer or customer.lower() in ['', 'nan', 'none']) and (not policy_num or policy_num.lower() in ['', 'nan', 'none']):
-            continue
-        
-        # Check if this is truly an empty row
-        # Get the amount to help determine if row has data
-        amount = 0
-        if 'Agent Paid Amount (STMT)' in column_mapping:
-            mapped_col = column_mapping['Agent Paid Amount (STMT)']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    try:
-                        val = row.iloc[col_index]
-                        if pd.notna(val):
-                            amount = float(val)
-                    except (ValueError, TypeError):
-                        amount = 0
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    try:
-                        val = row[mapped_col]
-                        if pd.notna(val):
-                            amount = float(val)
-                    except (ValueError, TypeError):
-                        amount = 0
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        try:
-                            val = row[matching_cols[0]]
-                            if pd.notna(val):
-                                amount = float(val)
-                        except (ValueError, TypeError):
-                            amount = 0
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Skip only if ALL key fields are empty/missing
-        # A row needs at least customer OR policy number OR a non-zero amount to be valid
-        if not customer and not policy_num and amount == 0:
-            debug_matches['skipped_empty'] += 1
-            # Log ALL skipped rows for debugging (not just first 3)
-            with st.expander(f"⚠️ DEBUG: Skipped empty row {idx} (#{debug_matches['skipped_empty']})", expanded=False):
-                st.markdown("**Raw row data:**")
-                st.json(row.to_dict())
-                
-                st.markdown("**Column mapping being used:**")
-                st.json(column_mapping)
-                
-                st.markdown("**Extraction attempts:**")
-                
-                # Customer extraction debug
-                st.markdown("1. **Customer extraction:**")
-                if 'Customer' in column_mapping:
-                    mapped_col = column_mapping['Customer']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                            st.text(f"   - Is empty after strip: {not str(raw_val).strip() if pd.notna(raw_val) else True}")
-                            st.text(f"   - Lower is in ['nan', 'none']: {str(raw_val).strip().lower() in ['nan', 'none'] if pd.notna(raw_val) and str(raw_val).strip() else False}")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                            st.text(f"   - Is empty after strip: {not str(raw_val).strip() if pd.notna(raw_val) else True}")
-                            st.text(f"   - Lower is in ['nan', 'none']: {str(raw_val).strip().lower() in ['nan', 'none'] if pd.notna(raw_val) and str(raw_val).strip() else False}")
-                else:
-                    st.text("   - 'Customer' not in column_mapping")
-                st.text(f"   - Final customer value: '{customer}' (empty: {not customer})")
-                
-                # Policy Number extraction debug
-                st.markdown("2. **Policy Number extraction:**")
-                if 'Policy Number' in column_mapping:
-                    mapped_col = column_mapping['Policy Number']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                else:
-                    st.text("   - 'Policy Number' not in column_mapping")
-                st.text(f"   - Final policy_num value: '{policy_num}' (empty: {not policy_num})")
-                
-                # Amount extraction debug
-                st.markdown("3. **Amount extraction:**")
-                if 'Agent Paid Amount (STMT)' in column_mapping:
-                    mapped_col = column_mapping['Agent Paid Amount (STMT)']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            try:
-                                float_val = float(raw_val) if pd.notna(raw_val) else 0
-                                st.text(f"   - float(val): {float_val}")
-                            except Exception as e:
-                                st.text(f"   - float(val) failed: {str(e)}")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            try:
-                                float_val = float(raw_val) if pd.notna(raw_val) else 0
-                                st.text(f"   - float(val): {float_val}")
-                            except Exception as e:
-                                st.text(f"   - float(val) failed: {str(e)}")
-                else:
-                    st.text("   - 'Agent Paid Amount (STMT)' not in column_mapping")
-                st.text(f"   - Final amount value: {amount} (zero: {amount == 0})")
-                
-                st.markdown("**Decision:**")
-                st.text(f"Customer empty: {not customer}")
-                st.text(f"Policy empty: {not policy_num}")
-                st.text(f"Amount zero: {amount == 0}")
-                st.text(f"All empty/zero: {not customer and not policy_num and amount == 0}")
-                st.text("**Row will be SKIPPED**")
-            continue
-        
-        # Agency amount is optional for audit purposes
-        agency_amount = 0
-        if 'Agency Comm Received (STMT)' in column_mapping:
-            mapped_col = column_mapping['Agency Comm Received (STMT)']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    try:
-                        val = row.iloc[col_index]
-                        if pd.notna(val):
-                            agency_amount = float(val)
-                    except (ValueError, TypeError):
-                        agency_amount = 0
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    try:
-                        val = row[mapped_col]
-                        if pd.notna(val):
-                            agency_amount = float(val)
-                    except (ValueError, TypeError):
-                        agency_amount = 0
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        try:
-                            val = row[matching_cols[0]]
-                            if pd.notna(val):
-                                agency_amount = float(val)
-                        except (ValueError, TypeError):
-                            agency_amount = 0
-        
-        # Convert effective date to string format
-        if pd.notna(eff_date):
-            try:
-                eff_date = pd.to_datetime(eff_date).strftime('%Y-%m-%d')
-            except:
-                eff_date = str(eff_date)
-        
-        match_result = {
-            'row_index': idx,
-            'customer': customer,
-            'policy_number': policy_num,
-            'effective_date': eff_date,
-            'amount': amount,  # Agent Paid Amount (primary)
-            'agency_amount': agency_amount,  # Agency Comm Received (audit)
-            'statement_data': row.to_dict()
-        }
         
-        # DEBUG: Show first 3 match attempts in detail
-        if debug_matches['total_rows'] <= 3:
-            with st.expander(f"🔍 DEBUG: Matching row {idx} - {customer[:30]}", expanded=False):
-                st.markdown(f"**Statement data:**")
-                st.text(f"  Customer: {customer}")
-                st.text(f"  Policy: {policy_num}")
-                st.text(f"  Eff Date: {eff_date}")
-                st.text(f"  Amount: ${amount:.2f}")
-                st.text(f"  Agency Amount: ${agency_amount:.2f}")
-                st.markdown(f"\n**Matching attempt:**")
-                st.text(f"  Policy key: {policy_num}_{eff_date}")
-                st.text(f"  Key exists in lookup: {f'{policy_num}_{eff_date}' in existing_lookup}")
-        
-        # Try to match: Policy Number + Effective Date (highest confidence)
-        policy_key = f"{policy_num}_{eff_date}"
-        debug_matches['policy_date_attempts'] += 1
-        if policy_key in existing_lookup:
-            match_result['match'] = existing_lookup[policy_key]
-            match_result['confidence'] = 100
-            match_result['match_type'] = 'Policy + Date'
-            matched.append(match_result)
-            debug_matches['matched'] += 1
-            continue
-        
-        # Try enhanced customer matching
-        debug_matches['customer_attempts'] += 1
-        potential_customers = find_potential_customer_matches(customer, all_customers)
-        
-        if potential_customers:
-            # Check if we have a single high-confidence match
-            if len(potential_customers) == 1 and potential_customers[0][2] >= 90:
-                # Single high-confidence match - try to find transaction
-                matched_customer = potential_customers[0][0]
-                customer_key = matched_customer.lower().strip()
-                
-                if customer_key in customer_trans_lookup:
-                    customer_trans = customer_trans_lookup[customer_key]
-                    # Check for amount match among transactions WITH policy verification
-                    # Strip whitespace from policy numbers for comparison
-                    policy_num_stripped = str(policy_num).strip() if policy_num else ""
-                    amount_matched = False
-                    for trans in customer_trans:
-                        if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:  # 5% tolerance
-                            # Also verify policy number matches
-                            trans_policy = str(trans.get('Policy Number', '')).strip()
-                            if trans_policy == policy_num_stripped and policy_num_stripped:
-                                match_result['match'] = trans
-                                match_result['confidence'] = 90
-                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy + Amount'
-                                match_result['matched_customer'] = matched_customer
-                                matched.append(match_result)
-                                amount_matched = True
-                                break
-
-                    if not amount_matched:
-                        # Check if any transaction matches the policy number
-                        policy_matched = False
-                        for trans in customer_trans:
-                            trans_policy = str(trans.get('Policy Number', '')).strip()
-                            if trans_policy == policy_num_stripped and policy_num_stripped:
-                                # Policy number matches!
-                                match_result['match'] = trans
-                                match_result['confidence'] = 95
-                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy'
-                                match_result['matched_customer'] = matched_customer
-                                matched.append(match_result)
-                                policy_matched = True
-                                break
-                        
-                        if not policy_matched:
-                            # No policy match - needs manual selection
-                            match_result['potential_matches'] = customer_trans
-                            match_result['potential_customers'] = potential_customers
-                            match_result['needs_selection'] = True
-                            unmatched.append(match_result)
-                else:
-                    # Customer found but no transactions in lookup - still add to unmatched for manual selection
-                    match_result['potential_customers'] = potential_customers
-                    match_result['needs_selection'] = True
-                    unmatched.append(match_result)
-            else:
-                # Multiple potential matches or low confidence - needs manual selection
-                match_result['potential_customers'] = potential_customers
-                match_result['needs_selection'] = True
-                
-                # Collect all transactions for all potential customers
-                all_potential_trans = []
-                for potential_customer, match_type, score in potential_customers[:5]:  # Limit to top 5
-                    customer_key = potential_customer.lower().strip()
-                    if customer_key in customer_trans_lookup:
-                        trans_list = customer_trans_lookup[customer_key]
-                        for trans in trans_list:
-                            trans_copy = trans.copy()  # Avoid modifying original
-                            trans_copy['_customer_match'] = potential_customer
-                            trans_copy['_match_type'] = match_type
-                            trans_copy['_match_score'] = score
-                            all_potential_trans.append(trans_copy)
-                
-                if all_potential_trans:
-                    match_result['potential_matches'] = all_potential_trans
-                    
-                unmatched.append(match_result)
-        else:
-            # No fuzzy match found - check if exact customer exists
-            customer_key = customer.lower().strip()
-            if customer_key in customer_trans_lookup:
-                # Exact match exists
-                customer_matches = customer_trans_lookup[customer_key]
-                # Check for amount match WITH policy number verification
-                amount_matched = False
-                for trans in customer_matches:
-                    if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:  # 5% tolerance
-                        # Also verify policy number matches
-                        if trans.get('Policy Number') == policy_num and policy_num:
-                            match_result['match'] = trans
-                            match_result['confidence'] = 90
-                            match_result['match_type'] = 'Customer + Policy + Amount'
-                            matched.append(match_result)
-                            amount_matched = True
-                            break
-                
-                if not amount_matched:
-                    # Check for policy number match
-                    policy_matched = False
-                    for trans in customer_matches:
-                        if trans.get('Policy Number') == policy_num and policy_num:
-                            # Policy number matches!
-                            match_result['match'] = trans
-                            match_result['confidence'] = 95
-                            match_result['match_type'] = 'Customer + Policy'
-                            matched.append(match_result)
-                            policy_matched = True
-                            break
-                    
-                    if not policy_matched:
-                        # No policy match - needs selection
-                        match_result['potential_matches'] = customer_matches
-                        match_result['potential_customers'] = [(customer, 'exact', 100)]
-                        match_result['needs_selection'] = True
-                        unmatched.append(match_result)
-            else:
-                # No match found - can create new transaction
-                match_result['can_create'] = True
-                can_create.append(match_result)
-                debug_matches['can_create'] += 1
+        st.markdown("\n**Extracted statement fields (first 3 rows):**")
+        st.dataframe(statement_fields.head(3))
+    
+    # Resolve every statement line against the indexes
+    with timer.stage('match'):
+        result = match_statement_rows(
+            statement_df, statement_fields, match_index, all_customers, find_potential_customer_matches
+        )
+    matched, unmatched, can_create = result['matched'], result['unmatched'], result['can_create']
+    debug_matches = result['stats']
     
-    # Count unmatched at the end
-    debug_matches['unmatched'] = len(unmatched)
-    debug_matches['matched'] = len(matched)
+    st.session_state[get_user_session_key('statement_match_timings')] = timer.timings
     
     # DEBUG: Show matching summary
     with st.expander("🔍 DEBUG: Matching Summary", expanded=False):
@@ -3596,7 +2456,7 @@ def match_statement_transactions(statement_df, column_mapping, existing_data, st
         st.markdown(f"- Valid rows: {debug_matches['total_rows'] - debug_matches['skipped_totals'] - debug_matches['skipped_empty']}")
         
         if debug_matches['skipped_empty'] > 0:
-            st.warning(f"⚠️ {debug_matches['skipped_empty']} rows were skipped as empty. This happens when a row has no customer name, no policy number, AND zero amount. Check your column mappings!")
+            st.warning(f"⚠️ {debug_matches['skipped_empty']} rows were skipped as empty. This happens when a row has no customer name and no policy number. Check your column mappings!")
         
         st.markdown("\n**Matching Attempts:**")
         st.markdown(f"- Policy + Date attempts: {debug_matches['policy_date_attempts']}")
@@ -3606,6 +2466,10 @@ def match_statement_transactions(statement_df, column_mapping, existing_data, st
         st.markdown(f"- Matched: {debug_matches['matched']}")
         st.markdown(f"- Unmatched (need review): {debug_matches['unmatched']}")
         st.markdown(f"- Can create new: {debug_matches['can_create']}")
+        
+        st.markdown("\n**Timings:**")
+        for stage_name, seconds in timer.timings.items():
+            st.markdown(f"- {stage_name}: {seconds * 1000:.1f} ms")
     
     return matched, unmatched, can_create
 
@@ -4020,7 +2884,7 @@ def show_import_results(statement_date, all_data):
                                             # Get ALL transactions for this customer (not just those with balance)
                                             all_customer_trans = all_data[
                                                 (all_data['Customer'] == selected_customer) &
-                                                (~all_data['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False))
+                                                (~policy_kind_mask(all_data, RECONCILIATION_KINDS))
                                             ]
                                         
                                             if not all_customer_trans.empty:
@@ -4320,7 +3184,7 @@ def show_import_results(statement_date, all_data):
                             # with outstanding balance, regardless of policy/date match
                             matching_trans = all_data[
                                 (all_data['Customer'] == customer_name) &
-                                (~all_data['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False))
+                                (~policy_kind_mask(all_data, RECONCILIATION_KINDS))
                             ]
                             
                             # Calculate balances for customer transactions
@@ -4877,6 +3741,90 @@ def show_import_results(statement_date, all_data):
     if has_manual_matches and not (has_matched or has_to_create):
         st.info("💡 You have pending manual matches. Click 'Apply Manual Matches' above before importing, or the import button will process them automatically.")
     
+    # Resume a bulk import that stopped part way
+    import_checkpoint_key = get_user_session_key('import_write_checkpoint')
+    if import_checkpoint_key in st.session_state:
+        checkpoint = st.session_state[import_checkpoint_key]
+        st.warning(f"⚠️ Import {checkpoint['batch_id']} stopped part way: {checkpoint['written']} rows written, "
+                   f"{len(checkpoint['operations'])} remaining.")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("▶️ Resume Import", type="primary", key="resume_import"):
+                with st.spinner("Writing remaining rows..."):
+                    write_result = write_operations(get_supabase_client(), checkpoint['operations'])
+                    checkpoint['written'] += write_result.written
+                    clear_policies_cache()
+                    if write_result.completed:
+                        del st.session_state[import_checkpoint_key]
+                        st.session_state[get_user_session_key('import_data')] = None
+                        st.session_state[matched_key] = []
+                        st.session_state[unmatched_key] = []
+                        st.session_state[to_create_key] = []
+                        st.session_state[column_mapping_key] = {}
+                        st.success(f"✅ Import {checkpoint['batch_id']} completed - {checkpoint['written']} rows written "
+                                   f"({checkpoint['created_count']} created, {checkpoint['reconciled_count']} reconciled)")
+                        st.cache_data.clear()
+                        time.sleep(2)
+                        st.rerun()
+                    else:
+                        checkpoint['operations'] = write_result.remaining_operations()
+                        st.error(f"❌ {len(write_result.errors)} row(s) still failing:\n{write_result.error_summary()}")
+        with col2:
+            if st.button("Discard", key="discard_import_checkpoint"):
+                del st.session_state[import_checkpoint_key]
+                st.rerun()
+        return
+    
+    # Dry run - show everything the import would write without touching the database
+    if st.button("🧪 Dry Run (no changes)", disabled=not can_import, key="import_dry_run"):
+        with st.spinner("Building dry run report..."):
+            report = build_dry_run_report(
+                st.session_state[matched_key],
+                st.session_state[unmatched_key],
+                st.session_state[to_create_key],
+                statement_date,
+                create_new=create_selected,
+                match_timings=st.session_state.get(get_user_session_key('statement_match_timings'))
+            )
+        summary = report['summary']
+        st.markdown("### 🧪 Dry Run Report")
+        st.caption("Nothing has been written. Pending manual matches and offset NEW transactions are not included.")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("STMT Rows to Insert", summary['stmt_rows'])
+        with col2:
+            st.metric("New Transactions", summary['new_transactions'])
+        with col3:
+            st.metric("Terms Affected", summary['terms_affected'],
+                     help=f"{summary['paid_in_full']} paid in full, {summary['overpaid']} overpaid")
+        with col4:
+            st.metric("Unmatched Lines", summary['unmatched'], help=f"${summary['unmatched_amount']:,.2f} not reconciled")
+        
+        with st.expander(f"New STMT rows ({summary['stmt_rows']}) - ${summary['reconciled_amount']:,.2f}", expanded=True):
+            st.dataframe(report['new_stmt_rows'], use_container_width=True, hide_index=True)
+        if summary['new_transactions']:
+            with st.expander(f"New transactions ({summary['new_transactions']})", expanded=False):
+                st.dataframe(report['new_transactions'], use_container_width=True, hide_index=True)
+        with st.expander(f"Balance changes per policy term ({summary['terms_affected']})", expanded=True):
+            st.dataframe(report['balance_changes'], use_container_width=True, hide_index=True)
+        if summary['unmatched']:
+            with st.expander(f"Unmatched lines ({summary['unmatched']})", expanded=False):
+                st.dataframe(report['unmatched'], use_container_width=True, hide_index=True)
+        with st.expander("⏱️ Timing per stage", expanded=False):
+            st.dataframe(pd.DataFrame(
+                [(stage, round(seconds * 1000, 1)) for stage, seconds in report['timings'].items()],
+                columns=['Stage', 'Milliseconds']
+            ), hide_index=True)
+        
+        st.download_button(
+            "📥 Download Balance Changes (CSV)",
+            report['balance_changes'].to_csv(index=False),
+            file_name=f"dry_run_balance_changes_{statement_date.strftime('%Y%m%d')}.csv",
+            mime="text/csv",
+            key="dry_run_download"
+        )
+    
     if st.button("🔄 Proceed with Import", type="primary", disabled=not can_import):
         with st.spinner("Importing transactions..."):
             # Store all database operations to execute at once
@@ -4904,6 +3852,9 @@ def show_import_results(statement_date, all_data):
                 
                 # Step 1: Create missing transactions if selected
                 if create_selected and st.session_state[to_create_key]:
+                    # Reserve the new Transaction IDs for the whole import up front
+                    import_suffix = f"-IMPORT-{statement_date.strftime('%Y%m%d')}"
+                    import_ids = iter(allocate_transaction_ids(len(st.session_state[to_create_key]), suffix=import_suffix))
                     for idx, item in enumerate(st.session_state[to_create_key]):
                         # Check if this transaction should be created (default to True if no edit)
                         should_create = True
@@ -4919,9 +3870,8 @@ def show_import_results(statement_date, all_data):
                             should_create = create_df.loc[idx, 'Create'] if idx < len(create_df) else True
                         
                         if should_create:
-                            # Generate new transaction ID with -IMPORT-YYYYMMDD suffix
-                            import_suffix = f"-IMPORT-{statement_date.strftime('%Y%m%d')}"
-                            new_trans_id = generate_unique_transaction_id(suffix=import_suffix)
+                            # New transaction ID with -IMPORT-YYYYMMDD suffix
+                            new_trans_id = next(import_ids, None) or generate_unique_transaction_id(suffix=import_suffix)
                             
                             # Check if offset should be created based on edited dataframe
                             create_offset_for_item = False
@@ -5080,8 +4030,8 @@ def show_import_results(statement_date, all_data):
                             })
                 
                 # Step 2: Create reconciliation entries for all matched transactions
-                for item in st.session_state[matched_key]:
-                    recon_id = generate_reconciliation_transaction_id("STMT", statement_date)
+                recon_ids = allocate_reconciliation_transaction_ids(len(st.session_state[matched_key]), "STMT", statement_date)
+                for item, recon_id in zip(st.session_state[matched_key], recon_ids):
                     
                     # Create reconciliation entry - copy all fields from matched transaction
                     # Start with all fields from the matched transaction
@@ -5144,21 +4094,31 @@ def show_import_results(statement_date, all_data):
                     all_operations.append(('insert', 'policies', cleaned_recon))
                     reconciled_count += 1
                 
-                # Execute all operations in a single batch
-                # This ensures atomicity - either all succeed or none do
+                # Execute all operations as chunked bulk inserts
+                # A failed chunk stops the run and saves a checkpoint so it can be resumed
                 if all_operations:
                     st.info(f"Executing {len(all_operations)} database operations...")
                     
                     supabase = get_supabase_client()
-                    successful_operations = 0
-                    
-                    # Execute each operation
-                    for op_type, table, data in all_operations:
-                        if op_type == 'insert':
-                            result = supabase.table(table).insert(data).execute()
-                            if not result.data:
-                                raise Exception(f"Failed to insert record: {data.get('Transaction ID', 'Unknown')}")
-                            successful_operations += 1
+                    write_progress = st.progress(0.0)
+                    write_result = write_operations(
+                        supabase, all_operations, batch_size=BULK_WRITE_BATCH_SIZE,
+                        progress_callback=lambda written, total: write_progress.progress(min(written / total, 1.0))
+                    )
+                    successful_operations = write_result.written
+                    
+                    if not write_result.completed:
+                        st.session_state[import_checkpoint_key] = {
+                            'batch_id': batch_id,
+                            'operations': write_result.remaining_operations(),
+                            'written': successful_operations,
+                            'created_count': created_count,
+                            'reconciled_count': reconciled_count
+                        }
+                        raise Exception(
+                            f"{len(write_result.errors)} row(s) failed after {successful_operations} were written:\n"
+                            f"{write_result.error_summary()}"
+                        )
                     
                     # If we got here, all operations succeeded
                     st.success(f"✅ All {successful_operations} operations completed successfully!")
@@ -5219,19 +4179,31 @@ def show_import_results(statement_date, all_data):
                 
                 # Clear cache and refresh
                 st.cache_data.clear()
+                clear_policies_cache()
                 # Note: The uploaded file is automatically cleaned up by Streamlit on rerun
                 time.sleep(4)
                 st.rerun()
                 
             except Exception as e:
-                # If ANY error occurs, no database changes were made
-                st.error(f"""
-                ❌ Import failed - NO changes were made to the database
-                
-                Error: {str(e)}
-                
-                Please fix the issue and try again. All transactions remain unchanged.
-                """)
+                if import_checkpoint_key in st.session_state:
+                    # Bulk write stopped part way - rows already written are kept
+                    checkpoint = st.session_state[import_checkpoint_key]
+                    st.error(f"""
+                    ❌ Import stopped after {checkpoint['written']} rows were written
+                    
+                    Error: {str(e)}
+                    
+                    Fix the issue and use 'Resume Import' to write the remaining {len(checkpoint['operations'])} rows.
+                    """)
+                else:
+                    # Failed before anything was written
+                    st.error(f"""
+                    ❌ Import failed - NO changes were made to the database
+                    
+                    Error: {str(e)}
+                    
+                    Please fix the issue and try again. All transactions remain unchanged.
+                    """)
                 
                 # Clear cache on failure to prevent stale data issues
                 clear_policies_cache()
@@ -5239,8 +4211,8 @@ def show_import_results(statement_date, all_data):
                 st.exception(e)
                 
                 # Log which operation failed if possible
-                if 'all_operations' in locals() and all_operations:
-                    st.info(f"Failed while processing operation {successful_operations + 1} of {len(all_operations)}")
+                if 'all_operations' in locals() and all_operations and 'successful_operations' in locals():
+                    st.info(f"Failed after {successful_operations} of {len(all_operations)} operations")
 
 def duplicate_for_renewal(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -6963,7 +5935,8 @@ def main():
         display_app_header()
         st.title("📊 Commission Dashboard")
         
-        # Load fresh data for this page
+        # Load this page's reference data concurrently, then use the cached results
+        prefetch_page_reference_data()
         all_data = load_policies_data()
         
         # Debug section - Optional for troubleshooting
@@ -7250,6 +6223,7 @@ def main():
                                         except Exception as update_error:
                                             st.error(f"Error updating record {transaction_id}: {update_error}")
                                 
+                                clear_policies_cache()
                                 st.success("Changes saved successfully!")
                                 st.rerun()
                                 
@@ -8482,6 +7456,7 @@ def main():
                                                 saved_count += 1
                                     
                                     if saved_count > 0:
+                                        clear_policies_cache()
                                         status_container.success(f"✅ Auto-saved {saved_count} changes")
                                         # Update the base data to reflect saved changes
                                         # Preserve column order when updating session state
@@ -8973,9 +7948,7 @@ def main():
                                     st.write("")  # Add more spacing
                                     if st.button("🔄 Refresh", help="Refresh MGA list if you've added new commission rules", key="refresh_mga_cache"):
                                         # Clear all MGA caches
-                                        keys_to_clear = [key for key in st.session_state.keys() if key.startswith('mgas_for_carrier_')]
-                                        for key in keys_to_clear:
-                                            del st.session_state[key]
+                                        clear_carrier_mga_cache()
                                         st.success("✅ MGA lists refreshed!")
                                         st.rerun()
                             
@@ -9580,7 +8553,8 @@ def main():
                 st.success("✅ Form cleared! All fields have been reset.")
                 st.rerun()
         
-        # Load fresh data for this page
+        # Load this page's reference data concurrently, then use the cached results
+        prefetch_page_reference_data()
         all_data = load_policies_data()
         
         # Import data validation utilities
@@ -10664,11 +9638,13 @@ def main():
                                 try:
                                     # Generate batch reconciliation ID
                                     batch_id = f"REC-{statement_date.strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-                                    success_count = 0
+                                    recon_operations = []
+                                    update_operations = []
+                                    reconciled_at = datetime.datetime.now().isoformat()
                                     
                                     # Create reconciliation entries for each item in batch
-                                    for item in st.session_state.reconciliation_batch:
-                                        recon_id = generate_reconciliation_transaction_id("STMT", statement_date)
+                                    recon_ids = allocate_reconciliation_transaction_ids(len(st.session_state.reconciliation_batch), "STMT", statement_date)
+                                    for item, recon_id in zip(st.session_state.reconciliation_batch, recon_ids):
                                         
                                         # Create reconciliation entry
                                         recon_entry = {
@@ -10697,26 +9673,26 @@ def main():
                                         # Clean data before insertion
                                         cleaned_recon = clean_data_for_database(recon_entry)
                                         
-                                        # Insert reconciliation entry
-                                        supabase.table('policies').insert(add_user_email_to_data(cleaned_recon)).execute()
+                                        # Queue reconciliation entry
+                                        recon_operations.append(insert_op('policies', add_user_email_to_data(cleaned_recon)))
                                         
-                                        # Update original transaction
-                                        update_query = supabase.table('policies').update({
+                                        # Queue update of the original transaction
+                                        update_operations.append(update_op('policies', {
                                             'reconciliation_status': 'reconciled',
                                             'reconciliation_id': batch_id,
-                                            'reconciled_at': datetime.datetime.now().isoformat()
-                                        }).eq('_id', item['_id'])
-                                        # Add user filtering for security
-                                        if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-                                            user_id = get_user_id()
-                                            if user_id:
-                                                update_query = update_query.eq('user_id', user_id)
-                                            else:
-                                                user_email = get_normalized_user_email()
-                                                update_query = update_query.eq('user_email', user_email)
-                                        update_query.execute()
-                                        
-                                        success_count += 1
+                                            'reconciled_at': reconciled_at
+                                        }, '_id', item['_id']))
+                                    
+                                    # Bulk insert entries, then bulk update originals (with user filtering for security)
+                                    write_result = write_operations(supabase, recon_operations + update_operations,
+                                                                    filters=get_user_write_filters())
+                                    if not write_result.completed:
+                                        clear_policies_cache()
+                                        raise Exception(
+                                            f"{write_result.written} of {len(write_result.operations)} writes completed. "
+                                            f"Failed rows:\n{write_result.error_summary()}"
+                                        )
+                                    success_count = len(recon_operations)
                                     
                                     # Clear batch
                                     st.session_state.reconciliation_batch = []
@@ -10724,6 +9700,7 @@ def main():
                                     
                                     st.success(f"✅ Batch reconciled successfully! {success_count} transactions processed. Batch ID: {batch_id}")
                                     st.cache_data.clear()
+                                    clear_policies_cache()
                                     time.sleep(2)
                                     st.rerun()
                                     
@@ -10791,7 +9768,7 @@ def main():
                     # Get all original transactions for this customer
                     customer_data = all_data[
                         (all_data["Customer"] == selected_customer) &
-                        (~all_data['Transaction ID'].str.contains('-STMT-|-ADJ-|-VOID-', na=False))
+                        (~policy_kind_mask(all_data, RECONCILIATION_KINDS))
                     ]
                     
                     # Calculate balance for each transaction
@@ -10928,7 +9905,7 @@ def main():
                                                 policy_num = transaction.get('Policy Number', '')
                                                 payment_history = all_data[
                                                     (all_data['Policy Number'] == policy_num) &
-                                                    (all_data['Transaction ID'].str.contains('-STMT-', na=False))
+                                                    policy_kind_mask(all_data, [TransactionKind.STMT])
                                                 ]
                                                 
                                                 if not payment_history.empty:
@@ -11873,10 +10850,7 @@ def main():
             # Show reconciliation entries
             if not all_data.empty:
                 # Include both -STMT- and -VOID- transactions
-                recon_entries = all_data[
-                    (all_data['Transaction ID'].str.contains('-STMT-', na=False)) |
-                    (all_data['Transaction ID'].str.contains('-VOID-', na=False))
-                ]
+                recon_entries = all_data[policy_kind_mask(all_data, PAYMENT_KINDS)]
                 
                 if not recon_entries.empty:
                     # Date range filter with form to prevent jumping
@@ -12659,6 +11633,7 @@ def main():
                                     
                                     # Refresh data
                                     st.cache_data.clear()
+                                    clear_policies_cache()
                                     time.sleep(1)
                                     st.rerun()
                                 else:
@@ -12677,7 +11652,7 @@ def main():
                 if not all_data.empty and 'reconciliation_id' in all_data.columns:
                     # Get unique reconciliation batches
                     reconciliation_entries = all_data[
-                        (all_data['Transaction ID'].str.contains('-STMT-', na=False)) &
+                        policy_kind_mask(all_data, [TransactionKind.STMT]) &
                         (all_data['reconciliation_id'].notna())
                     ]
                     
@@ -12778,6 +11753,7 @@ def main():
                                             if st.button("🗑️ Void Batch", type="secondary"):
                                                 try:
                                                     void_count = 0
+                                                    void_operations = []
                                                     
                                                     # Extract the statement date from the batch ID
                                                     # Formats: IMPORT-YYYYMMDD-XXXXXXXX, REC-YYYYMMDD-XXXXXXXX, MNL-YYYYMMDD-XXXXXXXX
@@ -12838,32 +11814,33 @@ def main():
                                                         # Clean data before insertion
                                                         cleaned_void = clean_data_for_database(void_entry)
                                                         
-                                                        # Insert void entry
-                                                        supabase.table('policies').insert(add_user_email_to_data(cleaned_void)).execute()
+                                                        # Queue void entry
+                                                        void_operations.append(insert_op('policies', add_user_email_to_data(cleaned_void)))
                                                         void_count += 1
                                                     
                                                     # Update original transactions to mark as unreconciled again
                                                     # Find original transactions that were reconciled in this batch
                                                     original_trans = all_data[
                                                         (all_data['reconciliation_id'] == selected_batch) &
-                                                        (~all_data['Transaction ID'].str.contains('-STMT-|-ADJ-|-VOID-', na=False))
+                                                        (~policy_kind_mask(all_data, RECONCILIATION_KINDS))
                                                     ]
                                                     
-                                                    for idx, orig in original_trans.iterrows():
-                                                        update_query = supabase.table('policies').update({
+                                                    for orig_id in original_trans['_id'].tolist():
+                                                        void_operations.append(update_op('policies', {
                                                             'reconciliation_status': 'unreconciled',
                                                             'reconciliation_id': None,
                                                             'reconciled_at': None
-                                                        }).eq('_id', orig['_id'])
-                                                        # Add user filtering for security
-                                                        if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-                                                            user_id = get_user_id()
-                                                            if user_id:
-                                                                update_query = update_query.eq('user_id', user_id)
-                                                            else:
-                                                                user_email = get_normalized_user_email()
-                                                                update_query = update_query.eq('user_email', user_email)
-                                                        update_query.execute()
+                                                        }, '_id', orig_id))
+                                                    
+                                                    # Bulk insert void entries and bulk update originals (with user filtering for security)
+                                                    write_result = write_operations(supabase, void_operations,
+                                                                                    filters=get_user_write_filters())
+                                                    if not write_result.completed:
+                                                        clear_policies_cache()
+                                                        raise Exception(
+                                                            f"{write_result.written} of {len(write_result.operations)} writes completed. "
+                                                            f"Failed rows:\n{write_result.error_summary()}"
+                                                        )
                                                     
                                                     # Log the void in reconciliations table
                                                     void_log = {
@@ -12883,6 +11860,7 @@ def main():
                                                     
                                                     # Clear cache and refresh
                                                     st.cache_data.clear()
+                                                    clear_policies_cache()
                                                     time.sleep(2)
                                                     st.rerun()
                                                     
@@ -12935,6 +11913,23 @@ def main():
                 st.dataframe(all_data.head(), use_container_width=True)
             else:
                 st.info("No data available")
+            
+            # DataFrames this session keeps in memory (policies cache, summaries, indexes)
+            st.subheader("Session Memory")
+            policies_cache_key = get_user_session_key('policies_data')
+            memory_report = session_memory_report(st.session_state, compact_key=policies_cache_key)
+            if not memory_report.empty:
+                st.metric("Session DataFrames", f"{memory_report['bytes'].sum() / 1_048_576:,.1f} MB")
+                policies_row = memory_report[memory_report['key'] == policies_cache_key]
+                if not policies_row.empty:
+                    before_mb = policies_row['expanded_bytes'].iloc[0] / 1_048_576
+                    after_mb = policies_row['compact_bytes'].iloc[0] / 1_048_576
+                    st.caption(f"Policies cache: {before_mb:,.1f} MB as loaded, {after_mb:,.1f} MB compact "
+                               f"(compact cache {'on' if COMPACT_POLICIES_CACHE else 'off'}, set COMPACT_POLICIES_CACHE=1 to enable)")
+                memory_report['MB'] = (memory_report['bytes'] / 1_048_576).round(2)
+                st.dataframe(memory_report[['key', 'frames', 'MB']], use_container_width=True, hide_index=True)
+            else:
+                st.info("No DataFrames cached in this session")
         
         with tab2:
             st.subheader("🐛 Debug Logs")
@@ -13791,6 +12786,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                     st.session_state['search_mode'] = 'carrier_detail'
                                     # Force reload of carriers data
                                     st.session_state.carriers_data.append(new_carrier_data)
+                                    clear_commission_rules_cache()
                                 
                                 del st.session_state['show_add_carrier']
                                 st.rerun()
@@ -13856,6 +12852,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                     st.session_state['search_mode'] = 'mga_detail'
                                     # Force reload of MGAs data
                                     st.session_state.mgas_data.append(new_mga_data)
+                                    clear_commission_rules_cache()
                                 
                                 del st.session_state['show_add_mga']
                                 st.rerun()
@@ -14049,6 +13046,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                         }
                                         
                                         supabase.table('carriers').update(update_data).eq('carrier_id', selected_carrier['carrier_id']).eq('user_id', st.session_state.get('user_id')).execute()
+                                        clear_commission_rules_cache()
                                         st.success(f"✅ Updated {edited_name}")
                                         del st.session_state['editing_carrier']
                                         st.rerun()
@@ -14174,10 +13172,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                         # Add user email for multi-tenancy
                                         new_rule = add_user_email_to_data(new_rule)
                                         response = supabase.table('commission_rules').insert(new_rule).execute()
-                                        # Clear MGA cache for this carrier since we added a new rule
-                                        cache_key = f'mgas_for_carrier_{selected_carrier["carrier_id"]}'
-                                        if cache_key in st.session_state:
-                                            del st.session_state[cache_key]
+                                        clear_commission_rules_cache()
                                         st.success("✅ Rule added")
                                         del st.session_state['show_inline_add_rule']
                                         st.rerun()
@@ -14278,10 +13273,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                                     user_email = get_normalized_user_email()
                                                     update_query = update_query.eq('user_email', user_email)
                                             update_query.execute()
-                                            # Clear MGA cache for this carrier since we updated a rule
-                                            cache_key = f'mgas_for_carrier_{selected_carrier["carrier_id"]}'
-                                            if cache_key in st.session_state:
-                                                del st.session_state[cache_key]
+                                            clear_commission_rules_cache()
                                             del st.session_state[f'end_date_{rule["rule_id"]}']
                                             st.success("Rule updated")
                                             st.rerun()
@@ -14351,11 +13343,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                                     user_email = get_normalized_user_email()
                                                     update_query = update_query.eq('user_email', user_email)
                                             update_query.execute()
-                                            
-                                            # Clear MGA cache for this carrier since we updated a rule
-                                            cache_key = f'mgas_for_carrier_{selected_carrier["carrier_id"]}'
-                                            if cache_key in st.session_state:
-                                                del st.session_state[cache_key]
+                                            clear_commission_rules_cache()
                                             
                                             # If retroactive, update all affected policies
                                             if is_retroactive:
@@ -14392,6 +13380,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                                         
                                                         updated_count += 1
                                                     
+                                                    clear_policies_cache()
                                                     st.success(f"✅ Rule updated! {updated_count} transactions recalculated.")
                                                 else:
                                                     st.success("✅ Rule updated! No existing transactions to update.")
@@ -14505,6 +13494,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                                         }
                                         
                                         supabase.table('mgas').update(update_data).eq('mga_id', selected_mga['mga_id']).eq('user_id', st.session_state.get('user_id')).execute()
+                                        clear_commission_rules_cache()
                                         st.success(f"✅ Updated {edited_name}")
                                         del st.session_state['editing_mga']
                                         st.rerun()
@@ -14725,7 +13715,7 @@ ADD COLUMN IF NOT EXISTS policy_types JSONB NOT NULL DEFAULT '[]'::jsonb;
                 st.warning("No transaction data found. Please add some policies first or check your data import.")
             else:
                 # Exclude reconciliation transactions (STMT, VOID, ADJ)
-                regular_transactions = all_data[~all_data['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False)].copy()
+                regular_transactions = all_data[~policy_kind_mask(all_data, RECONCILIATION_KINDS)].copy()
                 
                 # Find transactions missing Policy Origination Date
                 missing_origination = regular_transactions[
@@ -16398,6 +15388,7 @@ CL12349,CAN001,AUTO,Bob Johnson,AUTO-2024-002,CAN,08/01/2024,-800.00,15,-120.00,
                                 
                                 progress_bar.progress(1.0)
                                 status_text.empty()
+                                clear_commission_rules_cache()
                                 
                                 # Log the import operation
                                 total_imported = (carriers_imported if 'carriers_imported' in locals() else 0) + \
@@ -16970,6 +15961,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
         with col_refresh:
             if st.button("🔄 Refresh", help="Refresh data from database"):
                 st.cache_data.clear()
+                clear_policies_cache(full_reload=True)
                 st.success("✅ Cache cleared! Data refreshed.")
                 time.sleep(0.5)
                 st.rerun()
@@ -19342,6 +18334,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 preserved_current_page = st.session_state.get('prl_current_page', 1)
                 
                 st.cache_data.clear()
+                clear_policies_cache(full_reload=True)
                 
                 # Restore selections after cache clear
                 st.session_state.prl_current_view_mode = preserved_view_mode
@@ -19366,30 +18359,8 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 all_data["Policy Number"] = all_data["Policy Number"].astype(str).str.strip()
             
             # Special handling for STMT transactions (same as Policy Revenue Ledger)
-            # Find all STMT transactions that might have missing/different Client IDs
-            stmt_transactions = all_data[
-                all_data["Transaction ID"].astype(str).str.contains("-STMT-", na=False)
-            ].copy()
-            
-            if not stmt_transactions.empty:
-                # For each unique policy number with STMT transactions, ensure they're included
-                for policy_num in stmt_transactions["Policy Number"].unique():
-                    # Find the main client ID for this policy
-                    policy_data = all_data[all_data["Policy Number"] == policy_num]
-                    if not policy_data.empty and "Client ID" in policy_data.columns:
-                        # Get the most common Client ID
-                        client_ids = policy_data["Client ID"].dropna()
-                        if not client_ids.empty:
-                            main_client_id = client_ids.mode().iloc[0] if not client_ids.mode().empty else client_ids.iloc[0]
-                            
-                            # Update STMT transactions with missing Client IDs
-                            missing_client_mask = (
-                                (all_data["Policy Number"] == policy_num) & 
-                                (all_data["Transaction ID"].astype(str).str.contains("-STMT-", na=False)) &
-                                (all_data["Client ID"].isna())
-                            )
-                            if missing_client_mask.any():
-                                all_data.loc[missing_client_mask, "Client ID"] = main_client_id
+            # STMT transactions with missing Client IDs get their policy's main Client ID
+            all_data = fill_statement_client_ids(all_data)
             # View mode toggle
             st.markdown("### 📊 Report View Mode")
             view_col1, view_col2, view_col3 = st.columns([2, 2, 3])
@@ -19615,67 +18586,9 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                     ]
                     
                     if not new_rwl_in_month.empty:
-                        month_data = pd.DataFrame()
-                        
-                        # Process each NEW/RWL transaction to find its term boundaries
-                        for _, term_defining_row in new_rwl_in_month.iterrows():
-                            policy_num = term_defining_row['Policy Number']
-                            term_eff_date = pd.to_datetime(term_defining_row['Effective Date'])
-                            term_x_date = pd.to_datetime(term_defining_row['X-DATE']) if pd.notna(term_defining_row.get('X-DATE')) else None
-                            
-                            # Get all transactions for this specific policy
-                            if 'Client ID' in working_data.columns and pd.notna(term_defining_row.get('Client ID')):
-                                policy_transactions = working_data[
-                                    (working_data['Client ID'] == term_defining_row['Client ID']) & 
-                                    (working_data['Policy Number'] == policy_num)
-                                ].copy()
-                            else:
-                                policy_transactions = working_data[
-                                    working_data['Policy Number'] == policy_num
-                                ].copy()
-                            
-                            # Filter to only include transactions within this specific term
-                            term_transactions = []
-                            
-                            for _, trans_row in policy_transactions.iterrows():
-                                trans_type = trans_row.get('Transaction Type', '')
-                                trans_id = str(trans_row.get('Transaction ID', ''))
-                                trans_eff_date = pd.to_datetime(trans_row.get('Effective Date'), errors='coerce')
-                                
-                                include_transaction = False
-                                
-                                # For NEW/RWL/REWRITE transactions, be very strict - only include if in selected month
-                                if trans_type in ['NEW', 'RWL', 'REWRITE']:
-                                    trans_year_month = trans_eff_date.strftime('%Y-%m') if pd.notna(trans_eff_date) else ''
-                                    # Only include if this NEW/RWL/REWRITE is in our selected month
-                                    if trans_year_month == selected_ym:
-                                        include_transaction = True
-                                # Include END transactions within the term dates
-                                elif trans_type == 'END' and pd.notna(trans_eff_date) and term_x_date:
-                                    if term_eff_date <= trans_eff_date < term_x_date:
-                                        include_transaction = True
-                                # Include STMT/VOID transactions within term (using Effective Date only)
-                                elif '-STMT-' in trans_id or '-VOID-' in trans_id:
-                                    # Use Effective Date just like other transactions
-                                    if pd.notna(trans_eff_date) and term_x_date:
-                                        if term_eff_date <= trans_eff_date < term_x_date:
-                                            include_transaction = True
-                                # Include other transactions (CAN, PMT, etc.) within the term dates
-                                elif pd.notna(trans_eff_date) and term_x_date:
-                                    if term_eff_date <= trans_eff_date < term_x_date:
-                                        include_transaction = True
-                                
-                                if include_transaction:
-                                    term_transactions.append(trans_row.to_dict())
-                            
-                            # Add this term's transactions to the month data
-                            if term_transactions:
-                                term_df = pd.DataFrame(term_transactions)
-                                month_data = pd.concat([month_data, term_df], ignore_index=True)
-                        
-                        # Remove any duplicates that might have been added
-                        if not month_data.empty and 'Transaction ID' in month_data.columns:
-                            month_data = month_data.drop_duplicates(subset=['Transaction ID'])
+                        # Every transaction of the terms that started this month (one term assignment pass)
+                        month_data = transactions_for_term_month(working_data, selected_ym,
+                                                                 get_policy_canonical_columns(working_data))
                     else:
                         # No NEW/RWL transactions in this month
                         month_data = pd.DataFrame()
@@ -19819,10 +18732,8 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
             
             # Calculate As Earned Balance Due if payment plans exist
             if has_payment_plans:
-                working_data['As Earned Balance Due'] = working_data.apply(
-                    lambda row: calculate_as_earned_balance(row, working_data), 
-                    axis=1
-                )
+                working_data['As Earned Balance Due'] = calculate_as_earned_balances(
+                    working_data, canonical=get_policy_canonical_columns(working_data))
             
             # Get all available columns (including the new column if added)
             all_columns = list(working_data.columns)
@@ -21955,10 +20866,11 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
         # Add summary metrics at the top
         if not display_df.empty:
             # Calculate summary statistics
-            past_due_count = len(display_df[display_df['Days Until Expiration'] < 0])
-            this_week_count = len(display_df[(display_df['Days Until Expiration'] >= 0) & (display_df['Days Until Expiration'] <= 7)])
-            this_month_count = len(display_df[(display_df['Days Until Expiration'] >= 0) & (display_df['Days Until Expiration'] <= 30)])
-            total_count = len(display_df)
+            due_windows = summarize_due_windows(display_df['Days Until Expiration'])
+            past_due_count = due_windows['past_due']
+            this_week_count = due_windows['due_0_7']
+            this_month_count = due_windows['due_0_30']
+            total_count = due_windows['total']
             
             # Display metrics
             col1, col2, col3, col4 = st.columns(4)
@@ -22431,6 +21343,52 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 else:
                     st.button("✏️ Edit Selected Pending Renewal", type="primary", use_container_width=True, 
                              disabled=True, help=f"{selected_count} selected - please select only ONE renewal to edit")
+                
+                # Renew every checked policy as-is (next term dates, renewal commission rates)
+                if selected_count > 0:
+                    if st.button(f"🔁 Bulk Renew {selected_count} Selected", use_container_width=True,
+                                 help="Create RWL transactions for all checked renewals without editing them"):
+                        supabase = get_supabase_client()
+                        if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
+                            ensure_user_id()
+                        resolver = get_rule_resolver(supabase, get_commission_rules_cache_key(),
+                                                     get_policies_cache_owner(), get_user_write_filters())
+                        batch_id = f"RENEW-{dt.now().strftime('%Y%m%d-%H%M%S')}"
+                        try:
+                            built = build_renewal_rows(edit_selected_rows, allocate_transaction_ids(selected_count),
+                                                       resolver, notes=f"Bulk renewal {batch_id}")
+                        except ValueError as e:
+                            st.error(f"Bulk renewal failed: {e}")
+                            st.stop()
+                        
+                        renew_progress = st.progress(0.0)
+                        written = write_renewals(
+                            supabase, edit_selected_rows, built['renewals'], batch_id,
+                            prepare_row=lambda row: add_user_email_to_data(clean_data_for_database(row)),
+                            progress_callback=lambda done, total: renew_progress.progress(min(done / total, 1.0))
+                        )
+                        clear_policies_cache()
+                        st.session_state['deleted_renewals'].extend(written['renewed'].tolist())
+                        
+                        if len(written['renewed']):
+                            log_audit_trail(
+                                operation_type="BULK_INSERT",
+                                table_name="policies",
+                                affected_records=len(written['renewed']),
+                                details={'batch_id': batch_id, 'operation': 'bulk_renewal'}
+                            )
+                        if not built['skipped'].empty:
+                            st.warning(f"Skipped {len(built['skipped'])} renewal(s) without a valid X-DATE: "
+                                       f"{', '.join(built['skipped']['Policy Number'].astype(str))}")
+                        if written['policies'].errors:
+                            st.error(f"{len(written['failed'])} renewal(s) failed:\n{written['policies'].error_summary()}")
+                        if written['history'].errors:
+                            st.warning(f"Renewals saved but history logging failed for {len(written['history'].errors)} row(s)")
+                        if len(written['renewed']):
+                            st.success(f"✅ Renewed {len(written['renewed'])} policies")
+                        if not written['policies'].errors:
+                            time.sleep(1)
+                            st.rerun()
         else:
             if pending_renewals_df.empty:
                 st.info("No policies are pending renewal at this time.")
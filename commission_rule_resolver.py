@@ -0,0 +1,187 @@
+"""
+In-process commission rule resolver.
+Loads the user's active commission rules once, indexes them by carrier, MGA and
+policy type, and keeps each bucket sorted by effective date so a lookup is a few
+dictionary hits plus a short interval scan instead of a database query per call.
+"""
+
+import datetime
+import time
+import streamlit as st
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Safety net for rule changes made outside this session
+RULE_CACHE_TTL_SECONDS = 600
+
+# Rows requested per round trip when loading rules
+RULES_PAGE_SIZE = 1000
+
+RULE_COLUMNS = "rule_id, carrier_id, mga_id, policy_type, new_rate, renewal_rate, rule_description, effective_date, end_date, is_active"
+
+
+def _to_date(value) -> Optional[datetime.date]:
+    """Parse a rule date (ISO string, date or datetime)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class _RuleBucket:
+    """Rules sharing a (carrier, MGA) pair, split by how they match a policy type."""
+
+    def __init__(self):
+        self.exact: Dict[str, list] = {}     # single-type rules by type
+        self.multi: Dict[str, list] = {}     # multi-type rules by each listed type
+        self.default: list = []              # rules without a policy type
+        self.typed: list = []                # every rule with a policy type
+
+    def sort(self):
+        # Most recent effective date first; load order kept for ties
+        for rules in [self.default, self.typed, *self.exact.values(), *self.multi.values()]:
+            rules.sort(key=lambda rule: rule['_start'], reverse=True)
+
+
+def _latest_effective(rules: list, on_date: datetime.date) -> Optional[dict]:
+    """First rule (most recent start) whose [effective_date, end_date] interval contains on_date."""
+    for rule in rules:
+        if rule['_start'] > on_date:
+            continue
+        if rule['_end'] is None or rule['_end'] >= on_date:
+            return rule
+    return None
+
+
+class CommissionRuleResolver:
+    """Resolve the most specific active commission rule for a carrier/MGA/policy type on a date."""
+
+    def __init__(self, rules: Sequence[dict]):
+        self._buckets: Dict[Tuple[str, Optional[str]], _RuleBucket] = {}
+        self.rule_count = 0
+
+        for rule in rules:
+            start = _to_date(rule.get('effective_date'))
+            if not rule.get('is_active') or start is None:
+                continue
+
+            prepared = dict(rule)
+            prepared['_start'] = start
+            prepared['_end'] = _to_date(rule.get('end_date'))
+
+            bucket = self._buckets.setdefault((rule.get('carrier_id'), rule.get('mga_id') or None), _RuleBucket())
+            if rule.get('policy_type'):
+                rule_types = [t.strip() for t in rule['policy_type'].split(',')]
+                bucket.typed.append(prepared)
+                if len(rule_types) == 1:
+                    bucket.exact.setdefault(rule_types[0], []).append(prepared)
+                else:
+                    for rule_type in dict.fromkeys(rule_types):
+                        bucket.multi.setdefault(rule_type, []).append(prepared)
+            else:
+                bucket.default.append(prepared)
+            self.rule_count += 1
+
+        for bucket in self._buckets.values():
+            bucket.sort()
+
+    def find_rule(self, carrier_id, mga_id=None, policy_type=None,
+                  effective_date: Optional[datetime.date] = None) -> Optional[dict]:
+        """
+        Best matching rule, using the same priorities as before:
+        matching MGA (1000) > direct appointment (500) > direct rule for an MGA policy (0),
+        plus exact single policy type (200) > multi-type rule listing it (100) > default rule (10).
+        Ties go to the most recent effective date.
+        """
+        on_date = _to_date(effective_date) or datetime.date.today()
+
+        groups = []
+        if mga_id:
+            groups.append((1000, self._buckets.get((carrier_id, mga_id))))
+            groups.append((0, self._buckets.get((carrier_id, None))))
+        else:
+            groups.append((500, self._buckets.get((carrier_id, None))))
+
+        best, best_key = None, None
+        for base, bucket in groups:
+            if bucket is None:
+                continue
+            if policy_type:
+                candidates = [
+                    (base + 200, bucket.exact.get(policy_type, [])),
+                    (base + 100, bucket.multi.get(policy_type, [])),
+                    (base + 10, bucket.default),
+                ]
+            else:
+                candidates = [(base + 10, bucket.default), (base, bucket.typed)]
+
+            for priority, rules in candidates:
+                rule = _latest_effective(rules, on_date)
+                if rule is not None:
+                    key = (priority, rule['_start'])
+                    if best_key is None or key > best_key:
+                        best, best_key = rule, key
+        return best
+
+
+def fetch_commission_rules(supabase, filters: Sequence[tuple] = ()) -> List[dict]:
+    """Load all active commission rules matching filters, page by page."""
+    rules = []
+    start = 0
+    while True:
+        query = supabase.table('commission_rules').select(RULE_COLUMNS).eq('is_active', True)
+        for operator, *args in filters:
+            query = getattr(query, operator)(*args)
+        page = query.order('rule_id').range(start, start + RULES_PAGE_SIZE - 1).execute().data or []
+        rules.extend(page)
+        if len(page) < RULES_PAGE_SIZE:
+            return rules
+        start += RULES_PAGE_SIZE
+
+
+def get_rule_resolver(supabase, cache_key: str, owner: str,
+                      filters: Sequence[tuple] = ()) -> CommissionRuleResolver:
+    """Return the session's rule resolver, loading the rules on first use or after invalidation."""
+    entry = st.session_state.get(cache_key)
+    if (isinstance(entry, dict) and entry.get('owner') == owner
+            and time.time() - entry.get('loaded_at', 0) <= RULE_CACHE_TTL_SECONDS):
+        return entry['resolver']
+
+    return store_rule_resolver(cache_key, owner, fetch_commission_rules(supabase, filters))
+
+
+def store_rule_resolver(cache_key: str, owner: str, rules: List[dict]) -> CommissionRuleResolver:
+    """Build the resolver from fetched rules and keep it in the session (main thread only)."""
+    resolver = CommissionRuleResolver(rules)
+    st.session_state[cache_key] = {
+        'owner': owner,
+        'loaded_at': time.time(),
+        'resolver': resolver,
+        'names': {}
+    }
+    return resolver
+
+
+def get_cached_name(supabase, cache_key: str, table: str, id_column: str, name_column: str, row_id) -> Optional[str]:
+    """Carrier/MGA display name, fetched once per id and kept with the resolver."""
+    entry = st.session_state.get(cache_key)
+    names = entry.get('names') if isinstance(entry, dict) else None
+    if names is not None and (table, row_id) in names:
+        return names[(table, row_id)]
+
+    response = supabase.table(table).select(name_column).eq(id_column, row_id).execute()
+    name = response.data[0][name_column] if response.data else None
+    if names is not None and name is not None:
+        names[(table, row_id)] = name
+    return name
+
+
+def invalidate_rule_resolver(cache_key: str):
+    """Drop the cached rules and names (call after commission rule, carrier or MGA edits)."""
+    if cache_key in st.session_state:
+        del st.session_state[cache_key]
@@ -0,0 +1,132 @@
+"""
+Compact in-memory representation of the policies frame.
+The session cache can hold the policies book in a compact form: repeated text
+columns (carrier, MGA, policy type, transaction type, customer, status) as
+categoricals and True/False/None columns as nullable booleans. Frames handed to
+pages are expanded back to the loader's dtypes, so display and edit code is
+unchanged. A memory report shows what each session is holding.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Opt-in: keep the session's cached policies frame compact
+COMPACT_POLICIES_CACHE = os.getenv("COMPACT_POLICIES_CACHE", "").lower() in ("1", "true", "yes")
+
+# Text columns with few distinct values relative to the number of rows
+CATEGORY_COLUMNS = [
+    'Carrier Name', 'MGA Name', 'Policy Type', 'Transaction Type', 'Customer',
+    'Status', 'reconciliation_status', 'Policy Term', 'user_email'
+]
+
+# A category only pays off when values repeat (distinct values / rows at most this)
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# How deep the memory report looks inside session state values (dicts, lists, objects)
+MEMORY_REPORT_MAX_DEPTH = 4
+
+
+def compact_policies_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a compact copy of a policies frame (see expand_policies_frame for the reverse)."""
+    compact = df.copy()
+    if compact.empty:
+        return compact
+
+    categories, flags = [], []
+    for column in CATEGORY_COLUMNS:
+        if column in compact.columns and not isinstance(compact[column].dtype, pd.CategoricalDtype):
+            values = compact[column]
+            if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+                continue
+            if values.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * len(values):
+                compact[column] = values.astype('category')
+                categories.append(column)
+
+    for column in compact.columns[compact.dtypes == object]:
+        if pd.api.types.infer_dtype(compact[column], skipna=True) == 'boolean':
+            compact[column] = compact[column].astype('boolean')
+            flags.append(column)
+
+    compact.attrs['compacted'] = {'categories': categories, 'flags': flags}
+    return compact
+
+
+def expand_policies_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of a (possibly compact) policies frame with the loader's original dtypes."""
+    expanded = df.copy()
+    compacted = expanded.attrs.pop('compacted', None)
+    if not compacted:
+        return expanded
+
+    for column in compacted['categories']:
+        if column in expanded.columns and isinstance(expanded[column].dtype, pd.CategoricalDtype):
+            values = expanded[column]
+            # Indexing the categories by code (faster than astype for columns with missing values)
+            restored = values.cat.categories.take(values.cat.codes.to_numpy(), allow_fill=True, fill_value=np.nan)
+            expanded[column] = pd.Series(restored, index=expanded.index, name=column)
+    for column in compacted['flags']:
+        if column in expanded.columns:
+            values = expanded[column]
+            expanded[column] = values.astype(object).where(values.notna(), None)
+    return expanded
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Deep memory usage of a frame in bytes (object strings included)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _collect_frames(value: Any, depth: int, seen: set) -> List[pd.DataFrame]:
+    if id(value) in seen or depth > MEMORY_REPORT_MAX_DEPTH:
+        return []
+    seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return [value]
+    if isinstance(value, pd.Series):
+        return [value.to_frame()]
+    if isinstance(value, dict):
+        children = value.values()
+    elif isinstance(value, (list, tuple, set)):
+        children = value
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        children = vars(value).values()
+    else:
+        return []
+
+    frames = []
+    for child in children:
+        frames.extend(_collect_frames(child, depth + 1, seen))
+    return frames
+
+
+def session_memory_report(state: Dict[str, Any], compact_key: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bytes held in DataFrames per session state key, largest first.
+
+    Args:
+        state: Session state (or any mapping)
+        compact_key: Optional key of the policies cache; its row also reports the
+            size of its frames expanded and compacted (before/after)
+
+    Returns:
+        DataFrame with key, frames, bytes and, for compact_key, expanded_bytes and compact_bytes
+    """
+    rows = []
+    seen = set()
+    for key in list(state.keys()):
+        frames = _collect_frames(state[key], 0, seen)
+        if not frames:
+            continue
+        row = {'key': str(key), 'frames': len(frames), 'bytes': sum(frame_bytes(frame) for frame in frames)}
+        if key == compact_key:
+            row['expanded_bytes'] = sum(frame_bytes(expand_policies_frame(frame)) for frame in frames)
+            row['compact_bytes'] = sum(frame_bytes(compact_policies_frame(expand_policies_frame(frame)))
+                                       for frame in frames)
+        rows.append(row)
+
+    report = pd.DataFrame(rows, columns=['key', 'frames', 'bytes', 'expanded_bytes', 'compact_bytes'])
+    return report.sort_values('bytes', ascending=False, kind='mergesort').reset_index(drop=True)
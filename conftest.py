@@ -0,0 +1,452 @@
+"""
+Shared test doubles: an in-memory Supabase/PostgREST client and a Redis stub.
+
+FakeSupabase keeps rows per table and answers the query builder calls the app
+makes (select/insert/update/delete/rpc with eq, neq, gt, gte, lt, lte, in_,
+is_, like, ilike, not_, or_, order, limit and range). Every executed request is
+logged on the client, and before/after hooks can fail, slow down or rewrite
+chosen requests. Test files import the classes with `from conftest import ...`.
+"""
+
+import asyncio
+import numbers
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class FakeAPIError(Exception):
+    """Stands in for postgrest.APIError (message plus a Postgres error code)."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _column(name):
+    return name.strip().strip('"')
+
+
+def _timestamp(value):
+    if not isinstance(value, str) or not re.match(r'\d{4}-\d{2}-\d{2}', value):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace(' ', 'T', 1))
+    except ValueError:
+        return None
+
+
+def _comparable(row_value, value):
+    """
+    Coerce a filter value to the column's type. Timestamps compare as Postgres does:
+    the offset of a literal is ignored for a naive TIMESTAMP column, and a naive
+    literal is read as UTC for a TIMESTAMPTZ column.
+    """
+    if isinstance(row_value, bool) and isinstance(value, str):
+        return row_value, value.lower() == 'true'
+    if isinstance(row_value, numbers.Number) and isinstance(value, str):
+        return row_value, float(value)
+    column_time, value_time = _timestamp(row_value), _timestamp(value)
+    if column_time is not None and value_time is not None:
+        if column_time.tzinfo is None:
+            value_time = value_time.replace(tzinfo=None)
+        elif value_time.tzinfo is None:
+            value_time = value_time.replace(tzinfo=timezone.utc)
+        return column_time, value_time
+    return row_value, value
+
+
+def _like(value, pattern, ignore_case):
+    """LIKE with % / * and _ wildcards; a backslash escapes the next character."""
+    regex, chars = '', iter(pattern)
+    for char in chars:
+        if char == '\\':
+            regex += re.escape(next(chars, '\\'))
+        elif char in '%*':
+            regex += '.*'
+        elif char == '_':
+            regex += '.'
+        else:
+            regex += re.escape(char)
+    return re.fullmatch(regex, str(value), re.DOTALL | (re.IGNORECASE if ignore_case else 0)) is not None
+
+
+def _matches(row, operator, column, value):
+    row_value = row.get(column)
+    if operator == 'is':
+        return row_value is None if value in (None, 'null') else row_value is value
+    if operator == 'in':
+        return any(_matches(row, 'eq', column, item) for item in value)
+    if row_value is None:
+        return False
+    if operator in ('like', 'ilike'):
+        return _like(row_value, value, operator == 'ilike')
+    left, right = _comparable(row_value, value)
+    return {
+        'eq': lambda: left == right,
+        'neq': lambda: left != right,
+        'gt': lambda: left > right,
+        'gte': lambda: left >= right,
+        'lt': lambda: left < right,
+        'lte': lambda: left <= right,
+    }[operator]()
+
+
+def _split_logic_tree(expression):
+    """Split a PostgREST or= expression on top-level commas, unquoting values."""
+    parts, current, quoted, escaped, depth = [], '', False, False, 0
+    for char in expression:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == '\\' and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+            current += '\0'
+        elif char == ',' and not quoted and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            if not quoted:
+                depth += {'(': 1, ')': -1}.get(char, 0)
+            current += char
+    parts.append(current)
+
+    conditions = []
+    for part in parts:
+        # '\0' marks where quotes were, so dots inside quoted names and values are kept
+        match = re.fullmatch(r'\0?([^\0]+?)\0?\.(not\.)?(\w+)\.\0?(.*?)\0?', part.strip())
+        column, negate, operator, value = match.groups()
+        if operator == 'in':
+            value = [item.strip() for item in value.strip('()').split(',')]
+        conditions.append((bool(negate), operator, column, value))
+    return conditions
+
+
+class FakeQuery:
+    """One request: records the builder calls, then runs against the client's tables."""
+
+    def __init__(self, supabase, table):
+        self.supabase = supabase
+        self.table = table
+        self.method = 'select'
+        self.columns = '*'
+        self.rows = []
+        self.values = None
+        self.params = None
+        self.filters = []
+        self.ordering = []
+        self.limit_count = None
+        self.offset = 0
+        self.count = None
+        self.returning = 'representation'
+        self.upsert = False
+        self.default_to_null = True
+        self._negate = False
+
+    def __repr__(self):
+        return f"<{self.method} {self.table} {self.filters}>"
+
+    # Query methods
+    def select(self, *columns, count=None):
+        self.columns = ','.join(columns) or '*'
+        self.count = count
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False, default_to_null=True):
+        self.method = 'insert'
+        self.rows = [dict(row) for row in (json if isinstance(json, list) else [json])]
+        self.count, self.returning, self.upsert, self.default_to_null = count, returning, upsert, default_to_null
+        return self
+
+    def upsert(self, json, *, count=None, returning='representation', default_to_null=True, **kwargs):
+        return self.insert(json, count=count, returning=returning, upsert=True, default_to_null=default_to_null)
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.method = 'update'
+        self.values = dict(json)
+        self.count, self.returning = count, returning
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.method = 'delete'
+        self.count, self.returning = count, returning
+        return self
+
+    # Filters
+    def _filter(self, operator, column, value):
+        self.filters.append((self._negate, operator, _column(column), value))
+        self._negate = False
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def like(self, column, pattern):
+        return self._filter('like', column, pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter('ilike', column, pattern)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def or_(self, expression):
+        self.filters.append(('or', _split_logic_tree(expression)))
+        return self
+
+    # Modifiers
+    def order(self, column, *, desc=False):
+        self.ordering.append((_column(column), desc))
+        return self
+
+    def limit(self, size):
+        self.limit_count = size
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_count = start, end - start + 1
+        return self
+
+    # Execution
+    def filter_values(self, column):
+        """Values this request filters a column on (eq and in_), for assertions."""
+        values = []
+        for condition in self.filters:
+            if condition[0] != 'or' and condition[2] == _column(column):
+                values.extend(condition[3] if condition[1] == 'in' else [condition[3]])
+        return values
+
+    def matches(self, row):
+        for condition in self.filters:
+            if condition[0] == 'or':
+                if not any(negate != _matches(row, operator, _column(column), value)
+                           for negate, operator, column, value in condition[1]):
+                    return False
+            else:
+                negate, operator, column, value = condition
+                if negate == _matches(row, operator, column, value):
+                    return False
+        return True
+
+    def execute(self):
+        return self.supabase._execute(self)
+
+    def _run(self):
+        """Apply the request to the client's tables (called with the client lock held)."""
+        supabase = self.supabase
+        if self.method == 'rpc':
+            return FakeResponse(supabase.functions[self.table](**self.params))
+
+        table = supabase.tables.setdefault(self.table, [])
+        if self.method == 'insert':
+            return self._insert(table)
+
+        selected = [row for row in table if self.matches(row)]
+        if self.method == 'update':
+            for row in selected:
+                row.update(self.values)
+        elif self.method == 'delete':
+            supabase.tables[self.table] = [row for row in table if not any(row is hit for hit in selected)]
+
+        count = len(selected) if self.count else None
+        for column, desc in reversed(self.ordering):
+            selected.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        end = None if self.limit_count is None else self.offset + self.limit_count
+        selected = selected[self.offset:end]
+        if self.method != 'select' and self.returning == 'minimal':
+            return FakeResponse([], count)
+        return FakeResponse([self._project(row) for row in selected], count)
+
+    def _insert(self, table):
+        supabase = self.supabase
+        key_columns = supabase.primary_keys.get(self.table)
+        serial = supabase.serial_columns.get(self.table)
+        rows = []
+        for row in self.rows:
+            row = dict(supabase.defaults.get(self.table, {}), **row) if not self.default_to_null else dict(row)
+            if serial and row.get(serial) is None:
+                supabase.next_serial += 1
+                row[serial] = supabase.next_serial
+            rows.append(row)
+
+        if key_columns:
+            existing = {tuple(row.get(column) for column in key_columns): row for row in table}
+            batch = set()
+            for row in rows:
+                key = tuple(row.get(column) for column in key_columns)
+                if (key in existing and not self.upsert) or key in batch:
+                    raise FakeAPIError(f'duplicate key value violates unique constraint "{self.table}_pkey"', '23505')
+                batch.add(key)
+            for row in rows:
+                key = tuple(row.get(column) for column in key_columns)
+                if key in existing:
+                    existing[key].update(row)
+                else:
+                    table.append(row)
+        else:
+            table.extend(rows)
+
+        if self.returning == 'minimal':
+            return FakeResponse([], len(rows) if self.count else None)
+        return FakeResponse([dict(row) for row in rows], len(rows) if self.count else None)
+
+    def _project(self, row):
+        if self.columns.strip() == '*':
+            return dict(row)
+        projected = {}
+        # Embedded resources (e.g. mgas(mga_name)) are stored on the row under their name
+        for name in re.split(r',(?![^(]*\))', self.columns):
+            column = _column(name.split('(')[0])
+            if column == '*':
+                projected.update(row)
+            elif column in row:
+                projected[column] = row[column]
+        return projected
+
+
+class FakeAsyncQuery(FakeQuery):
+    async def execute(self):
+        if self.supabase.latency:
+            await asyncio.sleep(self.supabase.latency)
+        return self.supabase._execute(self, sleep=False)
+
+
+class FakeSupabase:
+    """
+    In-memory Supabase client.
+
+    Args:
+        tables: initial rows per table name
+        primary_keys: table -> key columns; duplicate inserts raise a 23505 FakeAPIError
+        serial_columns: table -> column filled with increasing integers when missing
+        defaults: table -> column defaults used by inserts with default_to_null=False
+        functions: rpc name -> callable taking the params as keyword arguments
+        latency: seconds each request takes (awaited by the asynchronous client)
+        asynchronous: queries have an async execute, like the async Supabase client
+    """
+
+    def __init__(self, tables=None, primary_keys=None, serial_columns=None, defaults=None,
+                 functions=None, latency=0.0, asynchronous=False):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.primary_keys = dict(primary_keys or {})
+        self.serial_columns = dict(serial_columns or {})
+        self.defaults = dict(defaults or {})
+        self.functions = dict(functions or {})
+        self.latency = latency
+        self.query_class = FakeAsyncQuery if asynchronous else FakeQuery
+        self.next_serial = max((row.get(column) or 0 for table, column in self.serial_columns.items()
+                                for row in self.tables.get(table, [])), default=0)
+        self.requests = []
+        self.before_execute = []
+        self.after_execute = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return self.query_class(self, name)
+
+    def rpc(self, function, params=None):
+        query = self.query_class(self, function)
+        query.method, query.params = 'rpc', dict(params or {})
+        return query
+
+    def rows(self, table):
+        return self.tables.get(table, [])
+
+    def executed(self, table=None, method=None):
+        """Executed requests (failed ones included), optionally for one table and/or method."""
+        return [request for request in self.requests
+                if (table is None or request.table == table) and (method is None or request.method == method)]
+
+    def _execute(self, query, sleep=True):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            with self.lock:
+                self.requests.append(query)
+            if sleep and self.latency:
+                time.sleep(self.latency)
+            # Hooks may raise to fail a request before it is applied
+            for hook in self.before_execute:
+                hook(query)
+            with self.lock:
+                response = query._run()
+            for hook in self.after_execute:
+                response = hook(query, response) or response
+            return response
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class FakeRedis:
+    """Dict-backed Redis with get/setex/delete and pub/sub (TTLs are recorded, not enforced)."""
+
+    def __init__(self):
+        self.values, self.ttls, self.subscribers = {}, {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+        self.ttls[key] = ttl
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        self.ttls.pop(key, None)
+
+    def publish(self, channel, message):
+        for subscriber in self.subscribers.get(channel, []):
+            subscriber.put({'type': 'message', 'data': message})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis_client.subscribers.setdefault(channel, []).append(self.messages)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
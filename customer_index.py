@@ -0,0 +1,310 @@
+"""
+Customer name similarity index.
+Precomputes the lowercase, normalized, first-word and token forms of every
+customer once and keeps exact, first-word, token and trigram indexes, so a
+lookup only scores the handful of customers that can possibly match instead
+of normalizing and comparing the whole book on every call.
+"""
+
+import re
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Common business suffixes removed by normalize_business_name
+BUSINESS_SUFFIXES = [
+    'LLC', 'L.L.C.', 'L.L.C', 'Inc', 'Inc.', 'Incorporated',
+    'Corp', 'Corp.', 'Corporation', 'Ltd', 'Ltd.', 'Limited',
+    'PA', 'P.A.', 'PC', 'P.C.', 'PLLC', 'P.L.L.C.',
+    'LLP', 'L.L.P.', 'LP', 'L.P.', 'Company', 'Co.', 'Co'
+]
+
+_SUFFIX_PATTERNS = [
+    re.compile(pattern, flags=re.IGNORECASE)
+    for suffix in BUSINESS_SUFFIXES
+    for pattern in (rf',?\s+{re.escape(suffix)}\s*$', rf'\s+{re.escape(suffix)}\s*$')
+]
+_LOCATION_PATTERN = re.compile(r'\s+of\s+[A-Z][A-Za-z\s]+(?:LLC|Inc|Corp)?$', flags=re.IGNORECASE)
+
+# Shared empty posting list for index misses
+_NO_IDS = frozenset()
+
+# Number of distinct customer lists whose index is kept in memory
+CUSTOMER_INDEX_CACHE_SIZE = 8
+
+
+def normalize_business_name(name):
+    """
+    Normalize business names by removing common suffixes and punctuation.
+    Helps match "RCM Construction" to "RCM Construction of SWFL LLC"
+    """
+    if not name:
+        return ""
+
+    normalized = str(name).strip()
+
+    # Remove suffixes (case-insensitive), with or without a leading comma
+    for pattern in _SUFFIX_PATTERNS:
+        normalized = pattern.sub('', normalized)
+
+    # Remove "of [Location]" patterns
+    normalized = _LOCATION_PATTERN.sub('', normalized)
+
+    # Clean up extra whitespace and punctuation
+    normalized = ' '.join(normalized.split())
+    normalized = normalized.strip(' ,.-')
+
+    return normalized
+
+
+def _first_word(name: str) -> str:
+    words = name.split()
+    return words[0].lower() if words else ""
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _score_customer(query: dict, forms: tuple) -> Optional[Tuple[str, int]]:
+    """
+    Score one customer against a prepared query.
+    Applies the strategies of find_potential_customer_matches in the same order.
+    """
+    customer, customer_lower, customer_normalized, customer_first_word, customer_words = forms
+    search_name = query['name']
+    search_name_lower = query['lower']
+    search_normalized = query['normalized']
+
+    # 1. Exact match (highest priority)
+    if search_name_lower == customer_lower:
+        return ('exact', 100)
+
+    # 2. Reversed name match (Last, First -> First Last)
+    if query['reversed'] and query['reversed'] == customer_lower:
+        return ('name_reversed', 98)
+
+    # 3. Normalized match
+    if search_normalized and search_normalized == customer_normalized:
+        return ('normalized', 95)
+
+    # 4. First word match (e.g., "Barboun" matches "Barboun, Thomas")
+    if query['first_word'] and customer_first_word == query['first_word']:
+        return ('first_word', 90)
+
+    # 5. Contains match (e.g., "RCM" in "RCM Construction")
+    if len(search_name) >= 3:
+        if search_name_lower in customer_lower:
+            return ('contains', 85)
+        if search_normalized in customer_normalized:
+            return ('normalized_contains', 83)
+
+    # 6. Customer contains search
+    if customer_lower in search_name_lower and len(customer) >= 3:
+        return ('reverse_contains', 80)
+
+    match = None
+
+    # 7. Starts with match
+    if customer_lower.startswith(search_name_lower[:3]) and len(search_name) >= 3:
+        match = ('starts_with', 75)
+
+    # 8. Word matching in any order (e.g., "Adam Gomes" matches "Adam J Gomes")
+    search_words = query['words']
+    if len(search_words) >= 2 and len(customer_words) >= 2:
+        if search_words.issubset(customer_words):
+            match = ('all_words', 88)
+        elif len(search_words & customer_words) >= min(len(search_words), len(customer_words)) - 1:
+            match = ('most_words', 82)
+
+    return match
+
+
+class CustomerNameIndex:
+    """Prebuilt lookup structures over customer names for fast similarity matching."""
+
+    def __init__(self, customers: Iterable[str] = ()):
+        self._ids: Dict[str, int] = {}
+        self._forms: List[tuple] = []
+        self._by_lower: Dict[str, Set[int]] = {}
+        self._by_normalized: Dict[str, Set[int]] = {}
+        self._by_first_word: Dict[str, Set[int]] = {}
+        self._by_token: Dict[str, Set[int]] = {}
+        self._by_trigram: Dict[str, Set[int]] = {}
+        self._by_normalized_trigram: Dict[str, Set[int]] = {}
+        self._sorted_lower: Optional[List[str]] = None
+        self.add_many(customers)
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def __contains__(self, customer) -> bool:
+        return customer in self._ids
+
+    def add(self, customer: str):
+        """Add one customer name (no-op for blanks and names already indexed)."""
+        if not customer or customer in self._ids:
+            return
+
+        customer_id = len(self._forms)
+        customer_lower = customer.lower().strip()
+        customer_normalized = normalize_business_name(customer).lower()
+        customer_first_word = _first_word(customer)
+        customer_words = frozenset(customer_lower.split())
+
+        self._ids[customer] = customer_id
+        self._forms.append((customer, customer_lower, customer_normalized, customer_first_word, customer_words))
+
+        self._by_lower.setdefault(customer_lower, set()).add(customer_id)
+        self._by_normalized.setdefault(customer_normalized, set()).add(customer_id)
+        self._by_first_word.setdefault(customer_first_word, set()).add(customer_id)
+        if len(customer_words) >= 2:
+            for word in customer_words:
+                self._by_token.setdefault(word, set()).add(customer_id)
+        for trigram in _trigrams(customer_lower):
+            self._by_trigram.setdefault(trigram, set()).add(customer_id)
+        for trigram in _trigrams(customer_normalized):
+            self._by_normalized_trigram.setdefault(trigram, set()).add(customer_id)
+
+        # Rebuilt lazily on the next prefix lookup
+        self._sorted_lower = None
+
+    def add_many(self, customers: Iterable[str]):
+        """Add several customer names."""
+        for customer in customers:
+            self.add(customer)
+
+    def _all_ids(self) -> Set[int]:
+        return set(range(len(self._forms)))
+
+    def _containing(self, text: str, trigram_index: Dict[str, Set[int]]) -> Set[int]:
+        """Customers whose indexed form may contain text (superset, verified by scoring)."""
+        if len(text) < 3:
+            return self._all_ids()
+        postings = [trigram_index.get(trigram) for trigram in _trigrams(text)]
+        if any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def _contained_in(self, text: str) -> Set[int]:
+        """Customers whose lowercase name is a substring of text."""
+        result = set(self._by_lower.get("", _NO_IDS))
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                result |= self._by_lower.get(text[start:end], _NO_IDS)
+        return result
+
+    def _sharing_words(self, words: frozenset) -> Set[int]:
+        """Multi-word customers sharing enough words with the search for all_words/most_words."""
+        shared = Counter()
+        for word in words:
+            shared.update(self._by_token.get(word, _NO_IDS))
+        return {
+            customer_id for customer_id, count in shared.items()
+            if count >= min(len(words), len(self._forms[customer_id][4])) - 1
+        }
+
+    def _starting_with(self, prefix: str) -> Set[int]:
+        """Customers whose lowercase name starts with prefix."""
+        if not prefix:
+            return self._all_ids()
+        if self._sorted_lower is None:
+            self._sorted_lower = sorted(self._by_lower)
+        result = set()
+        position = bisect_left(self._sorted_lower, prefix)
+        while position < len(self._sorted_lower) and self._sorted_lower[position].startswith(prefix):
+            result |= self._by_lower[self._sorted_lower[position]]
+            position += 1
+        return result
+
+    def find_matches(self, search_name: str) -> List[Tuple[str, str, int]]:
+        """
+        Find potential customer matches using various strategies.
+        Returns list of (customer_name, match_type, score) tuples, best first.
+        """
+        if not search_name:
+            return []
+
+        query = {
+            'name': search_name,
+            'lower': search_name.lower().strip(),
+            'normalized': normalize_business_name(search_name).lower(),
+            'first_word': _first_word(search_name),
+            'reversed': "",
+        }
+        query['words'] = frozenset(query['lower'].split())
+
+        # Handle "Last, First" format
+        if "," in search_name:
+            parts = search_name.split(",", 1)
+            query['reversed'] = f"{parts[1].strip()} {parts[0].strip()}".lower()
+
+        # Collect every customer any strategy could match, then score only those
+        candidates = set(self._by_lower.get(query['lower'], _NO_IDS))
+        if query['reversed']:
+            candidates |= self._by_lower.get(query['reversed'], _NO_IDS)
+        if query['normalized']:
+            candidates |= self._by_normalized.get(query['normalized'], _NO_IDS)
+        if query['first_word']:
+            candidates |= self._by_first_word.get(query['first_word'], _NO_IDS)
+        if len(search_name) >= 3:
+            candidates |= self._containing(query['lower'], self._by_trigram)
+            candidates |= self._containing(query['normalized'], self._by_normalized_trigram)
+            candidates |= self._starting_with(query['lower'][:3])
+        candidates |= self._contained_in(query['lower'])
+        if len(query['words']) >= 2:
+            candidates |= self._sharing_words(query['words'])
+
+        result = []
+        for customer_id in candidates:
+            forms = self._forms[customer_id]
+            match = _score_customer(query, forms)
+            if match:
+                result.append((forms[0], match[0], match[1]))
+
+        result.sort(key=lambda x: (-x[2], x[0]))  # Sort by score desc, then name
+        return result
+
+
+_index_cache: "OrderedDict[tuple, CustomerNameIndex]" = OrderedDict()
+
+
+def get_customer_index(customers) -> CustomerNameIndex:
+    """
+    Return a CustomerNameIndex for a list of customer names.
+    Indexes are cached per distinct list; a list that only appends names to a
+    cached one extends that index incrementally instead of rebuilding it.
+    """
+    if isinstance(customers, CustomerNameIndex):
+        return customers
+
+    key = tuple(customers)
+    index = _index_cache.get(key)
+    if index is not None:
+        _index_cache.move_to_end(key)
+        return index
+
+    # Reuse the most recent index whose names are a prefix of this list
+    for cached_key in reversed(_index_cache):
+        if len(cached_key) < len(key) and key[:len(cached_key)] == cached_key:
+            index = _index_cache.pop(cached_key)
+            index.add_many(key[len(cached_key):])
+            break
+    else:
+        index = CustomerNameIndex(key)
+
+    _index_cache[key] = index
+    while len(_index_cache) > CUSTOMER_INDEX_CACHE_SIZE:
+        _index_cache.popitem(last=False)
+    return index
+
+
+def find_customer_matches(search_name: str, customers) -> List[Tuple[str, str, int]]:
+    """Find potential matches for search_name among customers (list or CustomerNameIndex)."""
+    return get_customer_index(customers).find_matches(search_name)
@@ -0,0 +1,237 @@
+"""
+Dashboard metrics for the commission app.
+Builds a per-policy-term summary (credits, debits, amount due, last transaction
+type, status, STMT dates) in one grouped pass over the book, then derives the
+dashboard metrics as vectorized reductions over that summary.
+"""
+
+import datetime
+import pandas as pd
+from typing import Optional
+
+from balance_engine import (
+    RECONCILIATION_PATTERN, PAYMENT_PATTERN, build_balance_frame, calculate_credits,
+    normalize_policy_key, parse_effective_dates
+)
+from canonical_columns import PAYMENT_KINDS, RECONCILIATION_KINDS, TransactionKind, kind_mask
+
+STMT_PATTERN = '-STMT-'
+
+# Transaction types that end a policy
+CANCELLED_TRANSACTION_TYPES = ['CAN', 'XCL']
+
+# Balances at or below this are treated as paid
+BALANCE_TOLERANCE = 0.01
+
+
+def _column(df: pd.DataFrame, column: str, default=0.0) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(default, index=df.index)
+    return df[column]
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    return pd.to_numeric(_column(df, column), errors='coerce').fillna(0.0)
+
+
+def _id_mask(df: pd.DataFrame, pattern: str, default: bool) -> pd.Series:
+    if 'Transaction ID' not in df.columns:
+        return pd.Series(default, index=df.index)
+    return df['Transaction ID'].astype('string').str.contains(pattern, na=False, regex=True).astype(bool)
+
+
+def build_policy_summary(df: pd.DataFrame, canonical: Optional[pd.DataFrame] = None) -> Optional[dict]:
+    """
+    Summarize a policies book per policy term (stripped Policy Number + Effective Date).
+    canonical: Optional canonical columns of df (parsed dates, policy keys, transaction kinds)
+
+    Returns:
+        dict with:
+            terms: one row per term with premium_sold, total_agent_comm, credits, debits,
+                amount_due, original_count, stmt_count, stmt_paid, first/last STMT date,
+                last_transaction_type, policy_last_transaction_type, is_latest_term and status
+            payments: one row per -STMT- entry (term keys, STMT year, effective year, amount paid)
+            counts: row-level counts (transactions, '-' transaction types, per-month effective dates)
+        or None for an empty book
+    """
+    if df is None or df.empty:
+        return None
+
+    if canonical is not None:
+        effective_dates = canonical['effective_date']
+        policy_keys = canonical['policy_key']
+        is_original = ~kind_mask(canonical, RECONCILIATION_KINDS)
+        is_stmt = canonical['transaction_kind'] == TransactionKind.STMT
+        is_payment = kind_mask(canonical, PAYMENT_KINDS)
+        stmt_dates = canonical['stmt_date']
+    else:
+        effective_dates = parse_effective_dates(_column(df, 'Effective Date', None))
+        policy_keys = normalize_policy_key(_column(df, 'Policy Number', ''))
+        is_original = ~_id_mask(df, RECONCILIATION_PATTERN, False)
+        is_stmt = _id_mask(df, STMT_PATTERN, False)
+        is_payment = _id_mask(df, PAYMENT_PATTERN, False)
+        stmt_dates = pd.to_datetime(_column(df, 'STMT DATE', None), errors='coerce', format='mixed')
+    paid = _numeric(df, 'Agent Paid Amount (STMT)')
+
+    # Total Agent Comm includes broker fees; older books only have the estimate
+    estimate_column = 'Total Agent Comm' if 'Total Agent Comm' in df.columns else 'Agent Estimated Comm $'
+
+    rows = pd.DataFrame({
+        'policy_key': policy_keys,
+        'effective_date': effective_dates,
+        'customer': _column(df, 'Customer', None).where(is_original),
+        'premium_sold': _numeric(df, 'Premium Sold').where(is_original, 0.0),
+        'total_agent_comm': _numeric(df, estimate_column).where(is_original, 0.0),
+        'credits': calculate_credits(df).fillna(0.0).where(is_original, 0.0),
+        'debits': paid.where(is_payment, 0.0),
+        'stmt_paid': paid.where(is_stmt, 0.0),
+        'is_original': is_original.astype(int),
+        'is_stmt': is_stmt.astype(int),
+        'stmt_date': stmt_dates.where(is_stmt),
+        'transaction_type': _column(df, 'Transaction Type', None),
+    }, index=df.index)
+
+    # Per-original outstanding balance (only positive balances count as due)
+    has_balances = 'Transaction ID' in df.columns
+    rows['amount_due'] = 0.0
+    if has_balances:
+        balances = build_balance_frame(df, canonical)
+        if not balances.empty:
+            due = balances['_balance'].where(balances['_balance'] > BALANCE_TOLERANCE, 0.0)
+            rows.loc[due.index, 'amount_due'] = due
+
+    # Latest transaction wins within a term and a policy (undated rows sort last)
+    rows = rows.sort_values('effective_date', kind='mergesort', na_position='last')
+    grouped = rows.groupby(['policy_key', 'effective_date'], sort=False, dropna=False)
+    terms = grouped.agg(
+        customer=('customer', 'first'),
+        premium_sold=('premium_sold', 'sum'),
+        total_agent_comm=('total_agent_comm', 'sum'),
+        credits=('credits', 'sum'),
+        debits=('debits', 'sum'),
+        amount_due=('amount_due', 'sum'),
+        stmt_paid=('stmt_paid', 'sum'),
+        original_count=('is_original', 'sum'),
+        stmt_count=('is_stmt', 'sum'),
+        first_stmt_date=('stmt_date', 'min'),
+        last_stmt_date=('stmt_date', 'max'),
+        last_transaction_type=('transaction_type', 'last'),
+    ).reset_index()
+    terms['balance'] = terms['credits'] - terms['debits']
+
+    terms['policy_last_transaction_type'] = terms.groupby('policy_key', sort=False)['last_transaction_type'].transform('last')
+    terms['is_latest_term'] = ~terms.duplicated('policy_key', keep='last')
+
+    is_cancelled = terms['last_transaction_type'].isin(CANCELLED_TRANSACTION_TYPES)
+    terms['status'] = 'Unpaid'
+    terms.loc[terms['stmt_count'] > 0, 'status'] = 'Partially Paid'
+    terms.loc[(terms['stmt_count'] > 0) & (terms['amount_due'] <= BALANCE_TOLERANCE), 'status'] = 'Paid'
+    terms.loc[is_cancelled, 'status'] = 'Cancelled'
+
+    stmt_rows = rows[rows['is_stmt'] == 1]
+    payments = pd.DataFrame({
+        'policy_key': stmt_rows['policy_key'],
+        'effective_date': stmt_rows['effective_date'],
+        'stmt_year': stmt_rows['stmt_date'].dt.year,
+        'effective_year': stmt_rows['effective_date'].dt.year,
+        'paid': stmt_rows['stmt_paid'],
+    }).reset_index(drop=True)
+
+    transaction_types = _column(df, 'Transaction Type', None)
+    counts = {
+        'total_transactions': len(df),
+        'stmt_transactions': int(transaction_types.astype('string').str.startswith('-', na=False).sum()),
+        'unique_policies': int(_column(df, 'Policy Number', None).nunique()) if 'Policy Number' in df.columns else 0,
+        'effective_months': (effective_dates.dt.year * 100 + effective_dates.dt.month).value_counts(),
+        'has_policy_numbers': 'Policy Number' in df.columns,
+        'has_transaction_types': 'Transaction Type' in df.columns,
+        'has_balances': has_balances,
+    }
+
+    return {'terms': terms, 'payments': payments, 'counts': counts}
+
+
+def calculate_metrics_from_summary(summary: Optional[dict], year: Optional[int] = None,
+                                   today: Optional[datetime.date] = None) -> dict:
+    """
+    Dashboard metrics from a policy summary.
+
+    Args:
+        summary: Output of build_policy_summary
+        year: Year for the reconciled/unreconciled YTD figures (default: current year)
+        today: Reference date for "this month" (default: today)
+    """
+    today = today or datetime.date.today()
+    year = year or today.year
+
+    metrics = {
+        # Transaction metrics
+        'total_transactions': 0,
+        'transactions_this_month': 0,
+        'stmt_transactions': 0,
+
+        # Policy metrics (unique policy numbers)
+        'unique_policies': 0,
+        'active_policies': 0,
+        'cancelled_policies': 0,
+
+        # Financial totals (all time, not just YTD)
+        'premium_sold_total': 0.0,
+        'agent_comm_paid_total': 0.0,
+        'agent_comm_due_total': 0.0,
+
+        # Reconciled vs unreconciled for the selected year
+        'metrics_year': year,
+        'premium_reconciled_ytd': 0.0,
+        'agent_comm_paid_ytd': 0.0,
+        'premium_unreconciled_ytd': 0.0,
+        'agent_comm_estimated_ytd': 0.0
+    }
+
+    if not summary:
+        return metrics
+
+    terms, payments, counts = summary['terms'], summary['payments'], summary['counts']
+
+    metrics['total_transactions'] = counts['total_transactions']
+    metrics['transactions_this_month'] = int(counts['effective_months'].get(today.year * 100 + today.month, 0))
+    metrics['stmt_transactions'] = counts['stmt_transactions']
+    metrics['unique_policies'] = counts['unique_policies']
+
+    # Active vs cancelled by the latest transaction of each policy
+    if counts['has_policy_numbers'] and counts['has_transaction_types']:
+        latest = terms[terms['is_latest_term']]
+        cancelled = latest['policy_last_transaction_type'].isin(CANCELLED_TRANSACTION_TYPES)
+        metrics['cancelled_policies'] = int(cancelled.sum())
+        metrics['active_policies'] = int((~cancelled).sum())
+
+    metrics['premium_sold_total'] = float(terms['premium_sold'].sum())
+    metrics['agent_comm_paid_total'] = float(terms['stmt_paid'].sum())
+    if counts['has_balances']:
+        metrics['agent_comm_due_total'] = float(terms['amount_due'].sum())
+    else:
+        metrics['agent_comm_due_total'] = max(0.0, float(terms['total_agent_comm'].sum()) - metrics['agent_comm_paid_total'])
+
+    # Payments made in the year (by STMT DATE, falling back to the effective date)
+    paid_in_year = payments[payments['stmt_year'] == year]
+    if paid_in_year.empty:
+        paid_in_year = payments[payments['effective_year'] == year]
+    metrics['agent_comm_paid_ytd'] = float(paid_in_year['paid'].sum())
+
+    # Terms (from any year) that received a payment in the year
+    reconciled = paid_in_year.loc[
+        paid_in_year['effective_date'].notna() & (paid_in_year['policy_key'] != ''),
+        ['policy_key', 'effective_date']
+    ].drop_duplicates()
+    term_index = pd.MultiIndex.from_frame(terms[['policy_key', 'effective_date']])
+    is_reconciled = term_index.isin(pd.MultiIndex.from_frame(reconciled)) if not reconciled.empty else \
+        pd.Series(False, index=terms.index).to_numpy()
+
+    metrics['premium_reconciled_ytd'] = float(terms.loc[is_reconciled, 'premium_sold'].sum())
+
+    # Terms effective in the year that have not been paid in the year
+    unpaid = (terms['effective_date'].dt.year == year).to_numpy() & ~is_reconciled
+    metrics['premium_unreconciled_ytd'] = float(terms.loc[unpaid, 'premium_sold'].sum())
+    metrics['agent_comm_estimated_ytd'] = float(terms.loc[unpaid, 'total_agent_comm'].sum())
+
+    return metrics
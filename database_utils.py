@@ -1,16 +1,88 @@
 """
 Database utilities for user-specific modules.
 Provides access to Supabase client with proper environment handling.
+
+Clients are kept in a process-wide registry keyed by (environment, key role),
+so every caller shares one client and its pooled keep-alive HTTP session
+instead of building a new client and connection per call.
 """
 
 import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
 from supabase import create_client, Client
 
+# Connections kept open per registered client (Streamlit serves sessions from a thread pool)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
 
-def get_supabase_client() -> Client:
-    """Get cached Supabase client based on environment."""
+# Seconds an idle pooled connection is kept alive
+SUPABASE_KEEPALIVE_EXPIRY = 60.0
+
+_registry: Dict[Tuple[str, str], dict] = {}
+_registry_lock = threading.Lock()
+
+
+def _new_stats() -> dict:
+    return {
+        'created_at': time.time(),
+        'lookups': 0,
+        'requests': 0,
+        'responses': 0,
+        'errors': 0,
+        'request_seconds': 0.0,
+    }
+
+
+def _stats_hooks(stats: dict) -> dict:
+    """httpx event hooks counting requests, failed responses and time spent waiting."""
+    def on_request(request):
+        request.extensions['registry_started'] = time.perf_counter()
+        with _registry_lock:
+            stats['requests'] += 1
+
+    def on_response(response):
+        started = response.request.extensions.get('registry_started')
+        with _registry_lock:
+            stats['responses'] += 1
+            if response.status_code >= 400:
+                stats['errors'] += 1
+            if started is not None:
+                stats['request_seconds'] += time.perf_counter() - started
+
+    return {'request': [on_request], 'response': [on_response]}
+
+
+def _build_client(url: str, key: str, stats: dict) -> Tuple[Client, Optional[httpx.Client]]:
+    """Create a Supabase client whose PostgREST calls go through one pooled, instrumented HTTP session."""
+    client = create_client(url, key)
+    try:
+        postgrest = client.postgrest
+        default_session = postgrest.session
+    except AttributeError:
+        return client, None
+
+    # Same base URL, auth headers and timeout as the default session, with our pool limits and hooks
+    session = httpx.Client(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=default_session.timeout,
+        limits=httpx.Limits(max_connections=SUPABASE_POOL_SIZE,
+                            max_keepalive_connections=SUPABASE_POOL_SIZE,
+                            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY),
+        event_hooks=_stats_hooks(stats),
+    )
+    postgrest.session = session
+    default_session.close()
+    return client, session
+
+
+def _resolve_credentials() -> Tuple[str, str, Optional[str], Optional[str]]:
+    """(environment, key role, url, key) for the current APP_ENVIRONMENT."""
     app_mode = os.getenv("APP_ENVIRONMENT")
-    
+
     if app_mode == "PRODUCTION":
         # Use production database credentials
         url = os.getenv("PRODUCTION_SUPABASE_URL", os.getenv("SUPABASE_URL"))
@@ -18,21 +90,74 @@ def get_supabase_client() -> Client:
         # Also check for shorter env var names in case of Render issues
         service_key = os.getenv("PRODUCTION_SUPABASE_SERVICE_ROLE_KEY") or os.getenv("PROD_SERVICE_KEY")
         anon_key = os.getenv("PRODUCTION_SUPABASE_ANON_KEY", os.getenv("SUPABASE_ANON_KEY"))
-        key = service_key or anon_key
-        
-        # Debug logging
-        if service_key:
-            print("Using PRODUCTION service role key (RLS bypassed)")
-        else:
-            print("Using PRODUCTION anon key (RLS enforced)")
-    else:
-        # Use personal database credentials (default)
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", os.getenv("SUPABASE_ANON_KEY"))
-    
+        return 'PRODUCTION', 'service' if service_key else 'anon', url, service_key or anon_key
+
+    # Use personal database credentials (default)
+    url = os.getenv("SUPABASE_URL")
+    service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    return 'PRIVATE', 'service' if service_key else 'anon', url, service_key or os.getenv("SUPABASE_ANON_KEY")
+
+
+def get_registered_client(environment: str, role: str, url: str, key: str) -> Client:
+    """
+    Shared Supabase client for (environment, role), created on first use.
+    The client is rebuilt if the URL or key for that slot changes.
+    """
+    registry_key = (environment, role)
+    with _registry_lock:
+        entry = _registry.get(registry_key)
+        if entry is None or entry['url'] != url or entry['key'] != key:
+            if entry is not None and entry['session'] is not None:
+                entry['session'].close()
+            if environment == 'PRODUCTION':
+                print(f"Using PRODUCTION {'service role' if role == 'service' else 'anon'} key "
+                      f"({'RLS bypassed' if role == 'service' else 'RLS enforced'})")
+            stats = _new_stats()
+            client, session = _build_client(url, key, stats)
+            entry = {'url': url, 'key': key, 'client': client, 'session': session, 'stats': stats}
+            _registry[registry_key] = entry
+        entry['stats']['lookups'] += 1
+        return entry['client']
+
+
+def get_supabase_client() -> Client:
+    """Get cached Supabase client based on environment."""
+    environment, role, url, key = _resolve_credentials()
+
     if not url or not key:
         raise ValueError("Supabase URL and key must be set in environment variables")
-    
-    # Create client instance
-    supabase: Client = create_client(url, key)
-    return supabase
\ No newline at end of file
+
+    return get_registered_client(environment, role, url, key)
+
+
+def get_client_stats() -> Dict[str, dict]:
+    """
+    Connection stats per registered client, keyed "ENVIRONMENT/role".
+    lookups counts get_supabase_client calls served from the registry;
+    requests/responses/errors and request_seconds cover the HTTP traffic.
+    """
+    stats = {}
+    with _registry_lock:
+        for (environment, role), entry in _registry.items():
+            item = dict(entry['stats'])
+            item['pool_size'] = SUPABASE_POOL_SIZE
+            item['open_connections'] = _open_connections(entry['session'])
+            stats[f"{environment}/{role}"] = item
+    return stats
+
+
+def _open_connections(session: Optional[httpx.Client]) -> Optional[int]:
+    """Connections currently held by the session's pool (None if httpx doesn't expose it)."""
+    try:
+        return len(session._transport._pool.connections)
+    except AttributeError:
+        return None
+
+
+def reset_supabase_clients():
+    """Close and forget all registered clients (after credential changes, or in tests)."""
+    with _registry_lock:
+        for entry in _registry.values():
+            if entry['session'] is not None:
+                entry['session'].close()
+        _registry.clear()
@@ -0,0 +1,223 @@
+"""
+ID allocation service for Transaction IDs and Client IDs.
+Loads the existing IDs once, generates candidates in the usual mixed
+letter/digit format locally, and reserves each batch in id_reservations
+(unique on kind + id) with a single bulk insert, so concurrent sessions can
+never hand out the same ID and imports don't query the database per row.
+"""
+
+import random
+import string
+from typing import List, Optional, Set
+
+from policies_data_layer import fetch_policies
+
+# Reservation table (see sql_scripts/create_id_reservations_table.sql)
+RESERVATIONS_TABLE = 'id_reservations'
+
+# IDs reserved (or checked) per round trip; keeps request URLs and bodies small
+RESERVATION_BATCH_SIZE = 100
+
+# Candidates are regenerated this many times before giving up on a batch
+MAX_ALLOCATION_ROUNDS = 10
+
+# Postgres unique_violation: the ID is already reserved by another session
+UNIQUE_VIOLATION = '23505'
+
+# Postgres insufficient_privilege: row-level security denies this key role the insert
+INSUFFICIENT_PRIVILEGE = '42501'
+
+
+def generate_client_id(length=6):
+    """Generate a unique Client ID with exactly 3 letters and 3 numbers in random order."""
+    # Generate exactly 3 letters and 3 numbers, then mix them randomly
+    letters = string.ascii_uppercase
+    digits = string.digits
+
+    # Pick 3 random letters
+    selected_letters = [random.choice(letters) for _ in range(3)]
+
+    # Pick 3 random numbers
+    selected_numbers = [random.choice(digits) for _ in range(3)]
+
+    # Combine them
+    result = selected_letters + selected_numbers
+
+    # Shuffle to create random pattern
+    random.shuffle(result)
+    return ''.join(result)
+
+
+def generate_transaction_id(length=7, suffix=None):
+    """Generate a unique Transaction ID with at least 3 letters and 3 numbers.
+
+    Args:
+        length: Length of the base ID (default 7)
+        suffix: Optional suffix to append (e.g., '-IMPORT', '-STMT')
+    """
+    # Ensure at least 3 letters and 3 numbers for 7-character ID
+    letters = string.ascii_uppercase
+    digits = string.digits
+
+    # Pick 3 random letters
+    selected_letters = [random.choice(letters) for _ in range(3)]
+
+    # Pick 3 random numbers
+    selected_numbers = [random.choice(digits) for _ in range(3)]
+
+    # For the 7th character, randomly choose letter or number
+    if random.choice([True, False]):
+        extra_char = random.choice(letters)
+    else:
+        extra_char = random.choice(digits)
+
+    # Combine all characters
+    result = selected_letters + selected_numbers + [extra_char]
+
+    # Shuffle to create random pattern
+    random.shuffle(result)
+    base_id = ''.join(result)
+
+    # Append suffix if provided
+    if suffix:
+        return f"{base_id}{suffix}"
+    return base_id
+
+
+def base_id_of(transaction_id) -> str:
+    """Base part of a Transaction ID (before any -IMPORT-/-STMT- style suffix), upper-cased."""
+    return str(transaction_id).split('-', 1)[0].strip().upper()
+
+
+def _is_unique_violation(error: Exception) -> bool:
+    return getattr(error, 'code', None) == UNIQUE_VIOLATION or 'duplicate key' in str(error)
+
+
+def _is_access_denied(error: Exception) -> bool:
+    return getattr(error, 'code', None) == INSUFFICIENT_PRIVILEGE or 'row-level security' in str(error)
+
+
+class IdAllocator:
+    """Hands out Transaction IDs and Client IDs that collide with neither the database nor each other."""
+
+    def __init__(self, supabase, user_id: Optional[str] = None):
+        self.supabase = supabase
+        self.user_id = user_id
+        self._known = {'transaction': None, 'client': None}
+        # None until the first reservation attempt tells us whether the table exists
+        self.reservations_available: Optional[bool] = None
+
+    def _load_known(self, kind: str) -> Set[str]:
+        """Existing IDs of a kind, loaded once with keyset pagination."""
+        if self._known[kind] is None:
+            column = 'Transaction ID' if kind == 'transaction' else 'Client ID'
+            rows = fetch_policies(self.supabase, columns=[column])
+            if kind == 'transaction':
+                self._known[kind] = {base_id_of(row[column]) for row in rows if row.get(column)}
+            else:
+                self._known[kind] = {str(row[column]).upper() for row in rows if row.get(column)}
+        return self._known[kind]
+
+    def _reserve(self, kind: str, candidates: List[str]) -> List[str]:
+        """
+        Reserve candidates in bulk; returns the ones that are now ours.
+        A failed bulk insert (someone else holds one of them) is retried per ID.
+        Without the reservation table, candidates are checked against policies instead.
+        """
+        reserved = []
+        for start in range(0, len(candidates), RESERVATION_BATCH_SIZE):
+            chunk = candidates[start:start + RESERVATION_BATCH_SIZE]
+            if self.reservations_available is not False:
+                claimed = self._insert_reservations(kind, chunk)
+                if claimed is not None:
+                    reserved.extend(claimed)
+                    continue
+            reserved.extend(self._check_policies(kind, chunk))
+        return reserved
+
+    def _insert_reservations(self, kind: str, candidates: List[str]) -> Optional[List[str]]:
+        """
+        Insert reservation rows; None when the reservation table doesn't exist or this
+        key role may not insert into it. Only unique violations mean an ID is taken;
+        any other error is raised. Inserts return nothing, so no read access is needed.
+        """
+        rows = [{'kind': kind, 'id': candidate, 'user_id': self.user_id} for candidate in candidates]
+        try:
+            self.supabase.table(RESERVATIONS_TABLE).insert(rows, returning='minimal').execute()
+            self.reservations_available = True
+            return candidates
+        except Exception as e:
+            message = str(e)
+            if 'does not exist' in message or 'schema cache' in message:
+                print(f"ID reservations table not available, checking policies instead: {e}")
+                self.reservations_available = False
+                return None
+            if _is_access_denied(e):
+                print(f"ID reservations not allowed for this key, checking policies instead: {e}")
+                self.reservations_available = False
+                return None
+            if not _is_unique_violation(e):
+                raise
+
+        claimed = []
+        for row in rows:
+            try:
+                self.supabase.table(RESERVATIONS_TABLE).insert(row, returning='minimal').execute()
+                claimed.append(row['id'])
+            except Exception as e:
+                if not _is_unique_violation(e):
+                    raise
+                # Taken by another session
+        self.reservations_available = True
+        return claimed
+
+    def _check_policies(self, kind: str, candidates: List[str]) -> List[str]:
+        """Drop candidates already present in policies (one query per chunk)."""
+        if kind == 'transaction':
+            # Base IDs are checked with a prefix match so suffixed IDs count as taken
+            expression = ','.join(f'"Transaction ID".like.{candidate}*' for candidate in candidates)
+            response = self.supabase.table('policies').select('"Transaction ID"').or_(expression).execute()
+            taken = {base_id_of(row['Transaction ID']) for row in response.data or []}
+        else:
+            response = self.supabase.table('policies').select('"Client ID"').in_('"Client ID"', candidates).execute()
+            taken = {str(row['Client ID']).upper() for row in response.data or []}
+        return [candidate for candidate in candidates if candidate not in taken]
+
+    def _allocate(self, kind: str, n: int) -> List[str]:
+        known = self._load_known(kind)
+        generate = generate_transaction_id if kind == 'transaction' else generate_client_id
+
+        allocated: List[str] = []
+        for _ in range(MAX_ALLOCATION_ROUNDS):
+            needed = n - len(allocated)
+            if needed <= 0:
+                break
+            candidates = set()
+            while len(candidates) < needed:
+                candidate = generate()
+                if candidate not in known:
+                    candidates.add(candidate)
+            reserved = self._reserve(kind, sorted(candidates))
+            known.update(candidates)
+            allocated.extend(reserved)
+
+        if len(allocated) < n:
+            raise RuntimeError(f"Could only allocate {len(allocated)} of {n} {kind} IDs")
+        return allocated[:n]
+
+    def allocate_many(self, n: int, suffix: Optional[str] = None) -> List[str]:
+        """Allocate n Transaction IDs, each with an optional suffix (e.g. '-IMPORT-20250102')."""
+        if n <= 0:
+            return []
+        return [f"{base_id}{suffix or ''}" for base_id in self._allocate('transaction', n)]
+
+    def allocate(self, suffix: Optional[str] = None) -> str:
+        """Allocate a single Transaction ID."""
+        return self.allocate_many(1, suffix)[0]
+
+    def allocate_client_ids(self, n: int) -> List[str]:
+        """Allocate n Client IDs."""
+        if n <= 0:
+            return []
+        return self._allocate('client', n)
+
@@ -0,0 +1,108 @@
+"""
+Pending renewal detection.
+Precomputes, once per policies data version, the latest renewable term of each
+policy together with hash sets of renewed (appearing as a Prior Policy Number)
+and cancelled policy numbers. Finding what is due on a given day is then a
+vectorized date difference and filter over that small table.
+"""
+
+import datetime
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from canonical_columns import RECONCILIATION_KINDS, kind_mask
+
+# Transactions that start a policy term that can be renewed
+RENEWAL_TRANSACTION_TYPES = ["NEW", "RWL", "REWRITE"]
+
+# Any of these on a policy means it won't be renewed
+CANCELLED_TRANSACTION_TYPES = ["CAN", "XCL"]
+
+# Reconciliation entries are not policy transactions
+NON_POLICY_ID_PATTERN = '-STMT-|-VOID-|-ADJ-'
+
+# Renewals expiring further out than this are not pending yet (past due has no limit)
+RENEWAL_HORIZON_DAYS = 365
+
+# Due-window bucket edges in days until expiration (lower bounds of each bucket after past due)
+DUE_WINDOW_EDGES = [0, 8, 31, 61, 91]
+DUE_WINDOW_NAMES = ['past_due', 'due_0_7', 'due_8_30', 'due_31_60', 'due_61_90', 'due_later']
+
+
+class RenewalIndex:
+    """Latest renewable term per policy, minus renewed and cancelled policies."""
+
+    def __init__(self, df: pd.DataFrame, transaction_type_col: str = 'Transaction Type',
+                 x_date_col: str = 'X-DATE', prior_policy_col: Optional[str] = 'Prior Policy Number',
+                 canonical: Optional[pd.DataFrame] = None):
+        """canonical: Optional canonical columns of df (parsed X-DATE, transaction kinds)."""
+        self.renewed_policies = set()
+        self.cancelled_policies = set()
+
+        required = [transaction_type_col, x_date_col, 'Policy Number']
+        if df is None or df.empty or any(col not in df.columns for col in required):
+            columns = list(df.columns) if df is not None else []
+            self.latest_terms = pd.DataFrame(columns=columns + ['expiration_date'])
+            self.candidates = self.latest_terms
+            return
+
+        transaction_types = df[transaction_type_col]
+        is_renewable = transaction_types.isin(RENEWAL_TRANSACTION_TYPES)
+        if canonical is not None:
+            is_renewable &= ~kind_mask(canonical, RECONCILIATION_KINDS)
+        elif 'Transaction ID' in df.columns:
+            is_renewable &= ~df['Transaction ID'].astype(str).str.contains(NON_POLICY_ID_PATTERN, case=False, na=False)
+
+        terms = df[is_renewable].copy()
+        if canonical is not None and x_date_col == 'X-DATE':
+            terms['expiration_date'] = canonical.loc[is_renewable, 'x_date']
+        else:
+            terms['expiration_date'] = pd.to_datetime(terms[x_date_col], errors='coerce')
+
+        # Latest expiration per policy (undated terms only when a policy has nothing else)
+        terms = terms.sort_values(by=["Policy Number", "expiration_date"], ascending=[True, False], kind='mergesort')
+        self.latest_terms = terms[~terms.duplicated(subset="Policy Number", keep="first")]
+
+        if prior_policy_col and prior_policy_col in df.columns:
+            self.renewed_policies = set(df[prior_policy_col].dropna().unique())
+        self.cancelled_policies = set(df.loc[transaction_types.isin(CANCELLED_TRANSACTION_TYPES), "Policy Number"].dropna().unique())
+
+        # Plain set lookups (Series.isin re-hashes a large value list on every call)
+        excluded = self.renewed_policies | self.cancelled_policies
+        policy_numbers = self.latest_terms["Policy Number"]
+        is_excluded = np.fromiter((number in excluded for number in policy_numbers), dtype=bool, count=len(policy_numbers))
+        self.candidates = self.latest_terms[~is_excluded]
+
+    def pending(self, today: Optional[datetime.date] = None,
+                horizon_days: int = RENEWAL_HORIZON_DAYS) -> pd.DataFrame:
+        """
+        Policies due for renewal: every past-due one and those expiring within horizon_days,
+        with a Days Until Expiration column, most past-due first.
+        """
+        candidates = self.candidates
+        if candidates.empty:
+            return candidates.assign(**{'Days Until Expiration': pd.Series(dtype=float)})
+
+        today = pd.Timestamp(today or datetime.date.today())
+        days = (candidates['expiration_date'] - today).dt.days
+        due = (days <= horizon_days).to_numpy()
+        pending = candidates[due].copy()
+        pending['Days Until Expiration'] = days[due]
+        return pending.sort_values('Days Until Expiration', ascending=True, kind='mergesort')
+
+
+def summarize_due_windows(days_until_expiration: pd.Series) -> dict:
+    """
+    Count renewals per due window in one pass.
+
+    Returns:
+        dict with past_due, due_0_7, due_8_30, due_31_60, due_61_90, due_later,
+        plus due_0_30 (0-30 days) and total
+    """
+    days = pd.to_numeric(days_until_expiration, errors='coerce').dropna().to_numpy()
+    buckets = np.searchsorted(DUE_WINDOW_EDGES, days, side='right')
+    counts = dict(zip(DUE_WINDOW_NAMES, np.bincount(buckets, minlength=len(DUE_WINDOW_NAMES)).tolist()))
+    counts['due_0_30'] = counts['due_0_7'] + counts['due_8_30']
+    counts['total'] = len(days_until_expiration)
+    return counts
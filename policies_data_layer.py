@@ -0,0 +1,473 @@
+"""
+Policies data layer for the commission app.
+Loads the current user's policies in keyset-paginated chunks and keeps a
+per-user copy in session state. Write paths mark the copy stale, and the next
+load pulls only rows changed since the last-seen updated_at/_id watermark
+(plus tombstones from deleted_policies) instead of the whole book. With
+snapshots enabled, a cold session starts from the user's on-disk snapshot
+(see policies_snapshot) and validates it against the database in the background.
+"""
+
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import pandas as pd
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from canonical_columns import build_canonical_columns
+from compact_policies import compact_policies_frame, expand_policies_frame
+from policies_snapshot import POLICIES_SNAPSHOT_DIR, delete_snapshot, read_snapshot, write_snapshot
+
+# Rows requested per round trip (Supabase caps responses at 1000 rows by default)
+POLICIES_PAGE_SIZE = 1000
+
+# Safety net for changes made outside this session (webhooks, API, other tabs)
+POLICIES_CACHE_TTL_SECONDS = 300
+
+# A filter is (operator, *args), e.g. ('eq', 'user_id', user_id) or ('or_', 'a.gt.1,b.gt.2')
+PolicyFilter = Tuple
+
+# Data versions are unique across cache entries so derived results can't be mistaken for current
+_data_versions = itertools.count(1)
+
+# Background snapshot validation and writes (workers only talk to the database and disk)
+_background_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='policies-snapshot')
+
+
+def format_select_columns(columns: Optional[Sequence[str]] = None) -> str:
+    """Build a PostgREST select clause, quoting column names with spaces or symbols."""
+    if not columns:
+        return "*"
+
+    selected = list(columns)
+    # _id is the pagination key and must always be present
+    if '_id' not in selected:
+        selected.insert(0, '_id')
+
+    formatted = []
+    for column in selected:
+        if column.isidentifier() and column == column.lower():
+            formatted.append(column)
+        else:
+            formatted.append(f'"{column}"')
+    return ",".join(formatted)
+
+
+def fetch_policies_pages(supabase, filters: Sequence[PolicyFilter] = (),
+                         columns: Optional[Sequence[str]] = None,
+                         page_size: int = POLICIES_PAGE_SIZE) -> Iterator[List[dict]]:
+    """
+    Yield pages of policy rows ordered by _id using keyset pagination.
+
+    Each page asks for rows with _id greater than the last one seen, so large
+    books are never silently truncated by the server's response cap.
+    """
+    select_clause = format_select_columns(columns)
+    last_id = None
+
+    while True:
+        query = supabase.table('policies').select(select_clause)
+        for operator, *args in filters:
+            query = getattr(query, operator)(*args)
+        if last_id is not None:
+            query = query.gt('_id', last_id)
+
+        response = query.order('_id').limit(page_size).execute()
+        rows = response.data or []
+        if not rows:
+            return
+
+        yield rows
+
+        last_id = rows[-1].get('_id')
+        if last_id is None:
+            return
+
+
+def fetch_policies(supabase, filters: Sequence[PolicyFilter] = (),
+                   columns: Optional[Sequence[str]] = None,
+                   page_size: int = POLICIES_PAGE_SIZE) -> List[dict]:
+    """Fetch all matching policy rows across pages."""
+    rows = []
+    for page in fetch_policies_pages(supabase, filters, columns, page_size):
+        rows.extend(page)
+    return rows
+
+
+def _cache_slot(columns: Optional[Sequence[str]]) -> str:
+    """Name of the frame slot inside a cache entry for a column selection."""
+    return "*" if not columns else "|".join(sorted(columns))
+
+
+def _get_entry(cache_key: str, owner: str) -> Optional[dict]:
+    """Return the cache entry for this owner, or None."""
+    entry = st.session_state.get(cache_key)
+    if not isinstance(entry, dict) or entry.get('owner') != owner:
+        return None
+    return entry
+
+
+def get_cached_policies(cache_key: str, owner: str,
+                        columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Return a copy of the cached policies frame for this owner, or None on a miss.
+    A full cached frame also serves any column subset. Stale or expired entries
+    are a miss (the caller should try sync_policies_delta first).
+    """
+    entry = _get_entry(cache_key, owner)
+    if entry is None or entry.get('stale'):
+        return None
+
+    if time.time() - entry.get('loaded_at', 0) > POLICIES_CACHE_TTL_SECONDS:
+        return None
+
+    frames = entry.get('frames', {})
+    if columns:
+        full_frame = frames.get("*")
+        if full_frame is not None:
+            return expand_policies_frame(full_frame[[col for col in columns if col in full_frame.columns]])
+
+    frame = frames.get(_cache_slot(columns))
+    return expand_policies_frame(frame) if frame is not None else None
+
+
+def store_cached_policies(cache_key: str, owner: str, df: pd.DataFrame,
+                          columns: Optional[Sequence[str]] = None,
+                          filters: Sequence[PolicyFilter] = (),
+                          compact: bool = False, snapshot_user_id: Optional[str] = None):
+    """
+    Store a policies frame for this owner in session state.
+    Full loads also record the filters used and the delta-sync watermark.
+    With compact=True the cached copy uses the compact representation (see compact_policies).
+    With snapshot_user_id, full loads (and later merged deltas) are also written to
+    that user's on-disk snapshot when snapshots are enabled.
+    """
+    entry = _get_entry(cache_key, owner)
+    if entry is None:
+        entry = {'owner': owner, 'loaded_at': time.time(), 'frames': {}}
+
+    if not columns:
+        # A fresh full load supersedes any column subsets
+        watermark = get_policies_watermark(df)
+        entry.update({
+            'frames': {},
+            'loaded_at': time.time(),
+            'version': next(_data_versions),
+            'stale': False,
+            'filters': list(filters),
+            'watermark': watermark,
+            # Tombstones are tracked from the newest row change we have seen, then
+            # from the newest deleted_at fetched (see fetch_policy_tombstones)
+            'tombstone_watermark': _tombstone_timestamp(watermark.get('updated_at')) if watermark else None,
+            'snapshot_user_id': snapshot_user_id
+        })
+        # A pending snapshot validation is superseded by the fresh load
+        entry.pop('validation', None)
+
+    entry['compact'] = compact
+    entry['frames'][_cache_slot(columns)] = compact_policies_frame(df) if compact else df.copy()
+    st.session_state[cache_key] = entry
+    if not columns:
+        _save_snapshot(entry, df.copy())
+
+
+def get_policies_data_version(cache_key: str, owner: str) -> Optional[int]:
+    """Version of the cached policies data (changes on every full load or merged delta), or None."""
+    entry = _get_entry(cache_key, owner)
+    if entry is None or entry.get('stale'):
+        return None
+    return entry.get('version')
+
+
+def get_canonical_columns(cache_key: str, owner: str) -> Optional[pd.DataFrame]:
+    """
+    Canonical typed columns (parsed dates, policy key, transaction kind) of the cached
+    full policies frame, built once per data version. None when there is no current frame.
+    """
+    entry = _get_entry(cache_key, owner)
+    if entry is None or entry.get('stale') or "*" not in entry.get('frames', {}):
+        return None
+
+    cached = entry.get('canonical')
+    if cached is None or cached[0] != entry.get('version'):
+        cached = (entry.get('version'), build_canonical_columns(entry['frames']["*"]))
+        entry['canonical'] = cached
+    return cached[1]
+
+
+def invalidate_policies_cache(cache_key: str):
+    """Drop the cached policies for a session key (forces a full reload)."""
+    if cache_key in st.session_state:
+        del st.session_state[cache_key]
+
+
+def mark_policies_stale(cache_key: str):
+    """Flag the cached policies as stale so the next load runs a delta sync."""
+    entry = st.session_state.get(cache_key)
+    if isinstance(entry, dict):
+        entry['stale'] = True
+        # A snapshot validation started before this write could miss it; the delta sync covers it
+        entry.pop('validation', None)
+
+
+# --- Incremental (delta) sync ---
+
+def get_policies_watermark(df: pd.DataFrame) -> Optional[dict]:
+    """Return the last-seen updated_at/_id watermark of a policies frame, or None if untracked."""
+    if df is None or df.empty or 'updated_at' not in df.columns or '_id' not in df.columns:
+        return None
+
+    updated_at = pd.to_datetime(df['updated_at'], errors='coerce', utc=True).max()
+    max_id = pd.to_numeric(df['_id'], errors='coerce').max()
+    if pd.isna(updated_at) or pd.isna(max_id):
+        return None
+    return {'updated_at': updated_at.isoformat(), '_id': int(max_id)}
+
+
+def fetch_policy_changes(supabase, filters: Sequence[PolicyFilter], watermark: dict,
+                         page_size: int = POLICIES_PAGE_SIZE) -> List[dict]:
+    """Fetch rows updated at/after the watermark or inserted after the last-seen _id."""
+    changed_filter = ('or_', f'updated_at.gte."{watermark["updated_at"]}",_id.gt.{watermark["_id"]}')
+    return fetch_policies(supabase, list(filters) + [changed_filter], page_size=page_size)
+
+
+def _tombstone_timestamp(value) -> Optional[str]:
+    """
+    A timestamp as deleted_at stores it: naive UTC.
+    deleted_policies.deleted_at is a plain TIMESTAMP (written in the database's UTC
+    clock), so an offset in a filter literal would be ignored rather than applied.
+    """
+    if value is None:
+        return None
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert('UTC').tz_localize(None)
+    return stamp.isoformat()
+
+
+def fetch_policy_tombstones(supabase, filters: Sequence[PolicyFilter],
+                            since: Optional[str]) -> Tuple[dict, Optional[str]]:
+    """
+    Fetch Transaction IDs archived to deleted_policies after a deleted_at watermark.
+    Returns (deleted transaction id -> newest deleted_at, newest deleted_at seen);
+    the second value is the watermark for the next call.
+    """
+    since = _tombstone_timestamp(since)
+    query = supabase.table('deleted_policies').select('transaction_id, deleted_at')
+    for operator, *args in filters:
+        query = getattr(query, operator)(*args)
+    if since:
+        query = query.gt('deleted_at', since)
+    response = query.order('deleted_at').execute()
+
+    deleted = {}
+    for row in response.data or []:
+        if row.get('transaction_id'):
+            deleted[row['transaction_id']] = _tombstone_timestamp(row.get('deleted_at'))
+    newest = max((stamp for stamp in deleted.values() if stamp), default=None)
+    return deleted, newest or since
+
+
+def count_policies(supabase, filters: Sequence[PolicyFilter]) -> Optional[int]:
+    """Count the user's policies on the server (used to verify a merged delta)."""
+    query = supabase.table('policies').select('_id', count='exact')
+    for operator, *args in filters:
+        query = getattr(query, operator)(*args)
+    response = query.limit(1).execute()
+    return getattr(response, 'count', None)
+
+
+def merge_policy_delta(df: pd.DataFrame, changed: pd.DataFrame, deleted_ids) -> pd.DataFrame:
+    """
+    Merge changed rows and tombstones into a cached policies frame.
+    Deleted Transaction IDs are dropped, changed rows replace their _id, new rows are appended.
+
+    deleted_ids maps Transaction ID -> deleted_at (naive UTC); only rows last updated
+    before their tombstone are dropped, so a Transaction ID re-created after it was
+    deleted survives. A plain set drops the IDs unconditionally.
+    """
+    merged = df
+    if deleted_ids and 'Transaction ID' in merged.columns:
+        doomed = merged['Transaction ID'].isin(list(deleted_ids))
+        if isinstance(deleted_ids, dict) and 'updated_at' in merged.columns:
+            deleted_at = pd.to_datetime(merged['Transaction ID'].map(deleted_ids), errors='coerce', utc=True)
+            updated_at = pd.to_datetime(merged['updated_at'], errors='coerce', utc=True)
+            doomed &= ~(updated_at > deleted_at).fillna(False)
+        merged = merged[~doomed]
+
+    if changed is not None and not changed.empty:
+        if '_id' in merged.columns and '_id' in changed.columns:
+            merged = merged[~merged['_id'].isin(changed['_id'])]
+        merged = pd.concat([merged, changed], ignore_index=True)
+        if 'Transaction ID' in merged.columns:
+            merged = merged.drop_duplicates(subset=['Transaction ID'], keep='last')
+
+    return merged.reset_index(drop=True)
+
+
+def fetch_policy_delta(supabase, filters: Sequence[PolicyFilter], watermark: dict,
+                       tombstone_watermark: Optional[str]) -> dict:
+    """
+    Everything needed to bring a book up to date from its watermark.
+
+    Returns:
+        dict with changed (rows), deleted_ids (Transaction ID -> deleted_at), tombstone_watermark
+        and server_count
+    """
+    changed_rows = fetch_policy_changes(supabase, filters, watermark)
+    deleted_ids, newest_tombstone = fetch_policy_tombstones(supabase, filters, tombstone_watermark)
+    return {
+        'changed': changed_rows,
+        'deleted_ids': deleted_ids,
+        'tombstone_watermark': newest_tombstone,
+        'server_count': count_policies(supabase, filters)
+    }
+
+
+def _apply_policy_delta(entry: dict, delta: dict,
+                        prepare_frame: Optional[Callable[[pd.DataFrame], pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    """Merge a fetched delta into a cache entry; None (entry untouched) on a row count mismatch."""
+    changed = pd.DataFrame(delta['changed'])
+    if prepare_frame is not None and not changed.empty:
+        changed = prepare_frame(changed)
+
+    entry_frame = expand_policies_frame(entry['frames']["*"])
+    merged = merge_policy_delta(entry_frame, changed, delta['deleted_ids'])
+
+    # Deletes that bypassed deleted_policies show up as a count mismatch
+    server_count = delta['server_count']
+    if server_count is not None and server_count != len(merged):
+        return None
+
+    entry.pop('validation', None)
+    entry.update({
+        'frames': {"*": compact_policies_frame(merged) if entry.get('compact') else merged},
+        'loaded_at': time.time(),
+        'version': next(_data_versions),
+        'stale': False,
+        'watermark': get_policies_watermark(merged) or entry['watermark'],
+        'tombstone_watermark': delta['tombstone_watermark']
+    })
+    if not changed.empty or len(merged) != len(entry_frame):
+        _save_snapshot(entry, merged.copy())
+    return merged
+
+
+def sync_policies_delta(supabase, cache_key: str, owner: str,
+                        prepare_frame: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None) -> Optional[pd.DataFrame]:
+    """
+    Refresh a stale cached policies frame with only the rows changed since its watermark.
+
+    Args:
+        supabase: Supabase client
+        cache_key: Session state key of the cache entry
+        owner: Cache owner (must match the entry)
+        prepare_frame: Optional function applying the loader's type conversions to changed rows
+
+    Returns:
+        The refreshed frame (copy), or None when a full reload is needed
+        (no cached frame, no watermark, query failure, or row count mismatch).
+    """
+    entry = _get_entry(cache_key, owner)
+    if entry is None or "*" not in entry.get('frames', {}) or not entry.get('watermark'):
+        return None
+
+    try:
+        delta = fetch_policy_delta(supabase, entry.get('filters', []), entry['watermark'],
+                                   entry.get('tombstone_watermark'))
+    except Exception as e:
+        print(f"Policies delta sync failed, falling back to full reload: {e}")
+        return None
+
+    merged = _apply_policy_delta(entry, delta, prepare_frame)
+    return merged.copy() if merged is not None else None
+
+
+# --- On-disk snapshots ---
+
+def _save_snapshot(entry: dict, df: pd.DataFrame):
+    """Write the entry's book to its user's snapshot in the background (when enabled)."""
+    user_id = entry.get('snapshot_user_id')
+    if not POLICIES_SNAPSHOT_DIR or not user_id:
+        return
+    _background_pool.submit(write_snapshot, POLICIES_SNAPSHOT_DIR, user_id, df, entry.get('watermark'),
+                            entry.get('tombstone_watermark'), entry.get('filters', []))
+
+
+def restore_policies_snapshot(supabase, cache_key: str, owner: str, user_id: Optional[str],
+                              compact: bool = False) -> bool:
+    """
+    Seed an empty session cache from the user's on-disk snapshot.
+    The restored book is served right away while a background query compares it
+    with the database (rows changed since its watermark, tombstones, row count);
+    apply_snapshot_validation merges the result on a later load.
+
+    Returns:
+        True when the cache was seeded
+    """
+    if not POLICIES_SNAPSHOT_DIR or not user_id or _get_entry(cache_key, owner) is not None:
+        return False
+
+    snapshot = read_snapshot(POLICIES_SNAPSHOT_DIR, user_id)
+    if snapshot is None:
+        return False
+    df, stamp = snapshot
+
+    entry = {
+        'owner': owner,
+        'loaded_at': time.time(),
+        'frames': {"*": compact_policies_frame(df) if compact else df},
+        'version': next(_data_versions),
+        'stale': False,
+        'filters': stamp['filters'],
+        'watermark': stamp['watermark'],
+        'tombstone_watermark': stamp.get('tombstone_watermark'),
+        'snapshot_user_id': user_id,
+        'compact': compact
+    }
+    entry['validation'] = _background_pool.submit(fetch_policy_delta, supabase, entry['filters'],
+                                                  entry['watermark'], entry['tombstone_watermark'])
+    st.session_state[cache_key] = entry
+    return True
+
+
+def apply_snapshot_validation(cache_key: str, owner: str,
+                              prepare_frame: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                              wait: bool = False) -> bool:
+    """
+    Merge a finished background validation of a restored snapshot into the cache.
+    A failed validation marks the entry stale (the next load runs a delta sync); a
+    row count mismatch drops both the entry and the snapshot (full reload).
+
+    Args:
+        wait: Block until the validation finishes instead of skipping a pending one
+
+    Returns:
+        True when the cache entry changed
+    """
+    entry = _get_entry(cache_key, owner)
+    future = entry.get('validation') if entry is not None else None
+    if future is None or (not wait and not future.done()):
+        return False
+    entry.pop('validation', None)
+
+    try:
+        delta = future.result()
+    except Exception as e:
+        print(f"Policies snapshot validation failed, syncing on next load: {e}")
+        entry['stale'] = True
+        return True
+
+    if _apply_policy_delta(entry, delta, prepare_frame) is None:
+        print("Policies snapshot out of date (row count mismatch), reloading")
+        if entry.get('snapshot_user_id') and POLICIES_SNAPSHOT_DIR:
+            delete_snapshot(POLICIES_SNAPSHOT_DIR, entry['snapshot_user_id'])
+        invalidate_policies_cache(cache_key)
+    return True
+
+
+def delete_policies_snapshot(user_id: Optional[str]):
+    """Remove a user's on-disk snapshot (the next cold start does a full load)."""
+    if POLICIES_SNAPSHOT_DIR and user_id:
+        delete_snapshot(POLICIES_SNAPSHOT_DIR, user_id)
@@ -0,0 +1,182 @@
+"""
+On-disk Parquet snapshots of each user's policies book.
+A new session (or a browser refresh) starts with an empty session cache and
+would re-download the whole book. With snapshots enabled, the last loaded book
+is kept as one Parquet file per user_id, stamped with a schema version and the
+delta-sync watermark, and read back memory-mapped on a cold start. The data
+layer then validates it against the database (row count, rows changed since the
+watermark) and applies the delta. Files are evicted least recently used first
+once the directory exceeds its size cap.
+
+Enable by pointing POLICIES_SNAPSHOT_DIR at a writable directory
+(e.g. POLICIES_SNAPSHOT_DIR=.policies_snapshots).
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    pa = pq = None
+    print(f"pyarrow not installed, policies snapshots disabled: {e}")
+
+# Directory holding the snapshots (empty disables them)
+POLICIES_SNAPSHOT_DIR = os.getenv("POLICIES_SNAPSHOT_DIR", "")
+
+# Total size of the snapshot directory before least recently used files are evicted
+POLICIES_SNAPSHOT_MAX_BYTES = int(float(os.getenv("POLICIES_SNAPSHOT_MAX_MB", "512")) * 1024 * 1024)
+
+# Bump when the stored layout changes; snapshots with another version are discarded
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# Parquet schema metadata key of the snapshot stamp
+SNAPSHOT_METADATA_KEY = b'commission_app.policies_snapshot'
+
+SNAPSHOT_SUFFIX = '.parquet'
+
+# Serializes writes and eviction within the process
+_snapshot_lock = threading.Lock()
+
+
+def snapshots_enabled(directory: Optional[str] = None) -> bool:
+    """True when a snapshot directory is configured and pyarrow is available."""
+    return bool(directory if directory is not None else POLICIES_SNAPSHOT_DIR) and pq is not None
+
+
+def snapshot_path(directory: str, user_id) -> Optional[str]:
+    """
+    Snapshot file of a user, or None without a user_id. The name is a hash of
+    the user_id, so only that user's loads ever read or replace it.
+    """
+    if not user_id:
+        return None
+    digest = hashlib.sha256(str(user_id).encode('utf-8')).hexdigest()
+    return os.path.join(directory, digest + SNAPSHOT_SUFFIX)
+
+
+def write_snapshot(directory: str, user_id, df: pd.DataFrame, watermark: Optional[dict],
+                   tombstone_watermark: Optional[str] = None, filters: Sequence[tuple] = (),
+                   max_bytes: int = POLICIES_SNAPSHOT_MAX_BYTES) -> bool:
+    """
+    Write a user's policies frame as a snapshot, then evict over the size cap.
+    Books without a watermark are not written (they couldn't be validated on read).
+
+    Returns:
+        True when the snapshot was written
+    """
+    path = snapshot_path(directory, user_id)
+    if path is None or pq is None or df is None or not watermark:
+        return False
+
+    stamp = {
+        'schema_version': SNAPSHOT_SCHEMA_VERSION,
+        'user_id': str(user_id),
+        'row_count': len(df),
+        'watermark': watermark,
+        'tombstone_watermark': tombstone_watermark,
+        'filters': [list(f) for f in filters],
+        'saved_at': time.time(),
+    }
+    try:
+        table = pa.Table.from_pandas(df)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SNAPSHOT_METADATA_KEY] = json.dumps(stamp, default=str).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        os.makedirs(directory, exist_ok=True)
+        with _snapshot_lock:
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            pq.write_table(table, temp_path)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, path)
+            evict_snapshots(directory, max_bytes)
+    except Exception as e:
+        print(f"Policies snapshot write failed: {e}")
+        return False
+    return True
+
+
+def read_snapshot(directory: str, user_id) -> Optional[Tuple[pd.DataFrame, dict]]:
+    """
+    Read a user's snapshot (memory-mapped) and mark it recently used.
+
+    Returns:
+        (frame, stamp) where stamp holds row_count, watermark, tombstone_watermark,
+        filters (as tuples) and saved_at; None when there is no usable snapshot.
+        Snapshots of another schema version or user, or with a row count that
+        doesn't match the file, are deleted.
+    """
+    path = snapshot_path(directory, user_id)
+    if path is None or pq is None or not os.path.exists(path):
+        return None
+
+    try:
+        table = pq.read_table(path, memory_map=True)
+        stamp = json.loads((table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY, b'{}'))
+    except Exception as e:
+        print(f"Policies snapshot unreadable, discarding: {e}")
+        _remove(path)
+        return None
+
+    if (stamp.get('schema_version') != SNAPSHOT_SCHEMA_VERSION or stamp.get('user_id') != str(user_id)
+            or stamp.get('row_count') != table.num_rows or not stamp.get('watermark')):
+        _remove(path)
+        return None
+
+    # Last access drives eviction (modification time, since atime is often disabled)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    stamp['filters'] = [tuple(f) for f in stamp.get('filters', [])]
+    return table.to_pandas(), stamp
+
+
+def delete_snapshot(directory: str, user_id):
+    """Remove a user's snapshot, if any."""
+    path = snapshot_path(directory, user_id)
+    if path is not None:
+        _remove(path)
+
+
+def evict_snapshots(directory: str, max_bytes: int = POLICIES_SNAPSHOT_MAX_BYTES) -> int:
+    """
+    Delete least recently used snapshots until the directory fits in max_bytes.
+
+    Returns:
+        Number of snapshots deleted
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*' + SNAPSHOT_SUFFIX)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        snapshots.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in snapshots)
+    evicted = 0
+    for _, size, path in sorted(snapshots):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
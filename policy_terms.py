@@ -0,0 +1,138 @@
+"""
+Policy term assignment.
+Gives every transaction the policy term it belongs to in one pass: the latest
+NEW/RWL/REWRITE of the same policy (and client) that started on or before the
+transaction, as long as the transaction falls before that term's X-DATE. Terms
+without a Client ID take every transaction of the policy, as the original
+month view did. The
+lookup is a single sorted merge_asof, so month and term views of the ledger
+become plain filters and groupbys instead of nested scans per policy.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Transactions that start a policy term
+TERM_DEFINING_TYPES = ['NEW', 'RWL', 'REWRITE']
+
+# term_id of transactions that don't fall in any term
+NO_TERM = -1
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors='coerce', format='mixed')
+
+
+def policy_term_keys(df: pd.DataFrame, policy_col: str = 'Policy Number',
+                     client_col: Optional[str] = 'Client ID') -> pd.Series:
+    """Key of the policy a row belongs to (stripped policy number, plus Client ID when present)."""
+    keys = df[policy_col].astype(str).str.strip()
+    if client_col in df.columns:
+        keys = keys + '|' + df[client_col].astype(str).where(df[client_col].notna(), '')
+    return keys
+
+
+def _latest_terms(others: pd.DataFrame, terms: pd.DataFrame) -> pd.DataFrame:
+    """Latest term of the same key that started on or before each transaction."""
+    if terms.empty or others.empty:
+        return pd.DataFrame(columns=['_pos', '_date', '_start', '_term'])
+    matched = pd.merge_asof(others.sort_values('_date', kind='mergesort'), terms,
+                            left_on='_date', right_on='_start', by='_key', direction='backward')
+    return matched[matched['_term'].notna()]
+
+
+def assign_policy_terms(df: pd.DataFrame, transaction_type_col: str = 'Transaction Type',
+                        effective_date_col: str = 'Effective Date',
+                        x_date_col: str = 'X-DATE', canonical: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Term of every row.
+    canonical: Optional canonical columns of df (parsed Effective Date and X-DATE)
+
+    Returns:
+        DataFrame aligned to df with term_id (row position of the term's
+        NEW/RWL/REWRITE, NO_TERM when the row isn't in a term), term_start and term_end
+    """
+    positions = np.arange(len(df))
+    if canonical is not None:
+        effective = canonical['effective_date'].reset_index(drop=True)
+        expiration = canonical['x_date'].reset_index(drop=True)
+    else:
+        effective = _parse_dates(df[effective_date_col]).reset_index(drop=True)
+        expiration = (_parse_dates(df[x_date_col]).reset_index(drop=True) if x_date_col in df.columns
+                      else pd.Series(pd.NaT, index=effective.index))
+    keys = policy_term_keys(df).reset_index(drop=True)
+    is_term = (df[transaction_type_col].isin(TERM_DEFINING_TYPES).to_numpy() & effective.notna().to_numpy())
+
+    term_ids = np.where(is_term, positions, NO_TERM)
+
+    terms = pd.DataFrame({'_key': keys[is_term], '_start': effective[is_term],
+                          '_term': positions[is_term]}).sort_values(['_start', '_term'], kind='mergesort')
+    others = pd.DataFrame({'_key': keys, '_date': effective, '_pos': positions})[~is_term & effective.notna().to_numpy()]
+    matched = _latest_terms(others, terms)
+    if 'Client ID' in df.columns:
+        # Terms without a Client ID also take the policy's transactions that have one
+        no_client = df['Client ID'].isna().to_numpy()[terms['_term'].to_numpy()]
+        if no_client.any():
+            policies = policy_term_keys(df, client_col=None).reset_index(drop=True)
+            fallback = _latest_terms(others.assign(_key=policies[others.index]),
+                                     terms[no_client].assign(_key=policies[terms.index[no_client]]))
+            matched = (pd.concat([matched, fallback]).sort_values(['_start', '_term'], kind='mergesort')
+                       .drop_duplicates('_pos', keep='last'))
+    if not matched.empty:
+        term_positions = matched['_term'].astype(int).to_numpy()
+        in_term = (matched['_date'].to_numpy() < expiration.to_numpy()[term_positions])
+        term_ids[matched['_pos'].to_numpy()[in_term]] = term_positions[in_term]
+
+    has_term = term_ids != NO_TERM
+    term_start = pd.Series(pd.NaT, index=effective.index, dtype=effective.dtype)
+    term_end = pd.Series(pd.NaT, index=expiration.index, dtype=expiration.dtype)
+    term_start[has_term] = effective.to_numpy()[term_ids[has_term]]
+    term_end[has_term] = expiration.to_numpy()[term_ids[has_term]]
+
+    return pd.DataFrame({'term_id': term_ids, 'term_start': term_start.to_numpy(),
+                         'term_end': term_end.to_numpy()}, index=df.index)
+
+
+def transactions_for_term_month(df: pd.DataFrame, year_month: str,
+                                canonical: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    All transactions of the policy terms that started in year_month ('YYYY-MM'),
+    grouped by term in the order the terms appear in df.
+    """
+    if df.empty:
+        return df
+    terms = assign_policy_terms(df, canonical=canonical)
+    month = pd.Timestamp(f"{year_month}-01")
+    term_start = terms['term_start']
+    selected = ((terms['term_id'] != NO_TERM) & (term_start.dt.year == month.year)
+                & (term_start.dt.month == month.month)).to_numpy()
+    order = np.lexsort((np.arange(len(df))[selected], terms['term_id'].to_numpy()[selected]))
+    month_data = df[selected].iloc[order]
+    if 'Transaction ID' in month_data.columns:
+        month_data = month_data.drop_duplicates(subset=['Transaction ID'])
+    return month_data.reset_index(drop=True)
+
+
+def fill_statement_client_ids(df: pd.DataFrame, policy_col: str = 'Policy Number',
+                              client_col: str = 'Client ID') -> pd.DataFrame:
+    """
+    Give STMT rows without a Client ID the policy's most common Client ID
+    (smallest one on ties), so they group with the policy's other transactions.
+    """
+    if client_col not in df.columns or 'Transaction ID' not in df.columns:
+        return df
+    missing = df['Transaction ID'].astype(str).str.contains('-STMT-', regex=False) & df[client_col].isna()
+    if not missing.any():
+        return df
+
+    known = df.loc[df[client_col].notna(), [policy_col, client_col]]
+    counts = known.groupby([policy_col, client_col], sort=False).size().reset_index(name='_count')
+    main_clients = (counts.sort_values([policy_col, '_count', client_col], ascending=[True, False, True], kind='mergesort')
+                    .drop_duplicates(policy_col).set_index(policy_col)[client_col])
+
+    df.loc[missing, client_col] = df.loc[missing, policy_col].map(main_clients)
+    return df
@@ -0,0 +1,158 @@
+"""
+Dry run for statement reconciliation imports.
+Builds, in one pass over the match results, every row the import would write
+(reconciliation STMT entries and new transactions), the resulting balance
+change per policy term and the lines left unmatched - without touching the
+database.
+"""
+
+import pandas as pd
+from typing import Dict, List, Optional
+
+from statement_matcher import StageTimer
+
+# Balance differences below this are treated as paid in full
+BALANCE_TOLERANCE = 0.01
+
+
+def _balance_status(balance_after: pd.Series) -> pd.Series:
+    status = pd.Series('Partial', index=balance_after.index)
+    status[balance_after.abs() < BALANCE_TOLERANCE] = 'Paid in full'
+    status[balance_after <= -BALANCE_TOLERANCE] = 'Overpaid'
+    return status
+
+
+def _matched_frame(matched: List[dict]) -> pd.DataFrame:
+    """
+    One row per matched statement line with the fields of its matched transaction.
+    _term keys the line's policy term: the matched Transaction ID, or the statement
+    row for a manual match without one (each such line is its own term).
+    """
+    rows = []
+    for position, item in enumerate(matched):
+        match = item.get('match') or {}
+        transaction_id = match.get('Transaction ID')
+        rows.append({
+            '_term': transaction_id if transaction_id else f"ROW:{item.get('row_index', position)}",
+            'Matched To': transaction_id or 'Manual Match',
+            'Customer': item.get('matched_customer', match.get('Customer', item.get('customer', ''))),
+            'Policy Number': match.get('Policy Number', item.get('policy_number', '')),
+            'Effective Date': match.get('Effective Date', item.get('effective_date', '')),
+            'Transaction Type': match.get('Transaction Type', ''),
+            'Balance Before': match.get('balance', 0),
+            'Agent Paid Amount (STMT)': item.get('amount', 0),
+            'Agency Comm Received (STMT)': item.get('agency_amount', 0),
+            'Match Type': item.get('match_type', ''),
+            'Confidence': item.get('confidence'),
+        })
+    return pd.DataFrame(rows, columns=[
+        '_term', 'Matched To', 'Customer', 'Policy Number', 'Effective Date', 'Transaction Type', 'Balance Before',
+        'Agent Paid Amount (STMT)', 'Agency Comm Received (STMT)', 'Match Type', 'Confidence'
+    ])
+
+
+def _create_frame(to_create: List[dict]) -> pd.DataFrame:
+    """One row per statement line that would create a new transaction (keyed by policy + date)."""
+    frame = pd.DataFrame({
+        'Matched To': 'NEW',
+        'Customer': [item.get('customer', '') for item in to_create],
+        'Policy Number': [item.get('policy_number', '') for item in to_create],
+        'Effective Date': [item.get('effective_date', '') for item in to_create],
+        'Transaction Type': [item.get('selected_transaction_type', 'NEW') for item in to_create],
+        'Agent Paid Amount (STMT)': [item.get('amount', 0) for item in to_create],
+        'Agency Comm Received (STMT)': [item.get('agency_amount', 0) for item in to_create],
+        'Match Type': 'Create new',
+        'Confidence': None,
+    })
+    # New transactions carry the statement amount as Total Agent Comm
+    frame['Balance Before'] = frame['Agent Paid Amount (STMT)']
+    frame.insert(0, '_term', 'NEW:' + frame['Policy Number'].astype(str) + '_' + frame['Effective Date'].astype(str))
+    return frame
+
+
+def build_dry_run_report(matched: List[dict], unmatched: List[dict], to_create: List[dict],
+                         statement_date, create_new: bool = True,
+                         match_timings: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Compute what a statement import would write, without writing anything.
+
+    Args:
+        matched: Matched statement lines (from match_statement_transactions)
+        unmatched: Lines needing manual selection
+        to_create: Lines that would create new transactions
+        statement_date: Statement date used for the STMT entries
+        create_new: Whether new transactions would be created for to_create
+        match_timings: Optional per-stage timings of the matching run to include
+
+    Returns:
+        dict with DataFrames new_stmt_rows, new_transactions, balance_changes and
+        unmatched, plus summary counts and per-stage timings
+    """
+    timer = StageTimer()
+    to_create = to_create if create_new else []
+
+    with timer.stage('dry_run_frames'):
+        lines = pd.concat([_matched_frame(matched), _create_frame(to_create)], ignore_index=True)
+        for col in ['Balance Before', 'Agent Paid Amount (STMT)', 'Agency Comm Received (STMT)']:
+            lines[col] = pd.to_numeric(lines[col], errors='coerce').fillna(0.0)
+
+    with timer.stage('dry_run_stmt_rows'):
+        new_stmt_rows = lines.drop(columns='_term')
+        new_stmt_rows['STMT DATE'] = pd.Timestamp(statement_date).strftime('%Y-%m-%d')
+        new_transactions = lines.loc[lines['Matched To'] == 'NEW', [
+            'Customer', 'Policy Number', 'Effective Date', 'Transaction Type', 'Agent Paid Amount (STMT)'
+        ]].rename(columns={'Agent Paid Amount (STMT)': 'Total Agent Comm'}).reset_index(drop=True)
+
+    with timer.stage('dry_run_balances'):
+        balance_changes = lines.groupby('_term', sort=False).agg(**{
+            'Matched To': ('Matched To', 'first'),
+            'Customer': ('Customer', 'first'),
+            'Policy Number': ('Policy Number', 'first'),
+            'Effective Date': ('Effective Date', 'first'),
+            'Balance Before': ('Balance Before', 'first'),
+            'Statement Payments': ('Agent Paid Amount (STMT)', 'sum'),
+            'Statement Lines': ('Agent Paid Amount (STMT)', 'size'),
+        }).reset_index(drop=True)
+        # A new transaction's starting balance is the sum of its statement lines
+        is_new = balance_changes['Matched To'] == 'NEW'
+        balance_changes.loc[is_new, 'Balance Before'] = balance_changes.loc[is_new, 'Statement Payments']
+        balance_changes['Balance After'] = (balance_changes['Balance Before'] - balance_changes['Statement Payments']).round(2)
+        balance_changes['Status'] = _balance_status(balance_changes['Balance After'])
+        # Manual matches without a transaction have no known balance to pay down
+        is_manual = balance_changes['Matched To'] == 'Manual Match'
+        balance_changes.loc[is_manual, ['Balance Before', 'Balance After']] = float('nan')
+        balance_changes.loc[is_manual, 'Status'] = 'Unknown'
+
+    with timer.stage('dry_run_unmatched'):
+        unmatched_df = pd.DataFrame({
+            'Customer': [item.get('customer', '') for item in unmatched],
+            'Policy Number': [item.get('policy_number', '') for item in unmatched],
+            'Effective Date': [item.get('effective_date', '') for item in unmatched],
+            'Agent Paid Amount (STMT)': [item.get('amount', 0) for item in unmatched],
+            'Candidate Customers': [len(item.get('potential_customers') or []) for item in unmatched],
+            'Candidate Transactions': [len(item.get('potential_matches') or []) for item in unmatched],
+        })
+
+    summary = {
+        'stmt_rows': len(new_stmt_rows),
+        'new_transactions': len(new_transactions),
+        'total_inserts': len(new_stmt_rows) + len(new_transactions),
+        'terms_affected': len(balance_changes),
+        'paid_in_full': int((balance_changes['Status'] == 'Paid in full').sum()),
+        'overpaid': int((balance_changes['Status'] == 'Overpaid').sum()),
+        'unmatched': len(unmatched_df),
+        'reconciled_amount': float(new_stmt_rows['Agent Paid Amount (STMT)'].sum()),
+        'unmatched_amount': float(pd.to_numeric(unmatched_df['Agent Paid Amount (STMT)'], errors='coerce').sum()),
+    }
+
+    timings = dict(match_timings or {})
+    timings.update(timer.timings)
+
+    return {
+        'new_stmt_rows': new_stmt_rows,
+        'new_transactions': new_transactions,
+        'balance_changes': balance_changes,
+        'unmatched': unmatched_df,
+        'summary': summary,
+        'timings': timings
+    }
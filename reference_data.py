@@ -0,0 +1,136 @@
+"""
+Per-user reference data prefetch.
+Pages need several independent lookups before they can render (policies,
+carriers, carrier MGAs, commission rules, user policy/transaction types,
+preferences, agent rates). This module runs those reads concurrently on a
+small thread pool and keeps the results in one session bundle, so page entry
+waits for the slowest read instead of the sum of all of them.
+
+Pool loaders must be pure fetchers: they take what they need as arguments and
+return a value, and never touch st.session_state (it isn't thread safe).
+Loaders that read or fill session caches run as main tasks on the calling
+thread while the pool works, and the caller stores pool results afterwards.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import streamlit as st
+
+# Concurrent reads per prefetch (each holds one pooled HTTP connection)
+PREFETCH_MAX_WORKERS = 6
+
+# Reference data is refetched after this long even without an invalidation
+REFERENCE_DATA_TTL_SECONDS = 300
+
+
+def _apply_filters(query, filters: Sequence[tuple]):
+    for operator, *args in filters:
+        query = getattr(query, operator)(*args)
+    return query
+
+
+def fetch_carriers(supabase, filters: Sequence[tuple] = ()) -> List[dict]:
+    """Active carriers (id and name) sorted by name."""
+    query = supabase.table('carriers').select('carrier_id, carrier_name').eq('status', 'Active')
+    response = _apply_filters(query, filters).order('carrier_name').execute()
+    return response.data or []
+
+
+def run_concurrently(tasks: Dict[str, Callable[[], Any]],
+                     max_workers: int = PREFETCH_MAX_WORKERS,
+                     main_tasks: Optional[Dict[str, Callable[[], Any]]] = None) -> dict:
+    """
+    Run independent loaders on a bounded thread pool.
+
+    tasks run on worker threads and must not touch st.session_state. main_tasks
+    run one after another on the calling thread while the pool works, so they
+    may read and write the session as usual.
+
+    Returns:
+        dict with results (name -> value), errors (name -> message),
+        timings (name -> seconds) and total_seconds (wall clock)
+    """
+    def timed(name, loader):
+        started = time.perf_counter()
+        try:
+            return name, loader(), None, time.perf_counter() - started
+        except Exception as e:
+            return name, None, str(e), time.perf_counter() - started
+
+    results, errors, timings = {}, {}, {}
+
+    def collect(name, value, error, seconds):
+        timings[name] = seconds
+        if error is None:
+            results[name] = value
+        else:
+            errors[name] = error
+            print(f"Reference data prefetch of {name} failed: {error}")
+
+    started = time.perf_counter()
+    pool = None
+    futures = []
+    if tasks:
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))))
+        futures = [pool.submit(timed, name, loader) for name, loader in tasks.items()]
+    try:
+        for name, loader in (main_tasks or {}).items():
+            collect(*timed(name, loader))
+        for future in futures:
+            collect(*future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    return {
+        'results': results,
+        'errors': errors,
+        'timings': timings,
+        'total_seconds': time.perf_counter() - started,
+    }
+
+
+def get_reference_bundle(cache_key: str, owner: str) -> Optional[dict]:
+    """The session's reference data bundle if it belongs to owner and hasn't expired."""
+    entry = st.session_state.get(cache_key)
+    if (isinstance(entry, dict) and entry.get('owner') == owner
+            and time.time() - entry.get('loaded_at', 0) <= REFERENCE_DATA_TTL_SECONDS):
+        return entry
+    return None
+
+
+def prefetch_reference_data(cache_key: str, owner: str, tasks: Dict[str, Callable[[], Any]],
+                            max_workers: int = PREFETCH_MAX_WORKERS,
+                            main_tasks: Optional[Dict[str, Callable[[], Any]]] = None) -> dict:
+    """Return the session bundle, running the loaders concurrently if it is missing or expired."""
+    entry = get_reference_bundle(cache_key, owner)
+    if entry is not None:
+        return entry
+
+    run = run_concurrently(tasks, max_workers, main_tasks)
+    entry = {
+        'owner': owner,
+        'loaded_at': time.time(),
+        'data': run['results'],
+        'errors': run['errors'],
+        'timings': run['timings'],
+        'total_seconds': run['total_seconds'],
+    }
+    st.session_state[cache_key] = entry
+    return entry
+
+
+def get_reference_value(cache_key: str, owner: str, name: str, default=None):
+    """One prefetched value, or default when it wasn't prefetched (or failed)."""
+    entry = get_reference_bundle(cache_key, owner)
+    if entry is None:
+        return default
+    return entry['data'].get(name, default)
+
+
+def invalidate_reference_data(cache_key: str):
+    """Drop the bundle (call after carrier, MGA or commission rule edits)."""
+    if cache_key in st.session_state:
+        del st.session_state[cache_key]
@@ -0,0 +1,22 @@
+-- Trigram indexes for the API's /v1/search endpoint
+-- Search matches ILIKE '%q%' on Customer and Policy Number; a btree index can't
+-- serve a leading wildcard, so without these every search scans the user's whole book.
+-- Trigram GIN indexes answer substring matches of 3+ characters from the index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_policies_customer_trgm
+    ON policies USING gin ("Customer" gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_policies_policy_number_trgm
+    ON policies USING gin ("Policy Number" gin_trgm_ops);
+
+-- Search is scoped to the key owner and paged by _id
+CREATE INDEX IF NOT EXISTS idx_policies_user_email_id ON policies(user_email, _id);
+
+-- Verify the indexes are used (expect a Bitmap Index Scan on the trigram index)
+-- EXPLAIN ANALYZE
+-- SELECT _id, "Policy Number", "Customer", "Premium Sold" FROM policies
+-- WHERE user_email = 'agent@example.com'
+--   AND ("Policy Number" ILIKE '%smith%' OR "Customer" ILIKE '%smith%')
+-- ORDER BY _id LIMIT 51;
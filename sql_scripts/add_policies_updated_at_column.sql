@@ -0,0 +1,28 @@
+-- Add updated_at tracking to the policies table
+-- Enables incremental (delta) sync in the app: after an edit only rows changed
+-- since the last-seen updated_at/_id watermark are downloaded instead of the whole book
+
+-- Add the column (existing rows get the time of the migration)
+ALTER TABLE policies
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+UPDATE policies SET updated_at = NOW() WHERE updated_at IS NULL;
+
+-- Keep updated_at current on every UPDATE
+CREATE OR REPLACE FUNCTION set_policies_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policies_updated_at ON policies;
+CREATE TRIGGER trg_policies_updated_at
+    BEFORE UPDATE ON policies
+    FOR EACH ROW
+    EXECUTE FUNCTION set_policies_updated_at();
+
+-- Indexes for the delta queries (per-user, ordered by watermark)
+CREATE INDEX IF NOT EXISTS idx_policies_user_id_updated_at ON policies(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_deleted_policies_user_id_deleted_at ON deleted_policies(user_id, deleted_at);
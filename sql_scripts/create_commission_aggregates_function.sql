@@ -0,0 +1,98 @@
+-- Server-side commission aggregates for the API (/v1/commissions/history, /v1/analytics/summary)
+-- The endpoints used to download every matching policy row to sum it in Python.
+-- commission_aggregates() groups in the database and returns one row per
+-- transaction type, carrier and month (plus a grand total), so only the aggregates
+-- cross the wire. policies_data_version() is a cheap stamp the API uses to key its
+-- Redis result cache: it changes whenever the user's rows are inserted, updated or deleted.
+
+-- Effective Date is stored as text in mixed formats (YYYY-MM-DD..., MM/DD/YYYY)
+CREATE OR REPLACE FUNCTION parse_policy_date(value TEXT)
+RETURNS DATE AS $$
+BEGIN
+    IF value IS NULL OR btrim(value) = '' THEN
+        RETURN NULL;
+    ELSIF value ~ '^\d{4}-\d{2}-\d{2}' THEN
+        RETURN to_date(substr(value, 1, 10), 'YYYY-MM-DD');
+    ELSIF value ~ '^\d{1,2}/\d{1,2}/\d{4}' THEN
+        RETURN to_date(value, 'MM/DD/YYYY');
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Amount columns may be numeric or text ("$1,200.00"); unparseable values count as 0
+CREATE OR REPLACE FUNCTION parse_policy_amount(value TEXT)
+RETURNS NUMERIC AS $$
+BEGIN
+    RETURN COALESCE(NULLIF(regexp_replace(value, '[^0-9.\-]', '', 'g'), '')::NUMERIC, 0);
+EXCEPTION WHEN others THEN
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- dimension is 'transaction_type', 'carrier', 'month' (YYYY-MM) or 'total' (key NULL)
+-- payments / paid cover statement payment rows (Transaction ID containing -STMT-)
+CREATE OR REPLACE FUNCTION commission_aggregates(
+    p_user_email TEXT DEFAULT NULL,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_transaction_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    dimension TEXT,
+    key TEXT,
+    transactions BIGINT,
+    payments BIGINT,
+    premium NUMERIC,
+    commission NUMERIC,
+    paid NUMERIC
+) AS $$
+    WITH scoped AS (
+        SELECT
+            COALESCE("Transaction Type", 'OTHER') AS transaction_type,
+            COALESCE(NULLIF(btrim("Carrier Name"), ''), 'Unknown') AS carrier,
+            COALESCE(to_char(parse_policy_date("Effective Date"), 'YYYY-MM'), 'Unknown') AS month,
+            parse_policy_date("Effective Date") AS effective_date,
+            COALESCE("Transaction ID" LIKE '%-STMT-%', FALSE) AS is_payment,
+            parse_policy_amount("Premium Sold"::TEXT) AS premium,
+            parse_policy_amount("Agent Estimated Comm $"::TEXT) AS commission,
+            parse_policy_amount("Agent Paid Amount (STMT)"::TEXT) AS paid
+        FROM policies
+        WHERE (p_user_email IS NULL OR user_email = p_user_email)
+          AND (p_transaction_type IS NULL OR "Transaction Type" = p_transaction_type)
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(transaction_type) = 0 THEN 'transaction_type'
+            WHEN GROUPING(carrier) = 0 THEN 'carrier'
+            WHEN GROUPING(month) = 0 THEN 'month'
+            ELSE 'total'
+        END AS dimension,
+        COALESCE(
+            CASE WHEN GROUPING(transaction_type) = 0 THEN transaction_type END,
+            CASE WHEN GROUPING(carrier) = 0 THEN carrier END,
+            CASE WHEN GROUPING(month) = 0 THEN month END
+        ) AS key,
+        COUNT(*) AS transactions,
+        COUNT(*) FILTER (WHERE is_payment) AS payments,
+        SUM(premium) AS premium,
+        SUM(commission) AS commission,
+        SUM(paid) FILTER (WHERE is_payment) AS paid
+    FROM scoped
+    WHERE (p_start_date IS NULL OR effective_date >= p_start_date)
+      AND (p_end_date IS NULL OR effective_date <= p_end_date)
+    GROUP BY GROUPING SETS ((transaction_type), (carrier), (month), ());
+$$ LANGUAGE sql STABLE;
+
+-- Row count plus newest updated_at: inserts and updates move updated_at, deletes change the count
+CREATE OR REPLACE FUNCTION policies_data_version(p_user_email TEXT DEFAULT NULL)
+RETURNS TEXT AS $$
+    SELECT COUNT(*)::TEXT || ':' || COALESCE(MAX(updated_at)::TEXT, '')
+    FROM policies
+    WHERE p_user_email IS NULL OR user_email = p_user_email;
+$$ LANGUAGE sql STABLE;
+
+-- Scoping index for both functions (the version stamp is served from the index)
+CREATE INDEX IF NOT EXISTS idx_policies_user_email_updated_at ON policies(user_email, updated_at);
@@ -0,0 +1,43 @@
+-- Create the ID reservations table used by the app's ID allocator (id_allocator.py)
+-- Candidate Transaction IDs / Client IDs are reserved here in bulk before use.
+-- The primary key makes a reservation atomic: two sessions can never both
+-- claim the same ID, so imports no longer re-check the policies table per row.
+
+CREATE TABLE IF NOT EXISTS id_reservations (
+    kind TEXT NOT NULL CHECK (kind IN ('transaction', 'client')),
+    id TEXT NOT NULL,
+    user_id UUID,
+    reserved_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (kind, id)
+);
+
+-- Seed with the IDs already in use (base part of Transaction IDs, before any -SUFFIX)
+INSERT INTO id_reservations (kind, id, user_id)
+SELECT DISTINCT ON (UPPER(SPLIT_PART("Transaction ID", '-', 1)))
+       'transaction', UPPER(SPLIT_PART("Transaction ID", '-', 1)), user_id
+FROM policies
+WHERE "Transaction ID" IS NOT NULL AND "Transaction ID" <> ''
+ON CONFLICT DO NOTHING;
+
+INSERT INTO id_reservations (kind, id, user_id)
+SELECT DISTINCT ON (UPPER("Client ID"))
+       'client', UPPER("Client ID"), user_id
+FROM policies
+WHERE "Client ID" IS NOT NULL AND "Client ID" <> ''
+ON CONFLICT DO NOTHING;
+
+-- Reservations are global (IDs are unique across all users) and insert-only.
+-- The app reserves with the service role key, which bypasses RLS. Other roles may
+-- only reserve IDs for themselves and can't read any reservations: the allocator
+-- inserts with return=minimal, and falls back to checking policies when denied.
+ALTER TABLE id_reservations ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can reserve IDs" ON id_reservations;
+CREATE POLICY "Users can reserve IDs" ON id_reservations
+    FOR INSERT
+    TO authenticated
+    WITH CHECK (user_id = auth.uid());
+
+DROP POLICY IF EXISTS "Users can view ID reservations" ON id_reservations;
+
+CREATE INDEX IF NOT EXISTS idx_id_reservations_user_id ON id_reservations(user_id);
@@ -0,0 +1,385 @@
+"""
+Indexed statement matcher for reconciliation imports.
+Extracts the mapped statement columns once, builds hash indexes over the
+outstanding transactions once, and resolves every statement line in a single
+pass of O(1) lookups instead of rescanning lookups and customers per row.
+"""
+
+import re
+import time
+import pandas as pd
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Customer names containing these words are treated as statement total rows
+TOTAL_ROW_WORDS = ['total', 'totals', 'subtotal', 'sub-total', 'grand total', 'sum']
+
+# Statement fields used to detect duplicate lines
+DEDUP_FIELDS = ['Customer', 'Policy Number', 'Effective Date', 'Agent Paid Amount (STMT)']
+
+# Tolerance for "balance equals statement amount" matches
+AMOUNT_TOLERANCE = 0.05
+
+
+class StageTimer:
+    """Collect wall-clock timings per named stage."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def resolve_statement_column(statement_df: pd.DataFrame, mapped_col) -> Optional[int]:
+    """
+    Resolve a column mapping entry to a column position.
+    Numeric mappings are positional indexes; otherwise the column name is matched
+    exactly, then case-insensitively.
+    """
+    try:
+        col_index = int(mapped_col)
+        if 0 <= col_index < len(statement_df.columns):
+            return col_index
+        return None
+    except (ValueError, TypeError):
+        pass
+
+    columns = list(statement_df.columns)
+    if mapped_col in columns:
+        return columns.index(mapped_col)
+
+    mapped_lower = str(mapped_col).lower()
+    for position, col in enumerate(columns):
+        if str(col).lower() == mapped_lower:
+            return position
+    return None
+
+
+def _map_unique(series: pd.Series, func: Callable) -> pd.Series:
+    """Apply func once per distinct value of a series."""
+    cache = {}
+
+    def cached(value):
+        try:
+            if value not in cache:
+                cache[value] = func(value)
+            return cache[value]
+        except TypeError:
+            # Unhashable value
+            return func(value)
+
+    return series.map(cached)
+
+
+def clean_text_value(value) -> str:
+    """Stripped text, or '' for missing/blank/'nan'/'none' values."""
+    if pd.notna(value) and str(value).strip() and str(value).strip().lower() not in ['nan', 'none']:
+        return str(value).strip()
+    return ''
+
+
+def to_amount(value) -> float:
+    """Float value of a statement amount, 0 when missing or not numeric."""
+    try:
+        return float(value) if pd.notna(value) else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def normalize_match_date(value):
+    """Normalize a date to YYYY-MM-DD for matching keys (missing values are returned unchanged)."""
+    if pd.notna(value):
+        try:
+            return pd.to_datetime(value).strftime('%Y-%m-%d')
+        except Exception:
+            return str(value)
+    return value
+
+
+def dedupe_statement_rows(statement_df: pd.DataFrame, column_mapping: dict) -> Tuple[pd.DataFrame, int]:
+    """Drop duplicate statement lines (same customer, policy, date and amount). Returns (df, removed_count)."""
+    if statement_df.empty:
+        return statement_df, 0
+
+    dedup_cols = []
+    for field in DEDUP_FIELDS:
+        if field in column_mapping:
+            try:
+                col_index = int(column_mapping[field])
+                if 0 <= col_index < len(statement_df.columns):
+                    dedup_cols.append(col_index)
+            except ValueError:
+                if column_mapping[field] in statement_df.columns:
+                    dedup_cols.append(column_mapping[field])
+
+    if not dedup_cols:
+        return statement_df, 0
+
+    original_count = len(statement_df)
+    statement_df = statement_df.drop_duplicates(subset=dedup_cols, keep='first')
+    return statement_df, original_count - len(statement_df)
+
+
+def extract_statement_fields(statement_df: pd.DataFrame, column_mapping: dict) -> pd.DataFrame:
+    """
+    Extract the mapped statement fields for all rows at once.
+    Returns a frame (same index as statement_df) with customer, policy_number,
+    effective_date (normalized), amount and agency_amount columns.
+    """
+    def mapped_series(field):
+        if field not in column_mapping:
+            return None
+        position = resolve_statement_column(statement_df, column_mapping[field])
+        if position is None:
+            return None
+        return statement_df.iloc[:, position]
+
+    fields = pd.DataFrame(index=statement_df.index)
+
+    for field, name in [('Customer', 'customer'), ('Policy Number', 'policy_number')]:
+        series = mapped_series(field)
+        fields[name] = _map_unique(series, clean_text_value) if series is not None else ''
+
+    for field, name in [('Agent Paid Amount (STMT)', 'amount'), ('Agency Comm Received (STMT)', 'agency_amount')]:
+        series = mapped_series(field)
+        fields[name] = _map_unique(series, to_amount) if series is not None else 0
+
+    series = mapped_series('Effective Date')
+    fields['effective_date'] = _map_unique(series, normalize_match_date).astype(object) if series is not None else None
+
+    return fields
+
+
+def total_row_mask(fields: pd.DataFrame) -> pd.Series:
+    """Rows whose customer name looks like a statement total."""
+    total_pattern = '|'.join(re.escape(word) for word in TOTAL_ROW_WORDS)
+    return fields['customer'].str.lower().str.contains(total_pattern, na=False)
+
+
+def statement_row_mask(fields: pd.DataFrame) -> pd.Series:
+    """Rows to match: not total rows, and with a customer or a policy number (summary rows have neither)."""
+    if fields.empty:
+        return pd.Series(False, index=fields.index)
+
+    no_identity = (fields['customer'] == '') & (fields['policy_number'] == '')
+    return ~total_row_mask(fields) & ~no_identity
+
+
+class StatementMatchIndex:
+    """Hash indexes over outstanding transactions for statement matching."""
+
+    def __init__(self, outstanding_trans: pd.DataFrame):
+        self.by_policy_date: Dict[str, dict] = {}
+        self.by_customer: Dict[str, List[dict]] = {}
+        self.by_customer_policy: Dict[Tuple[str, str], List[dict]] = {}
+        self.by_customer_raw_policy: Dict[tuple, List[dict]] = {}
+
+        if outstanding_trans is None or outstanding_trans.empty:
+            return
+
+        normalized_dates = _map_unique(outstanding_trans['Effective Date'], normalize_match_date).tolist()
+        records = outstanding_trans.to_dict('records')
+
+        for trans_dict, eff_date_normalized in zip(records, normalized_dates):
+            trans_dict['balance'] = trans_dict['_balance']
+
+            # (policy, effective date) key - later rows win, as with a plain dict lookup
+            policy_key = f"{trans_dict['Policy Number']}_{eff_date_normalized}"
+            self.by_policy_date[policy_key] = trans_dict
+
+            customer = trans_dict.get('Customer')
+            if pd.notna(customer):
+                customer_key = str(customer).lower().strip()
+                self.by_customer.setdefault(customer_key, []).append(trans_dict)
+
+                policy_raw = trans_dict.get('Policy Number')
+                policy_stripped = str(trans_dict.get('Policy Number', '')).strip()
+                self.by_customer_policy.setdefault((customer_key, policy_stripped), []).append(trans_dict)
+                try:
+                    self.by_customer_raw_policy.setdefault((customer_key, policy_raw), []).append(trans_dict)
+                except TypeError:
+                    pass
+
+    def lookup_policy_date(self, policy_num: str, eff_date) -> Optional[dict]:
+        return self.by_policy_date.get(f"{policy_num}_{eff_date}")
+
+    def customer_transactions(self, customer_key: str) -> Optional[List[dict]]:
+        return self.by_customer.get(customer_key)
+
+    def customer_policy_transactions(self, customer_key: str, policy_num: str, stripped: bool = True) -> List[dict]:
+        if stripped:
+            return self.by_customer_policy.get((customer_key, policy_num), [])
+        return self.by_customer_raw_policy.get((customer_key, policy_num), [])
+
+
+def _amount_matches(trans: dict, amount: float) -> bool:
+    return amount > 0 and abs(trans['balance'] - amount) / amount <= AMOUNT_TOLERANCE
+
+
+def _resolve_customer_policy(candidates: List[dict], amount: float) -> Tuple[Optional[dict], bool]:
+    """
+    Pick the transaction for a customer + policy match.
+    Returns (transaction, amount_matched); prefers the first one whose balance matches the amount.
+    """
+    for trans in candidates:
+        if _amount_matches(trans, amount):
+            return trans, True
+    if candidates:
+        return candidates[0], False
+    return None, False
+
+
+def match_statement_rows(statement_df: pd.DataFrame, fields: pd.DataFrame, index: StatementMatchIndex,
+                         all_customers: List[str],
+                         find_customer_matches: Callable[[str, List[str]], list]) -> dict:
+    """
+    Resolve every statement line against the indexes.
+
+    Args:
+        statement_df: Deduplicated statement
+        fields: Output of extract_statement_fields for statement_df
+        index: StatementMatchIndex over the outstanding transactions
+        all_customers: Customer names in the book (for fuzzy matching)
+        find_customer_matches: Fuzzy customer matcher returning (name, match_type, score) tuples
+
+    Returns:
+        dict with matched, unmatched and can_create lists plus stats
+    """
+    matched, unmatched, can_create = [], [], []
+    stats = {
+        'total_rows': len(fields),
+        'skipped_totals': 0,
+        'skipped_empty': 0,
+        'policy_date_attempts': 0,
+        'customer_attempts': 0,
+        'matched': 0,
+        'unmatched': 0,
+        'can_create': 0
+    }
+
+    keep = statement_row_mask(fields)
+    if not fields.empty:
+        is_total = total_row_mask(fields)
+        stats['skipped_totals'] = int(is_total.sum())
+        stats['skipped_empty'] = int((~keep & ~is_total).sum())
+
+    kept = fields[keep]
+    statement_records = dict(zip(statement_df.index, statement_df.to_dict('records')))
+    customer_match_cache = {}
+
+    for idx, customer, policy_num, eff_date, amount, agency_amount in zip(
+            kept.index, kept['customer'], kept['policy_number'], kept['effective_date'],
+            kept['amount'], kept['agency_amount']):
+
+        match_result = {
+            'row_index': idx,
+            'customer': customer,
+            'policy_number': policy_num,
+            'effective_date': eff_date,
+            'amount': amount,  # Agent Paid Amount (primary)
+            'agency_amount': agency_amount,  # Agency Comm Received (audit)
+            'statement_data': statement_records[idx]
+        }
+
+        # Policy Number + Effective Date (highest confidence)
+        stats['policy_date_attempts'] += 1
+        trans = index.lookup_policy_date(policy_num, eff_date)
+        if trans is not None:
+            match_result['match'] = trans
+            match_result['confidence'] = 100
+            match_result['match_type'] = 'Policy + Date'
+            matched.append(match_result)
+            continue
+
+        # Enhanced customer matching (memoized per distinct customer name)
+        stats['customer_attempts'] += 1
+        if customer not in customer_match_cache:
+            customer_match_cache[customer] = find_customer_matches(customer, all_customers)
+        potential_customers = customer_match_cache[customer]
+
+        if potential_customers:
+            if len(potential_customers) == 1 and potential_customers[0][2] >= 90:
+                # Single high-confidence match - try to find transaction
+                matched_customer = potential_customers[0][0]
+                customer_key = matched_customer.lower().strip()
+                customer_trans = index.customer_transactions(customer_key)
+
+                if customer_trans is not None:
+                    policy_num_stripped = str(policy_num).strip() if policy_num else ""
+                    candidates = index.customer_policy_transactions(customer_key, policy_num_stripped) if policy_num_stripped else []
+                    trans, amount_matched = _resolve_customer_policy(candidates, amount)
+                    if trans is not None:
+                        match_result['match'] = trans
+                        match_result['confidence'] = 90 if amount_matched else 95
+                        suffix = ' + Policy + Amount' if amount_matched else ' + Policy'
+                        match_result['match_type'] = f'{potential_customers[0][1]}{suffix}'
+                        match_result['matched_customer'] = matched_customer
+                        matched.append(match_result)
+                    else:
+                        # No policy match - needs manual selection
+                        match_result['potential_matches'] = customer_trans
+                        match_result['potential_customers'] = potential_customers
+                        match_result['needs_selection'] = True
+                        unmatched.append(match_result)
+                else:
+                    # Customer found but no transactions in lookup - still needs manual selection
+                    match_result['potential_customers'] = potential_customers
+                    match_result['needs_selection'] = True
+                    unmatched.append(match_result)
+            else:
+                # Multiple potential matches or low confidence - needs manual selection
+                match_result['potential_customers'] = potential_customers
+                match_result['needs_selection'] = True
+
+                all_potential_trans = []
+                for potential_customer, match_type, score in potential_customers[:5]:  # Limit to top 5
+                    for trans in index.customer_transactions(potential_customer.lower().strip()) or []:
+                        trans_copy = trans.copy()  # Avoid modifying original
+                        trans_copy['_customer_match'] = potential_customer
+                        trans_copy['_match_type'] = match_type
+                        trans_copy['_match_score'] = score
+                        all_potential_trans.append(trans_copy)
+
+                if all_potential_trans:
+                    match_result['potential_matches'] = all_potential_trans
+
+                unmatched.append(match_result)
+        else:
+            # No fuzzy match found - check if exact customer exists
+            customer_key = customer.lower().strip()
+            customer_matches = index.customer_transactions(customer_key)
+            if customer_matches is not None:
+                candidates = index.customer_policy_transactions(customer_key, policy_num, stripped=False) if policy_num else []
+                trans, amount_matched = _resolve_customer_policy(candidates, amount)
+                if trans is not None:
+                    match_result['match'] = trans
+                    match_result['confidence'] = 90 if amount_matched else 95
+                    match_result['match_type'] = 'Customer + Policy + Amount' if amount_matched else 'Customer + Policy'
+                    matched.append(match_result)
+                else:
+                    # No policy match - needs selection
+                    match_result['potential_matches'] = customer_matches
+                    match_result['potential_customers'] = [(customer, 'exact', 100)]
+                    match_result['needs_selection'] = True
+                    unmatched.append(match_result)
+            else:
+                # No match found - can create new transaction
+                match_result['can_create'] = True
+                can_create.append(match_result)
+
+    stats['matched'] = len(matched)
+    stats['unmatched'] = len(unmatched)
+    stats['can_create'] = len(can_create)
+
+    return {
+        'matched': matched,
+        'unmatched': unmatched,
+        'can_create': can_create,
+        'stats': stats
+    }
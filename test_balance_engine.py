@@ -0,0 +1,201 @@
+"""
+Test that the vectorized balance engine matches the original per-row balance loop
+and the original per-row as-earned calculation.
+Run with: pytest test_balance_engine.py
+"""
+
+import datetime
+import random
+import string
+
+import numpy as np
+import pandas as pd
+
+from balance_engine import build_balance_frame, calculate_as_earned_balances, get_payment_frequency
+
+
+def legacy_balances(all_data):
+    """
+    Reference implementation of the original calculate_transaction_balances loop.
+    Same per-row filter of all_data by (stripped Policy Number, parsed Effective Date,
+    -STMT-/-VOID- Transaction ID); the column conversions are hoisted out of the loop
+    so the O(N^2) scan finishes in reasonable time on a 50k-row book.
+    """
+    original_trans = all_data[
+        ~all_data['Transaction ID'].str.contains('-STMT-|-ADJ-|-VOID-', na=False)
+    ].copy()
+
+    normalized_dates = pd.to_datetime(all_data['Effective Date'], format='mixed', errors='coerce')
+    policy_stripped = all_data['Policy Number'].astype(str).str.strip().to_numpy()
+    dates = normalized_dates.to_numpy()
+    raw_dates = all_data['Effective Date'].to_numpy()
+    recon_mask = all_data['Transaction ID'].str.contains('-STMT-|-VOID-', na=False).to_numpy()
+    paid = all_data['Agent Paid Amount (STMT)'].fillna(0).to_numpy()
+
+    for idx, row in original_trans.iterrows():
+        total_agent_comm = row['Total Agent Comm'] if 'Total Agent Comm' in row.index else 0
+        if pd.isna(total_agent_comm) or total_agent_comm == 0:
+            agent_est_comm = row.get('Agent Estimated Comm $', 0)
+            if pd.isna(agent_est_comm):
+                agent_est_comm = 0
+            broker_fee_comm = row.get('Broker Fee Agent Comm', 0)
+            if pd.isna(broker_fee_comm):
+                broker_fee_comm = 0
+            total_agent_comm = float(agent_est_comm or 0) + float(broker_fee_comm or 0)
+        credit = float(total_agent_comm or 0)
+
+        policy_num_stripped = str(row['Policy Number']).strip()
+        effective_date_normalized = normalized_dates.at[idx]
+        if pd.notna(effective_date_normalized):
+            mask = (policy_stripped == policy_num_stripped) & (dates == effective_date_normalized.to_datetime64()) & recon_mask
+        else:
+            mask = (policy_stripped == policy_num_stripped) & (raw_dates == row['Effective Date']) & recon_mask
+
+        debit = paid[mask].sum() if mask.any() else 0
+        original_trans.at[idx, '_balance'] = credit - debit
+
+    return original_trans
+
+
+def _random_id(rng):
+    return ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(7))
+
+
+def generate_book(n_rows, seed=7):
+    """Generate a synthetic book of originals plus STMT/VOID/ADJ entries."""
+    rng = random.Random(seed)
+    n_policies = max(1, n_rows // 5)
+    policies = [f"POL-{i:06d}" for i in range(n_policies)]
+    date_formats = ['%m/%d/%Y', '%Y-%m-%d']
+    rows = []
+    while len(rows) < n_rows:
+        policy = rng.choice(policies)
+        eff = pd.Timestamp('2022-01-01') + pd.Timedelta(days=rng.randrange(0, 1200))
+        eff_str = eff.strftime(rng.choice(date_formats))
+        total = rng.choice([np.nan, 0, round(rng.uniform(10, 900), 2)])
+        rows.append({
+            'Transaction ID': _random_id(rng) + rng.choice(['', '', '-IMPORT']),
+            'Policy Number': policy + rng.choice(['', ' ']),
+            'Effective Date': eff_str,
+            'Total Agent Comm': total,
+            'Agent Estimated Comm $': rng.choice([np.nan, round(rng.uniform(5, 500), 2)]),
+            'Broker Fee Agent Comm': rng.choice([np.nan, 0, 25.0]),
+            'Agent Paid Amount (STMT)': np.nan,
+        })
+        # Payments and adjustments for the same term, in either date format
+        for _ in range(rng.randrange(0, 4)):
+            kind = rng.choice(['STMT', 'STMT', 'VOID', 'ADJ'])
+            amount = round(rng.uniform(1, 400), 2)
+            rows.append({
+                'Transaction ID': f"{_random_id(rng)}-{kind}-20250101",
+                'Policy Number': rng.choice([policy, policy + ' ', ' ' + policy]),
+                'Effective Date': eff.strftime(rng.choice(date_formats)),
+                'Total Agent Comm': np.nan,
+                'Agent Estimated Comm $': np.nan,
+                'Broker Fee Agent Comm': np.nan,
+                'Agent Paid Amount (STMT)': -amount if kind == 'VOID' else rng.choice([amount, np.nan]),
+            })
+    book = pd.DataFrame(rows[:n_rows])
+    # A few unparseable dates exercise the raw-value fallback
+    bad = book.sample(n=min(50, len(book)), random_state=seed).index
+    book.loc[bad, 'Effective Date'] = 'TBD'
+    return book
+
+
+def test_matches_legacy_on_small_book():
+    book = generate_book(2_000)
+    expected = legacy_balances(book)
+    actual = build_balance_frame(book)
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_allclose(actual['_balance'].to_numpy(), expected['_balance'].to_numpy(), atol=1e-6)
+
+
+def test_matches_legacy_on_50k_book():
+    book = generate_book(50_000)
+    expected = legacy_balances(book)
+    actual = build_balance_frame(book)
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_allclose(actual['_balance'].to_numpy(), expected['_balance'].to_numpy(), atol=1e-6)
+
+
+def test_empty_and_missing_columns():
+    assert build_balance_frame(pd.DataFrame()).empty
+    assert build_balance_frame(pd.DataFrame({'Policy Number': ['A']})).empty
+
+
+def test_reconciliation_only_book_is_empty():
+    book = pd.DataFrame({
+        'Transaction ID': ['ABC1234-STMT-20250101'],
+        'Policy Number': ['A'],
+        'Effective Date': ['01/01/2025'],
+        'Agent Paid Amount (STMT)': [10.0],
+    })
+    assert build_balance_frame(book).empty
+
+
+def legacy_as_earned_balance(transaction, now):
+    """Original calculate_as_earned_balance (row by row), with now passed in."""
+    trans_id = str(transaction.get('Transaction ID', ''))
+    if '-STMT-' in trans_id:
+        paid_amount = transaction.get('Agent Paid Amount (STMT)', 0)
+        try:
+            paid_amount = float(paid_amount) if paid_amount is not None else 0
+        except (ValueError, TypeError):
+            paid_amount = 0
+        if pd.isna(paid_amount):
+            paid_amount = 0
+        return -paid_amount if paid_amount != 0 else None
+
+    payment_plan = transaction.get('AS EARNED PMT PLAN') or transaction.get('AS_EARNED_PMT_PLAN')
+    frequency = get_payment_frequency(payment_plan)
+    if not frequency:
+        return None
+
+    effective_date = transaction.get('Effective Date')
+    total_comm = transaction.get('Total Agent Comm', 0)
+    try:
+        total_comm = float(total_comm) if total_comm is not None else 0
+    except (ValueError, TypeError):
+        total_comm = 0
+    if pd.isna(total_comm):
+        total_comm = 0
+    if not effective_date or total_comm == 0:
+        return None
+
+    start_date = pd.to_datetime(effective_date, errors='coerce')
+    if pd.isna(start_date):
+        months_elapsed = 0
+    else:
+        months_elapsed = max(0, (now.year - start_date.year) * 12 + (now.month - start_date.month) + 1)
+    if months_elapsed <= 0:
+        return 0
+
+    if frequency == 1:
+        return total_comm
+    payment_amount = total_comm / frequency
+    return payment_amount * min(months_elapsed, frequency)
+
+
+def generate_payment_plan_book(n_rows, seed=11):
+    rng = random.Random(seed)
+    plans = [None, '', 'FULL', 'monthly', 'Quarterly ', '12-PAY', '4-PAY', '0-PAY', 'X-PAY', 'WEEKLY', 'other']
+    rows = []
+    for _ in range(n_rows):
+        eff = pd.Timestamp('2024-01-01') + pd.Timedelta(days=rng.randrange(0, 1000))
+        rows.append({
+            'Transaction ID': _random_id(rng) + rng.choice(['', '', '-STMT-20250101']),
+            'AS EARNED PMT PLAN': rng.choice(plans),
+            'Effective Date': rng.choice([eff.strftime('%m/%d/%Y'), eff.strftime('%Y-%m-%d'), '', 'not a date']),
+            'Total Agent Comm': rng.choice([np.nan, 0, round(rng.uniform(10, 900), 2), '125.50']),
+            'Agent Paid Amount (STMT)': rng.choice([np.nan, 0, round(rng.uniform(5, 500), 2)]),
+        })
+    return pd.DataFrame(rows)
+
+
+def test_as_earned_matches_scalar_version():
+    book = generate_payment_plan_book(5_000)
+    now = datetime.datetime(2025, 6, 15, 12, 0)
+    expected = book.apply(lambda row: legacy_as_earned_balance(row, now), axis=1).astype(float)
+    actual = calculate_as_earned_balances(book, now=now)
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), equal_nan=True)
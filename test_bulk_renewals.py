@@ -0,0 +1,98 @@
+"""
+Test bulk renewal row generation and the partial-failure handling of the bulk write.
+Run with: pytest test_bulk_renewals.py
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from bulk_renewals import RENEWAL_AGENT_RATE, build_renewal_rows, write_renewals
+from commission_rule_resolver import CommissionRuleResolver
+from conftest import FakeSupabase
+
+
+def make_supabase(existing_ids=()):
+    """Policies keyed by Transaction ID; existing IDs make their inserts fail as duplicates."""
+    return FakeSupabase(tables={'policies': [{'Transaction ID': tid} for tid in existing_ids]},
+                        primary_keys={'policies': ('Transaction ID',)})
+
+
+def make_pending():
+    return pd.DataFrame({
+        'Transaction ID': ['T1', 'T2', 'T3'],
+        'Policy Number': ['P1', 'P2', 'P3'],
+        'Transaction Type': ['NEW', 'RWL', 'NEW'],
+        'Policy Term': [12, None, 6],
+        'carrier_id': ['c1', 'c1', 'c2'],
+        'Policy Type': ['HO3', 'AUTO', 'HO3'],
+        'Premium Sold': [1000.0, 500.0, 250.0],
+        'Policy Gross Comm %': [10.0, 10.0, 8.0],
+        'Edit': [True, True, True],
+        'Days Until Expiration': [-5, 3, 10],
+        'expiration_date': pd.to_datetime(['2025-01-31', '2025-03-15', None]),
+    }, index=[7, 8, 9])
+
+
+RULES = [{'rule_id': 'r1', 'carrier_id': 'c1', 'mga_id': None, 'policy_type': None,
+          'new_rate': 15.0, 'renewal_rate': 12.0, 'effective_date': '2020-01-01', 'is_active': True}]
+
+
+def test_build_renewal_rows():
+    built = build_renewal_rows(make_pending(), ['N1', 'N2', 'N3'], CommissionRuleResolver(RULES))
+    renewals = built['renewals']
+
+    assert list(built['skipped'].index) == [9]
+    assert list(renewals.index) == [7, 8]
+    assert list(renewals['Transaction ID']) == ['N1', 'N2']
+    assert list(renewals['Transaction Type']) == ['RWL', 'RWL']
+    assert list(renewals['Prior Policy Number']) == ['P1', 'P2']
+    # New term starts at the old expiration; 12 month term and the 6 month default
+    assert list(renewals['Effective Date']) == ['2025-01-31', '2025-03-15']
+    assert list(renewals['X-DATE']) == ['2026-01-31', '2025-09-15']
+    assert list(renewals['Policy Gross Comm %']) == [12.0, 12.0]
+    assert (renewals['Agent Comm %'] == RENEWAL_AGENT_RATE).all()
+    assert renewals['Premium Sold'].isna().all()
+    assert 'Edit' not in renewals.columns and 'expiration_date' not in renewals.columns
+
+
+def test_expiration_column_fallback_and_missing():
+    pending = make_pending().rename(columns={'expiration_date': 'X-DATE'})
+    pending['X-DATE'] = ['01/31/2025', '2025-03-15', None]
+    built = build_renewal_rows(pending, ['N1', 'N2', 'N3'])
+    assert list(built['renewals']['Effective Date']) == ['2025-01-31', '2025-03-15']
+    assert list(built['skipped'].index) == [9]
+
+    with pytest.raises(ValueError, match='expiration_date or X-DATE'):
+        build_renewal_rows(pending.drop(columns='X-DATE'), ['N1', 'N2', 'N3'])
+
+
+def test_write_renewals_reports_partial_failures():
+    pending = make_pending()
+    built = build_renewal_rows(pending, ['N1', 'N2', 'N3'])
+    supabase = make_supabase(existing_ids={'N2'})
+    progress = []
+
+    written = write_renewals(supabase, pending, built['renewals'], 'B1',
+                             progress_callback=lambda done, total: progress.append((done, total)))
+
+    assert list(written['renewed']) == [7]
+    assert list(written['failed']) == [8]
+    assert len(written['policies'].errors) == 1
+    # History only for the renewal that was written
+    assert [len(request.rows) for request in supabase.executed('renewal_history')] == [1]
+    assert progress[-1] == (3, 4)
+
+
+def test_history_rows_match_single_renewal_format():
+    pending = make_pending()
+    built = build_renewal_rows(pending, ['N1', 'N2', 'N3'])
+    supabase = make_supabase()
+
+    write_renewals(supabase, pending, built['renewals'], 'B1')
+    rows = supabase.rows('renewal_history')
+
+    assert [row['original_transaction_id'] for row in rows] == ['T1', 'T2']
+    details = json.loads(rows[0]['details'])
+    assert details['renewed_ids'] == ['N1'] and details['batch_id'] == 'B1'
@@ -0,0 +1,99 @@
+"""
+Test the bulk write pipeline: chunking, per-row isolation of failed chunks,
+stop/resume positions and bulk insert options.
+Run with: pytest test_bulk_writer.py
+"""
+
+from bulk_writer import insert_op, update_op, write_operations
+from conftest import FakeResponse, FakeSupabase
+
+
+def make_supabase(existing_ids=()):
+    """Policies keyed by Transaction ID; existing IDs make their inserts fail as duplicates."""
+    return FakeSupabase(tables={'policies': [{'Transaction ID': tid} for tid in existing_ids]},
+                        primary_keys={'policies': ('Transaction ID',)},
+                        defaults={'policies': {'reconciliation_status': 'unreconciled'}})
+
+
+def written(supabase):
+    return [(request.method, len(request.rows)) for request in supabase.executed('policies')]
+
+
+def policy_ops(count, prefix='T'):
+    return [insert_op('policies', {'Transaction ID': f"{prefix}{i}", 'user_id': 'u1'}) for i in range(count)]
+
+
+def test_chunks_keep_order_and_use_column_defaults():
+    operations = (policy_ops(5)
+                  + [update_op('policies', {'reconciliation_status': 'reconciled'}, 'Transaction ID', f"T{i}")
+                     for i in range(3)]
+                  + [insert_op('policies', {'Transaction ID': 'S1', 'created_at': '2025-01-01'})])
+    supabase = make_supabase()
+    progress = []
+
+    result = write_operations(supabase, operations, filters=[('eq', 'user_id', 'u1')], batch_size=2,
+                              progress_callback=lambda done, total: progress.append((done, total)))
+
+    assert result.completed and result.written == 9
+    assert [method for method, _rows in written(supabase)] == ['insert'] * 3 + ['update'] * 2 + ['insert']
+    # Equal updates go out as one in_() call, with the extra filters
+    first_update = supabase.executed('policies', 'update')[0]
+    assert first_update.filter_values('Transaction ID') == ['T0', 'T1']
+    assert first_update.filter_values('user_id') == ['u1']
+    # Rows missing a column get the column default, not NULL
+    assert all(request.default_to_null is False for request in supabase.executed('policies', 'insert'))
+    statuses = {row['Transaction ID']: row['reconciliation_status'] for row in supabase.rows('policies')}
+    assert statuses == {'T0': 'reconciled', 'T1': 'reconciled', 'T2': 'reconciled',
+                        'T3': 'unreconciled', 'T4': 'unreconciled', 'S1': 'unreconciled'}
+    assert progress[-1] == (9, 9)
+
+
+def test_failed_chunk_isolates_bad_rows():
+    supabase = make_supabase(existing_ids=['T3'])
+
+    result = write_operations(supabase, policy_ops(6), batch_size=4, stop_on_error=False)
+
+    assert [error['index'] for error in result.errors] == [3]
+    assert result.errors[0]['transaction_id'] == 'T3'
+    assert 'duplicate key' in result.errors[0]['error']
+    assert result.written == 5
+    # Failed chunk retried row by row, the next chunk still sent in bulk
+    assert written(supabase) == [('insert', 4)] + [('insert', 1)] * 4 + [('insert', 2)]
+
+
+def test_stop_on_error_and_resume():
+    operations = policy_ops(10)
+    supabase = make_supabase(existing_ids=['T4'])
+
+    result = write_operations(supabase, operations, batch_size=3)
+
+    assert not result.completed
+    assert result.next_index == 6
+    assert [row['Transaction ID'] for row in supabase.rows('policies')] == ['T4', 'T0', 'T1', 'T2', 'T3', 'T5']
+    remaining = result.remaining_operations()
+    assert [op[2]['Transaction ID'] for op in remaining] == ['T4', 'T6', 'T7', 'T8', 'T9']
+
+    # The conflicting row is removed, then the run is resumed
+    supabase.tables['policies'] = [row for row in supabase.rows('policies') if row['Transaction ID'] != 'T4']
+    resumed = write_operations(supabase, remaining, batch_size=3)
+    assert resumed.completed and resumed.written == 5
+    assert sorted(row['Transaction ID'] for row in supabase.rows('policies')) == sorted(f"T{i}" for i in range(10))
+
+
+def test_short_bulk_response_is_reported_not_retried():
+    supabase = make_supabase()
+    # The server saves a multi-row insert but returns one row fewer
+    supabase.after_execute.append(
+        lambda request, response: FakeResponse(response.data[:-1]) if len(request.rows) > 1 else response)
+
+    result = write_operations(supabase, policy_ops(4), batch_size=3, stop_on_error=False)
+
+    # The 3-row chunk was sent once and not retried per row (it may have been saved)
+    assert len(supabase.rows('policies')) == 4
+    assert written(supabase) == [('insert', 3), ('insert', 1)]
+    assert result.written == 1
+    assert [error['index'] for error in result.errors] == [0, 1, 2]
+    assert not any(error['retryable'] for error in result.errors)
+    assert 'not retried' in result.errors[0]['error']
+    # Uncertain rows are not queued for a resume
+    assert result.remaining_operations() == []
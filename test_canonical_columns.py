@@ -0,0 +1,68 @@
+"""
+Test that the canonical typed columns give the same results as re-parsing the raw columns.
+Run with: pytest test_canonical_columns.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from balance_engine import build_balance_frame
+from canonical_columns import (
+    PAYMENT_KINDS, RECONCILIATION_KINDS, TransactionKind, align_canonical_columns,
+    build_canonical_columns, kind_mask
+)
+from dashboard_metrics import build_policy_summary
+from pending_renewals import RenewalIndex
+from test_balance_engine import generate_book
+
+
+def make_book():
+    book = generate_book(3_000)
+    book['_id'] = np.arange(len(book)) + 1
+    book['X-DATE'] = (pd.to_datetime(book['Effective Date'], format='mixed', errors='coerce') + pd.DateOffset(months=12)).dt.strftime('%Y-%m-%d')
+    book['Transaction Type'] = np.where(np.arange(len(book)) % 3 == 0, 'RWL', 'NEW')
+    return book
+
+
+def test_transaction_kinds_match_id_patterns():
+    ids = pd.Series(['A1', 'A1-IMPORT-20250101', 'A1-STMT-20250101', 'A1-VOID-20250101', 'A1-ADJ-1', None])
+    canonical = build_canonical_columns(pd.DataFrame({'Transaction ID': ids}))
+    assert list(canonical['transaction_kind']) == [TransactionKind.ORIGINAL, TransactionKind.IMPORT, TransactionKind.STMT,
+                                                   TransactionKind.VOID, TransactionKind.ADJ, TransactionKind.ORIGINAL]
+
+    book = make_book()
+    canonical = build_canonical_columns(book)
+    ids = book['Transaction ID']
+    assert kind_mask(canonical, RECONCILIATION_KINDS).equals(ids.str.contains('-STMT-|-ADJ-|-VOID-', na=False))
+    assert kind_mask(canonical, PAYMENT_KINDS).equals(ids.str.contains('-STMT-|-VOID-', na=False))
+
+
+def test_consumers_match_without_canonical():
+    book = make_book()
+    canonical = build_canonical_columns(book)
+
+    expected = build_balance_frame(book)
+    actual = build_balance_frame(book, canonical)
+    np.testing.assert_allclose(actual['_balance'].to_numpy(), expected['_balance'].to_numpy())
+
+    expected_terms = build_policy_summary(book)['terms']
+    actual_terms = build_policy_summary(book, canonical)['terms']
+    pd.testing.assert_frame_equal(actual_terms, expected_terms, check_dtype=False)
+
+    today = pd.Timestamp('2024-06-01')
+    expected_pending = RenewalIndex(book).pending(today)
+    actual_pending = RenewalIndex(book, canonical=canonical).pending(today)
+    assert list(actual_pending['Transaction ID']) == list(expected_pending['Transaction ID'])
+
+
+def test_alignment_requires_matching_ids():
+    book = make_book()
+    canonical = build_canonical_columns(book)
+
+    subset = book[book['Total Agent Comm'] > 100]
+    aligned = align_canonical_columns(canonical, subset)
+    assert aligned is not None and list(aligned.index) == list(subset.index)
+
+    # Re-indexed or aggregated frames are never paired with the wrong rows
+    assert align_canonical_columns(canonical, subset.reset_index(drop=True)) is None
+    assert align_canonical_columns(canonical, book.drop(columns=['_id'])) is None
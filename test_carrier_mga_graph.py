@@ -0,0 +1,40 @@
+"""
+Test that the carrier/MGA graph answers the same MGA lists as the per-carrier lookups.
+Run with: pytest test_carrier_mga_graph.py
+"""
+
+from carrier_mga_graph import CarrierMgaGraph, fetch_carrier_mga_links
+from conftest import FakeSupabase
+
+
+ZETA = {'mga_name': 'Zeta MGA', 'status': 'Active'}
+ALPHA = {'mga_name': 'Alpha MGA', 'status': 'Active'}
+OLD = {'mga_name': 'Old MGA', 'status': 'Inactive'}
+
+
+def test_graph_from_relationships_and_rules():
+    supabase = FakeSupabase(tables={
+        'carrier_mga_relationships': [
+            {'carrier_id': 'c1', 'mga_id': 'm1', 'mgas': ZETA, 'user_id': 'u1'},
+            {'carrier_id': 'c1', 'mga_id': 'm2', 'mgas': ALPHA, 'user_id': 'u1'},
+            {'carrier_id': 'c2', 'mga_id': 'm1', 'mgas': ZETA, 'user_id': 'u2'},
+        ],
+        'commission_rules': [
+            {'carrier_id': 'c1', 'mga_id': 'm1', 'mgas': ZETA, 'user_id': 'u1'},
+            {'carrier_id': 'c2', 'mga_id': 'm3', 'mgas': OLD, 'user_id': 'u1'},
+            {'carrier_id': 'c3', 'mga_id': None, 'mgas': None, 'user_id': 'u1'},
+            {'carrier_id': 'c4', 'mga_id': 'm2', 'mgas': ALPHA, 'user_id': 'u1'},
+        ],
+    })
+
+    graph = CarrierMgaGraph(fetch_carrier_mga_links(supabase, [('eq', 'user_id', 'u1')]))
+
+    # Two queries for the whole graph
+    assert len(supabase.requests) == 2
+    assert graph.mgas_for_carrier('c1') == [{'mga_id': 'm2', 'mga_name': 'Alpha MGA'},
+                                            {'mga_id': 'm1', 'mga_name': 'Zeta MGA'}]
+    assert graph.mgas_for_carrier('c2') == []   # inactive MGA only
+    assert graph.mgas_for_carrier('c3') == []   # direct appointments only
+    assert sorted(graph.carriers_for_mga('m2')) == ['c1', 'c4']
+    assert graph.mga_name('m1') == 'Zeta MGA'
+    assert graph.link_count == 3
@@ -0,0 +1,118 @@
+"""
+Test that CommissionRuleResolver picks the same rule as the original per-query lookup.
+Run with: pytest test_commission_rule_resolver.py
+"""
+
+import datetime
+import random
+
+from commission_rule_resolver import CommissionRuleResolver
+
+
+def legacy_find_rule(rules, carrier_id, mga_id, policy_type, effective_date):
+    """
+    Reference implementation of the original lookup_commission_rule: the commission_rules
+    query (carrier, active, effective_date <= date, end_date null or >= date) followed by
+    the priority scoring and sort.
+    """
+    on_date = effective_date.isoformat()
+    response = [
+        rule for rule in rules
+        if rule['carrier_id'] == carrier_id and rule['is_active']
+        and rule['effective_date'] <= on_date
+        and (rule['end_date'] is None or rule['end_date'] >= on_date)
+    ]
+
+    rules_with_priority = []
+    for rule in response:
+        priority = 0
+        if mga_id and rule.get('mga_id') == mga_id:
+            priority += 1000
+        elif not mga_id and not rule.get('mga_id'):
+            priority += 500
+        elif rule.get('mga_id'):
+            continue
+
+        if policy_type and rule.get('policy_type'):
+            rule_types = [t.strip() for t in rule['policy_type'].split(',')]
+            if policy_type in rule_types:
+                if len(rule_types) == 1 and rule_types[0] == policy_type:
+                    priority += 200
+                else:
+                    priority += 100
+            else:
+                continue
+        elif not rule.get('policy_type'):
+            priority += 10
+
+        rules_with_priority.append((priority, rule))
+
+    if not rules_with_priority:
+        return None
+    rules_with_priority.sort(key=lambda x: (x[0], x[1].get('effective_date', '')), reverse=True)
+    return rules_with_priority[0][1]
+
+
+def generate_rules(n_rules, seed):
+    rng = random.Random(seed)
+    # Few distinct dates so ties on priority and effective date are common
+    starts = [datetime.date(2023, 1, 1), datetime.date(2024, 1, 1), datetime.date(2024, 7, 1), datetime.date(2025, 1, 1)]
+    rules = []
+    for i in range(n_rules):
+        start = rng.choice(starts)
+        end = rng.choice([None, None, start + datetime.timedelta(days=rng.choice([90, 365, 700]))])
+        rules.append({
+            'rule_id': f"r{i:04d}",
+            'carrier_id': rng.choice(['c1', 'c2', 'c3']),
+            'mga_id': rng.choice([None, None, '', 'm1', 'm2']),
+            'policy_type': rng.choice([None, '', 'HO3', 'AUTO', ' DP3 ', 'HO3, AUTO', 'AUTO,DP3', 'HO3,HO3']),
+            'new_rate': round(rng.uniform(5, 20), 2),
+            'renewal_rate': round(rng.uniform(5, 20), 2),
+            'effective_date': start.isoformat(),
+            'end_date': end.isoformat() if end else None,
+            'is_active': rng.random() < 0.9,
+        })
+    return rules
+
+
+def test_matches_legacy_priorities():
+    rng = random.Random(1)
+    for seed in range(20):
+        rules = generate_rules(rng.randrange(5, 80), seed)
+        resolver = CommissionRuleResolver(rules)
+        for _ in range(250):
+            carrier_id = rng.choice(['c1', 'c2', 'c3', 'c4'])
+            mga_id = rng.choice([None, 'm1', 'm2', 'm3'])
+            policy_type = rng.choice([None, 'HO3', 'AUTO', 'DP3', 'BOAT'])
+            on_date = datetime.date(2022, 6, 1) + datetime.timedelta(days=rng.randrange(0, 1400))
+
+            expected = legacy_find_rule(rules, carrier_id, mga_id, policy_type, on_date)
+            actual = resolver.find_rule(carrier_id, mga_id, policy_type, on_date)
+            assert (actual or {}).get('rule_id') == (expected or {}).get('rule_id'), \
+                (seed, carrier_id, mga_id, policy_type, on_date)
+
+
+def test_priorities():
+    rules = [
+        {'rule_id': 'default', 'carrier_id': 'c1', 'mga_id': None, 'policy_type': None,
+         'effective_date': '2024-01-01', 'end_date': None, 'is_active': True},
+        {'rule_id': 'multi', 'carrier_id': 'c1', 'mga_id': None, 'policy_type': 'HO3, AUTO',
+         'effective_date': '2024-01-01', 'end_date': None, 'is_active': True},
+        {'rule_id': 'exact', 'carrier_id': 'c1', 'mga_id': None, 'policy_type': 'HO3',
+         'effective_date': '2023-01-01', 'end_date': '2024-12-31', 'is_active': True},
+        {'rule_id': 'mga', 'carrier_id': 'c1', 'mga_id': 'm1', 'policy_type': None,
+         'effective_date': '2024-01-01', 'end_date': None, 'is_active': True},
+        {'rule_id': 'inactive', 'carrier_id': 'c1', 'mga_id': None, 'policy_type': 'HO3',
+         'effective_date': '2024-06-01', 'end_date': None, 'is_active': False},
+    ]
+    resolver = CommissionRuleResolver(rules)
+    on_date = datetime.date(2024, 8, 1)
+
+    assert resolver.find_rule('c1', None, 'HO3', on_date)['rule_id'] == 'exact'
+    assert resolver.find_rule('c1', None, 'AUTO', on_date)['rule_id'] == 'multi'
+    assert resolver.find_rule('c1', None, 'DP3', on_date)['rule_id'] == 'default'
+    assert resolver.find_rule('c1', 'm1', 'HO3', on_date)['rule_id'] == 'mga'
+    # After the exact rule ends, the multi-type rule applies
+    assert resolver.find_rule('c1', None, 'HO3', datetime.date(2025, 2, 1))['rule_id'] == 'multi'
+    assert resolver.find_rule('c2', None, 'HO3', on_date) is None
+    assert resolver.rule_count == 4
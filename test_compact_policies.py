@@ -0,0 +1,58 @@
+"""
+Test that the compact policies representation round-trips and shrinks the frame.
+Run with: pytest test_compact_policies.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from compact_policies import compact_policies_frame, expand_policies_frame, frame_bytes, session_memory_report
+
+
+def make_policies(rows=5_000, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '_id': np.arange(rows) + 1,
+        'Transaction ID': [f"T{i:07d}" for i in range(rows)],
+        'Customer': [f"Customer {i % 400}" for i in range(rows)],
+        'Carrier Name': rng.choice(['Progressive', 'Travelers', 'Safeco', None], rows),
+        'MGA Name': rng.choice(['Alpha MGA', 'Zeta MGA', None], rows),
+        'Policy Type': rng.choice(['HO3', 'AUTO', 'DFIRE', 'BOAT'], rows),
+        'Transaction Type': rng.choice(['NEW', 'RWL', 'END', 'CAN'], rows),
+        'Policy Number': [f"POL{i % 1500:06d}" for i in range(rows)],
+        'Total Agent Comm': rng.uniform(0, 900, rows).round(2),
+        'is_reconciliation_entry': pd.Series(rng.choice([True, False, None], rows), dtype=object),
+    })
+
+
+def test_round_trip_restores_loader_dtypes():
+    df = make_policies()
+    compact = compact_policies_frame(df)
+
+    assert isinstance(compact['Carrier Name'].dtype, pd.CategoricalDtype)
+    assert str(compact['is_reconciliation_entry'].dtype) == 'boolean'
+    # Unique per row: left alone
+    assert not isinstance(compact['Transaction ID'].dtype, pd.CategoricalDtype)
+
+    expanded = expand_policies_frame(compact)
+    pd.testing.assert_frame_equal(expanded, df)
+    assert expanded['is_reconciliation_entry'].map(type).isin([bool, type(None)]).all()
+
+
+def test_compact_frame_is_smaller():
+    df = make_policies()
+    assert frame_bytes(compact_policies_frame(df)) < 0.7 * frame_bytes(df)
+
+
+def test_session_memory_report():
+    df = make_policies()
+    state = {
+        'policies_data_u1': {'owner': 'u1', 'frames': {'*': compact_policies_frame(df)}},
+        'policy_summary_u1': {'summary': {'terms': df.head(100)}},
+        'user_email': 'a@example.com',
+    }
+    report = session_memory_report(state, compact_key='policies_data_u1')
+
+    assert list(report['key']) == ['policies_data_u1', 'policy_summary_u1']
+    policies = report.iloc[0]
+    assert policies['compact_bytes'] == policies['bytes'] < policies['expanded_bytes']
@@ -0,0 +1,176 @@
+"""
+Test that the customer name index returns the same matches as the original linear scan.
+Run with: pytest test_customer_index.py
+"""
+
+import random
+import string
+import time
+
+from customer_index import CustomerNameIndex, find_customer_matches, get_customer_index, normalize_business_name
+
+
+def legacy_find_matches(search_name, existing_customers):
+    """Reference copy of the original linear-scan find_potential_customer_matches."""
+    if not search_name:
+        return []
+    
+    search_name_lower = search_name.lower().strip()
+    search_normalized = normalize_business_name(search_name).lower()
+    search_first_word = search_name.split()[0].lower() if search_name else ""
+    
+    # Handle "Last, First" format
+    search_name_reversed = ""
+    if "," in search_name:
+        parts = search_name.split(",", 1)
+        if len(parts) == 2:
+            search_name_reversed = f"{parts[1].strip()} {parts[0].strip()}".lower()
+    
+    matches = {}  # Use dict to avoid duplicates
+    
+    for customer in existing_customers:
+        if not customer:
+            continue
+            
+        customer_lower = customer.lower().strip()
+        customer_normalized = normalize_business_name(customer).lower()
+        customer_first_word = customer.split()[0].lower() if customer else ""
+        
+        # 1. Exact match (highest priority)
+        if search_name_lower == customer_lower:
+            matches[customer] = ('exact', 100)
+            continue
+        
+        # 2. Reversed name match (Last, First -> First Last)
+        if search_name_reversed and search_name_reversed == customer_lower:
+            if customer not in matches or matches[customer][1] < 98:
+                matches[customer] = ('name_reversed', 98)
+            continue
+        
+        # 3. Normalized match (very high priority)
+        if search_normalized and search_normalized == customer_normalized:
+            if customer not in matches or matches[customer][1] < 95:
+                matches[customer] = ('normalized', 95)
+            continue
+        
+        # 4. First word match (e.g., "Barboun" matches "Barboun, Thomas")
+        if search_first_word and customer_first_word == search_first_word:
+            if customer not in matches or matches[customer][1] < 90:
+                matches[customer] = ('first_word', 90)
+            continue
+        
+        # 5. Contains match (e.g., "RCM" in "RCM Construction")
+        if len(search_name) >= 3:
+            if search_name_lower in customer_lower:
+                if customer not in matches or matches[customer][1] < 85:
+                    matches[customer] = ('contains', 85)
+                continue
+            
+            # Check if search is contained in normalized version
+            if search_normalized in customer_normalized:
+                if customer not in matches or matches[customer][1] < 83:
+                    matches[customer] = ('normalized_contains', 83)
+                continue
+        
+        # 6. Customer contains search (e.g., searching "RCM Construction" finds "RCM Construction of SWFL LLC")
+        if customer_lower in search_name_lower and len(customer) >= 3:
+            if customer not in matches or matches[customer][1] < 80:
+                matches[customer] = ('reverse_contains', 80)
+            continue
+        
+        # 7. Starts with match
+        if customer_lower.startswith(search_name_lower[:3]) and len(search_name) >= 3:
+            if customer not in matches or matches[customer][1] < 75:
+                matches[customer] = ('starts_with', 75)
+        
+        # 8. Fuzzy word matching (e.g., "Adam Gomes" matches "Gomes Adam" or "Adam J Gomes")
+        search_words = set(search_name_lower.split())
+        customer_words = set(customer_lower.split())
+        if len(search_words) >= 2 and len(customer_words) >= 2:
+            # Check if all search words are in customer name (any order)
+            if search_words.issubset(customer_words):
+                if customer not in matches or matches[customer][1] < 88:
+                    matches[customer] = ('all_words', 88)
+            # Check if most words match
+            elif len(search_words.intersection(customer_words)) >= min(len(search_words), len(customer_words)) - 1:
+                if customer not in matches or matches[customer][1] < 82:
+                    matches[customer] = ('most_words', 82)
+    
+    # Convert to sorted list
+    result = [(name, match_type, score) for name, (match_type, score) in matches.items()]
+    result.sort(key=lambda x: (-x[2], x[0]))  # Sort by score desc, then name
+    
+    return result
+
+
+FIRST_NAMES = ['Adam', 'Maria', 'Thomas', 'Linda', 'Jose', 'Karen', 'RCM', 'Barboun', 'Gomes', 'Lee']
+LAST_NAMES = ['Gomes', 'Smith', 'Barboun', 'Construction', 'Lee', 'Nguyen', 'Adam', 'Park']
+SUFFIXES = ['', '', ' LLC', ', Inc.', ' Corp', ' of SWFL LLC', ' P.A.', ' Co']
+
+
+def generate_customers(n, seed=11):
+    rng = random.Random(seed)
+    customers = set()
+    while len(customers) < n:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        style = rng.randrange(4)
+        if style == 0:
+            name = f"{first} {last}"
+        elif style == 1:
+            name = f"{last}, {first}"
+        elif style == 2:
+            name = f"{first} {rng.choice('ABCJ')} {last}{rng.choice(SUFFIXES)}"
+        else:
+            name = f"{first} {last} {rng.randrange(1000)}{rng.choice(SUFFIXES)}"
+        customers.add(name)
+    return sorted(customers)
+
+
+def search_terms(customers, seed=5):
+    rng = random.Random(seed)
+    terms = ['RCM', 'Gomes, Adam', 'Adam Gomes', 'rcm construction', 'Lee', 'Xy', 'Zzz Nobody',
+             '...', 'LLC', 'Barboun', 'Smith Maria', 'Ad', '  spaced  name ']
+    for customer in rng.sample(customers, 60):
+        terms.append(customer)
+        terms.append(customer.upper())
+        terms.append(normalize_business_name(customer))
+        terms.append(customer[:rng.randrange(2, max(3, len(customer)))])
+    return terms
+
+
+def test_index_matches_linear_scan():
+    customers = generate_customers(1_500)
+    index = CustomerNameIndex(customers)
+    for term in search_terms(customers):
+        assert index.find_matches(term) == legacy_find_matches(term, customers), term
+
+
+def test_incremental_add_matches_rebuild():
+    customers = generate_customers(600)
+    index = CustomerNameIndex(customers[:400])
+    for customer in customers[400:]:
+        index.add(customer)
+    for term in search_terms(customers, seed=9):
+        assert index.find_matches(term) == legacy_find_matches(term, customers), term
+
+
+def test_cached_index_extends_appended_list():
+    customers = generate_customers(300)
+    first = get_customer_index(customers[:200])
+    extended = get_customer_index(customers)
+    assert extended is first and len(extended) == 300
+    assert find_customer_matches('Adam Gomes', customers) == legacy_find_matches('Adam Gomes', customers)
+
+
+def test_lookup_is_sub_millisecond():
+    rng = random.Random(3)
+    word = lambda: ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randrange(3, 9))).title()
+    customers = [f"{word()} {word()}{rng.choice(SUFFIXES)}" for _ in range(20_000)]
+    index = CustomerNameIndex(customers)
+    terms = [customers[5], 'Zzz Nobody', 'Abc', f"{customers[10].split()[1]}, {customers[10].split()[0]}"]
+    start = time.perf_counter()
+    for _ in range(100):
+        for term in terms:
+            index.find_matches(term)
+    per_lookup = (time.perf_counter() - start) / (100 * len(terms))
+    assert per_lookup < 0.001, per_lookup
@@ -0,0 +1,205 @@
+"""
+Test that the policy-summary dashboard metrics match the original calculate_dashboard_metrics.
+Run with: pytest test_dashboard_metrics.py
+"""
+
+import datetime
+import random
+
+import numpy as np
+import pandas as pd
+
+from dashboard_metrics import build_policy_summary, calculate_metrics_from_summary
+from test_balance_engine import legacy_balances
+
+
+def legacy_dashboard_metrics(df, year, today):
+    """
+    Reference implementation of the original calculate_dashboard_metrics (on a copy of df).
+    The hard-coded 2025 and datetime.now() are parameters; the logic is unchanged.
+    """
+    df = df.copy()
+    metrics = {
+        'total_transactions': 0,
+        'transactions_this_month': 0,
+        'stmt_transactions': 0,
+        'unique_policies': 0,
+        'active_policies': 0,
+        'cancelled_policies': 0,
+        'premium_sold_total': 0.0,
+        'agent_comm_paid_total': 0.0,
+        'agent_comm_due_total': 0.0
+    }
+    if df is None or df.empty:
+        return metrics
+
+    metrics['total_transactions'] = len(df)
+
+    if 'Effective Date' in df.columns:
+        df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
+        metrics['transactions_this_month'] = len(df[(df['Effective Date'].dt.month == today.month) &
+                                                   (df['Effective Date'].dt.year == today.year)])
+
+    if 'Transaction Type' in df.columns:
+        metrics['stmt_transactions'] = len(df[df['Transaction Type'].str.startswith('-', na=False)])
+
+    if 'Policy Number' in df.columns:
+        metrics['unique_policies'] = df['Policy Number'].nunique()
+        if 'Transaction Type' in df.columns:
+            df['Policy Number'] = df['Policy Number'].astype(str).str.strip()
+            latest_trans = df.sort_values('Effective Date').groupby('Policy Number').last()
+            metrics['active_policies'] = len(latest_trans[~latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
+            metrics['cancelled_policies'] = len(latest_trans[latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
+
+    original_mask = pd.Series(True, index=df.index)
+    if 'Transaction ID' in df.columns:
+        original_mask = ~df['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False, regex=True)
+    df_originals = df[original_mask]
+    if 'Premium Sold' in df_originals.columns:
+        metrics['premium_sold_total'] = df_originals['Premium Sold'].sum()
+
+    stmt_mask = pd.Series(False, index=df.index)
+    if 'Transaction ID' in df.columns:
+        stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
+    df_stmt = df[stmt_mask]
+    if 'Agent Paid Amount (STMT)' in df_stmt.columns:
+        metrics['agent_comm_paid_total'] = df_stmt['Agent Paid Amount (STMT)'].sum()
+
+    balances = legacy_balances(df)
+    balances = balances[balances['_balance'] > 0.01]
+    metrics['agent_comm_due_total'] = balances[balances['_balance'] > 0]['_balance'].sum()
+
+    df_stmt_all = df[stmt_mask].copy()
+    df_stmt_year = df_stmt_all[df_stmt_all['Effective Date'].dt.year == year]
+    df_originals_year = df_originals[df_originals['Effective Date'].dt.year == year]
+
+    df_stmt_by_stmt_date = pd.DataFrame()
+    if 'STMT DATE' in df_stmt_all.columns:
+        df_stmt_all['STMT DATE'] = pd.to_datetime(df_stmt_all['STMT DATE'], errors='coerce', format='mixed')
+        df_stmt_by_stmt_date = df_stmt_all[df_stmt_all['STMT DATE'].dt.year == year]
+    if df_stmt_by_stmt_date.empty:
+        df_stmt_by_stmt_date = df_stmt_year
+
+    reconciled = set()
+    for _, stmt_row in df_stmt_by_stmt_date.iterrows():
+        policy = stmt_row.get('Policy Number', '')
+        eff_date = pd.to_datetime(stmt_row.get('Effective Date'), errors='coerce')
+        if policy and pd.notna(eff_date):
+            reconciled.add((policy, eff_date))
+
+    paid_mask = pd.Series(False, index=df_originals.index)
+    for idx, row in df_originals.iterrows():
+        eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
+        if (row.get('Policy Number', ''), eff_date) in reconciled:
+            paid_mask.loc[idx] = True
+
+    df_originals_paid = df_originals[paid_mask]
+    df_originals_unpaid = df_originals_year[~df_originals_year.index.isin(df_originals_paid.index)]
+    metrics['premium_reconciled_ytd'] = df_originals_paid['Premium Sold'].sum()
+    metrics['agent_comm_paid_ytd'] = df_stmt_by_stmt_date['Agent Paid Amount (STMT)'].sum()
+    metrics['premium_unreconciled_ytd'] = df_originals_unpaid['Premium Sold'].sum()
+    metrics['agent_comm_estimated_ytd'] = df_originals_unpaid['Total Agent Comm'].sum()
+    return metrics
+
+
+def generate_book(n_policies, date_format='%m/%d/%Y', seed=5):
+    """
+    Synthetic book: each policy has yearly terms (NEW/RWL/END, sometimes ending in CAN/XCL)
+    with STMT/VOID/ADJ entries for some terms. Terms of one policy are a year apart and
+    payment rows carry no Transaction Type, so "latest transaction" has no ties.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for p in range(n_policies):
+        policy = f"POL-{p:05d}"
+        start = pd.Timestamp('2022-01-01') + pd.Timedelta(days=rng.randrange(0, 365))
+        terms = rng.randrange(1, 5)
+        for term in range(terms):
+            eff = start + pd.DateOffset(years=term)
+            if term == 0:
+                transaction_type = 'NEW'
+            elif term == terms - 1 and rng.random() < 0.2:
+                transaction_type = rng.choice(['CAN', 'XCL'])
+            else:
+                transaction_type = rng.choice(['RWL', 'END'])
+            comm = round(rng.uniform(20, 600), 2)
+            rows.append({
+                'Transaction ID': f"T{p:05d}{term}",
+                'Customer': f"Customer {p % 300}",
+                'Policy Number': policy + rng.choice(['', '', ' ']),
+                'Effective Date': eff.strftime(date_format),
+                'Transaction Type': transaction_type,
+                'Premium Sold': rng.choice([np.nan, round(rng.uniform(200, 5000), 2)]),
+                'Total Agent Comm': comm,
+                'Agent Estimated Comm $': comm,
+                'Agent Paid Amount (STMT)': np.nan,
+                'STMT DATE': None,
+            })
+            for n in range(rng.choice([0, 0, 1, 2])):
+                kind = rng.choice(['STMT', 'STMT', 'STMT', 'VOID', 'ADJ'])
+                amount = round(comm * rng.choice([0.5, 1.0, 1.0]), 2)
+                stmt_date = eff + pd.Timedelta(days=rng.randrange(20, 400))
+                rows.append({
+                    'Transaction ID': f"S{p:05d}{term}{n}-{kind}-{stmt_date:%Y%m%d}",
+                    'Customer': f"Customer {p % 300}",
+                    'Policy Number': policy,
+                    'Effective Date': eff.strftime(date_format),
+                    'Transaction Type': None,
+                    'Premium Sold': np.nan,
+                    'Total Agent Comm': np.nan,
+                    'Agent Estimated Comm $': np.nan,
+                    'Agent Paid Amount (STMT)': -amount if kind == 'VOID' else amount,
+                    'STMT DATE': stmt_date.strftime('%m/%d/%Y'),
+                })
+    # Policies whose only row is a '-' prefixed (statement) transaction type
+    for s in range(25):
+        rows.append({
+            'Transaction ID': f"X{s:04d}", 'Customer': 'Statement Only', 'Policy Number': f"STMT-{s:03d}",
+            'Effective Date': (pd.Timestamp('2024-06-01') + pd.Timedelta(days=s)).strftime(date_format),
+            'Transaction Type': '-STMT', 'Premium Sold': 0.0, 'Total Agent Comm': 0.0,
+            'Agent Estimated Comm $': 0.0, 'Agent Paid Amount (STMT)': np.nan, 'STMT DATE': None,
+        })
+    return pd.DataFrame(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def assert_metrics_match(actual, expected):
+    for key, value in expected.items():
+        assert np.isclose(actual[key], value, atol=1e-6), (key, actual[key], value)
+
+
+def test_matches_legacy_metrics():
+    book = generate_book(1_500)
+    today = datetime.date(2024, 3, 15)
+
+    for year in (2023, 2024, 2025):
+        expected = legacy_dashboard_metrics(book, year, today)
+        actual = calculate_metrics_from_summary(build_policy_summary(book), year=year, today=today)
+        assert_metrics_match(actual, expected)
+
+    # The generated book exercises every figure
+    assert expected['cancelled_policies'] > 0 and expected['stmt_transactions'] == 25
+    assert expected['premium_reconciled_ytd'] > 0 and expected['premium_unreconciled_ytd'] > 0
+
+
+def test_matches_legacy_with_iso_dates():
+    book = generate_book(400, date_format='%Y-%m-%d', seed=8)
+    today = datetime.date(2023, 7, 1)
+
+    expected = legacy_dashboard_metrics(book, 2023, today)
+    actual = calculate_metrics_from_summary(build_policy_summary(book), year=2023, today=today)
+    assert_metrics_match(actual, expected)
+
+
+def test_mixed_date_formats_parse_like_uniform_dates():
+    # The original parser inferred one format and dropped dates in any other format;
+    # the summary parses each date, so a mixed-format book gives the uniform-format figures
+    uniform = generate_book(400, seed=11)
+    mixed = uniform.copy()
+    iso_rows = mixed.sample(frac=0.3, random_state=1).index
+    mixed.loc[iso_rows, 'Effective Date'] = pd.to_datetime(mixed.loc[iso_rows, 'Effective Date'],
+                                                           format='%m/%d/%Y').dt.strftime('%Y-%m-%d')
+    today = datetime.date(2024, 3, 15)
+
+    expected = legacy_dashboard_metrics(uniform, 2024, today)
+    actual = calculate_metrics_from_summary(build_policy_summary(mixed), year=2024, today=today)
+    assert_metrics_match(actual, expected)
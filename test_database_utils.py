@@ -0,0 +1,75 @@
+"""
+Test the shared Supabase client registry: one client per (environment, role),
+rebuilds on credential changes and the per-client HTTP stats.
+Run with: pytest test_database_utils.py
+"""
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+import database_utils
+from database_utils import get_client_stats, get_registered_client, reset_supabase_clients
+
+URL = 'https://example.supabase.co'
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    reset_supabase_clients()
+    yield
+    reset_supabase_clients()
+
+
+def registered_session(environment, role):
+    return database_utils._registry[(environment, role)]['session']
+
+
+def test_one_client_per_environment_and_role():
+    client = get_registered_client('PRIVATE', 'anon', URL, 'anon-key')
+
+    assert get_registered_client('PRIVATE', 'anon', URL, 'anon-key') is client
+    assert get_registered_client('PRIVATE', 'service', URL, 'service-key') is not client
+    assert get_registered_client('PRODUCTION', 'anon', URL, 'anon-key') is not client
+    # PostgREST calls go through the registry's pooled session
+    assert client.postgrest.session is registered_session('PRIVATE', 'anon')
+
+    stats = get_client_stats()
+    assert set(stats) == {'PRIVATE/anon', 'PRIVATE/service', 'PRODUCTION/anon'}
+    assert stats['PRIVATE/anon']['lookups'] == 2
+    assert stats['PRIVATE/anon']['pool_size'] == database_utils.SUPABASE_POOL_SIZE
+
+
+def test_client_is_rebuilt_when_credentials_change():
+    client = get_registered_client('PRIVATE', 'anon', URL, 'anon-key')
+    session = registered_session('PRIVATE', 'anon')
+
+    rotated = get_registered_client('PRIVATE', 'anon', URL, 'rotated-key')
+    assert rotated is not client
+    assert session.is_closed
+    assert get_client_stats()['PRIVATE/anon']['lookups'] == 1
+
+    moved = get_registered_client('PRIVATE', 'anon', 'https://other.supabase.co', 'rotated-key')
+    assert moved is not rotated
+    assert get_registered_client('PRIVATE', 'anon', 'https://other.supabase.co', 'rotated-key') is moved
+
+    current = registered_session('PRIVATE', 'anon')
+    reset_supabase_clients()
+    assert current.is_closed and get_client_stats() == {}
+
+
+def test_stats_count_requests_through_event_hooks():
+    client = get_registered_client('PRIVATE', 'anon', URL, 'anon-key')
+    # Answer locally: the policies table exists, anything else is a 404
+    registered_session('PRIVATE', 'anon')._transport = httpx.MockTransport(
+        lambda request: httpx.Response(200 if request.url.path.endswith('/policies') else 404, json=[]))
+
+    client.table('policies').select('*').execute()
+    client.table('policies').select('*').execute()
+    with pytest.raises(APIError):
+        client.table('missing').select('*').execute()
+
+    stats = get_client_stats()['PRIVATE/anon']
+    assert stats['requests'] == 3 and stats['responses'] == 3
+    assert stats['errors'] == 1
+    assert stats['request_seconds'] > 0
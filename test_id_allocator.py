@@ -0,0 +1,142 @@
+"""
+Test batched ID allocation: bulk reservations, collisions with other sessions,
+error handling and the policies fallback when the reservation table is missing.
+Run with: pytest test_id_allocator.py
+"""
+
+import itertools
+
+import pytest
+
+import id_allocator
+from conftest import FakeAPIError, FakeSupabase
+from id_allocator import RESERVATION_BATCH_SIZE, IdAllocator
+
+
+OTHER_SESSION = 'other-session'
+
+
+def make_supabase(policies=(), steal=0, failure=None, fail_bulk=False):
+    """
+    Policies with the given Transaction IDs and an id_reservations table keyed on (kind, id).
+    steal: another session reserves the first IDs of our first bulk insert just before it runs.
+    failure: raised by reservation inserts (single-row ones only, unless fail_bulk).
+    """
+    supabase = FakeSupabase(tables={'policies': [{'_id': i, 'Transaction ID': tid} for i, tid in enumerate(policies)],
+                                    'id_reservations': []},
+                            primary_keys={'id_reservations': ('kind', 'id')})
+
+    def interfere(request):
+        nonlocal steal
+        if request.table != 'id_reservations':
+            return
+        if failure is not None and (len(request.rows) == 1 or fail_bulk):
+            raise failure
+        if steal and len(request.rows) > 1:
+            supabase.rows('id_reservations').extend(dict(row, user_id=OTHER_SESSION) for row in request.rows[:steal])
+            steal = 0
+
+    supabase.before_execute.append(interfere)
+    return supabase
+
+
+def fail_reservations(supabase, error):
+    """Every reservation insert raises error (e.g. missing table, RLS denial)."""
+    def raise_error(request):
+        if request.table == 'id_reservations':
+            raise error
+    supabase.before_execute.append(raise_error)
+
+
+def reserved_by_us(supabase):
+    return {row['id'] for row in supabase.rows('id_reservations') if row['user_id'] != OTHER_SESSION}
+
+
+def reservation_calls(supabase):
+    return [len(request.rows) for request in supabase.executed('id_reservations', 'insert')]
+
+
+def policy_checks(supabase):
+    """Policies queries checking candidates (not the pages loading the existing IDs)."""
+    return [request for request in supabase.executed('policies')
+            if any(condition[0] == 'or' for condition in request.filters)]
+
+
+@pytest.fixture
+def sequential_ids(monkeypatch):
+    """Deterministic candidate IDs: AAA0000, AAA0001, ..."""
+    counter = itertools.count()
+    monkeypatch.setattr(id_allocator, 'generate_transaction_id', lambda: f"AAA{next(counter):04d}")
+
+
+def test_allocate_many_reserves_in_bulk(sequential_ids):
+    supabase = make_supabase(policies=['AAA0000', 'AAA0002-STMT-20250101'])
+
+    ids = IdAllocator(supabase, 'u1').allocate_many(250, suffix='-IMPORT-20250102')
+
+    assert len(ids) == len(set(ids)) == 250
+    assert all(tid.endswith('-IMPORT-20250102') for tid in ids)
+    bases = {tid.split('-', 1)[0] for tid in ids}
+    # Existing IDs (suffixed ones included) are never handed out
+    assert not bases & {'AAA0000', 'AAA0002'}
+    assert bases == reserved_by_us(supabase)
+    assert reservation_calls(supabase) == [RESERVATION_BATCH_SIZE, RESERVATION_BATCH_SIZE, 50]
+    # Reservations are never read back (the table grants no SELECT)
+    assert {request.returning for request in supabase.executed('id_reservations')} == {'minimal'}
+
+
+def test_ids_taken_by_another_session_are_replaced(sequential_ids):
+    supabase = make_supabase(steal=3)
+    allocator = IdAllocator(supabase)
+
+    ids = allocator.allocate_many(10)
+
+    assert len(set(ids)) == 10
+    assert set(ids) == reserved_by_us(supabase)
+    assert not set(ids) & {'AAA0000', 'AAA0001', 'AAA0002'}
+    # Bulk insert failed, then one insert per ID, then a new bulk round for the 3 missing
+    assert reservation_calls(supabase) == [10] + [1] * 10 + [3]
+    assert {request.returning for request in supabase.executed('id_reservations')} == {'minimal'}
+    # IDs already handed out are not reused by the next allocation
+    assert not set(allocator.allocate_many(5)) & set(ids)
+
+
+def test_other_errors_are_raised_not_treated_as_taken(sequential_ids):
+    network_error = ConnectionError("connection reset")
+
+    with pytest.raises(ConnectionError):
+        IdAllocator(make_supabase(failure=network_error, fail_bulk=True)).allocate_many(5)
+
+    # Bulk insert hits a collision, then a per-row insert fails for another reason
+    supabase = make_supabase(steal=1, failure=FakeAPIError('permission denied for table id_reservations', '42501'))
+    with pytest.raises(FakeAPIError):
+        IdAllocator(supabase).allocate_many(5)
+    assert reserved_by_us(supabase) == set()
+
+
+def test_falls_back_to_policies_without_reservation_table(sequential_ids):
+    supabase = make_supabase(policies=['AAA0001'])
+    fail_reservations(supabase, FakeAPIError('relation "id_reservations" does not exist', '42P01'))
+    allocator = IdAllocator(supabase)
+
+    ids = allocator.allocate_many(4)
+
+    assert allocator.reservations_available is False
+    assert ids == ['AAA0000', 'AAA0002', 'AAA0003', 'AAA0004']
+    assert len(policy_checks(supabase)) == 1
+
+
+def test_falls_back_to_policies_when_reservations_are_denied(sequential_ids):
+    supabase = make_supabase(policies=['AAA0000'])
+    fail_reservations(supabase, FakeAPIError('new row violates row-level security policy for table "id_reservations"',
+                                             '42501'))
+    allocator = IdAllocator(supabase, 'u1')
+
+    ids = allocator.allocate_many(3)
+
+    assert allocator.reservations_available is False
+    assert ids == ['AAA0001', 'AAA0002', 'AAA0003']
+    assert reserved_by_us(supabase) == set()
+    # Later allocations go straight to the policies check
+    allocator.allocate_many(2)
+    assert reservation_calls(supabase) == [3]
@@ -0,0 +1,61 @@
+"""
+Test pending renewal detection on a small book.
+Run with: pytest test_pending_renewals.py
+"""
+
+import datetime
+
+import pandas as pd
+
+from pending_renewals import RenewalIndex, summarize_due_windows
+
+TODAY = datetime.date(2025, 6, 1)
+
+
+def day(offset):
+    return (TODAY + datetime.timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+def book():
+    return pd.DataFrame([
+        # Latest term wins: P1 renews in 20 days
+        {'Transaction ID': 'A1', 'Policy Number': 'P1', 'Transaction Type': 'NEW', 'X-DATE': day(-345), 'Prior Policy Number': None},
+        {'Transaction ID': 'A2', 'Policy Number': 'P1', 'Transaction Type': 'RWL', 'X-DATE': day(20), 'Prior Policy Number': None},
+        # Reconciliation entries are ignored even with a later X-DATE
+        {'Transaction ID': 'A3-STMT-20250101', 'Policy Number': 'P1', 'Transaction Type': 'RWL', 'X-DATE': day(200), 'Prior Policy Number': None},
+        # Past due
+        {'Transaction ID': 'B1', 'Policy Number': 'P2', 'Transaction Type': 'NEW', 'X-DATE': day(-10), 'Prior Policy Number': None},
+        # P3 was renewed as P4, so only P4 is pending
+        {'Transaction ID': 'C1', 'Policy Number': 'P3', 'Transaction Type': 'NEW', 'X-DATE': day(5), 'Prior Policy Number': None},
+        {'Transaction ID': 'C2', 'Policy Number': 'P4', 'Transaction Type': 'REWRITE', 'X-DATE': day(70), 'Prior Policy Number': 'P3'},
+        # Cancelled
+        {'Transaction ID': 'D1', 'Policy Number': 'P5', 'Transaction Type': 'NEW', 'X-DATE': day(40), 'Prior Policy Number': None},
+        {'Transaction ID': 'D2', 'Policy Number': 'P5', 'Transaction Type': 'CAN', 'X-DATE': day(40), 'Prior Policy Number': None},
+        # Beyond the horizon, and an endorsement that is never a renewal candidate
+        {'Transaction ID': 'E1', 'Policy Number': 'P6', 'Transaction Type': 'NEW', 'X-DATE': day(400), 'Prior Policy Number': None},
+        {'Transaction ID': 'F1', 'Policy Number': 'P7', 'Transaction Type': 'END', 'X-DATE': day(10), 'Prior Policy Number': None},
+    ])
+
+
+def test_pending_renewals():
+    pending = RenewalIndex(book()).pending(today=TODAY)
+
+    assert pending['Transaction ID'].tolist() == ['B1', 'A2', 'C2']
+    assert pending['Days Until Expiration'].tolist() == [-10, 20, 70]
+
+
+def test_due_windows():
+    counts = summarize_due_windows(pd.Series([-10, 0, 7, 8, 30, 31, 60, 61, 90, 91, None]))
+
+    assert counts['past_due'] == 1
+    assert counts['due_0_7'] == 2
+    assert counts['due_0_30'] == 4
+    assert counts['due_31_60'] == 2
+    assert counts['due_61_90'] == 2
+    assert counts['due_later'] == 1
+    assert counts['total'] == 11
+
+
+def test_missing_columns():
+    pending = RenewalIndex(pd.DataFrame()).pending(today=TODAY)
+    assert pending.empty
@@ -0,0 +1,106 @@
+"""
+Test the policies data layer: keyset pagination and delta sync of changed rows
+and deleted_policies tombstones.
+Run with: pytest test_policies_data_layer.py
+"""
+
+import pandas as pd
+import streamlit as st
+
+import policies_data_layer
+from conftest import FakeSupabase
+
+CACHE_KEY = 'policies_data_test'
+FILTERS = [('eq', 'user_id', 'user-1')]
+
+
+def policy(row_id, transaction_id, updated_at, amount=100.0):
+    return {'_id': row_id, 'Transaction ID': transaction_id, 'Total Agent Comm': amount,
+            'updated_at': pd.Timestamp(updated_at, tz='UTC').isoformat(), 'user_id': 'user-1'}
+
+
+def tombstone(transaction_id, deleted_at):
+    # deleted_at is a plain TIMESTAMP column: no offset
+    return {'transaction_id': transaction_id, 'deleted_at': deleted_at, 'user_id': 'user-1'}
+
+
+def tombstone_filters(supabase):
+    return [[condition for condition in request.filters if condition[2] == 'deleted_at']
+            for request in supabase.executed('deleted_policies')]
+
+
+def test_delta_merges_upserts_tombstones_and_recreated_ids():
+    book = pd.DataFrame([policy(i + 1, f"T{i}", '2025-01-01') for i in range(4)])
+    policies_data_layer.store_cached_policies(CACHE_KEY, 'user-1', book, filters=FILTERS)
+
+    # Since the load: T0 edited, T1 deleted, T2 deleted and re-created under a new _id
+    supabase = FakeSupabase(tables={
+        'policies': [policy(1, 'T0', '2025-02-01 10:00', amount=1.0),
+                     policy(10, 'T2', '2025-02-01 11:00', amount=2.0),
+                     policy(4, 'T3', '2025-01-01')],
+        'deleted_policies': [tombstone('T2', '2025-01-15T00:00:00'), tombstone('T1', '2025-02-01T09:00:00')],
+    })
+
+    synced = policies_data_layer.sync_policies_delta(supabase, CACHE_KEY, 'user-1')
+    assert synced.set_index('Transaction ID')['Total Agent Comm'].to_dict() == {'T3': 100.0, 'T0': 1.0, 'T2': 2.0}
+    assert synced.loc[synced['Transaction ID'] == 'T2', '_id'].item() == 10
+    # The first tombstone query starts at the load's watermark, compared as naive UTC
+    assert tombstone_filters(supabase)[0] == [(False, 'gt', 'deleted_at', '2025-01-01T00:00:00')]
+
+    # The next sync only asks for tombstones newer than the newest one seen
+    synced = policies_data_layer.sync_policies_delta(supabase, CACHE_KEY, 'user-1')
+    assert tombstone_filters(supabase)[1] == [(False, 'gt', 'deleted_at', '2025-02-01T09:00:00')]
+    assert sorted(synced['Transaction ID']) == ['T0', 'T2', 'T3']
+    del st.session_state[CACHE_KEY]
+
+
+def test_tombstone_only_drops_rows_older_than_it():
+    cached = pd.DataFrame([policy(1, 'T0', '2025-01-01'), policy(10, 'T2', '2025-02-01 11:00')])
+
+    # A refetched tombstone from before T2 was re-created leaves the new row alone
+    deleted = {'T0': '2025-01-15T00:00:00', 'T2': '2025-01-15T00:00:00'}
+    merged = policies_data_layer.merge_policy_delta(cached, pd.DataFrame(), deleted)
+    assert list(merged['Transaction ID']) == ['T2']
+
+    # A tombstone written after the last update still applies
+    deleted = {'T2': '2025-02-01T12:00:00'}
+    assert policies_data_layer.merge_policy_delta(cached, pd.DataFrame(), deleted)['Transaction ID'].tolist() == ['T0']
+
+
+def test_tombstone_watermark_is_compared_as_naive_utc():
+    supabase = FakeSupabase(tables={'deleted_policies': [tombstone('T1', '2025-02-01T09:00:00'),
+                                                         tombstone('T2', '2025-02-01T09:30:00')]})
+
+    deleted, newest = policies_data_layer.fetch_policy_tombstones(supabase, FILTERS, '2025-02-01T11:00:00+02:00')
+    assert tombstone_filters(supabase) == [[(False, 'gt', 'deleted_at', '2025-02-01T09:00:00')]]
+    assert deleted == {'T2': '2025-02-01T09:30:00'} and newest == '2025-02-01T09:30:00'
+
+    # Nothing new keeps the watermark where it was
+    assert policies_data_layer.fetch_policy_tombstones(supabase, FILTERS, newest) == ({}, newest)
+
+
+def test_keyset_pages_cover_the_book_once_with_filters():
+    rows = [dict(policy(row_id, f"T{row_id}", '2025-01-01'), user_id='user-1' if row_id % 3 else 'user-2')
+            for row_id in range(1, 26)]
+    # The server hands rows back out of _id order
+    supabase = FakeSupabase(tables={'policies': rows[::-1]})
+
+    pages = list(policies_data_layer.fetch_policies_pages(supabase, FILTERS, page_size=5))
+    ids = [row['_id'] for page in pages for row in page]
+
+    expected = [row_id for row_id in range(1, 26) if row_id % 3]
+    assert ids == expected
+    assert [len(page) for page in pages] == [5, 5, 5, 2]
+    # Each page starts after the last _id of the one before, with the user filter on every page
+    requests = supabase.executed('policies')
+    assert len(requests) == 5
+    assert all(request.filter_values('user_id') == ['user-1'] for request in requests)
+    boundaries = [[condition[3] for condition in request.filters if condition[2] == '_id'] for request in requests]
+    assert boundaries == [[]] + [[page[-1]['_id']] for page in pages]
+    assert all(request.ordering == [('_id', False)] and request.limit_count == 5 for request in requests)
+
+    # A book that fills its last page exactly ends on an empty page, not a repeat
+    supabase.requests.clear()
+    pages = list(policies_data_layer.fetch_policies_pages(supabase, FILTERS, page_size=len(expected)))
+    assert [[row['_id'] for row in page] for page in pages] == [expected]
+    assert len(supabase.executed('policies')) == 2
@@ -0,0 +1,113 @@
+"""
+Test the per-user on-disk policies snapshots and their validation on cold start.
+Run with: pytest test_policies_snapshot.py
+"""
+
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+
+import policies_data_layer
+from conftest import FakeSupabase
+from policies_snapshot import evict_snapshots, read_snapshot, snapshot_path, write_snapshot
+from test_compact_policies import make_policies
+
+
+def make_book(rows=2_000):
+    book = make_policies(rows)
+    book['updated_at'] = pd.Timestamp('2025-01-01', tz='UTC').isoformat()
+    book['user_id'] = 'user-1'
+    return book
+
+
+def server_tables(book, deleted=()):
+    """Database state for a book: the policies rows and deleted_policies tombstones."""
+    return {
+        'policies': book.to_dict('records'),
+        'deleted_policies': [{'transaction_id': tid, 'deleted_at': '2025-02-01T00:00:00', 'user_id': 'user-1'}
+                             for tid in deleted],
+    }
+
+
+def test_snapshot_round_trip(tmp_path):
+    book = make_book()
+    watermark = policies_data_layer.get_policies_watermark(book)
+    assert write_snapshot(str(tmp_path), 'user-1', book, watermark, filters=[('eq', 'user_id', 'user-1')])
+
+    df, stamp = read_snapshot(str(tmp_path), 'user-1')
+    pd.testing.assert_frame_equal(df, book)
+    assert stamp['watermark'] == watermark
+    assert stamp['row_count'] == len(book)
+    assert stamp['filters'] == [('eq', 'user_id', 'user-1')]
+
+
+def test_snapshots_are_isolated_by_user_id(tmp_path):
+    book = make_book()
+    watermark = policies_data_layer.get_policies_watermark(book)
+    write_snapshot(str(tmp_path), 'user-1', book, watermark)
+
+    assert read_snapshot(str(tmp_path), 'user-2') is None
+    assert snapshot_path(str(tmp_path), None) is None
+    assert not write_snapshot(str(tmp_path), '', book, watermark)
+
+    # A file renamed into another user's slot is rejected and removed
+    os.replace(snapshot_path(str(tmp_path), 'user-1'), snapshot_path(str(tmp_path), 'user-2'))
+    assert read_snapshot(str(tmp_path), 'user-2') is None
+    assert not os.path.exists(snapshot_path(str(tmp_path), 'user-2'))
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    book = make_book(500)
+    watermark = policies_data_layer.get_policies_watermark(book)
+    for index, user_id in enumerate(['a', 'b', 'c']):
+        write_snapshot(str(tmp_path), user_id, book, watermark)
+        os.utime(snapshot_path(str(tmp_path), user_id), (time.time() - 100 + index, time.time() - 100 + index))
+
+    # Reading 'a' makes it the most recently used
+    read_snapshot(str(tmp_path), 'a')
+    # Room for exactly the two snapshots that should be kept (sizes differ slightly)
+    keep = sum(os.path.getsize(snapshot_path(str(tmp_path), user_id)) for user_id in ('a', 'c'))
+    assert evict_snapshots(str(tmp_path), max_bytes=keep) == 1
+
+    assert not os.path.exists(snapshot_path(str(tmp_path), 'b'))
+    assert os.path.exists(snapshot_path(str(tmp_path), 'a'))
+    assert os.path.exists(snapshot_path(str(tmp_path), 'c'))
+
+
+def test_cold_start_restores_and_applies_delta(tmp_path, monkeypatch):
+    monkeypatch.setattr(policies_data_layer, 'POLICIES_SNAPSHOT_DIR', str(tmp_path))
+    book = make_book()
+    write_snapshot(str(tmp_path), 'user-1', book, policies_data_layer.get_policies_watermark(book),
+                   filters=[('eq', 'user_id', 'user-1')])
+
+    # Since the snapshot: the first row was edited and the second one deleted
+    server = book.drop(index=1)
+    server.loc[0, 'Total Agent Comm'] = 1.0
+    server.loc[0, 'updated_at'] = pd.Timestamp('2025-02-01', tz='UTC').isoformat()
+    supabase = FakeSupabase(tables=server_tables(server, deleted=[book['Transaction ID'].iloc[1]]))
+
+    assert policies_data_layer.restore_policies_snapshot(supabase, 'policies_data_u1', 'user-1', 'user-1')
+    restored = policies_data_layer.get_cached_policies('policies_data_u1', 'user-1')
+    assert len(restored) == len(book)
+
+    assert policies_data_layer.apply_snapshot_validation('policies_data_u1', 'user-1', wait=True)
+    synced = policies_data_layer.get_cached_policies('policies_data_u1', 'user-1')
+    assert len(synced) == len(book) - 1
+    assert synced.loc[synced['_id'] == book['_id'].iloc[0], 'Total Agent Comm'].item() == 1.0
+    del st.session_state['policies_data_u1']
+
+
+def test_count_mismatch_discards_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(policies_data_layer, 'POLICIES_SNAPSHOT_DIR', str(tmp_path))
+    book = make_book()
+    write_snapshot(str(tmp_path), 'user-1', book, policies_data_layer.get_policies_watermark(book))
+
+    # Rows deleted without a tombstone only show up in the row count
+    supabase = FakeSupabase(tables=server_tables(book.iloc[5:]))
+    assert policies_data_layer.restore_policies_snapshot(supabase, 'policies_data_u1', 'user-1', 'user-1')
+    assert policies_data_layer.apply_snapshot_validation('policies_data_u1', 'user-1', wait=True)
+
+    assert policies_data_layer.get_cached_policies('policies_data_u1', 'user-1') is None
+    assert not os.path.exists(snapshot_path(str(tmp_path), 'user-1'))
@@ -0,0 +1,118 @@
+"""
+Test that term assignment selects the same month view as the original per-term scan.
+Run with: pytest test_policy_terms.py
+"""
+
+import random
+
+import pandas as pd
+
+from policy_terms import NO_TERM, assign_policy_terms, fill_statement_client_ids, transactions_for_term_month
+
+
+def legacy_month_view(working_data, selected_ym):
+    """Original month-view loop of Policy Revenue Ledger Reports."""
+    working_data = working_data.copy()
+    working_data['Effective Date'] = pd.to_datetime(working_data['Effective Date'], errors='coerce')
+    working_data['Year-Month'] = working_data['Effective Date'].dt.strftime('%Y-%m')
+    new_rwl_in_month = working_data[
+        (working_data['Transaction Type'].isin(['NEW', 'RWL', 'REWRITE'])) &
+        (working_data['Year-Month'] == selected_ym)
+    ]
+    month_data = pd.DataFrame()
+    for _, term_defining_row in new_rwl_in_month.iterrows():
+        policy_num = term_defining_row['Policy Number']
+        term_eff_date = pd.to_datetime(term_defining_row['Effective Date'])
+        term_x_date = pd.to_datetime(term_defining_row['X-DATE']) if pd.notna(term_defining_row.get('X-DATE')) else None
+        if pd.notna(term_defining_row.get('Client ID')):
+            policy_transactions = working_data[
+                (working_data['Client ID'] == term_defining_row['Client ID']) &
+                (working_data['Policy Number'] == policy_num)
+            ]
+        else:
+            policy_transactions = working_data[working_data['Policy Number'] == policy_num]
+        term_transactions = []
+        for _, trans_row in policy_transactions.iterrows():
+            trans_eff_date = pd.to_datetime(trans_row.get('Effective Date'), errors='coerce')
+            if trans_row['Transaction Type'] in ['NEW', 'RWL', 'REWRITE']:
+                include = pd.notna(trans_eff_date) and trans_eff_date.strftime('%Y-%m') == selected_ym
+            else:
+                include = bool(pd.notna(trans_eff_date) and term_x_date and term_eff_date <= trans_eff_date < term_x_date)
+            if include:
+                term_transactions.append(trans_row.to_dict())
+        if term_transactions:
+            month_data = pd.concat([month_data, pd.DataFrame(term_transactions)], ignore_index=True)
+    if not month_data.empty:
+        month_data = month_data.drop_duplicates(subset=['Transaction ID'])
+    return month_data
+
+
+def generate_ledger(n_policies, seed=3):
+    """Consecutive 6 or 12 month terms per policy with END/CAN and STMT rows inside them."""
+    rng = random.Random(seed)
+    rows = []
+    for policy in range(n_policies):
+        client = f"CL-{policy % (n_policies // 2 or 1):05d}"
+        start = pd.Timestamp('2022-01-01') + pd.Timedelta(days=rng.randrange(0, 365))
+        for term in range(rng.randint(1, 4)):
+            months = rng.choice([6, 12])
+            end = start + pd.DateOffset(months=months)
+            rows.append({'Transaction ID': f"T{len(rows):07d}", 'Policy Number': f"P{policy:06d}",
+                         'Client ID': client, 'Transaction Type': 'NEW' if term == 0 else 'RWL',
+                         'Effective Date': start.strftime('%Y-%m-%d'), 'X-DATE': end.strftime('%Y-%m-%d')})
+            for _ in range(rng.randint(0, 3)):
+                when = start + pd.Timedelta(days=rng.randrange(0, (end - start).days + 30))
+                kind = rng.choice(['END', 'CAN', 'STMT'])
+                rows.append({'Transaction ID': f"T{len(rows):07d}" + ('-STMT-20250101' if kind == 'STMT' else ''),
+                             'Policy Number': f"P{policy:06d}", 'Client ID': client,
+                             'Transaction Type': 'END' if kind == 'STMT' else kind,
+                             'Effective Date': when.strftime('%Y-%m-%d'), 'X-DATE': end.strftime('%Y-%m-%d')})
+            start = end
+    ledger = pd.DataFrame(rows)
+    return ledger.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_month_view_matches_legacy():
+    ledger = generate_ledger(400)
+    for year_month in ['2022-03', '2023-01', '2023-07', '2024-02']:
+        expected = legacy_month_view(ledger, year_month)
+        actual = transactions_for_term_month(ledger, year_month)
+        assert list(actual['Transaction ID']) == list(expected['Transaction ID'])
+
+
+def test_terms_without_client_id_match_legacy():
+    ledger = generate_ledger(400, seed=7)
+    policy = ledger['Policy Number'].str[1:].astype(int)
+    is_term = ledger['Transaction Type'].isin(['NEW', 'RWL'])
+    # Whole policies without a Client ID, and policies where only the terms lack one
+    ledger.loc[policy % 5 == 0, 'Client ID'] = None
+    ledger.loc[(policy % 5 == 1) & is_term, 'Client ID'] = None
+    for year_month in ['2022-03', '2023-01', '2023-07', '2024-02']:
+        expected = legacy_month_view(ledger, year_month)
+        actual = transactions_for_term_month(ledger, year_month)
+        assert list(actual['Transaction ID']) == list(expected['Transaction ID'])
+
+
+def test_transactions_after_x_date_have_no_term():
+    ledger = pd.DataFrame({
+        'Transaction ID': ['A', 'B', 'C', 'D'],
+        'Policy Number': ['P1', 'P1', 'P1', 'P2'],
+        'Client ID': ['C1', 'C1', 'C1', 'C1'],
+        'Transaction Type': ['NEW', 'END', 'END', 'END'],
+        'Effective Date': ['2024-01-01', '2024-03-01', '2025-01-01', '2024-03-01'],
+        'X-DATE': ['2025-01-01', None, None, None],
+    })
+    terms = assign_policy_terms(ledger)
+    assert list(terms['term_id']) == [0, 0, NO_TERM, NO_TERM]
+    assert terms['term_end'].iloc[1] == pd.Timestamp('2025-01-01')
+
+
+def test_fill_statement_client_ids():
+    ledger = pd.DataFrame({
+        'Transaction ID': ['A', 'B', 'C', 'D-STMT-1', 'E-STMT-2'],
+        'Policy Number': ['P1', 'P1', 'P1', 'P1', 'P2'],
+        'Client ID': ['C2', 'C1', 'C2', None, None],
+    })
+    filled = fill_statement_client_ids(ledger)
+    assert filled['Client ID'].iloc[3] == 'C2'
+    assert pd.isna(filled['Client ID'].iloc[4])
@@ -0,0 +1,119 @@
+"""
+Test the statement import dry run: STMT rows, new transactions, balance changes per term,
+manual matches and unmatched lines.
+Run with: pytest test_reconciliation_dry_run.py
+"""
+
+import pandas as pd
+
+from reconciliation_dry_run import build_dry_run_report
+
+
+def matched_line(row_index, amount, transaction_id=None, balance=0.0, customer='Smith, John'):
+    item = {'row_index': row_index, 'customer': customer, 'policy_number': f"POL-{row_index}",
+            'effective_date': '2025-01-15', 'amount': amount, 'agency_amount': amount * 2,
+            'match_type': 'Policy + Date' if transaction_id else 'Manual', 'confidence': 100}
+    if transaction_id:
+        item['match'] = {'Transaction ID': transaction_id, 'Customer': customer, 'Policy Number': 'POL-A',
+                         'Effective Date': '01/15/2025', 'Transaction Type': 'NEW', 'balance': balance}
+    return item
+
+
+def create_line(policy_number, amount, effective_date='2025-02-01'):
+    return {'customer': 'New Customer', 'policy_number': policy_number, 'effective_date': effective_date,
+            'amount': amount, 'agency_amount': amount * 2, 'selected_transaction_type': 'NEW'}
+
+
+def build_report(**kwargs):
+    matched = [
+        # Two lines paying one transaction in full
+        matched_line(0, 60.0, 'T1', balance=100.0),
+        matched_line(1, 40.0, 'T1', balance=100.0),
+        # Partly paid and overpaid terms
+        matched_line(2, 30.0, 'T2', balance=100.0),
+        matched_line(3, 150.0, 'T3', balance=100.0),
+        # Manual matches without a matched transaction
+        matched_line(4, 25.0),
+        matched_line(5, 35.0, customer='Doe, Jane'),
+        matched_line(6, 45.0),
+    ]
+    unmatched = [{'customer': 'Unknown', 'policy_number': 'X-1', 'effective_date': '2025-03-01', 'amount': 12.5,
+                  'potential_customers': ['A', 'B'], 'potential_matches': []}]
+    to_create = [create_line('NEW-1', 80.0), create_line('NEW-1', 20.0), create_line('NEW-2', 10.0)]
+    return build_dry_run_report(matched, unmatched, to_create, '2025-04-30', **kwargs)
+
+
+def test_stmt_rows_and_new_transactions():
+    report = build_report()
+    stmt_rows = report['new_stmt_rows']
+
+    assert len(stmt_rows) == 10
+    assert (stmt_rows['STMT DATE'] == '2025-04-30').all()
+    assert '_term' not in stmt_rows.columns
+    assert list(stmt_rows['Matched To']) == ['T1', 'T1', 'T2', 'T3'] + ['Manual Match'] * 3 + ['NEW'] * 3
+    assert list(report['new_transactions']['Total Agent Comm']) == [80.0, 20.0, 10.0]
+    assert report['summary']['total_inserts'] == 13
+    assert report['summary']['reconciled_amount'] == 495.0
+
+
+def test_balance_changes_per_term():
+    report = build_report()
+    changes = report['balance_changes']
+
+    existing = changes.set_index(changes['Matched To']).loc[['T1', 'T2', 'T3']]
+    assert list(existing['Statement Payments']) == [100.0, 30.0, 150.0]
+    assert list(existing['Statement Lines']) == [2, 1, 1]
+    assert list(existing['Balance After']) == [0.0, 70.0, -50.0]
+    assert list(existing['Status']) == ['Paid in full', 'Partial', 'Overpaid']
+
+    # New transactions are grouped by policy + effective date and start at their statement total
+    new = changes[changes['Matched To'] == 'NEW']
+    assert list(new['Policy Number']) == ['NEW-1', 'NEW-2']
+    assert list(new['Balance Before']) == [100.0, 10.0]
+    assert (new['Status'] == 'Paid in full').all()
+
+    summary = report['summary']
+    assert summary['terms_affected'] == 8
+    assert summary['paid_in_full'] == 3 and summary['overpaid'] == 1
+
+
+def test_manual_matches_are_not_merged():
+    changes = build_report()['balance_changes']
+    manual = changes[changes['Matched To'] == 'Manual Match']
+
+    # One row per statement line, not one row summing every manual match
+    assert len(manual) == 3
+    assert list(manual['Statement Payments']) == [25.0, 35.0, 45.0]
+    assert list(manual['Customer']) == ['Smith, John', 'Doe, Jane', 'Smith, John']
+    assert (manual['Statement Lines'] == 1).all()
+    # Their balance isn't known, so they don't count as overpaid
+    assert manual['Balance After'].isna().all()
+    assert (manual['Status'] == 'Unknown').all()
+
+    # Without a row index the position in the matched list keeps them apart
+    items = [matched_line(0, 10.0), matched_line(0, 20.0)]
+    for item in items:
+        del item['row_index']
+    report = build_dry_run_report(items, [], [], '2025-04-30')
+    assert list(report['balance_changes']['Statement Payments']) == [10.0, 20.0]
+
+
+def test_unmatched_lines_and_create_new_off():
+    report = build_report(create_new=False)
+
+    unmatched = report['unmatched']
+    assert list(unmatched['Policy Number']) == ['X-1']
+    assert list(unmatched['Candidate Customers']) == [2]
+    assert report['summary']['unmatched_amount'] == 12.5
+
+    assert report['new_transactions'].empty
+    assert not (report['new_stmt_rows']['Matched To'] == 'NEW').any()
+    assert report['summary']['stmt_rows'] == 7
+
+
+def test_empty_import():
+    report = build_dry_run_report([], [], [], pd.Timestamp('2025-04-30'))
+
+    assert report['new_stmt_rows'].empty and report['balance_changes'].empty
+    assert report['summary']['total_inserts'] == 0
+    assert report['summary']['terms_affected'] == 0
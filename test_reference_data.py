@@ -0,0 +1,46 @@
+"""
+Test that the reference data prefetch runs its loaders concurrently, keeping
+session-bound loaders on the calling thread.
+Run with: pytest test_reference_data.py
+"""
+
+import threading
+import time
+
+from reference_data import run_concurrently
+
+
+def test_loaders_run_concurrently():
+    tasks = {f"task_{i}": (lambda i=i: time.sleep(0.2) or i) for i in range(5)}
+    tasks['broken'] = lambda: 1 / 0
+
+    started = time.perf_counter()
+    run = run_concurrently(tasks, max_workers=6)
+    elapsed = time.perf_counter() - started
+
+    assert run['results'] == {f"task_{i}": i for i in range(5)}
+    assert 'broken' in run['errors']
+    # Roughly the slowest loader, not the sum of all five
+    assert elapsed < 0.6
+
+
+
+def test_main_tasks_run_on_the_calling_thread():
+    caller = threading.get_ident()
+    threads = {}
+
+    def record(name):
+        threads[name] = threading.get_ident()
+        time.sleep(0.2)
+        return name
+
+    started = time.perf_counter()
+    run = run_concurrently({'fetch': lambda: record('fetch')},
+                           main_tasks={'session': lambda: record('session'), 'broken': lambda: 1 / 0})
+    elapsed = time.perf_counter() - started
+
+    assert run['results'] == {'fetch': 'fetch', 'session': 'session'}
+    assert 'broken' in run['errors'] and set(run['timings']) == {'fetch', 'session', 'broken'}
+    assert threads['session'] == caller and threads['fetch'] != caller
+    # The pool works while the main tasks run
+    assert elapsed < 0.35
@@ -0,0 +1,353 @@
+"""
+Test that the indexed statement matcher gives the same matched / unmatched /
+can_create results as the original per-row matching loop.
+Run with: pytest test_statement_matcher.py
+"""
+
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+from statement_matcher import (
+    StatementMatchIndex, dedupe_statement_rows, extract_statement_fields, match_statement_rows
+)
+
+
+def legacy_extract(row, statement_df, column_mapping, field, as_amount=False):
+    """Original per-row extraction of one mapped field (text, amount or raw value)."""
+    if field not in column_mapping:
+        return 0 if as_amount else None
+    mapped_col = column_mapping[field]
+    val = None
+    try:
+        col_index = int(mapped_col)
+        if 0 <= col_index < len(row):
+            val = row.iloc[col_index]
+        else:
+            return 0 if as_amount else None
+    except ValueError:
+        if mapped_col in statement_df.columns:
+            val = row[mapped_col]
+        else:
+            matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
+            if not matching_cols:
+                return 0 if as_amount else None
+            val = row[matching_cols[0]]
+    if as_amount:
+        try:
+            return float(val) if pd.notna(val) else 0
+        except (ValueError, TypeError):
+            return 0
+    return val
+
+
+def legacy_text(val):
+    if val is not None and pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
+        return str(val).strip()
+    return ''
+
+
+def legacy_match(statement_df, column_mapping, outstanding_trans, all_customers, find_customer_matches):
+    """
+    Reference implementation of the original match_statement_transactions loop,
+    without the Streamlit debug output.
+    """
+    matched, unmatched, can_create = [], [], []
+
+    dedup_cols = []
+    for field in ['Customer', 'Policy Number', 'Effective Date', 'Agent Paid Amount (STMT)']:
+        if field in column_mapping:
+            mapped_col = column_mapping[field]
+            try:
+                col_index = int(mapped_col)
+                if 0 <= col_index < len(statement_df.columns):
+                    dedup_cols.append(col_index)
+            except ValueError:
+                if mapped_col in statement_df.columns:
+                    dedup_cols.append(mapped_col)
+    if dedup_cols:
+        statement_df = statement_df.drop_duplicates(subset=dedup_cols, keep='first')
+
+    existing_lookup = {}
+    customer_trans_lookup = {}
+    for idx, trans in outstanding_trans.iterrows():
+        trans_dict = trans.to_dict()
+        trans_dict['balance'] = trans['_balance']
+        eff_date_normalized = trans['Effective Date']
+        if pd.notna(eff_date_normalized):
+            try:
+                eff_date_normalized = pd.to_datetime(eff_date_normalized).strftime('%Y-%m-%d')
+            except Exception:
+                eff_date_normalized = str(eff_date_normalized)
+        existing_lookup[f"{trans['Policy Number']}_{eff_date_normalized}"] = trans_dict
+        customer = trans['Customer']
+        if pd.notna(customer):
+            customer_trans_lookup.setdefault(customer.lower().strip(), []).append(trans_dict)
+
+    for idx, row in statement_df.iterrows():
+        customer = legacy_text(legacy_extract(row, statement_df, column_mapping, 'Customer'))
+        policy_num = legacy_text(legacy_extract(row, statement_df, column_mapping, 'Policy Number'))
+        eff_date = legacy_extract(row, statement_df, column_mapping, 'Effective Date')
+
+        customer_lower = customer.lower()
+        if any(word in customer_lower for word in ['total', 'totals', 'subtotal', 'sub-total', 'grand total', 'sum']):
+            continue
+        if (not customer or customer.lower() in ['', 'nan', 'none']) and (not policy_num or policy_num.lower() in ['', 'nan', 'none']):
+            continue
+
+        amount = legacy_extract(row, statement_df, column_mapping, 'Agent Paid Amount (STMT)', as_amount=True)
+        if not customer and not policy_num and amount == 0:
+            continue
+        agency_amount = legacy_extract(row, statement_df, column_mapping, 'Agency Comm Received (STMT)', as_amount=True)
+
+        if pd.notna(eff_date):
+            try:
+                eff_date = pd.to_datetime(eff_date).strftime('%Y-%m-%d')
+            except Exception:
+                eff_date = str(eff_date)
+
+        match_result = {
+            'row_index': idx,
+            'customer': customer,
+            'policy_number': policy_num,
+            'effective_date': eff_date,
+            'amount': amount,
+            'agency_amount': agency_amount,
+            'statement_data': row.to_dict()
+        }
+
+        policy_key = f"{policy_num}_{eff_date}"
+        if policy_key in existing_lookup:
+            match_result['match'] = existing_lookup[policy_key]
+            match_result['confidence'] = 100
+            match_result['match_type'] = 'Policy + Date'
+            matched.append(match_result)
+            continue
+
+        potential_customers = find_customer_matches(customer, all_customers)
+        if potential_customers:
+            if len(potential_customers) == 1 and potential_customers[0][2] >= 90:
+                matched_customer = potential_customers[0][0]
+                customer_key = matched_customer.lower().strip()
+                if customer_key in customer_trans_lookup:
+                    customer_trans = customer_trans_lookup[customer_key]
+                    policy_num_stripped = str(policy_num).strip() if policy_num else ""
+                    amount_matched = False
+                    for trans in customer_trans:
+                        if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:
+                            trans_policy = str(trans.get('Policy Number', '')).strip()
+                            if trans_policy == policy_num_stripped and policy_num_stripped:
+                                match_result['match'] = trans
+                                match_result['confidence'] = 90
+                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy + Amount'
+                                match_result['matched_customer'] = matched_customer
+                                matched.append(match_result)
+                                amount_matched = True
+                                break
+                    if not amount_matched:
+                        policy_matched = False
+                        for trans in customer_trans:
+                            trans_policy = str(trans.get('Policy Number', '')).strip()
+                            if trans_policy == policy_num_stripped and policy_num_stripped:
+                                match_result['match'] = trans
+                                match_result['confidence'] = 95
+                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy'
+                                match_result['matched_customer'] = matched_customer
+                                matched.append(match_result)
+                                policy_matched = True
+                                break
+                        if not policy_matched:
+                            match_result['potential_matches'] = customer_trans
+                            match_result['potential_customers'] = potential_customers
+                            match_result['needs_selection'] = True
+                            unmatched.append(match_result)
+                else:
+                    match_result['potential_customers'] = potential_customers
+                    match_result['needs_selection'] = True
+                    unmatched.append(match_result)
+            else:
+                match_result['potential_customers'] = potential_customers
+                match_result['needs_selection'] = True
+                all_potential_trans = []
+                for potential_customer, match_type, score in potential_customers[:5]:
+                    customer_key = potential_customer.lower().strip()
+                    if customer_key in customer_trans_lookup:
+                        for trans in customer_trans_lookup[customer_key]:
+                            trans_copy = trans.copy()
+                            trans_copy['_customer_match'] = potential_customer
+                            trans_copy['_match_type'] = match_type
+                            trans_copy['_match_score'] = score
+                            all_potential_trans.append(trans_copy)
+                if all_potential_trans:
+                    match_result['potential_matches'] = all_potential_trans
+                unmatched.append(match_result)
+        else:
+            customer_key = customer.lower().strip()
+            if customer_key in customer_trans_lookup:
+                customer_matches = customer_trans_lookup[customer_key]
+                amount_matched = False
+                for trans in customer_matches:
+                    if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:
+                        if trans.get('Policy Number') == policy_num and policy_num:
+                            match_result['match'] = trans
+                            match_result['confidence'] = 90
+                            match_result['match_type'] = 'Customer + Policy + Amount'
+                            matched.append(match_result)
+                            amount_matched = True
+                            break
+                if not amount_matched:
+                    policy_matched = False
+                    for trans in customer_matches:
+                        if trans.get('Policy Number') == policy_num and policy_num:
+                            match_result['match'] = trans
+                            match_result['confidence'] = 95
+                            match_result['match_type'] = 'Customer + Policy'
+                            matched.append(match_result)
+                            policy_matched = True
+                            break
+                    if not policy_matched:
+                        match_result['potential_matches'] = customer_matches
+                        match_result['potential_customers'] = [(customer, 'exact', 100)]
+                        match_result['needs_selection'] = True
+                        unmatched.append(match_result)
+            else:
+                match_result['can_create'] = True
+                can_create.append(match_result)
+
+    return matched, unmatched, can_create
+
+
+def fake_customer_matches(search_name, existing_customers):
+    """Deterministic stand-in for find_potential_customer_matches: exact, spacing-insensitive and first-name matches."""
+    search = search_name.lower().strip()
+    if not search:
+        return []
+    results = []
+    for name in existing_customers:
+        candidate = name.lower().strip()
+        if candidate == search:
+            results.append((name, 'Exact', 100))
+        elif candidate.replace(' ', '') == search.replace(' ', ''):
+            results.append((name, 'Spacing', 95))
+        elif candidate.split()[0] == search.split()[0]:
+            results.append((name, 'First name', 70))
+    return sorted(results, key=lambda item: -item[2])
+
+
+def generate_case(n_trans=400, n_statement=600, seed=3):
+    """Outstanding transactions plus a statement mixing exact, fuzzy, new, total, empty and duplicate lines."""
+    rng = random.Random(seed)
+    first = ['Ann', 'Bob', 'Cara', 'Dan', 'Eve', 'Finn', 'Gail', 'Hugo']
+    last = ['Smith', 'Jones', 'Lee', 'Brown', 'Garcia', 'Nguyen']
+    customers = [f"{f} {l}" for f in first for l in last]
+
+    trans_rows = []
+    for i in range(n_trans):
+        eff = pd.Timestamp('2024-01-01') + pd.Timedelta(days=rng.randrange(0, 500))
+        trans_rows.append({
+            'Transaction ID': f"T{i:05d}",
+            'Customer': rng.choice(customers + [np.nan]),
+            'Policy Number': f"POL-{rng.randrange(0, n_trans // 2):04d}" + rng.choice(['', '', ' ']),
+            'Effective Date': eff.strftime(rng.choice(['%m/%d/%Y', '%Y-%m-%d'])),
+            'Total Agent Comm': round(rng.uniform(20, 500), 2),
+            '_balance': round(rng.choice([0, rng.uniform(20, 500)]), 2),
+        })
+    outstanding = pd.DataFrame(trans_rows)
+
+    lines = []
+    for _ in range(n_statement):
+        kind = rng.random()
+        trans = trans_rows[rng.randrange(n_trans)]
+        customer = trans['Customer'] if isinstance(trans['Customer'], str) else rng.choice(customers)
+        eff = pd.to_datetime(trans['Effective Date'], format='mixed')
+        amount = trans['_balance'] if rng.random() < 0.5 else round(rng.uniform(20, 500), 2)
+        policy = trans['Policy Number']
+        if kind < 0.25:
+            pass  # same policy and date
+        elif kind < 0.45:
+            eff = eff + pd.Timedelta(days=rng.choice([1, 30]))  # date mismatch: customer matching
+            customer = rng.choice([customer, customer.upper(), customer.replace(' ', ''), f"  {customer} "])
+        elif kind < 0.55:
+            customer = customer.split()[0] + ' Unknown'  # first-name-only matches
+        elif kind < 0.65:
+            customer, policy = f"New Customer {rng.randrange(50)}", f"NEW-{rng.randrange(100)}"
+        elif kind < 0.7:
+            customer, policy = rng.choice(['Grand Total', 'SUBTOTAL', 'Totals']), ''
+        elif kind < 0.75:
+            customer, policy = rng.choice(['', 'nan', None]), rng.choice(['', None])
+        elif kind < 0.8:
+            policy = f"POL-{rng.randrange(0, n_trans // 2):04d}"  # other policy of a known customer
+        lines.append({
+            'Client Name': customer,
+            'Policy #': policy,
+            'Eff': eff.strftime(rng.choice(['%m/%d/%Y', '%Y-%m-%d'])),
+            'Commission': rng.choice([amount, str(amount), 'n/a']) if rng.random() < 0.1 else amount,
+            'Agency Comm': round(amount * 1.5, 2),
+        })
+    lines.extend(lines[:20])  # duplicated lines
+    statement = pd.DataFrame(lines)
+
+    column_mapping = {
+        'Customer': 'client name',  # case-insensitive name
+        'Policy Number': 'Policy #',
+        'Effective Date': 'Eff',
+        'Agent Paid Amount (STMT)': 'Commission',
+        'Agency Comm Received (STMT)': 'Agency Comm',
+    }
+    # Some book customers are missing from the fuzzy list (exercises the exact-customer fallback)
+    all_customers = [name for name in customers if not name.startswith('Hugo')]
+    return statement, column_mapping, outstanding, all_customers
+
+
+def canonical(value):
+    """Comparable form of match results (NaN -> None, numpy scalars -> Python values)."""
+    if isinstance(value, dict):
+        return {key: canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def indexed_match(statement_df, column_mapping, outstanding, all_customers):
+    statement_df, _removed = dedupe_statement_rows(statement_df, column_mapping)
+    fields = extract_statement_fields(statement_df, column_mapping)
+    result = match_statement_rows(statement_df, fields, StatementMatchIndex(outstanding),
+                                  all_customers, fake_customer_matches)
+    return result['matched'], result['unmatched'], result['can_create']
+
+
+def test_matches_legacy_loop():
+    statement, column_mapping, outstanding, all_customers = generate_case()
+
+    expected = legacy_match(statement, column_mapping, outstanding, all_customers, fake_customer_matches)
+    actual = indexed_match(statement, column_mapping, outstanding, all_customers)
+
+    matched, unmatched, can_create = expected
+    # The generated case covers every outcome
+    assert {item['match_type'] for item in matched} >= {'Policy + Date', 'Customer + Policy'}
+    assert any(item['match_type'].startswith('Spacing') for item in matched)
+    assert any('potential_matches' in item for item in unmatched) and can_create
+
+    for expected_list, actual_list in zip(expected, actual):
+        assert canonical(actual_list) == canonical(expected_list)
+
+
+def test_matches_legacy_loop_with_positional_mapping():
+    statement, _mapping, outstanding, all_customers = generate_case(n_trans=150, n_statement=200, seed=9)
+    # Header-less statements: columns are positions and mappings are indexes (some fields unmapped)
+    statement.columns = range(len(statement.columns))
+    column_mapping = {'Customer': '0', 'Effective Date': '2', 'Agent Paid Amount (STMT)': '3', 'Policy Number': '1',
+                      'Agency Comm Received (STMT)': '9'}
+
+    expected = legacy_match(statement, column_mapping, outstanding, all_customers, fake_customer_matches)
+    actual = indexed_match(statement, column_mapping, outstanding, all_customers)
+
+    assert expected[0] and expected[1]
+    for expected_list, actual_list in zip(expected, actual):
+        assert canonical(actual_list) == canonical(expected_list)
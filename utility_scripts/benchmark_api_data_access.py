@@ -0,0 +1,125 @@
+"""
+Load-test the API server's data access on one worker: handlers calling the sync
+Supabase client inside async endpoints (the original code) versus awaiting the
+query through AsyncDataAccess (bounded executor offload, and the async client).
+
+Queries are simulated: most take a few milliseconds, a few are slow. Requests
+arrive at a fixed rate; latency is measured from arrival to response.
+
+Usage:
+    python utility_scripts/benchmark_api_data_access.py [requests] [requests_per_second]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'api_platform'))
+
+from database.async_data import AsyncDataAccess
+
+FAST_QUERY_SECONDS = 0.010
+SLOW_QUERY_SECONDS = 0.300
+SLOW_QUERY_SHARE = 0.05
+
+
+class SimulatedResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class SyncQuery:
+    """Sync client query: execute() blocks for the query's duration."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        time.sleep(self.seconds)
+        return SimulatedResponse([])
+
+
+class AsyncQuery(SyncQuery):
+    """Async client query: execute() awaits the response."""
+
+    async def execute(self):
+        await asyncio.sleep(self.seconds)
+        return SimulatedResponse([])
+
+
+class SimulatedClient:
+    def __init__(self, query_class, durations):
+        self.query_class = query_class
+        self.durations = iter(durations)
+
+    def table(self, name):
+        return self.query_class(next(self.durations))
+
+
+def query_durations(requests, seed=7):
+    rng = random.Random(seed)
+    return [SLOW_QUERY_SECONDS if rng.random() < SLOW_QUERY_SHARE else FAST_QUERY_SECONDS
+            for _ in range(requests)]
+
+
+async def load_test(requests, rate, handler):
+    """Latencies (seconds) of requests arriving at a fixed rate."""
+    started = time.perf_counter()
+
+    async def one(index):
+        arrival = started + index / rate
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        await handler()
+        return time.perf_counter() - arrival
+
+    return await asyncio.gather(*(one(index) for index in range(requests)))
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:<40} p50 {p50 * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    print(f"{requests:,} requests at {rate:.0f} req/s; queries {FAST_QUERY_SECONDS * 1000:.0f} ms, "
+          f"{SLOW_QUERY_SHARE:.0%} slow ({SLOW_QUERY_SECONDS * 1000:.0f} ms)\n")
+
+    blocking_client = SimulatedClient(SyncQuery, query_durations(requests))
+
+    async def blocking_handler():
+        blocking_client.table('policies').select("*").execute()
+
+    report("sync client in async handler (before)", asyncio.run(load_test(requests, rate, blocking_handler)))
+
+    offload_client = SimulatedClient(SyncQuery, query_durations(requests))
+    offload_db = AsyncDataAccess(lambda: offload_client)
+
+    async def offload_handler():
+        await offload_db.execute(offload_db.table('policies').select("*"))
+
+    report("AsyncDataAccess, executor offload", asyncio.run(load_test(requests, rate, offload_handler)))
+
+    async_db = AsyncDataAccess(lambda: None, async_client=SimulatedClient(AsyncQuery, query_durations(requests)))
+
+    async def async_handler():
+        await async_db.execute(async_db.table('policies').select("*"))
+
+    report("AsyncDataAccess, async client", asyncio.run(load_test(requests, rate, async_handler)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark API key verification throughput for one API worker: the original
+dependency (select + last_used update per request, run on the threadpool) versus
+the cached verifier (no I/O on a hit, last_used flushed in batches).
+
+The database is simulated with a fixed round-trip latency; requests are served
+concurrently on one event loop with FastAPI's default 40 threadpool workers.
+
+Usage:
+    python utility_scripts/benchmark_api_key_verification.py [requests] [latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'api_platform'))
+
+from auth.api_key_cache import APIKeyCache, APIKeyVerifier, LastUsedWriter, write_last_used
+
+THREADPOOL_WORKERS = 40
+CONCURRENT_REQUESTS = 100
+API_KEYS = 50
+
+
+class SlowResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class SlowQuery:
+    """Supabase-style query whose execute() costs one database round trip."""
+
+    def __init__(self, db):
+        self.db, self.key, self.is_update = db, None, False
+
+    def select(self, *args):
+        return self
+
+    def update(self, values):
+        self.is_update = True
+        return self
+
+    def eq(self, column, value):
+        if column == 'api_key':
+            self.key = value
+        return self
+
+    def in_(self, column, values):
+        return self
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        self.db.round_trips += 1
+        if self.is_update:
+            return SlowResponse([])
+        return SlowResponse([{'id': self.key, 'api_key': self.key, 'user_email': f'{self.key}@example.com'}])
+
+
+class SlowSupabase:
+    def __init__(self, latency):
+        self.latency = latency
+        self.round_trips = 0
+
+    def table(self, name):
+        return SlowQuery(self)
+
+
+def legacy_verify(supabase, api_key):
+    result = supabase.table('api_keys').select("*").eq('api_key', api_key).eq('is_active', True).execute()
+    key_data = result.data[0]
+    supabase.table('api_keys').update({'last_used': datetime.now().isoformat()}).eq('id', key_data['id']).execute()
+    return key_data
+
+
+async def serve(requests, handler):
+    """Serve requests with bounded concurrency; returns requests per second."""
+    semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+
+    async def one(index):
+        async with semaphore:
+            await handler(f"cipk_{index % API_KEYS}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000
+    pool = ThreadPoolExecutor(max_workers=THREADPOOL_WORKERS)
+    print(f"{requests:,} requests over {API_KEYS} keys, {latency * 1000:.0f} ms per database round trip\n")
+
+    legacy_db = SlowSupabase(latency)
+
+    async def legacy_handler(api_key):
+        await asyncio.get_running_loop().run_in_executor(pool, legacy_verify, legacy_db, api_key)
+
+    legacy_rps = asyncio.run(serve(requests, legacy_handler))
+    print(f"{'legacy (select + update per request)':<45} {legacy_rps:10,.0f} req/s  {legacy_db.round_trips:6,} round trips")
+
+    cached_db = SlowSupabase(latency)
+    verifier = APIKeyVerifier(lambda: cached_db, APIKeyCache(),
+                              LastUsedWriter(lambda batch: write_last_used(cached_db, batch)))
+
+    async def cached_handler(api_key):
+        hit, _ = verifier.verify_local(api_key)
+        if not hit:
+            await asyncio.get_running_loop().run_in_executor(pool, verifier.verify, api_key)
+
+    cached_rps = asyncio.run(serve(requests, cached_handler))
+    verifier.last_used.flush()
+    print(f"{'cached verifier (write-behind last_used)':<45} {cached_rps:10,.0f} req/s  {cached_db.round_trips:6,} round trips")
+    print(f"\nSpeedup: {cached_rps / legacy_rps:.0f}x")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
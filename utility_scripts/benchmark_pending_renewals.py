@@ -0,0 +1,93 @@
+"""
+Benchmark pending renewal detection on a synthetic book: the original
+sort/drop_duplicates/isin implementation versus the precomputed RenewalIndex.
+
+Usage:
+    python utility_scripts/benchmark_pending_renewals.py [rows]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pending_renewals import RenewalIndex, summarize_due_windows
+
+
+def build_book(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Synthetic policies book: several terms per policy, STMT entries, renewals and cancellations."""
+    rng = np.random.default_rng(seed)
+    policies = max(1, rows // 4)
+    policy_numbers = np.array([f"POL{i:07d}" for i in range(policies)])
+    policy = policy_numbers[rng.integers(0, policies, rows)]
+    today = pd.Timestamp(datetime.date.today())
+    x_dates = today + pd.to_timedelta(rng.integers(-400, 800, rows), unit='D')
+    transaction_types = rng.choice(['NEW', 'RWL', 'REWRITE', 'END', 'CAN', 'PCH'], rows, p=[.3, .35, .05, .2, .03, .07])
+    ids = np.array([f"T{i:07d}" for i in range(rows)], dtype=object)
+    is_stmt = rng.random(rows) < 0.25
+    ids[is_stmt] = [f"{tid}-STMT-20250101" for tid in ids[is_stmt]]
+    prior = np.where(rng.random(rows) < 0.1, policy_numbers[rng.integers(0, policies, rows)], None)
+    return pd.DataFrame({
+        'Transaction ID': ids,
+        'Customer': [f"Customer {i % 5000}" for i in range(rows)],
+        'Policy Number': policy,
+        'Transaction Type': transaction_types,
+        'X-DATE': x_dates.strftime('%Y-%m-%d'),
+        'Prior Policy Number': prior,
+    })
+
+
+def legacy_pending_renewals(df: pd.DataFrame) -> pd.DataFrame:
+    """The original get_pending_renewals (without debug output)."""
+    all_policies = df[df["Transaction Type"].isin(["NEW", "RWL", "REWRITE"])]
+    all_policies = all_policies[
+        ~all_policies['Transaction ID'].astype(str).str.contains('-STMT-|-VOID-|-ADJ-', case=False, na=False)
+    ]
+    renewal_candidates = all_policies.copy()
+    renewal_candidates['expiration_date'] = pd.to_datetime(renewal_candidates["X-DATE"], errors='coerce')
+    renewal_candidates = renewal_candidates.sort_values(by=["Policy Number", "expiration_date"], ascending=[True, False])
+    latest_renewals = renewal_candidates.drop_duplicates(subset="Policy Number", keep="first")
+    today = pd.to_datetime(datetime.date.today())
+    latest_renewals['Days Until Expiration'] = (latest_renewals['expiration_date'] - today).dt.days
+    pending_renewals = latest_renewals[latest_renewals['Days Until Expiration'] <= 365].copy()
+    renewed_policies = df[df["Prior Policy Number"].notna()]["Prior Policy Number"].unique()
+    pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(renewed_policies)]
+    cancelled_policies = df[df["Transaction Type"].isin(["CAN", "XCL"])]["Policy Number"].unique()
+    pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(cancelled_policies)]
+    return pending_renewals.sort_values('Days Until Expiration', ascending=True)
+
+
+def timed(label, func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<45} {best * 1000:8.1f} ms")
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = build_book(rows)
+    print(f"Book: {rows:,} rows, {df['Policy Number'].nunique():,} policies\n")
+
+    legacy = timed("legacy get_pending_renewals", lambda: legacy_pending_renewals(df))
+    index = timed("RenewalIndex build (once per data version)", lambda: RenewalIndex(df))
+    pending = timed("RenewalIndex.pending (per page visit)", lambda: index.pending())
+    windows = timed("summarize_due_windows", lambda: summarize_due_windows(pending['Days Until Expiration']))
+
+    same_rows = sorted(legacy['Transaction ID']) == sorted(pending['Transaction ID'])
+    same_days = (legacy.set_index('Transaction ID')['Days Until Expiration'].sort_index()
+                 .equals(pending.set_index('Transaction ID')['Days Until Expiration'].sort_index()))
+    print(f"\nPending renewals: {len(pending):,} (same rows as legacy: {same_rows}, same days: {same_days})")
+    print(f"Due windows: {windows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark /v1/policies/batch ingestion: one insert request per policy, awaited in
+turn (the original loop over create_policy), versus validating up front and
+inserting through policy_ingestion.insert_rows (multi-row chunks, several in flight).
+
+Inserts are simulated: each request costs a round trip plus a little per row.
+
+Usage:
+    python utility_scripts/benchmark_policy_batch.py [batch_size] [round_trip_ms]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'api_platform'))
+
+from database.async_data import AsyncDataAccess
+from database.policy_ingestion import BATCH_INSERT_CHUNK_SIZE, BATCH_MAX_CONCURRENT_CHUNKS, insert_rows
+
+PER_ROW_SECONDS = 0.0002
+
+
+class SimulatedResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class SimulatedInsert:
+    def __init__(self, client, rows):
+        self.client, self.rows = client, rows if isinstance(rows, list) else [rows]
+
+    async def execute(self):
+        self.client.requests += 1
+        await asyncio.sleep(self.client.round_trip + PER_ROW_SECONDS * len(self.rows))
+        return SimulatedResponse([{**row, '_id': str(index)} for index, row in enumerate(self.rows)])
+
+
+class SimulatedClient:
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.requests = 0
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        return SimulatedInsert(self, rows)
+
+
+def policy_rows(count):
+    return [(index, {'Policy Number': f"POL-{index:05d}", 'Premium Sold': 1000.0}) for index in range(count)]
+
+
+def timed(label, client, func):
+    start = time.perf_counter()
+    asyncio.run(func())
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {elapsed * 1000:9.1f} ms   {client.requests:5d} requests")
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    round_trip = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000
+    rows = policy_rows(batch_size)
+    print(f"{batch_size:,} policies; {round_trip * 1000:.0f} ms per insert request\n")
+
+    sequential_client = SimulatedClient(round_trip)
+    sequential_db = AsyncDataAccess(lambda: None, async_client=sequential_client)
+
+    async def sequential():
+        for _index, row in rows:
+            await sequential_db.execute(sequential_db.table('policies').insert(row))
+
+    timed("one insert per policy (before)", sequential_client, sequential)
+
+    chunked_client = SimulatedClient(round_trip)
+    chunked_db = AsyncDataAccess(lambda: None, async_client=chunked_client)
+
+    async def chunked():
+        await insert_rows(chunked_db, 'policies', rows)
+
+    timed(f"chunks of {BATCH_INSERT_CHUNK_SIZE}, {BATCH_MAX_CONCURRENT_CHUNKS} in flight", chunked_client, chunked)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark the Policy Revenue Ledger Reports month view on a synthetic multi-year
+ledger: the original per-term iterrows scan versus one term assignment pass.
+
+Usage:
+    python utility_scripts/benchmark_policy_terms.py [policies]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from policy_terms import assign_policy_terms, transactions_for_term_month
+from test_policy_terms import generate_ledger, legacy_month_view
+
+
+def timed(label, func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<45} {best * 1000:8.1f} ms")
+    return result
+
+
+def main():
+    policies = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    ledger = generate_ledger(policies)
+    year_month = '2023-01'
+    print(f"Ledger: {len(ledger):,} rows, {policies:,} policies, month {year_month}\n")
+
+    legacy = timed("legacy month view (iterrows per term)", lambda: legacy_month_view(ledger, year_month), repeat=1)
+    timed("assign_policy_terms", lambda: assign_policy_terms(ledger))
+    month = timed("transactions_for_term_month", lambda: transactions_for_term_month(ledger, year_month))
+
+    same = list(month['Transaction ID']) == list(legacy['Transaction ID'])
+    print(f"\nMonth view: {len(month):,} transactions (same as legacy: {same})")
+
+
+if __name__ == "__main__":
+    main()
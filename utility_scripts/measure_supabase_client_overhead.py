@@ -0,0 +1,53 @@
+"""
+Measure Supabase client/connection overhead: a new client per call (old behaviour)
+versus the shared registry client from database_utils.get_supabase_client().
+
+Usage:
+    python utility_scripts/measure_supabase_client_overhead.py [calls]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from database_utils import _resolve_credentials, get_client_stats, get_supabase_client
+
+load_dotenv()
+
+
+def run_query(client):
+    client.table('policies').select('"Transaction ID"').limit(1).execute()
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    _environment, _role, url, key = _resolve_credentials()
+    if not url or not key:
+        print("Error: Supabase URL and key must be set in environment variables")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        run_query(create_client(url, key))
+    per_call_client = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        run_query(get_supabase_client())
+    shared_client = time.perf_counter() - start
+
+    print(f"{calls} queries, new client per call: {per_call_client:.2f}s ({per_call_client / calls * 1000:.1f} ms/query)")
+    print(f"{calls} queries, shared pooled client: {shared_client:.2f}s ({shared_client / calls * 1000:.1f} ms/query)")
+    for name, stats in get_client_stats().items():
+        print(f"\n{name}:")
+        for stat, value in stats.items():
+            print(f"  {stat}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Report the in-memory size of a synthetic policies book as loaded and in the
+compact representation used when COMPACT_POLICIES_CACHE=1.
+
+Usage:
+    python utility_scripts/report_policies_memory.py [rows]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_policies import compact_policies_frame, expand_policies_frame, frame_bytes
+from test_compact_policies import make_policies
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_policies(rows)
+
+    started = time.perf_counter()
+    compact = compact_policies_frame(df)
+    compact_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    expanded = expand_policies_frame(compact)
+    expand_seconds = time.perf_counter() - started
+
+    before, after = frame_bytes(df), frame_bytes(compact)
+    print(f"Book: {rows:,} rows\n")
+    print(f"{'column':<25} {'as loaded':>12} {'compact':>12}")
+    loaded_usage = df.memory_usage(deep=True, index=False)
+    compact_usage = compact.memory_usage(deep=True, index=False)
+    for column in df.columns:
+        print(f"{column:<25} {loaded_usage[column] / 1024:>10,.0f}KB {compact_usage[column] / 1024:>10,.0f}KB")
+    print(f"\n{'total':<25} {before / 1_048_576:>10,.2f}MB {after / 1_048_576:>10,.2f}MB ({after / before:.0%})")
+    print(f"compact {compact_seconds * 1000:.1f} ms, expand {expand_seconds * 1000:.1f} ms, "
+          f"round trip identical: {expanded.equals(df)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,11 @@ import os
 import stripe
 import json
 from flask import Flask, request, jsonify
-from supabase import create_client, Client
 from datetime import datetime, timedelta
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from email_utils import send_welcome_email
+from database_utils import get_registered_client
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -23,7 +23,7 @@ def get_supabase_client():
     if not url or not key:
         print("Warning: Supabase credentials not configured")
         return None
-    return create_client(url, key)
+    return get_registered_client('PRODUCTION', 'anon', url, key)
 
 @app.route('/')
 def home():